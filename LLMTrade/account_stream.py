@@ -0,0 +1,213 @@
+"""
+OKX 私有 WebSocket：account / orders / orders-algo 推送，维护本地余额与订单缓存。
+
+- BalanceCache：线程安全（推送在事件循环线程写，TrendBot 在自己的线程读），
+  version 每次余额变化 +1；下单后可 wait_newer 等推送到达
+- AccountStream：登录（HMAC 签名）后订阅，断线重连复用 market_feed.WSConnection，
+  重连后交易所会重推账户快照；断线期间缓存标记为不可用，调用方回落 REST
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+
+from market_feed import WSConnection, PING_INTERVAL
+
+PRIVATE_URL = "wss://ws.okx.com:8443/ws/v5/private"
+# 终态：这些订单不再变化
+FINAL_ORDER_STATES = ("filled", "canceled", "mmp_canceled")
+
+
+def _detail(balance_resp: Dict[str, Any], ccy: str) -> Dict[str, Any]:
+    # REST /account/balance 返回：data[0].details[] 里找 ccy
+    try:
+        for d in balance_resp["data"][0].get("details", []):
+            if d.get("ccy") == ccy:
+                return d
+    except Exception:
+        pass
+    return {}
+
+
+def parse_avail(balance_resp: Dict[str, Any], ccy: str) -> float:
+    # 可用余额 availBal（不含挂单冻结）
+    return float(_detail(balance_resp, ccy).get("availBal") or 0.0)
+
+
+def parse_total(balance_resp: Dict[str, Any], ccy: str) -> float:
+    # 总余额 = 可用 + 挂单冻结（availBal + frozenBal）
+    d = _detail(balance_resp, ccy)
+    return float(d.get("availBal") or 0.0) + float(d.get("frozenBal") or 0.0)
+
+
+class BalanceCache:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.balances: Dict[str, Dict[str, float]] = {}
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.algos: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self.ready = False            # 已收到快照且连接在线
+        self.updated_at = 0.0         # 最近一次余额写入（monotonic）
+        self.reconciled_at = 0.0      # 最近一次 REST 对账（monotonic）
+
+    # ---------- 写入（推送 / REST 对账） ----------
+    def apply_account(self, data: List[Dict[str, Any]], snapshot: bool = False) -> None:
+        with self._cond:
+            for acct in data:
+                for d in acct.get("details", []):
+                    self.balances[d["ccy"]] = {
+                        "availBal": float(d.get("availBal") or 0.0),
+                        "cashBal": float(d.get("cashBal") or 0.0),
+                        "frozenBal": float(d.get("frozenBal") or 0.0),
+                    }
+            self.version += 1
+            self.updated_at = time.monotonic()
+            if snapshot:
+                self.ready = True
+            self._cond.notify_all()
+
+    def apply_rest(self, ccy: str, balance_resp: Dict[str, Any]) -> None:
+        with self._cond:
+            cur = self.balances.setdefault(ccy, {"availBal": 0.0, "cashBal": 0.0, "frozenBal": 0.0})
+            d = _detail(balance_resp, ccy)
+            cur["availBal"] = float(d.get("availBal") or 0.0)
+            cur["frozenBal"] = float(d.get("frozenBal") or 0.0)
+            cur["cashBal"] = float(d.get("cashBal") or 0.0)
+            self.reconciled_at = time.monotonic()
+
+    def apply_rest_snapshot(self, balance_resp: Dict[str, Any]) -> None:
+        # 组合模式没有私有推送：一次 REST 查多个币种，整体当作快照并记为刚对过账
+        self.apply_account(balance_resp.get("data") or [], snapshot=True)
+        with self._cond:
+            self.reconciled_at = time.monotonic()
+
+    def apply_orders(self, data: List[Dict[str, Any]]) -> None:
+        with self._cond:
+            for o in data:
+                self.orders[o["ordId"]] = o
+
+    def apply_algos(self, data: List[Dict[str, Any]]) -> None:
+        with self._cond:
+            for a in data:
+                self.algos[a["algoId"]] = a
+
+    def invalidate(self) -> None:
+        with self._cond:
+            self.ready = False
+
+    # ---------- 读取 ----------
+    def avail(self, ccy: str) -> Optional[float]:
+        with self._cond:
+            if not self.ready:
+                return None
+            b = self.balances.get(ccy)
+            return b["availBal"] if b is not None else 0.0
+
+    def total(self, ccy: str) -> Optional[float]:
+        """可用 + 冻结；连接不可用时为 None。"""
+        with self._cond:
+            if not self.ready:
+                return None
+            b = self.balances.get(ccy)
+            return b["availBal"] + b["frozenBal"] if b is not None else 0.0
+
+    def wait_newer(self, version: int, timeout: float) -> bool:
+        """等到 version 之后的余额推送（下单后用）；超时返回 False。"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.version > version, timeout=timeout)
+
+    def open_orders(self, inst_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [o for o in self.orders.values()
+                    if o.get("state") not in FINAL_ORDER_STATES and (inst_id is None or o.get("instId") == inst_id)]
+
+
+def login_args(api_key: str, api_secret: str, passphrase: str, ts: Optional[str] = None) -> Dict[str, str]:
+    # WebSocket 登录签名：Base64(HMAC_SHA256(secret, timestamp + "GET" + "/users/self/verify"))，timestamp 为秒
+    ts = ts or str(int(time.time()))
+    mac = hmac.new(api_secret.encode(), f"{ts}GET/users/self/verify".encode(), hashlib.sha256)
+    return {"apiKey": api_key, "passphrase": passphrase, "timestamp": ts,
+            "sign": base64.b64encode(mac.digest()).decode()}
+
+
+class AccountStream:
+    def __init__(self, api_key: str, api_secret: str, passphrase: str, url: str = PRIVATE_URL,
+                 cache: Optional[BalanceCache] = None, inst_type: str = "SPOT",
+                 on_order: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_algo: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 ping_interval: float = PING_INTERVAL):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.passphrase = passphrase
+        self.cache = cache or BalanceCache()
+        self.on_order = on_order
+        self.on_algo = on_algo
+        self.conn = WSConnection(url, self._on_message, ping_interval, on_open=self._login,
+                                 on_close=self.cache.invalidate)
+        self.conn.args = [
+            {"channel": "account"},
+            {"channel": "orders", "instType": inst_type},
+            {"channel": "orders-algo", "instType": inst_type},
+        ]
+        self._account_seen = False
+
+    async def _login(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        self.cache.invalidate()
+        self._account_seen = False
+        await ws.send_str(json.dumps({"op": "login", "args": [
+            login_args(self.api_key, self.api_secret, self.passphrase)]}))
+        while True:
+            msg = await ws.receive(timeout=10.0)
+            if msg.type != aiohttp.WSMsgType.TEXT or msg.data == "pong":
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    raise ConnectionError(f"websocket closed during login: {msg.type}")
+                continue
+            resp = json.loads(msg.data)
+            if resp.get("event") == "login":
+                if str(resp.get("code")) != "0":
+                    raise PermissionError(f"login failed code={resp.get('code')} msg={resp.get('msg')}")
+                return
+            if resp.get("event") == "error":
+                raise PermissionError(f"login failed code={resp.get('code')} msg={resp.get('msg')}")
+
+    def _on_message(self, msg: Dict[str, Any]) -> None:
+        if "event" in msg:
+            if msg["event"] == "error":
+                print(f"[WS] 私有频道错误：{msg.get('code')} {msg.get('msg')}")
+            return
+        channel = (msg.get("arg") or {}).get("channel")
+        data = msg.get("data") or []
+        if channel == "account":
+            # 订阅后的第一条是全量快照，之后是变动
+            self.cache.apply_account(data, snapshot=not self._account_seen)
+            self._account_seen = True
+        elif channel == "orders":
+            self.cache.apply_orders(data)
+            if self.on_order is not None:
+                for o in data:
+                    self.on_order(o)
+        elif channel == "orders-algo":
+            self.cache.apply_algos(data)
+            if self.on_algo is not None:
+                for a in data:
+                    self.on_algo(a)
+
+    async def run(self) -> None:
+        await self.conn.run()
+
+    async def stop(self) -> None:
+        await self.conn.stop()
+        self.cache.invalidate()
+
+    def start_in_thread(self) -> threading.Thread:
+        """给同步主循环用：在守护线程里跑自己的事件循环。"""
+        t = threading.Thread(target=lambda: asyncio.run(self.run()), name="okx-private-ws", daemon=True)
+        t.start()
+        return t
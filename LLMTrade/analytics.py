@@ -0,0 +1,215 @@
+"""
+回测绩效分析（全部向量化）：输入是权益曲线和成交数组（backtest.TRADE_DTYPE），
+一次调用同时算成百上千个回测（扫描结果），不按回测逐个写 Python 循环。
+
+- equity_metrics：equity 形状 (runs, bars)（单条可传 1 维）-> 收益、波动、Sharpe/Sortino、CAGR、
+  最大回撤及最长水下时长（根数）、Calmar、持仓时间占比
+- trade_metrics：按 (run, cycle) 把成交归成一轮轮仓位，已平仓的轮次算胜率、期望、盈亏比
+- tranche_attribution：每轮盈亏拆到入场批次（tranche_quotes 的第几批）× 出场方式（TP1 / 追踪止损）；
+  同一轮各批共用同一批卖单，按买入数量占比分摊卖出所得，减去该批自己的买入成本
+- summarize / metric_rows：直接吃 BacktestResult 列表，得到逐 run 的标量指标（供 sweep 结果表）
+
+轮次盈亏 = 卖出净额 - 买入成本 × 卖出数量 / 买入数量（残留的零头不计成本）；最后一轮未平仓不计入。
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backtest import BacktestResult, TP1, STOP
+from timeframes import bar_to_ms
+
+YEAR_MS = 365 * 24 * 3600 * 1000
+
+# 出场方式（tranche_attribution 最后一维）
+EXIT_NAMES = ("tp1", "trail")
+
+# metric_rows 输出的标量字段
+ANALYTICS_FIELDS = ("sharpe", "sortino", "cagr", "max_dd_bars", "win_rate", "expectancy",
+                    "profit_factor", "tp1_pnl", "trail_pnl")
+
+
+def periods_per_year(bar: str) -> float:
+    return YEAR_MS / bar_to_ms(bar)
+
+
+def _div(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # 分母为 0 时记 0（无交易/无波动的 run）
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    return np.divide(a, b, out=np.zeros(a.shape), where=b != 0)
+
+
+def _as_2d(x: Any) -> np.ndarray:
+    arr = np.asarray(x, dtype=np.float64)
+    return arr[None, :] if arr.ndim == 1 else arr
+
+
+# ---------- 权益曲线 ----------
+def drawdowns(equity: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """返回 (回撤比例, 水下根数)，形状同 equity（2 维）。"""
+    eq = _as_2d(equity)
+    peak = np.maximum.accumulate(eq, axis=1)
+    dd = 1.0 - _div(eq, peak)
+    idx = np.broadcast_to(np.arange(eq.shape[1]), eq.shape)
+    last_peak = np.maximum.accumulate(np.where(eq >= peak, idx, 0), axis=1)
+    return dd, idx - last_peak
+
+
+def equity_metrics(equity: Any, periods: float = 8760.0, initial: Optional[Any] = None,
+                   position: Optional[Any] = None) -> Dict[str, np.ndarray]:
+    """
+    equity：(runs, bars) 每根收盘后的权益；initial 给了就作为第 0 点（标量或每 run 一个）。
+    periods：每年多少根（periods_per_year(bar)），用于年化。
+    """
+    eq = _as_2d(equity)
+    if initial is not None:
+        init = np.broadcast_to(np.asarray(initial, dtype=np.float64), (eq.shape[0],))
+        eq = np.concatenate([init[:, None], eq], axis=1)
+    runs, n = eq.shape
+    r = _div(eq[:, 1:], eq[:, :-1]) - 1.0 if n > 1 else np.zeros((runs, 0))
+    steps = r.shape[1]
+    mean = r.mean(axis=1) if steps else np.zeros(runs)
+    std = r.std(axis=1, ddof=1) if steps > 1 else np.zeros(runs)
+    downside = np.sqrt((np.minimum(r, 0.0) ** 2).mean(axis=1)) if steps else np.zeros(runs)
+    growth = _div(eq[:, -1], eq[:, 0]) if n else np.ones(runs)
+    cagr = np.where(growth > 0, np.power(np.maximum(growth, 1e-300), periods / max(steps, 1)) - 1.0, -1.0)
+    dd, under = drawdowns(eq)
+    max_dd = dd.max(axis=1) if n else np.zeros(runs)
+    out = {
+        "total_return": growth - 1.0,
+        "cagr": cagr,
+        "volatility": std * np.sqrt(periods),
+        "sharpe": _div(mean, std) * np.sqrt(periods),
+        "sortino": _div(mean, downside) * np.sqrt(periods),
+        "max_drawdown": max_dd,
+        "max_dd_bars": (under.max(axis=1) if n else np.zeros(runs)).astype(np.float64),
+        "calmar": _div(cagr, max_dd),
+    }
+    if position is not None:
+        out["exposure"] = (_as_2d(position) > 0.0).mean(axis=1)
+    return out
+
+
+# ---------- 成交 ----------
+def stack_trades(trade_lists: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """多个 run 的成交拼成一个数组 + 每行所属 run 下标。"""
+    if not trade_lists:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int64)
+    run = np.repeat(np.arange(len(trade_lists)), [t.size for t in trade_lists])
+    return np.concatenate(trade_lists), run
+
+
+def _cycles(trades: np.ndarray, run: Optional[np.ndarray], n_runs: Optional[int]) -> Dict[str, Any]:
+    # (run, cycle) -> 扁平下标 key；按 key 聚合买入成本/数量、卖出净额/数量
+    run = np.zeros(trades.size, dtype=np.int64) if run is None else np.asarray(run, dtype=np.int64)
+    n_runs = (int(run.max()) + 1 if run.size else 1) if n_runs is None else n_runs
+    n_cyc = int(trades["cycle"].max()) + 1 if trades.size else 1
+    key = run * n_cyc + trades["cycle"].astype(np.int64)
+    size = n_runs * n_cyc
+    buy = trades["side"] > 0
+    gross = trades["qty"] * trades["price"]
+    qty_in = np.bincount(key, np.where(buy, trades["qty"], 0.0), size)
+    cost_in = np.bincount(key, np.where(buy, gross + trades["fee"], 0.0), size)
+    qty_out = np.bincount(key, np.where(buy, 0.0, trades["qty"]), size)
+    net_out = np.bincount(key, np.where(buy, 0.0, gross - trades["fee"]), size)
+    # 已平仓：该 run 后面还有轮次，或本轮卖出数量 ≈ 买入数量
+    last = np.full(n_runs, -1, dtype=np.int64)
+    np.maximum.at(last, run, trades["cycle"].astype(np.int64))
+    cyc_idx = np.tile(np.arange(n_cyc), n_runs)
+    run_idx = np.repeat(np.arange(n_runs), n_cyc)
+    closed = (qty_in > 0) & ((cyc_idx < last[run_idx]) | (qty_out >= qty_in * (1.0 - 1e-9)))
+    sold_frac = _div(qty_out, qty_in)
+    return {"run": run, "key": key, "n_runs": n_runs, "n_cyc": n_cyc, "buy": buy, "gross": gross,
+            "qty_in": qty_in, "cost_in": cost_in, "qty_out": qty_out, "sold_frac": sold_frac,
+            "pnl": net_out - cost_in * sold_frac, "closed": closed}
+
+
+def trade_metrics(trades: np.ndarray, run: Optional[np.ndarray] = None,
+                  n_runs: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """逐 run（run 为每笔成交所属 run 下标）统计已平仓轮次：胜率、期望、平均盈/亏、盈亏比。"""
+    c = _cycles(trades, run, n_runs)
+    shape = (c["n_runs"], c["n_cyc"])
+    pnl = c["pnl"].reshape(shape)
+    closed = c["closed"].reshape(shape)
+    win = closed & (pnl > 0)
+    loss = closed & (pnl <= 0)
+    n = closed.sum(axis=1)
+    gains = np.where(win, pnl, 0.0).sum(axis=1)
+    losses = -np.where(loss, pnl, 0.0).sum(axis=1)
+    return {
+        "cycles_closed": n.astype(np.float64),
+        "win_rate": _div(win.sum(axis=1), n),
+        "expectancy": _div(gains - losses, n),
+        "avg_win": _div(gains, win.sum(axis=1)),
+        "avg_loss": _div(losses, loss.sum(axis=1)),
+        "profit_factor": np.where(losses > 0, _div(gains, losses), np.where(gains > 0, np.inf, 0.0)),
+        "realized_pnl": gains - losses,
+        "fees": np.bincount(c["run"], trades["fee"], c["n_runs"]) if trades.size else np.zeros(c["n_runs"]),
+    }
+
+
+def tranche_attribution(trades: np.ndarray, run: Optional[np.ndarray] = None, n_runs: Optional[int] = None,
+                        n_tranches: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    已平仓轮次的盈亏按 入场批次 × 出场方式 拆分：
+      pnl[run, i, k] = Σ_cycle 批次 i 数量占比 × 出场 k 卖出净额 - 批次 i 成本 × 出场 k 卖出数量 / 本轮买入数量
+    对 k 求和得各批次盈亏，对 i 求和得 TP1 / 追踪止损各自的盈亏，全部求和 = 已平仓轮次总盈亏。
+    """
+    c = _cycles(trades, run, n_runs)
+    n_t = n_tranches or (int(trades["tranche"].max()) if trades.size else 1) or 1
+    size = c["n_runs"] * c["n_cyc"]
+    key, buy = c["key"], c["buy"]
+    tranche = np.clip(trades["tranche"].astype(np.int64) - 1, 0, n_t - 1)
+    key_t = key * n_t + tranche
+    qty_t = np.bincount(key_t, np.where(buy, trades["qty"], 0.0), size * n_t).reshape(size, n_t)
+    cost_t = np.bincount(key_t, np.where(buy, c["gross"] + trades["fee"], 0.0), size * n_t).reshape(size, n_t)
+    exit_k = np.where(trades["kind"] == TP1, 0, 1)
+    sells = ~buy & ((trades["kind"] == TP1) | (trades["kind"] == STOP))
+    key_k = key * 2 + exit_k
+    net_k = np.bincount(key_k, np.where(sells, c["gross"] - trades["fee"], 0.0), size * 2).reshape(size, 2)
+    qty_k = np.bincount(key_k, np.where(sells, trades["qty"], 0.0), size * 2).reshape(size, 2)
+
+    share = _div(qty_t, c["qty_in"][:, None])                        # (key, tranche)
+    frac_k = _div(qty_k, c["qty_in"][:, None])                       # (key, exit)
+    pnl = share[:, :, None] * net_k[:, None, :] - cost_t[:, :, None] * frac_k[:, None, :]
+    pnl = np.where(c["closed"][:, None, None], pnl, 0.0)
+    pnl = pnl.reshape(c["n_runs"], c["n_cyc"], n_t, 2).sum(axis=1)
+    cost = np.where(c["closed"][:, None], cost_t, 0.0).reshape(c["n_runs"], c["n_cyc"], n_t).sum(axis=1)
+    exits = np.where(c["closed"][:, None], qty_k > 0, False).reshape(c["n_runs"], c["n_cyc"], 2).sum(axis=1)
+    return {
+        "pnl": pnl,                                   # (runs, tranches, 2)
+        "tranche_pnl": pnl.sum(axis=2),               # (runs, tranches)
+        "tranche_cost": cost,                         # (runs, tranches) 已平仓轮次里各批投入
+        "tranche_return": _div(pnl.sum(axis=2), cost),
+        "exit_pnl": pnl.sum(axis=1),                  # (runs, 2)：tp1 / trail
+        "exit_cycles": exits.astype(np.float64),      # (runs, 2)：有该出场方式成交的轮次数
+    }
+
+
+# ---------- 汇总 ----------
+def summarize(results: Sequence[BacktestResult], bar: str, initial_quote: Optional[Any] = None,
+              n_tranches: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """一组 BacktestResult（K线区间相同）-> 逐 run 指标数组；initial_quote 默认取各自 stats。"""
+    if not results:
+        return {}
+    lengths = {r.equity.size for r in results}
+    if len(lengths) != 1:
+        raise ValueError(f"equity curves differ in length: {sorted(lengths)}")
+    if initial_quote is None:
+        initial_quote = np.array([r.stats["initial_equity"] for r in results])
+    out = equity_metrics(np.stack([r.equity for r in results]), periods_per_year(bar), initial_quote,
+                         np.stack([r.position for r in results]))
+    trades, run = stack_trades([r.trades for r in results])
+    out.update(trade_metrics(trades, run, len(results)))
+    attr = tranche_attribution(trades, run, len(results), n_tranches)
+    out.update(attr)
+    out["tp1_pnl"] = attr["exit_pnl"][:, 0]
+    out["trail_pnl"] = attr["exit_pnl"][:, 1]
+    return out
+
+
+def metric_rows(metrics: Dict[str, np.ndarray], fields: Sequence[str] = ANALYTICS_FIELDS) -> List[Dict[str, float]]:
+    """summarize 的结果转成逐 run 的标量字典。"""
+    if not metrics:
+        return []
+    cols = [(k, metrics[k].tolist()) for k in fields]
+    return [{k: v[i] for k, v in cols} for i in range(len(cols[0][1]))]
@@ -0,0 +1,123 @@
+"""
+非阻塞 LLM 过滤：模型调用放到线程池里，决策路径只等到 deadline，超时/出错按回退策略给结论。
+
+- submit：提交一次判断，返回 Future（调用方自己决定等多久）
+- allow_trade：同 LLMFilter 接口；最多等 deadline_s，过了就回退：
+    allow  放行      deny  本轮不交易      last  沿用该品种最近一次模型给出的判断（没有则用 default）
+  超时的请求不取消，晚到的结论照样记为“最近一次判断”（内层有缓存时也照常写入缓存）
+- prefetch：收盘前用试算 payload（未收盘K线算的指标）提前发请求；收盘后的正式 payload
+  分桶特征（llm_cache.feature_key）与试算一致就直接用预取的 Future，否则重新请求
+- drain(timeout)：等已提交的请求全部结束（含“最近一次判断”的记录），退出/测试时用
+- stats：calls / prefetch_hits / prefetch_misses / timeouts / errors / latency_ms_last / latency_ms_max
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Optional, Tuple
+
+from llm_cache import feature_key
+from llm_filter import LLMFilter
+
+FALLBACKS = ("allow", "deny", "last")
+
+
+class AsyncLLMFilter(LLMFilter):
+    def __init__(self, inner: LLMFilter, deadline_s: float = 2.0, fallback: str = "last",
+                 default: bool = True, workers: int = 8, prefetch_ttl_s: float = 120.0):
+        if fallback not in FALLBACKS:
+            raise ValueError(f"fallback must be one of {FALLBACKS}")
+        super().__init__(inner.enabled)
+        self.inner = inner
+        self.deadline_s = deadline_s
+        self.fallback = fallback
+        self.default = default
+        self.prefetch_ttl_s = prefetch_ttl_s
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="llm")
+        self._last: Dict[str, bool] = {}
+        # instId -> (分桶 key, Future, 提交时刻)
+        self._prefetched: Dict[str, Tuple[str, Future, float]] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._inflight = 0
+        self.stats = {"calls": 0, "prefetch_hits": 0, "prefetch_misses": 0, "timeouts": 0, "errors": 0,
+                      "latency_ms_last": 0.0, "latency_ms_max": 0.0}
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, payload: Dict[str, Any]) -> Future:
+        inst_id = payload.get("instId", "")
+        with self._lock:
+            self._inflight += 1
+        try:
+            fut = self.pool.submit(self.inner.allow_trade, dict(payload))
+        except RuntimeError:
+            with self._lock:
+                self._inflight -= 1
+            raise
+
+        def done(f: Future) -> None:
+            # 晚到的结论也算“最近一次判断”
+            ok = not f.cancelled() and f.exception() is None
+            with self._lock:
+                if ok:
+                    self._last[inst_id] = bool(f.result())
+                self._inflight -= 1
+                self._idle.notify_all()
+        fut.add_done_callback(done)
+        return fut
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """等所有已提交的请求结束；超时返回 False。"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._inflight == 0, timeout=timeout)
+
+    def prefetch(self, payload: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        key = feature_key(payload, share_across_inst=False)
+        fut = self.submit(payload)
+        with self._lock:
+            self._prefetched[payload.get("instId", "")] = (key, fut, time.monotonic())
+
+    def _take_prefetched(self, payload: Dict[str, Any]) -> Optional[Future]:
+        with self._lock:
+            hit = self._prefetched.pop(payload.get("instId", ""), None)
+        if hit is None:
+            return None
+        key, fut, at = hit
+        if time.monotonic() - at <= self.prefetch_ttl_s and key == feature_key(payload, share_across_inst=False):
+            self.stats["prefetch_hits"] += 1
+            return fut
+        self.stats["prefetch_misses"] += 1
+        return None
+
+    def _fallback(self, inst_id: str) -> bool:
+        if self.fallback == "allow":
+            return True
+        if self.fallback == "deny":
+            return False
+        with self._lock:
+            return self._last.get(inst_id, self.default)
+
+    def allow_trade(self, payload: Dict[str, Any]) -> bool:
+        if not self.enabled:
+            return True
+        t0 = time.monotonic()
+        inst_id = payload.get("instId", "")
+        self.stats["calls"] += 1
+        fut = self._take_prefetched(payload) or self.submit(payload)
+        try:
+            allow = bool(fut.result(timeout=self.deadline_s))
+        except FutureTimeout:
+            self.stats["timeouts"] += 1
+            allow = self._fallback(inst_id)
+            print(f"[LLM] {inst_id} 超过 {self.deadline_s:.1f}s 未返回，按 {self.fallback} 回退：{allow}")
+        except Exception as e:
+            self.stats["errors"] += 1
+            allow = self._fallback(inst_id)
+            print(f"[LLM] {inst_id} 调用失败（{e}），按 {self.fallback} 回退：{allow}")
+        ms = (time.monotonic() - t0) * 1000.0
+        self.stats["latency_ms_last"] = ms
+        self.stats["latency_ms_max"] = max(self.stats["latency_ms_max"], ms)
+        return allow
@@ -0,0 +1,137 @@
+"""
+异步 OKX REST 客户端（aiohttp）：与 OKXClient 同样的方法与签名（端点只在 OKXEndpoints
+里定义一次，组成 RequestSpec，两边各自执行），一个事件循环里可同时挂起多个品种/多个请求。
+
+- 连接池有上限（TCPConnector limit），keep-alive 复用连接，不必每次握手
+- 重试用 asyncio.sleep，不阻塞事件循环里的其它请求
+- SyncOKXClient：同步外观，后台线程跑事件循环，现有 TrendBot/backfill 调用方式不变
+  （线程安全：多个线程的请求在同一个循环、同一个连接池里并发）
+"""
+import asyncio
+import threading
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+
+from okx_client import OKXClient, OKXEndpoints, RequestSpec
+from rate_limit import RateLimiter
+
+T = TypeVar("T")
+
+DEFAULT_MAX_CONNECTIONS = 32
+
+
+class AsyncOKXClient(OKXEndpoints):
+    """端点定义继承自 OKXEndpoints（与 OKXClient 同一份），这里只负责用 aiohttp 执行。"""
+
+    def __init__(self, api_key: str, api_secret: str, passphrase: str, base_url: str,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS, timeout: float = 10.0,
+                 keepalive: float = 30.0, limiter: Optional[RateLimiter] = None):
+        super().__init__(api_key, api_secret, passphrase, base_url, limiter=limiter)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    # ---------- 连接池 ----------
+    def _get_session(self) -> aiohttp.ClientSession:
+        # 懒创建：必须在事件循环里构造
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=self.keepalive)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Content-Type": "application/json"},
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "AsyncOKXClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def _call(self, spec: RequestSpec, parse: Callable[[Dict[str, Any]], Any] = lambda r: r) -> Any:
+        # 端点方法因此都返回协程：await cli.get_candles(...)
+        return parse(await self._request(*spec))
+
+    def _throttle(self, path: str):
+        return self.limiter.slot_async(path) if self.limiter is not None else nullcontext()
+
+    async def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                       body: Optional[Any] = None, auth: bool = False,
+                       retry: int = 2, partial_ok: bool = False) -> Dict[str, Any]:
+        method = method.upper()
+        session = self._get_session()
+        last_err: Optional[Exception] = None
+        for attempt in range(retry + 1):
+            throttled = False
+            try:
+                async with self._throttle(path):
+                    # 拿到令牌后再签名（排队可能较久，时间戳要新）
+                    request_path, body_str, headers = self._prepare(method, path, params, body, auth)
+                    if method == "GET":
+                        url = self.base_url + request_path
+                        async with session.get(url, headers=headers) as r:
+                            data = await r.json(content_type=None)
+                    else:
+                        url = self.base_url + path
+                        async with session.post(url, headers=headers, data=body_str) as r:
+                            data = await r.json(content_type=None)
+                last_err = self._check(data, partial_ok)
+                if last_err is None:
+                    return data
+                throttled = self._rate_limited(path, data)
+            except Exception as e:
+                last_err = e
+
+            if attempt < retry and not throttled:
+                await asyncio.sleep(0.6 * (attempt + 1))
+
+        raise last_err
+
+
+class SyncOKXClient(OKXClient):
+    """
+    同步外观：方法与 OKXClient 完全一致（只替换 _request），
+    请求实际在后台事件循环里由 AsyncOKXClient 发出。
+    """
+
+    def __init__(self, api_key: str, api_secret: str, passphrase: str, base_url: str,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS, timeout: float = 10.0,
+                 limiter: Optional[RateLimiter] = None):
+        super().__init__(api_key, api_secret, passphrase, base_url, limiter=limiter)
+        self.aio = AsyncOKXClient(api_key, api_secret, passphrase, base_url,
+                                  max_connections=max_connections, timeout=timeout, limiter=limiter)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="okx-aio", daemon=True)
+        self._thread.start()
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """在后台循环里执行协程并等待结果（可同时提交多个，再各自 result()）。"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                 body: Optional[Dict[str, Any]] = None, auth: bool = False,
+                 retry: int = 2, partial_ok: bool = False) -> Dict[str, Any]:
+        return self.run(self.aio._request(method, path, params, body, auth, retry, partial_ok))
+
+    def close(self) -> None:
+        if not self._loop.is_running():
+            return
+        self.run(self.aio.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> "SyncOKXClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
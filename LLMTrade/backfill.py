@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+历史K线回补：基于 OKXClient.get_history_candles 从新到旧翻页，
+多个 (instId, bar) 并发、共享限频（rate_limit，回补优先级最低），断点续传，最终写入本地K线库（candle_store）。
+
+- 每个任务的页先追加到暂存文件（按行 6 个 float64，倒序），检查点记录游标和已暂存行数
+- 中断后重启：按检查点截断暂存文件并从游标继续
+- 翻到 since 或交易所历史尽头后，一次性合并到 CandleSeries 头部
+
+用法：
+    python backfill.py --inst BTC-USDT,ETH-USDT --bar 1H,1m --since 2021-01-01 --workers 4
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from candle_store import CandleStore, COLUMNS
+from rate_limit import RateLimiter, ENDPOINT_LIMITS, PRIORITY_BACKFILL
+from vector_indicators import candles_to_arrays
+
+# /api/v5/market/history-candles：单次最多 100 根；限频 20 次/2s（IP）
+HISTORY_PATH = "/api/v5/market/history-candles"
+HISTORY_PAGE_LIMIT = 100
+HISTORY_RATE = ENDPOINT_LIMITS[HISTORY_PATH]
+_ROW_WIDTH = len(COLUMNS)
+
+
+@dataclass
+class BackfillJob:
+    inst_id: str
+    bar: str
+    since_ms: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.inst_id}|{self.bar}"
+
+
+class Backfiller:
+    def __init__(self, client, store: CandleStore, checkpoint_path: str = "backfill_checkpoint.json",
+                 workers: int = 4, rate=HISTORY_RATE, page_limit: int = HISTORY_PAGE_LIMIT,
+                 limiter: Optional[RateLimiter] = None):
+        self.client = client
+        self.store = store
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.page_limit = page_limit
+        # 客户端自带限频器时由客户端排队（回补接口自动归为最低优先级），这里不重复取令牌
+        if getattr(client, "limiter", None) is not None:
+            self.limiter = None
+        else:
+            self.limiter = limiter or RateLimiter({HISTORY_PATH: tuple(rate)})
+        self._lock = threading.Lock()
+        self.checkpoint: Dict[str, Dict[str, Any]] = self._load_checkpoint()
+
+    # ---------- 检查点 ----------
+    def _load_checkpoint(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, key: str, entry: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            if entry is None:
+                self.checkpoint.pop(key, None)
+            else:
+                self.checkpoint[key] = entry
+            tmp = self.checkpoint_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.checkpoint, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.checkpoint_path)
+
+    def _staging_path(self, job: BackfillJob) -> str:
+        return os.path.join(self.store.series(job.inst_id, job.bar).path, "backfill.staging")
+
+    # ---------- 单个任务 ----------
+    def run_job(self, job: BackfillJob) -> int:
+        series = self.store.series(job.inst_id, job.bar)
+        staging = self._staging_path(job)
+        entry = self.checkpoint.get(job.key)
+        if entry is None or entry.get("since_ms") != job.since_ms:
+            # 新任务：从本地最早一根往前翻（本地为空则从最新开始）
+            entry = {"since_ms": job.since_ms, "after": series.first_ts or None, "rows": 0, "done": False}
+            if os.path.exists(staging):
+                os.remove(staging)
+        # 截掉检查点之后写入的半页
+        row_bytes = _ROW_WIDTH * 8
+        with open(staging, "ab") as fh:
+            fh.truncate(int(entry["rows"]) * row_bytes)
+
+        while not entry["done"]:
+            if self.limiter is not None:
+                self.limiter.acquire(HISTORY_PATH, PRIORITY_BACKFILL)
+            rows = self.client.get_history_candles(job.inst_id, job.bar, self.page_limit, after=entry["after"])
+            bars = candles_to_arrays(rows)
+            keep = bars["confirm"] & (bars["ts"] >= job.since_ms)
+            if keep.any():
+                page = np.column_stack([bars[c][keep].astype(np.float64) for c in COLUMNS])[::-1]
+                with open(staging, "ab") as fh:
+                    fh.write(np.ascontiguousarray(page).tobytes())
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                entry["rows"] = int(entry["rows"]) + int(page.shape[0])
+            if bars["ts"].size == 0 or int(bars["ts"][0]) <= job.since_ms:
+                entry["done"] = True
+            else:
+                entry["after"] = int(bars["ts"][0])
+            self._save_checkpoint(job.key, dict(entry))
+
+        merged = self._merge(job, staging)
+        self._save_checkpoint(job.key, None)
+        return merged
+
+    def _merge(self, job: BackfillJob, staging: str) -> int:
+        raw = np.fromfile(staging, dtype=np.float64) if os.path.exists(staging) else np.empty(0)
+        merged = 0
+        if raw.size:
+            rows = raw.reshape(-1, _ROW_WIDTH)[::-1]      # 暂存为倒序，翻回正序
+            ts = rows[:, 0].astype(np.int64)
+            uniq = np.concatenate([[True], np.diff(ts) > 0])
+            bars = {c: rows[uniq, i] for i, c in enumerate(COLUMNS)}
+            bars["ts"] = ts[uniq]
+            merged = self.store.series(job.inst_id, job.bar).prepend(bars)
+        if os.path.exists(staging):
+            os.remove(staging)
+        return merged
+
+    # ---------- 并发执行 ----------
+    def run(self, jobs: List[BackfillJob]) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            futures = {pool.submit(self.run_job, job): job for job in jobs}
+            for fut in as_completed(futures):
+                job = futures[fut]
+                try:
+                    results[job.key] = fut.result()
+                    print(f"[BACKFILL] {job.key} 补入 {results[job.key]} 根")
+                except Exception as e:
+                    # 进度已在检查点里，下次运行会从断点继续
+                    results[job.key] = e
+                    print(f"[WARN] {job.key} 回补中断：{e}")
+        return results
+
+
+def _parse_day(s: str) -> int:
+    d = dt.datetime.strptime(s, "%Y-%m-%d").replace(tzinfo=dt.timezone.utc)
+    return int(d.timestamp() * 1000)
+
+
+def main() -> None:
+    from config import BotConfig
+    from okx_client import OKXClient
+
+    parser = argparse.ArgumentParser(description="OKX 历史K线回补")
+    parser.add_argument("--inst", required=True, help="逗号分隔，如 BTC-USDT,ETH-USDT")
+    parser.add_argument("--bar", default="1H", help="逗号分隔，如 1m,1H")
+    parser.add_argument("--since", required=True, help="起始日期 YYYY-MM-DD（UTC）")
+    parser.add_argument("--store", default=BotConfig.candle_store_dir)
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.json")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--base-url", default=BotConfig.base_url)
+    args = parser.parse_args()
+
+    client = OKXClient("", "", "", args.base_url)
+    since = _parse_day(args.since)
+    jobs = [BackfillJob(i.strip(), b.strip(), since)
+            for i in args.inst.split(",") if i.strip()
+            for b in args.bar.split(",") if b.strip()]
+    Backfiller(client, CandleStore(args.store), args.checkpoint, workers=args.workers).run(jobs)
+
+
+if __name__ == "__main__":
+    main()
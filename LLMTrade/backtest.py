@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+事件驱动回测：用 trend_bot 里同一套规则（分批入场/回撤加仓/TP1/追踪止损）逐根回放历史K线。
+
+- 模拟时钟：每根K线收盘时（ts + bar）做一次决策，相当于实盘的一次 run_once
+- 撮合模型：市价买按收盘价 + 滑点成交；TP1 限价单与止损条件单挂到后续K线，
+  按 开/高/低 判断触发（同一根里止损优先，保守）
+- 指标用 vector_indicators 整段预计算，循环内只做标量判断
+
+用法：
+    python backtest.py --inst BTC-USDT --bar 1H               # 读本地K线库
+    python backtest.py --synthetic 87600                      # 合成数据（十年 1H）测吞吐
+"""
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from config import BotConfig
+from timeframes import bar_to_ms
+from trend_bot import (trend_ok, reset_cycle_if_flat, plan_entry, commit_entry, plan_tp1,
+                       trail_remaining, trail_stop_price, stop_needs_update)
+from vector_indicators import ema_array, atr_array, adx_array
+
+# 成交记录类型
+ENTRY, ADD, TP1, STOP = 0, 1, 2, 3
+KIND_NAMES = ("ENTRY", "ADD", "TP1", "STOP")
+
+TRADE_DTYPE = np.dtype([
+    ("ts", np.int64),        # 成交时间（ms）
+    ("kind", np.int8),       # ENTRY/ADD/TP1/STOP
+    ("side", np.int8),       # +1 买 / -1 卖
+    ("price", np.float64),
+    ("qty", np.float64),     # 基础币数量
+    ("fee", np.float64),     # 计价币手续费
+    ("tranche", np.int8),    # 买入：第几批；卖出：成交时已入场批数
+    ("cycle", np.int32),     # 第几轮仓位周期（从 0 开始）
+])
+
+
+@dataclass
+class FillModel:
+    taker_fee: float = 0.001        # 市价/止损（OKX 现货 taker 0.10%）
+    maker_fee: float = 0.0008       # 限价 TP1
+    slippage_bps: float = 2.0       # 市价/止损滑点（基点）
+    lot_sz: float = 0.00000001
+    min_sz: float = 0.0001
+    tick_sz: float = 0.01
+
+
+@dataclass
+class BacktestResult:
+    ts: np.ndarray            # 每根K线收盘时间
+    equity: np.ndarray        # 每根收盘后的权益（计价币）
+    position: np.ndarray      # 每根收盘后的基础币持仓（含挂单冻结）
+    trades: np.ndarray        # TRADE_DTYPE 结构化数组
+    stats: Dict[str, float]
+
+
+def precompute_indicators(bars: Dict[str, np.ndarray], cfg: BotConfig) -> Dict[str, np.ndarray]:
+    close = bars["close"]
+    ind = {
+        "ema_fast": ema_array(close, cfg.ema_fast),
+        "ema_slow": ema_array(close, cfg.ema_slow),
+        "atr": atr_array(bars["high"], bars["low"], close, cfg.atr_len),
+    }
+    if cfg.adx_min > 0.0:
+        # ADX 只在启用趋势过滤时才算
+        ind["adx"] = adx_array(bars["high"], bars["low"], close, cfg.adx_len)
+    return ind
+
+
+def _max_drawdown(equity: np.ndarray) -> float:
+    if equity.size == 0:
+        return 0.0
+    peak = np.maximum.accumulate(equity)
+    return float(np.max(1.0 - equity / peak))
+
+
+def run_backtest(cfg: BotConfig, bars: Dict[str, np.ndarray], fill: Optional[FillModel] = None,
+                 initial_quote: float = 10000.0, start: int = 0, end: Optional[int] = None,
+                 indicators: Optional[Dict[str, np.ndarray]] = None,
+                 allow: Optional[Callable[[Dict[str, Any]], bool]] = None) -> BacktestResult:
+    """
+    回放 bars[start:end]（列数组，按 ts 正序）。indicators 可传入预计算结果（整段共用，便于参数扫描/滚动窗口复用）。
+    allow：可选的过滤器（对应实盘 LLMFilter.allow_trade），返回 False 时本根K线不交易也不维护止盈止损。
+    """
+    t0 = time.perf_counter()
+    fill = fill or FillModel()
+    ind = indicators if indicators is not None else precompute_indicators(bars, cfg)
+    n_all = bars["ts"].size
+    end = n_all if end is None else min(end, n_all)
+    start = max(0, start)
+    n = max(0, end - start)
+
+    bar_ms = bar_to_ms(cfg.bar)
+    ts = bars["ts"][start:end].tolist()
+    o = bars["open"][start:end].tolist()
+    h = bars["high"][start:end].tolist()
+    lo = bars["low"][start:end].tolist()
+    c = bars["close"][start:end].tolist()
+    ef = ind["ema_fast"][start:end].tolist()
+    es = ind["ema_slow"][start:end].tolist()
+    at = ind["atr"][start:end].tolist()
+    adx = ind["adx"][start:end].tolist() if cfg.adx_min > 0.0 else None
+
+    taker, maker = fill.taker_fee, fill.maker_fee
+    slip = fill.slippage_bps / 10000.0
+    lot, min_sz, tick = fill.lot_sz, fill.min_sz, fill.tick_sz
+
+    def round_sz(sz: float) -> float:
+        return float(f"{int(sz / lot) * lot:.12f}")
+
+    state: Dict[str, Any] = {}
+    quote = float(initial_quote)
+    base_free = 0.0
+    base_locked = 0.0
+    stop_px = 0.0
+    stop_qty = 0.0
+    stop_on = False
+    tp_orders = []           # [(px, qty)]
+    trades = []
+    cycle = 0
+    equity = np.empty(n)
+    position = np.empty(n)
+    exposed = 0
+
+    for k in range(n):
+        ok, hk, lk, ck = o[k], h[k], lo[k], c[k]
+
+        # ---- 1) 先撮合上一根挂出的单：止损优先 ----
+        if stop_on and lk <= stop_px:
+            qty = stop_qty if stop_qty <= base_free else base_free
+            if qty > 0.0:
+                px = (ok if ok < stop_px else stop_px) * (1.0 - slip)
+                gross = qty * px
+                fee = gross * taker
+                quote += gross - fee
+                base_free -= qty
+                trades.append((ts[k], STOP, -1, px, qty, fee, int(state.get("tranche_idx", 0)), cycle))
+            stop_on = False
+        if tp_orders:
+            still = []
+            for px0, qty in tp_orders:
+                if hk >= px0:
+                    px = ok if ok > px0 else px0
+                    gross = qty * px
+                    fee = gross * maker
+                    quote += gross - fee
+                    base_locked -= qty
+                    trades.append((ts[k], TP1, -1, px, qty, fee, int(state.get("tranche_idx", 0)), cycle))
+                else:
+                    still.append((px0, qty))
+            tp_orders = still
+
+        # ---- 2) 收盘决策（同 TrendBot.run_once） ----
+        e1, e2, a = ef[k], es[k], at[k]
+        if e1 == e1 and e2 == e2 and a == a:
+            now_ms = ts[k] + bar_ms
+            if allow is None or allow({"last_price": ck, "ema_fast": e1, "ema_slow": e2, "atr": a,
+                                       "pos_btc": base_free, "usdt_avail": quote}):
+                if reset_cycle_if_flat(cfg, state, base_free + base_locked, min_sz):
+                    # 同实盘：撤掉残留的 TP1（冻结量不足 minSz）
+                    base_free += base_locked
+                    base_locked = 0.0
+                    tp_orders = []
+                    stop_on = False
+                    cycle += 1
+                if trend_ok(cfg, e1, e2, adx[k] if adx is not None else 0.0):
+                    plan = plan_entry(cfg, state, base_free, quote, ck, a, now_ms, min_sz)
+                    if plan is not None:
+                        q = plan[1]
+                        px = ck * (1.0 + slip)
+                        fee = q * taker
+                        qty = (q - fee) / px
+                        quote -= q
+                        base_free += qty
+                        trades.append((now_ms, ENTRY if plan[0] == "ENTRY" else ADD, 1, px, qty, fee,
+                                       int(state.get("tranche_idx", 0)) + 1, cycle))
+                        commit_entry(state, q, now_ms, ck)
+
+                if base_free > 0.0:
+                    tp1 = plan_tp1(cfg, state, base_free, ck)
+                    if tp1 is not None:
+                        sz = round_sz(tp1[0])
+                        if sz >= min_sz:
+                            base_free -= sz
+                            base_locked += sz
+                            tp_orders.append((tp1[1], sz))
+                            state["tp1_placed"] = True
+                    remaining = round_sz(trail_remaining(cfg, state, base_free))
+                    if remaining >= min_sz:
+                        # 同实盘：触发价按 tick 取整，变动不足阈值时沿用旧止损
+                        new_px = round(trail_stop_price(cfg, ck, a) / tick) * tick
+                        if not stop_on or stop_needs_update(cfg, stop_px, stop_qty, new_px, remaining, tick):
+                            stop_px = new_px
+                            stop_qty = remaining
+                            stop_on = True
+
+        held = base_free + base_locked
+        if held > 0.0:
+            exposed += 1
+        equity[k] = quote + held * ck
+        position[k] = held
+
+    trade_arr = np.array(trades, dtype=TRADE_DTYPE) if trades else np.empty(0, dtype=TRADE_DTYPE)
+    elapsed = time.perf_counter() - t0
+    first_close = c[0] if n else 0.0
+    stats = {
+        "bars": float(n),
+        "initial_equity": float(initial_quote),
+        "final_equity": float(equity[-1]) if n else float(initial_quote),
+        "total_return": float(equity[-1] / initial_quote - 1.0) if n else 0.0,
+        "max_drawdown": _max_drawdown(equity),
+        "trades": float(len(trades)),
+        "cycles": float(cycle + (1 if state.get("tranche_idx") else 0)),
+        "fees": float(trade_arr["fee"].sum()) if trades else 0.0,
+        "exposure": exposed / n if n else 0.0,
+        "buy_hold_return": float(c[-1] / first_close - 1.0) if n and first_close else 0.0,
+        "elapsed_s": elapsed,
+        "bars_per_sec": n / elapsed if elapsed > 0 else float("inf"),
+    }
+    return BacktestResult(ts=np.asarray(ts, dtype=np.int64) + bar_ms, equity=equity, position=position,
+                          trades=trade_arr, stats=stats)
+
+
+def synthetic_bars(n: int, bar: str = "1H", seed: int = 1, start_ms: int = 1_262_304_000_000) -> Dict[str, np.ndarray]:
+    # 带趋势切换的随机游走（对数价减去慢速均线，避免长序列漂到离谱价位），用于吞吐测试/演示
+    rng = np.random.default_rng(seed)
+    drift = np.repeat(rng.normal(0.0, 0.0006, n // 500 + 1), 500)[:n]
+    logp = np.cumsum(drift + rng.normal(0.0, 0.006, n))
+    slow = ema_array(logp, 5000)
+    logp = logp - np.where(np.isnan(slow), 0.0, slow)
+    close = 30000.0 * np.exp(logp)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    wick = np.abs(rng.normal(0.0, 0.003, n)) * close
+    return {
+        "ts": start_ms + np.arange(n, dtype=np.int64) * bar_to_ms(bar),
+        "open": open_,
+        "high": np.maximum(open_, close) + wick,
+        "low": np.minimum(open_, close) - wick,
+        "close": close,
+        "vol": np.ones(n),
+    }
+
+
+def load_bars(store_dir: str, inst_id: str, bar: str) -> Dict[str, np.ndarray]:
+    from candle_store import CandleStore
+    return CandleStore(store_dir).series(inst_id, bar).window()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TrendBot 回测")
+    parser.add_argument("--inst", default=BotConfig.inst_id)
+    parser.add_argument("--bar", default=BotConfig.bar)
+    parser.add_argument("--store", default=BotConfig.candle_store_dir)
+    parser.add_argument("--synthetic", type=int, default=0, help="用 N 根合成K线代替本地K线库")
+    parser.add_argument("--quote", type=float, default=10000.0, help="初始 USDT")
+    parser.add_argument("--ledger", default="", help="把成交写入交易账本（SQLite 路径）")
+    parser.add_argument("--run", default="", help="账本里的 run_id（默认按时间生成）")
+    parser.add_argument("--no-reset", action="store_true", help="清仓后不重置分批进度（同实盘默认）")
+    args = parser.parse_args()
+
+    cfg = BotConfig(inst_id=args.inst, bar=args.bar, reset_cycle_when_flat=not args.no_reset)
+    bars = synthetic_bars(args.synthetic, args.bar) if args.synthetic else load_bars(args.store, args.inst, args.bar)
+    if bars["ts"].size == 0:
+        print("没有K线数据：先运行 backfill.py 回补，或用 --synthetic")
+        return
+    res = run_backtest(cfg, bars, initial_quote=args.quote)
+    for k, v in res.stats.items():
+        print(f"{k:>16s}: {v:,.6g}")
+    from analytics import ANALYTICS_FIELDS, summarize
+    metrics = summarize([res], args.bar)
+    for k in ANALYTICS_FIELDS:
+        print(f"{k:>16s}: {metrics[k][0]:,.6g}")
+    for i, (pnl, cost) in enumerate(zip(metrics["tranche_pnl"][0], metrics["tranche_cost"][0])):
+        print(f"{'tranche ' + str(i + 1):>16s}: pnl {pnl:,.6g} / cost {cost:,.6g}")
+    for t in res.trades[-10:]:
+        print(f"  {int(t['ts'])} {KIND_NAMES[t['kind']]:<5s} {'BUY' if t['side'] > 0 else 'SELL'} "
+              f"{t['qty']:.8f} @ {t['price']:.2f}")
+    if args.ledger:
+        from ledger import Ledger
+        run_id = args.run or time.strftime("bt-%Y%m%d-%H%M%S")
+        with Ledger(args.ledger, source="backtest", run_id=run_id) as led:
+            n = led.record_backtest(args.inst, res.trades)
+        print(f"[LEDGER] {n} 笔成交写入 {args.ledger}（run_id={run_id}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+基准套件：指标 / 签名 / K线解析 / 完整一轮决策 / 回测吞吐，结果存 JSON，对比基线标出回归。
+
+- 每个用例先自动定每轮次数（单轮 >= --min-time 秒，同 timeit.autorange），再重复 --repeat 轮，
+  记最小值与中位数；对比以最小值为准（受系统噪声影响最小）
+- 数据全部固定种子生成，TrendBot 用 MockOKXClient + 临时状态库，不联网
+- --compare：与基线 JSON 逐项对比，变慢超过 --threshold（默认 10%）记为回归，进程返回码 1
+
+用法：
+    python bench.py                                   # 全量（含 1M 根）
+    python bench.py --quick --out bench.json          # 跳过大尺寸，存结果
+    python bench.py --compare bench.json              # 再跑一次并对比基线
+    python bench.py -k ema -k sign                    # 只跑名字含 ema 或 sign 的用例
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bench_indicators import synthetic_ohlc
+
+# name -> (准备函数：返回 (被测函数, 每次调用处理的条目数)), 是否为大尺寸用例
+Case = Callable[[], Tuple[Callable[[], Any], int]]
+CASES: Dict[str, Tuple[Case, bool]] = {}
+
+
+def case(name: str, big: bool = False):
+    def deco(fn: Case) -> Case:
+        CASES[name] = (fn, big)
+        return fn
+    return deco
+
+
+# ---------- 指标（列表接口，即 TrendBot 旧调用方看到的 indicators.ema / atr） ----------
+def _indicator_cases(n: int, label: str) -> None:
+    def ema_case():
+        from indicators import ema
+        close = synthetic_ohlc(n)[2].tolist()
+        return (lambda: ema(close, 20)), n
+
+    def atr_case():
+        from indicators import atr
+        h, l, c = (a.tolist() for a in synthetic_ohlc(n))
+        return (lambda: atr(h, l, c, 14)), n
+
+    case(f"indicators.ema[{label}]", big=n >= 1_000_000)(ema_case)
+    case(f"indicators.atr[{label}]", big=n >= 1_000_000)(atr_case)
+
+
+for _n, _label in ((200, "200"), (10_000, "10k"), (1_000_000, "1M")):
+    _indicator_cases(_n, _label)
+
+
+@case("vector.adx[100k]")
+def _adx():
+    from vector_indicators import adx_array
+    h, l, c = synthetic_ohlc(100_000)
+    return (lambda: adx_array(h, l, c, 14)), 100_000
+
+
+@case("vector.supertrend[100k]")
+def _supertrend():
+    from vector_indicators import supertrend_array
+    h, l, c = synthetic_ohlc(100_000)
+    return (lambda: supertrend_array(h, l, c, 10, 3.0)), 100_000
+
+
+# ---------- 签名 ----------
+@case("okx._sign")
+def _sign():
+    from okx_client import OKXClient
+    client = OKXClient("key", "secret" * 6, "pass", "https://www.okx.com")
+    body = json.dumps([{"instId": "BTC-USDT", "tdMode": "cash", "side": "buy", "ordType": "market", "sz": "100"}])
+    return (lambda: client._sign("2024-01-01T00:00:00.000Z", "POST", "/api/v5/trade/batch-orders", body)), 1
+
+
+# ---------- K线解析 ----------
+def _okx_rows(n: int) -> List[List[str]]:
+    h, l, c = synthetic_ohlc(n)
+    t0 = 1_700_000_000_000
+    return [[str(t0 - i * 3_600_000), f"{c[i]:.2f}", f"{h[i]:.2f}", f"{l[i]:.2f}", f"{c[i]:.2f}", "12.5",
+             "625000", "625000", "1"] for i in range(n)]
+
+
+@case("candles.json_to_arrays[300]")
+def _parse_rest():
+    from vector_indicators import candles_to_arrays
+    raw = json.dumps({"code": "0", "msg": "", "data": _okx_rows(300)})
+    return (lambda: candles_to_arrays(json.loads(raw)["data"])), 300
+
+
+@case("candles.ws_rows[300]")
+def _parse_ws():
+    from market_feed import parse_candle_row
+    raw = json.dumps({"arg": {"channel": "candle1H", "instId": "BTC-USDT"}, "data": _okx_rows(300)})
+    return (lambda: [parse_candle_row(r) for r in json.loads(raw)["data"]]), 300
+
+
+# ---------- 完整一轮 ----------
+@case("trend_bot.run_once[mock]")
+def _run_once():
+    from config import BotConfig
+    from llm_filter import LLMFilter
+    from okx_client import MockOKXClient
+    from state_manager import StateStore
+    from trend_bot import TrendBot
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    client = MockOKXClient("k", "s", "p", "http://mock")
+    bot = TrendBot(BotConfig(candle_store_dir=""), client, LLMFilter(False),
+                   store=StateStore(os.path.join(tmp, "state.db")), state_path=None)
+    sink = io.StringIO()
+
+    def once():
+        with contextlib.redirect_stdout(sink):
+            bot.run_once()
+        sink.seek(0)
+        sink.truncate()
+    once()          # 预热指标，之后每轮走增量路径
+    return once, 1
+
+
+@case("backtest.run[87.6k bars]")
+def _backtest():
+    from backtest import run_backtest, synthetic_bars
+    from config import BotConfig
+    bars = synthetic_bars(87_600)
+    cfg = BotConfig()
+    return (lambda: run_backtest(cfg, bars)), 87_600
+
+
+# ---------- 运行 ----------
+def measure(fn: Callable[[], Any], repeat: int, min_time: float) -> Dict[str, Any]:
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - t0 >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    return {"min_s": min(samples), "median_s": statistics.median(samples), "number": number, "repeat": repeat}
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def run(names: List[str], repeat: int = 5, min_time: float = 0.05) -> Dict[str, Any]:
+    results = {}
+    for name in names:
+        fn, items = CASES[name][0]()
+        r = measure(fn, repeat, min_time)
+        r["items"] = items
+        r["items_per_s"] = items / r["min_s"] if r["min_s"] > 0 else 0.0
+        results[name] = r
+        print(f"{name:<32s} {_fmt(r['min_s']):>10s}  median {_fmt(r['median_s']):>10s}  "
+              f"{r['items_per_s']:>14,.0f} items/s")
+    return {
+        "meta": {"ts_ms": int(time.time() * 1000), "git_rev": _git_rev(), "python": platform.python_version(),
+                 "numpy": np.__version__, "platform": platform.platform(), "machine": platform.machine(),
+                 "cpus": os.cpu_count(), "repeat": repeat, "min_time": min_time},
+        "results": results,
+    }
+
+
+def _fmt(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def compare(base: Dict[str, Any], cur: Dict[str, Any], threshold: float = 0.10) -> List[Dict[str, Any]]:
+    """逐项对比最小耗时：ratio = 当前 / 基线；> 1+threshold 为 regression，< 1-threshold 为 faster。"""
+    rows = []
+    for name, r in cur["results"].items():
+        b = base.get("results", {}).get(name)
+        if b is None or b["min_s"] <= 0:
+            rows.append({"name": name, "ratio": None, "status": "new"})
+            continue
+        ratio = r["min_s"] / b["min_s"]
+        status = "regression" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else "ok"
+        rows.append({"name": name, "base_s": b["min_s"], "cur_s": r["min_s"], "ratio": ratio, "status": status})
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="LLMTrade 基准套件")
+    parser.add_argument("-k", dest="filters", action="append", default=[], help="只跑名字含该子串的用例（可多次）")
+    parser.add_argument("--quick", action="store_true", help="跳过 1M 等大尺寸用例")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="单轮最短耗时（秒），决定每轮调用次数")
+    parser.add_argument("--out", default="", help="结果写入该 JSON")
+    parser.add_argument("--compare", default="", help="基线 JSON：对比并标出回归")
+    parser.add_argument("--threshold", type=float, default=0.10, help="变慢超过该比例记为回归")
+    parser.add_argument("--list", action="store_true", help="只列出用例")
+    args = parser.parse_args(argv)
+
+    names = [n for n, (_, big) in CASES.items()
+             if not (args.quick and big) and (not args.filters or any(f in n for f in args.filters))]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    cur = run(names, args.repeat, args.min_time)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(cur, f, indent=2)
+        print(f"[BENCH] 结果写入 {args.out}")
+    if not args.compare:
+        return 0
+    with open(args.compare, encoding="utf-8") as f:
+        base = json.load(f)
+    rows = compare(base, cur, args.threshold)
+    print(f"\n对比基线 {args.compare}（git {base.get('meta', {}).get('git_rev', '?')}），阈值 {args.threshold:.0%}：")
+    for r in rows:
+        if r["ratio"] is None:
+            print(f"  {r['name']:<32s} {'':>10s}   (基线里没有)")
+        else:
+            print(f"  {r['name']:<32s} {_fmt(r['base_s']):>10s} -> {_fmt(r['cur_s']):>10s}  "
+                  f"x{r['ratio']:.2f}  {r['status'].upper() if r['status'] != 'ok' else ''}")
+    bad = [r["name"] for r in rows if r["status"] == "regression"]
+    if bad:
+        print(f"[BENCH] {len(bad)} 项回归：{', '.join(bad)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+指标基准：纯 Python 逐点循环（旧实现） vs NumPy 向量化。
+
+用法：
+    python bench_indicators.py               # 默认 200 / 10k / 1M
+    python bench_indicators.py 5000 50000
+"""
+import sys
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from vector_indicators import (adx_array, atr_array, bollinger_array, donchian_array, ema_array, keltner_array,
+                               rolling_max, rsi_array, supertrend_array)
+
+
+# ---------- 旧实现（参考基线，也用于对拍） ----------
+def ema_loop(values: List[float], period: int) -> List[float]:
+    if len(values) < period:
+        return []
+    k = 2.0 / (period + 1.0)
+    out = []
+    s = sum(values[:period]) / period
+    out.extend([float("nan")] * (period - 1))
+    out.append(s)
+    for i in range(period, len(values)):
+        s = values[i] * k + s * (1 - k)
+        out.append(s)
+    return out
+
+
+def atr_loop(highs: List[float], lows: List[float], closes: List[float], period: int) -> List[float]:
+    if len(closes) < period + 1:
+        return []
+    trs = []
+    for i in range(1, len(closes)):
+        tr = max(
+            highs[i] - lows[i],
+            abs(highs[i] - closes[i - 1]),
+            abs(lows[i] - closes[i - 1]),
+        )
+        trs.append(tr)
+    out = [float("nan")] * period
+    first = sum(trs[:period]) / period
+    out.append(first)
+    alpha = 1.0 / period
+    s = first
+    for i in range(period, len(trs)):
+        s = (1 - alpha) * s + alpha * trs[i]
+        out.append(s)
+    return out
+
+
+def rolling_max_loop(values: List[float], window: int) -> List[float]:
+    out = [float("nan")] * min(window - 1, len(values))
+    for i in range(window - 1, len(values)):
+        out.append(max(values[i - window + 1:i + 1]))
+    return out
+
+
+def adx_loop(highs: List[float], lows: List[float], closes: List[float], period: int) -> List[float]:
+    n = len(closes)
+    out = [float("nan")] * n
+    if n < 2 * period:
+        return out
+    tr, pdm, mdm = [], [], []
+    for i in range(1, n):
+        up, down = highs[i] - highs[i - 1], lows[i - 1] - lows[i]
+        pdm.append(up if up > down and up > 0 else 0.0)
+        mdm.append(down if down > up and down > 0 else 0.0)
+        tr.append(max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])))
+    s_tr, s_p, s_m = sum(tr[:period]) / period, sum(pdm[:period]) / period, sum(mdm[:period]) / period
+    dx = []
+    for j in range(period - 1, len(tr)):
+        if j >= period:
+            s_tr += (tr[j] - s_tr) / period
+            s_p += (pdm[j] - s_p) / period
+            s_m += (mdm[j] - s_m) / period
+        pdi, mdi = 100.0 * s_p / s_tr, 100.0 * s_m / s_tr
+        dx.append(100.0 * abs(pdi - mdi) / (pdi + mdi) if pdi + mdi else 0.0)
+    a = sum(dx[:period]) / period
+    out[2 * period - 1] = a
+    for k in range(period, len(dx)):
+        a += (dx[k] - a) / period
+        out[period + k] = a
+    return out
+
+
+def rsi_loop(closes: List[float], period: int) -> List[float]:
+    n = len(closes)
+    out = [float("nan")] * n
+    if n < period + 1:
+        return out
+    ch = [closes[i] - closes[i - 1] for i in range(1, n)]
+    g = sum(max(x, 0.0) for x in ch[:period]) / period
+    l = sum(max(-x, 0.0) for x in ch[:period]) / period
+    for i in range(period - 1, len(ch)):
+        if i >= period:
+            g = (g * (period - 1) + max(ch[i], 0.0)) / period
+            l = (l * (period - 1) + max(-ch[i], 0.0)) / period
+        out[i + 1] = 100.0 - 100.0 / (1.0 + g / l) if l > 0 else (100.0 if g > 0 else 50.0)
+    return out
+
+
+def bollinger_loop(closes: List[float], period: int, mult: float) -> List[List[float]]:
+    mid, up, lo = [], [], []
+    for i in range(len(closes)):
+        if i < period - 1:
+            mid.append(float("nan")), up.append(float("nan")), lo.append(float("nan"))
+            continue
+        w = closes[i - period + 1:i + 1]
+        m = sum(w) / period
+        sd = (sum((x - m) ** 2 for x in w) / period) ** 0.5
+        mid.append(m), up.append(m + mult * sd), lo.append(m - mult * sd)
+    return [mid, up, lo]
+
+
+def supertrend_loop(highs: List[float], lows: List[float], closes: List[float], period: int,
+                    mult: float) -> List[List[float]]:
+    """按 TradingView ta.supertrend 的写法逐根计算（方向 1 = 上升）。"""
+    atr = atr_loop(highs, lows, closes, period)
+    n = len(closes)
+    line, direction = [float("nan")] * n, [float("nan")] * n
+    up = dn = 0.0
+    d = 0
+    for i in range(period, n):
+        hl2 = (highs[i] + lows[i]) / 2.0
+        bu, bl = hl2 + mult * atr[i], hl2 - mult * atr[i]
+        if i == period:
+            up, dn, d = bu, bl, -1
+        else:
+            prev_up, prev_dn = up, dn
+            up = bu if bu < prev_up or closes[i - 1] > prev_up else prev_up
+            dn = bl if bl > prev_dn or closes[i - 1] < prev_dn else prev_dn
+            if line[i - 1] == prev_up:
+                d = 1 if closes[i] > up else -1
+            else:
+                d = -1 if closes[i] < dn else 1
+        line[i] = dn if d == 1 else up
+        direction[i] = d
+    return [line, direction]
+
+
+def synthetic_ohlc(n: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    close = 50000.0 * np.exp(np.cumsum(rng.normal(0.0, 0.004, n)))
+    spread = np.abs(rng.normal(0.0, 0.003, n)) * close
+    high = close + spread
+    low = close - spread
+    return high, low, close
+
+
+def _best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench(n: int) -> None:
+    high, low, close = synthetic_ohlc(n)
+    hl, ll, cl = high.tolist(), low.tolist(), close.tolist()
+    repeat = 5 if n <= 100_000 else 2
+
+    t_ema_py = _best_of(lambda: ema_loop(cl, 20), repeat)
+    t_ema_np = _best_of(lambda: ema_array(close, 20), repeat)
+    t_atr_py = _best_of(lambda: atr_loop(hl, ll, cl, 14), repeat)
+    t_atr_np = _best_of(lambda: atr_array(high, low, close, 14), repeat)
+
+    t_max_py = _best_of(lambda: rolling_max_loop(hl, 72), repeat) if n <= 100_000 else float("nan")
+    t_max_np = _best_of(lambda: rolling_max(high, 72), repeat)
+    t_adx_py = _best_of(lambda: adx_loop(hl, ll, cl, 14), repeat)
+    t_adx_np = _best_of(lambda: adx_array(high, low, close, 14), repeat)
+
+    t_rsi_py = _best_of(lambda: rsi_loop(cl, 14), repeat)
+    t_rsi_np = _best_of(lambda: rsi_array(close, 14), repeat)
+    t_bb_py = _best_of(lambda: bollinger_loop(cl, 20, 2.0), repeat)
+    t_bb_np = _best_of(lambda: bollinger_array(close, 20, 2.0), repeat)
+    t_dc_np = _best_of(lambda: donchian_array(high, low, 20), repeat)
+    t_kc_np = _best_of(lambda: keltner_array(high, low, close, 20, 10, 2.0), repeat)
+    t_st_py = _best_of(lambda: supertrend_loop(hl, ll, cl, 10, 3.0), repeat)
+    t_st_np = _best_of(lambda: supertrend_array(high, low, close, 10, 3.0), repeat)
+
+    # 2-D：64 个标的一次算
+    rows = np.tile(close, (64, 1)) if n <= 100_000 else None
+    t_ema_2d = _best_of(lambda: ema_array(rows, 20), repeat) if rows is not None else float("nan")
+
+    print(f"n={n:>9,d}  ema  loop {t_ema_py * 1e3:9.3f} ms  numpy {t_ema_np * 1e3:8.3f} ms  x{t_ema_py / t_ema_np:6.1f}")
+    print(f"{'':11s}  atr  loop {t_atr_py * 1e3:9.3f} ms  numpy {t_atr_np * 1e3:8.3f} ms  x{t_atr_py / t_atr_np:6.1f}")
+    print(f"{'':11s}  adx  loop {t_adx_py * 1e3:9.3f} ms  numpy {t_adx_np * 1e3:8.3f} ms  x{t_adx_py / t_adx_np:6.1f}")
+    print(f"{'':11s}  max72 loop {t_max_py * 1e3:8.3f} ms  numpy {t_max_np * 1e3:8.3f} ms")
+    print(f"{'':11s}  rsi  loop {t_rsi_py * 1e3:9.3f} ms  numpy {t_rsi_np * 1e3:8.3f} ms  x{t_rsi_py / t_rsi_np:6.1f}")
+    print(f"{'':11s}  bb20 loop {t_bb_py * 1e3:9.3f} ms  numpy {t_bb_np * 1e3:8.3f} ms  x{t_bb_py / t_bb_np:6.1f}")
+    print(f"{'':11s}  st10 loop {t_st_py * 1e3:9.3f} ms  batch {t_st_np * 1e3:8.3f} ms  x{t_st_py / t_st_np:6.1f}")
+    print(f"{'':11s}  donchian20 {t_dc_np * 1e3:8.3f} ms  keltner(20,10) {t_kc_np * 1e3:8.3f} ms")
+    if rows is not None:
+        print(f"{'':11s}  ema 64x{n} numpy {t_ema_2d * 1e3:8.3f} ms（逐序列循环约 {t_ema_py * 64 * 1e3:.1f} ms）")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [200, 10_000, 1_000_000]
+    for size in sizes:
+        bench(size)
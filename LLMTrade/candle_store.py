@@ -0,0 +1,302 @@
+"""
+本地K线库：每个 (instId, bar) 一个目录，按列追加写入定长二进制文件
+（ts:int64 / open/high/low/close/vol:float64），读取用 np.memmap 零拷贝。
+
+- 只存已收盘（confirm）K线，ts 严格递增
+- 追加顺序：先写数据列，最后写 ts；打开时按最短列截断，崩溃后自动修复
+- CandleSync：实盘只拉“上次存到的 ts 之后”的新K线，再从本地读窗口；
+  断档超出最新几页时用 history-candles 补齐，补不上就清空序列重新播种，不留空洞
+"""
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from timeframes import bar_to_ms
+from vector_indicators import candles_to_arrays
+
+COLUMNS = ("ts", "open", "high", "low", "close", "vol")
+DTYPES = {"ts": np.int64, "open": np.float64, "high": np.float64,
+          "low": np.float64, "close": np.float64, "vol": np.float64}
+# OKX /market/candles 单次最多 300 根；/market/history-candles 单次最多 100 根
+MAX_CANDLES_PER_REQUEST = 300
+MAX_HISTORY_CANDLES_PER_REQUEST = 100
+
+
+class CandleSeries:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._maps: Dict[str, np.ndarray] = {}
+        self._mapped_rows = -1
+        self._rows = self._recover()
+
+    def _file(self, col: str) -> str:
+        return os.path.join(self.path, f"{col}.bin")
+
+    def _recover(self) -> int:
+        # 合并（prepend）中途崩溃：有提交标记则前滚，否则丢弃临时文件
+        marker = os.path.join(self.path, "merge.commit")
+        for col in COLUMNS:
+            tmp = self._file(col) + ".tmp"
+            if os.path.exists(tmp):
+                if os.path.exists(marker):
+                    os.replace(tmp, self._file(col))
+                else:
+                    os.remove(tmp)
+        if os.path.exists(marker):
+            os.remove(marker)
+        # 以最短列为准截断（上次追加中途崩溃时各列长度可能不一致）
+        rows = None
+        for col in COLUMNS:
+            f = self._file(col)
+            if not os.path.exists(f):
+                open(f, "wb").close()
+            n = os.path.getsize(f) // np.dtype(DTYPES[col]).itemsize
+            rows = n if rows is None else min(rows, n)
+        for col in COLUMNS:
+            size = rows * np.dtype(DTYPES[col]).itemsize
+            if os.path.getsize(self._file(col)) != size:
+                with open(self._file(col), "r+b") as fh:
+                    fh.truncate(size)
+        return rows
+
+    def __len__(self) -> int:
+        return self._rows
+
+    @property
+    def last_ts(self) -> int:
+        if self._rows == 0:
+            return 0
+        return int(self.columns()["ts"][-1])
+
+    @property
+    def first_ts(self) -> int:
+        if self._rows == 0:
+            return 0
+        return int(self.columns()["ts"][0])
+
+    def append(self, bars: Dict[str, np.ndarray]) -> int:
+        """追加 ts > last_ts 的行（输入需按 ts 正序），返回写入行数。"""
+        ts = np.asarray(bars["ts"], dtype=np.int64)
+        if ts.size == 0:
+            return 0
+        keep = ts > self.last_ts
+        if not keep.all():
+            ts = ts[keep]
+        if ts.size == 0:
+            return 0
+        if ts.size > 1 and np.any(np.diff(ts) <= 0):
+            raise ValueError("candles must be strictly increasing by ts")
+        for col in COLUMNS[1:]:
+            arr = np.ascontiguousarray(np.asarray(bars[col], dtype=DTYPES[col])[keep])
+            with open(self._file(col), "ab") as fh:
+                fh.write(arr.tobytes())
+        with open(self._file("ts"), "ab") as fh:
+            fh.write(ts.tobytes())
+            fh.flush()
+            os.fsync(fh.fileno())
+        self._rows += int(ts.size)
+        return int(ts.size)
+
+    def append_contiguous(self, bars: Dict[str, np.ndarray], step_ms: int) -> int:
+        """
+        只追加能和库尾无缝接上的行（空库，或首根 ts == last_ts + step_ms 且彼此间隔 step_ms）；
+        接不上就一行都不写、返回 0，留给 CandleSync 补档，库里不留空洞。
+        """
+        ts = np.asarray(bars["ts"], dtype=np.int64)
+        keep = ts > self.last_ts
+        ts = ts[keep]
+        if ts.size == 0:
+            return 0
+        if (self._rows and ts[0] != self.last_ts + step_ms) or np.any(np.diff(ts) != step_ms):
+            return 0
+        return self.append({c: np.asarray(bars[c])[keep] for c in COLUMNS})
+
+    def prepend(self, bars: Dict[str, np.ndarray]) -> int:
+        """
+        在头部补入更早的历史（回补用，ts < first_ts 的行），整列重写。
+        先写 *.tmp，落提交标记后逐列替换；崩溃后由 _recover 前滚。
+        """
+        ts = np.asarray(bars["ts"], dtype=np.int64)
+        keep = ts < self.first_ts if self._rows else np.ones(ts.size, dtype=bool)
+        ts = ts[keep]
+        if ts.size == 0:
+            return 0
+        if ts.size > 1 and np.any(np.diff(ts) <= 0):
+            raise ValueError("candles must be strictly increasing by ts")
+        cols = self.columns()
+        for col in COLUMNS:
+            older = ts if col == "ts" else np.asarray(bars[col], dtype=DTYPES[col])[keep]
+            with open(self._file(col) + ".tmp", "wb") as fh:
+                fh.write(np.ascontiguousarray(older, dtype=DTYPES[col]).tobytes())
+                fh.write(np.ascontiguousarray(cols[col]).tobytes())
+                fh.flush()
+                os.fsync(fh.fileno())
+        # 替换前释放旧映射
+        self._maps = {}
+        self._mapped_rows = -1
+        marker = os.path.join(self.path, "merge.commit")
+        with open(marker, "wb") as fh:
+            fh.flush()
+            os.fsync(fh.fileno())
+        for col in COLUMNS:
+            os.replace(self._file(col) + ".tmp", self._file(col))
+        os.remove(marker)
+        self._rows += int(ts.size)
+        return int(ts.size)
+
+    def reset(self) -> None:
+        """
+        清空序列（本地数据与交易所接不上时重新播种用）。同 prepend：写空的 *.tmp 再 os.replace，
+        不原地截断，之前 columns()/window() 交出去的 memmap 仍映射旧文件，读它不会 SIGBUS。
+        """
+        for col in COLUMNS:
+            with open(self._file(col) + ".tmp", "wb") as fh:
+                fh.flush()
+                os.fsync(fh.fileno())
+        self._maps = {}
+        self._mapped_rows = -1
+        marker = os.path.join(self.path, "merge.commit")
+        with open(marker, "wb") as fh:
+            fh.flush()
+            os.fsync(fh.fileno())
+        for col in COLUMNS:
+            os.replace(self._file(col) + ".tmp", self._file(col))
+        os.remove(marker)
+        self._rows = 0
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """全部列的只读 memmap（文件增长后按需重新映射）。"""
+        if self._mapped_rows != self._rows:
+            if self._rows == 0:
+                self._maps = {c: np.empty(0, dtype=DTYPES[c]) for c in COLUMNS}
+            else:
+                self._maps = {c: np.memmap(self._file(c), dtype=DTYPES[c], mode="r", shape=(self._rows,))
+                              for c in COLUMNS}
+            self._mapped_rows = self._rows
+        return self._maps
+
+    def window(self, n: Optional[int] = None, start_ts: Optional[int] = None,
+               end_ts: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        取窗口（切片视图，不复制）：
+        - n：最近 n 根
+        - start_ts / end_ts：按时间闭区间 [start_ts, end_ts]
+        """
+        cols = self.columns()
+        lo, hi = 0, self._rows
+        if start_ts is not None or end_ts is not None:
+            ts = cols["ts"]
+            if start_ts is not None:
+                lo = int(np.searchsorted(ts, start_ts, side="left"))
+            if end_ts is not None:
+                hi = int(np.searchsorted(ts, end_ts, side="right"))
+        if n is not None:
+            lo = max(lo, hi - int(n))
+        return {c: cols[c][lo:hi] for c in COLUMNS}
+
+
+class CandleStore:
+    def __init__(self, root: str = "candles"):
+        self.root = root
+        self._series: Dict[tuple, CandleSeries] = {}
+
+    def series(self, inst_id: str, bar: str) -> CandleSeries:
+        key = (inst_id, bar)
+        s = self._series.get(key)
+        if s is None:
+            s = CandleSeries(os.path.join(self.root, inst_id, bar))
+            self._series[key] = s
+        return s
+
+
+def _dedup(bars: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # 翻页可能有重叠，按 ts 去重（输入已按 ts 正序）
+    if bars["ts"].size > 1:
+        uniq = np.concatenate([[True], np.diff(bars["ts"]) > 0])
+        if not uniq.all():
+            bars = {k: v[uniq] for k, v in bars.items()}
+    return bars
+
+
+class CandleSync:
+    """
+    增量同步：按本地最后一根 ts 只拉新K线（通常 1~2 行），已收盘的落盘，
+    返回“本地最近 limit 根 + 当前未收盘那根”。
+    """
+
+    def __init__(self, client, store: CandleStore, max_pages: int = 5, max_gap_pages: int = 100):
+        self.client = client
+        self.store = store
+        self.max_pages = max_pages
+        # 断档补齐最多翻多少页 history-candles（每页 100 根）
+        self.max_gap_pages = max_gap_pages
+        self.stats = {"gaps_filled": 0, "reseeds": 0}
+
+    def _fetch_new(self, inst_id: str, bar: str, last_ts: int, limit: int) -> List[List[str]]:
+        bar_ms = bar_to_ms(bar)
+        if last_ts:
+            missing = int((time.time() * 1000 - last_ts) // bar_ms) + 2
+            need = max(2, missing)
+        else:
+            need = limit + 1
+        page = min(MAX_CANDLES_PER_REQUEST, need)
+        rows = list(self.client.get_candles(inst_id, bar, page))
+        # 最新一页不够覆盖断档时，用 after 往前翻页
+        for _ in range(self.max_pages - 1):
+            if not rows or len(rows) >= need:
+                break
+            oldest = min(int(r[0]) for r in rows)
+            if last_ts and oldest <= last_ts + bar_ms:
+                break
+            older = self.client.get_candles(inst_id, bar, page, after=oldest)
+            if not older:
+                break
+            rows.extend(older)
+        return rows
+
+    def _fill_gap(self, inst_id: str, bar: str, last_ts: int, rows: List[List[str]]) -> List[List[str]]:
+        """最新几页没接上本地最后一根：用 history-candles 从最早一根往前翻，直到覆盖 last_ts。"""
+        bar_ms = bar_to_ms(bar)
+        oldest = min(int(r[0]) for r in rows)
+        for _ in range(self.max_gap_pages):
+            if oldest <= last_ts + bar_ms:
+                break
+            older = self.client.get_history_candles(inst_id, bar, MAX_HISTORY_CANDLES_PER_REQUEST, after=oldest)
+            if not older:
+                break
+            rows = list(older) + rows
+            oldest = min(oldest, min(int(r[0]) for r in older))
+        return rows
+
+    def sync(self, inst_id: str, bar: str, limit: int) -> Dict[str, np.ndarray]:
+        series = self.store.series(inst_id, bar)
+        last_ts = series.last_ts
+        rows = self._fetch_new(inst_id, bar, last_ts, limit)
+        fresh = _dedup(candles_to_arrays(rows))
+        bar_ms = bar_to_ms(bar)
+        if last_ts and fresh["ts"].size and int(fresh["ts"][0]) > last_ts + bar_ms:
+            # 断档超出翻页范围：补齐之前不能追加，否则本地序列中间留洞，指标会跨洞计算
+            fresh = _dedup(candles_to_arrays(self._fill_gap(inst_id, bar, last_ts, rows)))
+            if int(fresh["ts"][0]) > last_ts + bar_ms:
+                print(f"[WARN] {inst_id} {bar} 本地K线断档（{last_ts} 之后）补不上，清空后重新播种")
+                series.reset()
+                self.stats["reseeds"] += 1
+            else:
+                self.stats["gaps_filled"] += 1
+        confirm = fresh["confirm"]
+        if confirm.any():
+            series.append({c: fresh[c][confirm] for c in COLUMNS})
+
+        out = series.window(limit)
+        forming = np.flatnonzero(~confirm)
+        if forming.size and fresh["ts"][forming[-1]] > series.last_ts:
+            i = forming[-1]
+            merged = {c: np.append(out[c], fresh[c][i]) for c in COLUMNS}
+            merged["confirm"] = np.append(np.ones(out["ts"].size, dtype=bool), False)
+            return merged
+        out = dict(out)
+        out["confirm"] = np.ones(out["ts"].size, dtype=bool)
+        return out
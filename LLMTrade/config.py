@@ -8,25 +8,64 @@ class BotConfig:
    inst_id: str = "BTC-USDT"              # 现货
    bar: str = "1H"                        # 小时级
    candle_limit: int = 200
+   candle_store_dir: str = "candles"      # 本地K线库目录（增量同步）；留空则每次直接拉 REST
+   bar_confirm_delay_s: float = 2.0       # 轮询模式：交易所时钟的收盘后再等这么久（K线确认）才决策
+   clock_resync_s: float = 900.0          # 交易所时钟偏移的重测间隔
+   use_ws_feed: bool = False              # True：WebSocket 推送K线，收盘即决策（替代整点轮询）
+   ws_public_url: str = "wss://ws.okx.com:8443/ws/v5/public"
+   ws_business_url: str = "wss://ws.okx.com:8443/ws/v5/business"   # candle 频道在 business
+   ws_resample_base: str = ""             # 例如 "1m"：推送模式只订阅该周期，bar 等周期本地合成（resampler.py）
+   use_private_ws: bool = False           # True：私有 WebSocket 推送余额/订单，REST 只做对账
+   ws_private_url: str = "wss://ws.okx.com:8443/ws/v5/private"
+   balance_push_wait_s: float = 1.0       # 下单后等余额推送的最长时间，超时走 REST
+   balance_reconcile_s: float = 300.0     # 距上次 REST 对账超过该秒数就再对一次
+
+   # 多品种组合（portfolio）：留空则只跑 inst_id 单品种
+   portfolio_file: str = ""               # JSON：["BTC-USDT", ...] 或 {"ETH-USDT": {"tranche_quotes": [50, 50]}}
+   portfolio_workers: int = 16            # 并发推进各品种决策的线程数
+   portfolio_bar_wait_s: float = 3.0      # 推送模式：首根收盘K线到达后最多等这么久凑齐其它品种
+   state_db: str = "state.db"             # 策略状态库（SQLite/WAL），每个品种一个命名空间；旧 state.json 首次启动时导入
+   ledger_db: str = "ledger.db"           # 交易账本（意图/订单/成交/手续费），留空不记
 
    # 趋势：EMA 快慢线
    ema_fast: int = 20
    ema_slow: int = 50
    atr_len: int = 14
+   adx_len: int = 14                      # ADX 周期（趋势强度特征，也发给 LLM）
+   adx_min: float = 0.0                   # >0：ADX 低于该值不入场/加仓（趋势过滤）；0 关闭
 
    # 仓位与加仓（用 USDT 计）
    max_total_quote: float = 300.0         # 最大投入 USDT（你自己改）
    tranche_quotes: Tuple[float, ...] = (100.0, 100.0, 100.0)  # 分3批
    add_on_pullback_atr: float = 0.8       # 回撤 >= 0.8*ATR 才考虑加仓（趋势内回撤加）
    min_hours_between_adds: int = 2        # 加仓冷却
+   reset_cycle_when_flat: bool = False    # 仓位被卖空后重置分批进度（回测 CLI 默认开启；False=旧行为：分批用完即不再入场）
 
    # 止盈与追踪
    tp1_pct: float = 0.012                # 第一段止盈：+1.2%
    tp1_sell_pct: float = 0.35            # 卖出35%，剩余继续追踪
    trail_atr_mult: float = 2.2           # 追踪止损距离 = 2.2*ATR
+   stop_update_min_ticks: int = 5         # 本地追踪：触发价变动超过 N 个 tickSz 才改单（amend-algos）
    use_exchange_trailing_algo: bool = False
    # True：尝试用 move_order_stop（追踪策略单）
    # False：用“本地追踪”= 每小时更新一次 conditional 止损单（更稳/更可控）
 
    # 大模型过滤（模板：你把这里接上自己的模型）
-   enable_llm_filter: bool = False
\ No newline at end of file
+   enable_llm_filter: bool = False
+   llm_cache_db: str = "llm_cache.db"     # 过滤结果缓存（按分桶特征复用判断），留空只缓存在内存
+   llm_cache_ttl_s: float = 3600.0        # 缓存的判断多久后失效
+   llm_cache_max: int = 10000             # LRU 最多条目
+   llm_cache_share: bool = True           # 行情特征相同的不同品种共用判断
+   llm_url: str = ""                      # 模型服务地址（POST payload，返回 {"allow": bool}）；留空用 LLMFilter 模板
+   llm_timeout_s: float = 10.0            # 单次 HTTP 超时（请求在后台线程里跑，不阻塞决策）
+   llm_deadline_s: float = 2.0            # 决策路径最多等模型这么久；<=0 则同步调用
+   llm_fallback: str = "last"             # 超时/出错：allow 放行 / deny 不交易 / last 沿用最近一次判断
+   llm_fallback_default: bool = True      # last 且该品种还没有过判断时的结论
+   llm_prefetch_lead_s: float = 5.0       # 收盘前多少秒用未收盘K线预取判断（轮询调度模式；0 关闭）
+   llm_workers: int = 8                   # 并发模型请求数
+
+   # 延迟追踪（tracing.py）：客户端调用 / 决策阶段的耗时直方图，定期导出
+   trace_enabled: bool = False
+   trace_prom_file: str = "metrics.prom"  # Prometheus 文本（node_exporter textfile 采集），留空不写
+   trace_json_file: str = "metrics.json"  # JSON 快照（含直方图桶，便于对比回归），留空不写
+   trace_export_s: float = 30.0           # 导出间隔
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+趋势特征（OpenAI/task.md 的特征集）：批量（回测/扫描）与增量（实盘，见 streaming.TrendIndicators）同一套公式。
+
+- ema_spread_pct    (EMA快 - EMA慢) / EMA慢
+- ema_fast_slope    EMA快 过去 6h 的变化率：EMA快[t] / EMA快[t-6h] - 1
+- atr_pct           ATR / 收盘价
+- ret_24h / ret_72h 收盘价 24h / 72h 收益率
+- hh_72h_dist_pct   收盘价相对 72h 最高价的距离（<= 0）
+- drawdown_72h_pct  收盘价相对 72h 最高收盘价的回撤（<= 0）
+- adx               Wilder ADX（趋势强度，0~100）
+
+窗口按小时给出，换算成当前周期的K线根数（lookback_bars）。滚动最高价用 O(n) 的
+rolling_max（批量：分块前缀/后缀极值；增量：单调队列），窗口再长、品种再多也是线性的。
+所有比例均为小数（0.01 = 1%），预热不足的位置为 NaN。
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+
+from timeframes import bar_to_ms
+from vector_indicators import adx_array, atr_array, ema_array, rolling_max
+
+FEATURE_NAMES = ("ema_spread_pct", "ema_fast_slope", "atr_pct", "ret_24h", "ret_72h",
+                 "hh_72h_dist_pct", "drawdown_72h_pct", "adx")
+
+# 特征窗口（小时）
+WINDOW_H = 72
+SHORT_H = 24
+SLOPE_H = 6
+
+HOUR_MS = 3_600_000
+
+
+def lookback_bars(bar: str, hours: float) -> int:
+    """hours 小时对应多少根 bar 周期的K线（至少 1 根）。"""
+    return max(1, int(round(hours * HOUR_MS / bar_to_ms(bar))))
+
+
+def feature_windows(bar: str) -> Dict[str, int]:
+    return {"window": lookback_bars(bar, WINDOW_H), "short": lookback_bars(bar, SHORT_H),
+            "slope": lookback_bars(bar, SLOPE_H)}
+
+
+def derive(close, ema_fast, ema_slow, atr, adx, high_max, close_max, close_short, close_long, ema_fast_back):
+    """由基础量算特征（标量或数组皆可）。*_back / close_short / close_long 为对应回看位置的值。"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "ema_spread_pct": (ema_fast - ema_slow) / ema_slow,
+            "ema_fast_slope": ema_fast / ema_fast_back - 1.0,
+            "atr_pct": atr / close,
+            "ret_24h": close / close_short - 1.0,
+            "ret_72h": close / close_long - 1.0,
+            "hh_72h_dist_pct": close / high_max - 1.0,
+            "drawdown_72h_pct": close / close_max - 1.0,
+            "adx": adx,
+        }
+
+
+def _lag(x: np.ndarray, k: int) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    if k < x.shape[-1]:
+        out[..., k:] = x[..., :x.shape[-1] - k]
+    return out
+
+
+def compute_features(bars: Dict[str, np.ndarray], ema_fast: int, ema_slow: int, atr_len: int,
+                     adx_len: int = 14, bar: str = "1H") -> Dict[str, np.ndarray]:
+    """
+    批量：bars 为列数组（high/low/close；1-D 单品种或 2-D 品种×时间），
+    一次算出基础指标（ema_fast/ema_slow/atr）和 FEATURE_NAMES 全部特征。
+    """
+    h = np.asarray(bars["high"], dtype=np.float64)
+    l = np.asarray(bars["low"], dtype=np.float64)
+    c = np.asarray(bars["close"], dtype=np.float64)
+    w = feature_windows(bar)
+    ef = ema_array(c, ema_fast)
+    es = ema_array(c, ema_slow)
+    atr = atr_array(h, l, c, atr_len)
+    out = {"ema_fast": ef, "ema_slow": es, "atr": atr}
+    out.update(derive(c, ef, es, atr, adx_array(h, l, c, adx_len), rolling_max(h, w["window"]),
+                      rolling_max(c, w["window"]), _lag(c, w["short"]), _lag(c, w["window"]),
+                      _lag(ef, w["slope"])))
+    return out
+
+
+def to_payload(features: Dict[str, float], names: Sequence[str] = FEATURE_NAMES) -> Dict[str, float]:
+    """标量特征 -> 发给 LLM 的字段（NaN 记 None，JSON 可序列化）。"""
+    return {k: (None if features[k] != features[k] else round(float(features[k]), 6)) for k in names}
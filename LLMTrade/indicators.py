@@ -1,38 +1,17 @@
 from typing import List
 
+from vector_indicators import ema_array, atr_array
 
+
+# 列表接口保留给旧调用方；计算全部走 vector_indicators（NumPy 向量化）
 def ema(values: List[float], period: int) -> List[float]:
     if len(values) < period:
         return []
-    k = 2.0 / (period + 1.0)
-    out = []
-    s = sum(values[:period]) / period
-    out.extend([float("nan")] * (period - 1))
-    out.append(s)
-    for i in range(period, len(values)):
-        s = values[i] * k + s * (1 - k)
-        out.append(s)
-    return out
+    return ema_array(values, period).tolist()
 
 
 def atr(highs: List[float], lows: List[float], closes: List[float], period: int) -> List[float]:
     if len(closes) < period + 1:
         return []
-    trs = []
-    for i in range(1, len(closes)):
-        tr = max(
-            highs[i] - lows[i],
-            abs(highs[i] - closes[i - 1]),
-            abs(lows[i] - closes[i - 1]),
-        )
-        trs.append(tr)
     # RMA/EMA-like 平滑
-    out = [float("nan")] * period
-    first = sum(trs[:period]) / period
-    out.append(first)
-    alpha = 1.0 / period
-    s = first
-    for i in range(period, len(trs)):
-        s = (1 - alpha) * s + alpha * trs[i]
-        out.append(s)
-    return out
\ No newline at end of file
+    return atr_array(highs, lows, closes, period).tolist()
@@ -0,0 +1,378 @@
+"""
+交易账本（SQLite/WAL）：每个下单意图、交易所订单号、成交、手续费、策略单触发都落库，
+按 (source, run_id, instId, 时间) 建索引。回测（backtest）、模拟盘（paper）、实盘（live）写同一套表。
+
+- intents：OrderBatcher 每发出一条意图记一行（结果 ok / rejected / error，ordId / algoId / sCode）；
+  私有推送的 orders-algo 状态变化（触发/撤销）也记在这里（kind="algo_update"）
+- fills：一行一笔成交，写入时顺带算好 pos_after / cost_after / realized（移动平均成本法，
+  买入手续费计入成本，卖出手续费计入已实现盈亏），于是区间查询都是索引范围内的聚合：
+    realized_pnl  区间已实现盈亏 = SUM(realized)
+    average_entry 某时刻持仓均价 = 最近一笔的 cost_after / pos_after
+    exposure      区间内持仓（数量/成本）的起止、最大值与时间加权平均
+- 成交按 tradeId 去重（推送断线重连后的重放不会重复记账）；晚到的乱序成交会重算该品种之后的派生列
+
+命令行：python ledger.py --db ledger.db --source backtest --run r1 --inst BTC-USDT
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SOURCES = ("backtest", "paper", "live")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS intents (
+    id INTEGER PRIMARY KEY,
+    ts_ms INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    inst_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    side TEXT,
+    ord_type TEXT,
+    sz REAL,
+    px REAL,
+    tag TEXT,
+    ord_id TEXT,
+    algo_id TEXT,
+    cl_ord_id TEXT,
+    status TEXT NOT NULL,
+    s_code TEXT,
+    error TEXT,
+    body TEXT
+);
+CREATE INDEX IF NOT EXISTS intents_inst_ts ON intents (source, run_id, inst_id, ts_ms);
+CREATE INDEX IF NOT EXISTS intents_ord ON intents (ord_id);
+CREATE INDEX IF NOT EXISTS intents_algo ON intents (algo_id);
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY,
+    ts_ms INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    inst_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    side INTEGER NOT NULL,
+    px REAL NOT NULL,
+    qty REAL NOT NULL,
+    fee REAL NOT NULL,
+    ord_id TEXT,
+    trade_id TEXT,
+    algo_id TEXT,
+    pos_after REAL NOT NULL,
+    cost_after REAL NOT NULL,
+    realized REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fills_inst_ts ON fills (source, run_id, inst_id, ts_ms);
+CREATE UNIQUE INDEX IF NOT EXISTS fills_trade ON fills (source, run_id, inst_id, trade_id)
+    WHERE trade_id IS NOT NULL;
+"""
+
+# 持仓小于该值视为清空（成本归零，避免浮点残渣）
+_FLAT_EPS = 1e-12
+
+# fills 的列数组（fills() 返回）
+FILL_COLUMNS = ("ts_ms", "side", "px", "qty", "fee", "pos_after", "cost_after", "realized")
+
+
+def apply_fill(pos: float, cost: float, side: int, px: float, qty: float, fee: float) -> Tuple[float, float, float]:
+    """移动平均成本：返回 (新持仓, 新持仓成本, 这笔已实现盈亏)。fee 为计价币金额。"""
+    if side > 0:
+        return pos + qty, cost + qty * px + fee, 0.0
+    qty = min(qty, pos) if pos > 0.0 else 0.0
+    avg = cost / pos if pos > 0.0 else 0.0
+    realized = qty * (px - avg) - fee
+    pos -= qty
+    cost = 0.0 if pos <= _FLAT_EPS else cost - qty * avg
+    return max(pos, 0.0), cost, realized
+
+
+class Ledger:
+    def __init__(self, path: str = "ledger.db", source: str = "live", run_id: str = ""):
+        if source not in SOURCES:
+            raise ValueError(f"source must be one of {SOURCES}")
+        self.path = path
+        self.source = source
+        self.run_id = run_id
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+        # 每个品种最后一笔成交后的 (ts, pos, cost)，增量写入时接着算
+        self._chain: Dict[str, Tuple[int, float, float]] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "Ledger":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _key(self, source: Optional[str], run_id: Optional[str]) -> Tuple[str, str]:
+        return (self.source if source is None else source), (self.run_id if run_id is None else run_id)
+
+    # ---------- 意图 ----------
+    def record_intents(self, kind: str, intents: Sequence[Any], ts_ms: Optional[int] = None) -> None:
+        """OrderBatcher 发出一块意图后调用（OrderIntent：body/tag/result/error）。"""
+        ts_ms = int(time.time() * 1000) if ts_ms is None else ts_ms
+        rows = []
+        for it in intents:
+            body, res = it.body, it.result or {}
+            status = "ok" if it.ok else ("rejected" if it.result else "error")
+            px = body.get("px") or body.get("slTriggerPx") or body.get("newSlTriggerPx")
+            sz = body.get("sz") or body.get("newSz")
+            rows.append((ts_ms, self.source, self.run_id, body.get("instId", ""), kind, body.get("side"),
+                         body.get("ordType"), float(sz) if sz else None, float(px) if px else None, it.tag,
+                         res.get("ordId") or body.get("ordId"), res.get("algoId") or body.get("algoId"),
+                         res.get("clOrdId") or body.get("clOrdId"), status, res.get("sCode"),
+                         None if it.error is None else str(it.error), json.dumps(body, ensure_ascii=False)))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO intents (ts_ms, source, run_id, inst_id, kind, side, ord_type, sz, px, tag, ord_id, "
+                "algo_id, cl_ord_id, status, s_code, error, body) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+
+    def record_algo_update(self, algo: Dict[str, Any]) -> None:
+        """orders-algo 推送：策略单触发（state=effective）/撤销等状态变化。"""
+        ts_ms = int(algo.get("uTime") or algo.get("cTime") or time.time() * 1000)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO intents (ts_ms, source, run_id, inst_id, kind, side, ord_type, sz, px, ord_id, algo_id, "
+                "status, body) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                (ts_ms, self.source, self.run_id, algo.get("instId", ""), "algo_update", algo.get("side"),
+                 algo.get("ordType"), float(algo.get("sz") or 0) or None,
+                 float(algo.get("slTriggerPx") or 0) or None, algo.get("ordId") or None, algo.get("algoId"),
+                 algo.get("state", ""), json.dumps(algo, ensure_ascii=False)))
+
+    # ---------- 成交 ----------
+    def _chain_state(self, inst_id: str) -> Tuple[int, float, float]:
+        st = self._chain.get(inst_id)
+        if st is None:
+            row = self._conn.execute(
+                "SELECT ts_ms, pos_after, cost_after FROM fills WHERE source=? AND run_id=? AND inst_id=? "
+                "ORDER BY ts_ms DESC, id DESC LIMIT 1", (self.source, self.run_id, inst_id)).fetchone()
+            st = tuple(row) if row else (-1, 0.0, 0.0)
+            self._chain[inst_id] = st
+        return st
+
+    def record_fills(self, inst_id: str, ts_ms: Iterable[int], side: Iterable[int], px: Iterable[float],
+                     qty: Iterable[float], fee: Iterable[float], kind: Optional[Iterable[str]] = None,
+                     ord_id: Optional[Iterable[Optional[str]]] = None,
+                     trade_id: Optional[Iterable[Optional[str]]] = None,
+                     algo_id: Optional[Iterable[Optional[str]]] = None) -> int:
+        """批量写成交（按时间顺序），返回实际写入条数（重复 tradeId 跳过）。"""
+        ts_l, side_l, px_l, qty_l, fee_l = (list(map(int, ts_ms)), list(map(int, side)), list(map(float, px)),
+                                            list(map(float, qty)), list(map(float, fee)))
+        n = len(ts_l)
+        kind_l = list(kind) if kind is not None else ["BUY" if s > 0 else "SELL" for s in side_l]
+        ord_l = list(ord_id) if ord_id is not None else [None] * n
+        trade_l = list(trade_id) if trade_id is not None else [None] * n
+        algo_l = list(algo_id) if algo_id is not None else [None] * n
+        written = 0
+        with self._lock:
+            last_ts, pos, cost = self._chain_state(inst_id)
+            rebuild_from = None
+            self._conn.execute("BEGIN")
+            try:
+                for i in range(n):
+                    if ts_l[i] < last_ts:
+                        # 一批里可能有多笔晚到的，要从最早那笔开始重算
+                        rebuild_from = ts_l[i] if rebuild_from is None else min(rebuild_from, ts_l[i])
+                    pos2, cost2, realized = apply_fill(pos, cost, side_l[i], px_l[i], qty_l[i], fee_l[i])
+                    cur = self._conn.execute(
+                        "INSERT OR IGNORE INTO fills (ts_ms, source, run_id, inst_id, kind, side, px, qty, fee, "
+                        "ord_id, trade_id, algo_id, pos_after, cost_after, realized) "
+                        "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                        (ts_l[i], self.source, self.run_id, inst_id, kind_l[i], side_l[i], px_l[i], qty_l[i],
+                         fee_l[i], ord_l[i], trade_l[i], algo_l[i], pos2, cost2, realized))
+                    if cur.rowcount:
+                        written += 1
+                        pos, cost = pos2, cost2
+                        last_ts = max(last_ts, ts_l[i])
+                if rebuild_from is not None:
+                    last_ts, pos, cost = self._rebuild(inst_id, rebuild_from)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._chain.pop(inst_id, None)
+                raise
+            self._chain[inst_id] = (last_ts, pos, cost)
+        return written
+
+    def record_fill(self, inst_id: str, side: int, px: float, qty: float, fee: float, ts_ms: int,
+                    kind: Optional[str] = None, ord_id: Optional[str] = None, trade_id: Optional[str] = None,
+                    algo_id: Optional[str] = None) -> bool:
+        kind = kind or ("BUY" if side > 0 else "SELL")
+        return self.record_fills(inst_id, [ts_ms], [side], [px], [qty], [fee], [kind], [ord_id], [trade_id],
+                                 [algo_id]) == 1
+
+    def _rebuild(self, inst_id: str, since_ts: int) -> Tuple[int, float, float]:
+        # 乱序成交：从 since_ts 之前的最后状态起，按时间重算之后所有行的派生列（调用方持锁、在事务内）
+        row = self._conn.execute(
+            "SELECT pos_after, cost_after FROM fills WHERE source=? AND run_id=? AND inst_id=? AND ts_ms < ? "
+            "ORDER BY ts_ms DESC, id DESC LIMIT 1", (self.source, self.run_id, inst_id, since_ts)).fetchone()
+        pos, cost = row if row else (0.0, 0.0)
+        last_ts = since_ts
+        rows = self._conn.execute(
+            "SELECT id, ts_ms, side, px, qty, fee FROM fills WHERE source=? AND run_id=? AND inst_id=? "
+            "AND ts_ms >= ? ORDER BY ts_ms, id", (self.source, self.run_id, inst_id, since_ts)).fetchall()
+        updates = []
+        for fid, ts, side, px, qty, fee in rows:
+            pos, cost, realized = apply_fill(pos, cost, side, px, qty, fee)
+            updates.append((pos, cost, realized, fid))
+            last_ts = ts
+        self._conn.executemany("UPDATE fills SET pos_after=?, cost_after=?, realized=? WHERE id=?", updates)
+        return last_ts, pos, cost
+
+    def record_order_update(self, order: Dict[str, Any]) -> bool:
+        """
+        orders 推送（或同格式的订单查询结果）：有新成交（fillSz>0）就记一笔，按 tradeId 去重。
+        OKX 的 fillFee 负数是扣费、正数是返佣（maker rebate）：记账 fee = -fillFee，返佣记成负成本。
+        现货买入手续费通常以基础币扣：到手数量 = fillSz - fee，手续费折成计价币记。
+        """
+        fill_sz = float(order.get("fillSz") or 0.0)
+        if fill_sz <= 0.0:
+            return False
+        inst_id = order.get("instId", "")
+        px = float(order.get("fillPx") or order.get("avgPx") or 0.0)
+        side = 1 if order.get("side") == "buy" else -1
+        fee = -float(order.get("fillFee") or order.get("fee") or 0.0)
+        base_ccy = inst_id.split("-")[0]
+        qty = fill_sz
+        if order.get("fillFeeCcy", order.get("feeCcy")) == base_ccy:
+            if side > 0:
+                qty = fill_sz - fee
+            fee *= px
+        kind = self._intent_kind(order.get("ordId")) or ("STOP" if order.get("algoId") else None)
+        return self.record_fill(inst_id, side, px, qty, fee, int(order.get("fillTime") or order.get("uTime") or 0),
+                                kind=kind, ord_id=order.get("ordId"), trade_id=order.get("tradeId") or None,
+                                algo_id=order.get("algoId") or None)
+
+    def _intent_kind(self, ord_id: Optional[str]) -> Optional[str]:
+        # 用下单时的 tag（"<instId>:buy" / "<instId>:tp1"）给成交标用途
+        if not ord_id:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT tag FROM intents WHERE ord_id = ? AND tag IS NOT NULL LIMIT 1",
+                                     (ord_id,)).fetchone()
+        if not row or not row[0]:
+            return None
+        return row[0].rsplit(":", 1)[-1].upper()
+
+    def record_backtest(self, inst_id: str, trades: np.ndarray) -> int:
+        """backtest.TRADE_DTYPE 结构化数组整批写入（source/run_id 用本账本的）。"""
+        from backtest import KIND_NAMES
+        return self.record_fills(inst_id, trades["ts"], trades["side"], trades["price"], trades["qty"],
+                                 trades["fee"], [KIND_NAMES[k] for k in trades["kind"]])
+
+    # ---------- 查询 ----------
+    def _where(self, inst_id: Optional[str], start_ms: Optional[int], end_ms: Optional[int],
+               source: Optional[str], run_id: Optional[str]) -> Tuple[str, List[Any]]:
+        src, run = self._key(source, run_id)
+        sql, args = "source=? AND run_id=?", [src, run]
+        if inst_id is not None:
+            sql += " AND inst_id=?"
+            args.append(inst_id)
+        if start_ms is not None:
+            sql += " AND ts_ms>=?"
+            args.append(int(start_ms))
+        if end_ms is not None:
+            sql += " AND ts_ms<?"
+            args.append(int(end_ms))
+        return sql, args
+
+    def realized_pnl(self, inst_id: Optional[str] = None, start_ms: Optional[int] = None,
+                     end_ms: Optional[int] = None, source: Optional[str] = None,
+                     run_id: Optional[str] = None) -> float:
+        """[start_ms, end_ms) 内卖出成交的已实现盈亏（扣手续费）；inst_id=None 为全部品种。"""
+        where, args = self._where(inst_id, start_ms, end_ms, source, run_id)
+        with self._lock:
+            row = self._conn.execute(f"SELECT COALESCE(SUM(realized), 0) FROM fills WHERE {where}", args).fetchone()
+        return float(row[0])
+
+    def _last_before(self, inst_id: str, at_ms: Optional[int], source: Optional[str],
+                     run_id: Optional[str]) -> Tuple[float, float]:
+        where, args = self._where(inst_id, None, None if at_ms is None else at_ms + 1, source, run_id)
+        with self._lock:
+            row = self._conn.execute(f"SELECT pos_after, cost_after FROM fills WHERE {where} "
+                                     "ORDER BY ts_ms DESC, id DESC LIMIT 1", args).fetchone()
+        return (float(row[0]), float(row[1])) if row else (0.0, 0.0)
+
+    def position(self, inst_id: str, at_ms: Optional[int] = None, source: Optional[str] = None,
+                 run_id: Optional[str] = None) -> float:
+        return self._last_before(inst_id, at_ms, source, run_id)[0]
+
+    def average_entry(self, inst_id: str, at_ms: Optional[int] = None, source: Optional[str] = None,
+                      run_id: Optional[str] = None) -> float:
+        """at_ms 时刻（含）持仓的平均成本价（含买入手续费）；空仓返回 0。"""
+        pos, cost = self._last_before(inst_id, at_ms, source, run_id)
+        return cost / pos if pos > _FLAT_EPS else 0.0
+
+    def fills(self, inst_id: Optional[str] = None, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+              source: Optional[str] = None, run_id: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """区间成交的列数组（按时间排序），供向量化分析。"""
+        where, args = self._where(inst_id, start_ms, end_ms, source, run_id)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(FILL_COLUMNS)} FROM fills WHERE {where} "
+                                      "ORDER BY ts_ms, id", args).fetchall()
+        arr = np.array(rows, dtype=np.float64).reshape(-1, len(FILL_COLUMNS))
+        out = {c: arr[:, i] for i, c in enumerate(FILL_COLUMNS)}
+        out["ts_ms"] = out["ts_ms"].astype(np.int64)
+        out["side"] = out["side"].astype(np.int8)
+        return out
+
+    def exposure(self, inst_id: str, start_ms: int, end_ms: int, source: Optional[str] = None,
+                 run_id: Optional[str] = None) -> Dict[str, float]:
+        """
+        [start_ms, end_ms) 内的持仓暴露：起止/最大持仓数量、最大持仓成本，
+        以及按时间加权的平均持仓数量与成本（计价币）。
+        """
+        pos0, cost0 = self._last_before(inst_id, start_ms - 1, source, run_id)
+        f = self.fills(inst_id, start_ms, end_ms, source, run_id)
+        ts = np.concatenate([[start_ms], f["ts_ms"], [end_ms]]).astype(np.float64)
+        pos = np.concatenate([[pos0], f["pos_after"]])
+        cost = np.concatenate([[cost0], f["cost_after"]])
+        dt = np.diff(ts)
+        span = float(end_ms - start_ms)
+        return {
+            "pos_start": float(pos0),
+            "pos_end": float(pos[-1]),
+            "pos_max": float(pos.max()),
+            "cost_max": float(cost.max()),
+            "pos_avg": float(np.dot(pos, dt) / span) if span > 0 else float(pos0),
+            "cost_avg": float(np.dot(cost, dt) / span) if span > 0 else float(cost0),
+            "time_in_market": float(dt[pos > _FLAT_EPS].sum() / span) if span > 0 else 0.0,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="交易账本查询")
+    parser.add_argument("--db", default="ledger.db")
+    parser.add_argument("--source", default="live", choices=SOURCES)
+    parser.add_argument("--run", default="")
+    parser.add_argument("--inst", default=None)
+    parser.add_argument("--start", type=int, default=None, help="起始时间 ms（含）")
+    parser.add_argument("--end", type=int, default=None, help="结束时间 ms（不含）")
+    args = parser.parse_args()
+
+    with Ledger(args.db, args.source, args.run) as led:
+        print(f"realized_pnl: {led.realized_pnl(args.inst, args.start, args.end):,.6g}")
+        if args.inst:
+            print(f"position    : {led.position(args.inst, args.end):,.8g}")
+            print(f"avg_entry   : {led.average_entry(args.inst, args.end):,.8g}")
+            if args.start is not None and args.end is not None:
+                for k, v in led.exposure(args.inst, args.start, args.end).items():
+                    print(f"{k:>14s}: {v:,.6g}")
+
+
+if __name__ == "__main__":
+    main()
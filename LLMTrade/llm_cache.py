@@ -0,0 +1,161 @@
+"""
+LLM 过滤结果缓存：payload 分桶量化成 key，行情变化不大时直接复用上次的判断，不再调用模型。
+
+- feature_key：只用与价格量纲无关的特征（EMA 价差%、价格相对快线%、ATR%、ADX、是否持仓、可用资金量级），
+  按步长就近取整；默认不含 instId，行情状态相近的不同品种共用判断（share_across_inst=False 时按品种分开）
+- DecisionCache：内存 LRU（OrderedDict）+ TTL，写入同时落 SQLite（WAL），重启后加载未过期的条目；
+  命中/未命中/过期/淘汰计数在 stats
+- CachedLLMFilter：包在 LLMFilter 外面，接口不变（allow_trade），未启用过滤时直接放行不查缓存
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from llm_filter import LLMFilter
+
+# 各特征的量化步长（百分比特征单位为 %）
+DEFAULT_STEPS: Dict[str, float] = {
+    "ema_spread_pct": 0.1,
+    "px_vs_fast_pct": 0.2,
+    "atr_pct": 0.1,
+    "adx": 5.0,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    allow INTEGER NOT NULL,
+    created_ms INTEGER NOT NULL,
+    payload TEXT
+);
+"""
+
+
+def _bucket(x: float, step: float) -> int:
+    return int(round(x / step)) if step > 0 else 0
+
+
+def feature_key(payload: Dict[str, Any], steps: Optional[Dict[str, float]] = None,
+                share_across_inst: bool = True) -> str:
+    """payload（TrendBot 发给模型的那份）-> 分桶后的缓存 key。"""
+    steps = {**DEFAULT_STEPS, **(steps or {})}
+    px = float(payload["last_price"]) or 1.0
+    ef, es = float(payload["ema_fast"]), float(payload["ema_slow"])
+    feats = {
+        "ema_spread_pct": (ef - es) / es * 100.0 if es else 0.0,
+        "px_vs_fast_pct": (px - ef) / ef * 100.0 if ef else 0.0,
+        "atr_pct": float(payload["atr"]) / px * 100.0,
+    }
+    parts = [str(payload.get("bar", ""))]
+    if not share_across_inst:
+        parts.append(str(payload.get("instId", "")))
+    if payload.get("adx") is not None:
+        # 带了趋势特征（features.py）：ADX 也参与分桶
+        feats["adx"] = float(payload["adx"])
+    parts += [f"{k}={_bucket(v, steps[k])}" for k, v in feats.items()]
+    # 持仓与资金只看“有没有/什么量级”：2 的幂分档
+    parts.append(f"pos={int(float(payload.get('pos_btc', 0.0)) * px >= 1.0)}")
+    parts.append(f"quote={int(math.log2(1.0 + max(float(payload.get('usdt_avail', 0.0)), 0.0)))}")
+    return "|".join(parts)
+
+
+class DecisionCache:
+    def __init__(self, path: str = "", ttl_s: float = 3600.0, max_entries: int = 10000,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl_ms = int(ttl_s * 1000)
+        self.max_entries = max_entries
+        self.clock = clock
+        self._mem: "OrderedDict[str, Tuple[bool, int]]" = OrderedDict()   # key -> (allow, created_ms)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._load()
+
+    def _now_ms(self) -> int:
+        return int(self.clock() * 1000)
+
+    def _load(self) -> None:
+        cutoff = self._now_ms() - self.ttl_ms
+        self._conn.execute("DELETE FROM llm_cache WHERE created_ms < ?", (cutoff,))
+        rows = self._conn.execute("SELECT key, allow, created_ms FROM llm_cache ORDER BY created_ms DESC LIMIT ?",
+                                  (self.max_entries,)).fetchall()
+        for key, allow, created in reversed(rows):
+            self._mem[key] = (bool(allow), created)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        return len(self._mem)
+
+    def get(self, key: str) -> Optional[bool]:
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is None:
+                self.stats["misses"] += 1
+                return None
+            if self._now_ms() - hit[1] > self.ttl_ms:
+                del self._mem[key]
+                if self._conn is not None:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._mem.move_to_end(key)
+            self.stats["hits"] += 1
+            return hit[0]
+
+    def put(self, key: str, allow: bool, payload: Optional[Dict[str, Any]] = None) -> None:
+        now = self._now_ms()
+        with self._lock:
+            self._mem[key] = (bool(allow), now)
+            self._mem.move_to_end(key)
+            evicted = []
+            while len(self._mem) > self.max_entries:
+                evicted.append(self._mem.popitem(last=False)[0])
+            self.stats["evictions"] += len(evicted)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO llm_cache (key, allow, created_ms, payload) "
+                                   "VALUES (?, ?, ?, ?)",
+                                   (key, int(allow), now, json.dumps(payload, default=str) if payload else None))
+                self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", [(k,) for k in evicted])
+
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+
+class CachedLLMFilter(LLMFilter):
+    def __init__(self, inner: LLMFilter, cache: DecisionCache, steps: Optional[Dict[str, float]] = None,
+                 share_across_inst: bool = True):
+        super().__init__(inner.enabled)
+        self.inner = inner
+        self.cache = cache
+        self.steps = steps
+        self.share_across_inst = share_across_inst
+
+    def allow_trade(self, payload: Dict[str, Any]) -> bool:
+        if not self.inner.enabled:
+            return True
+        key = feature_key(payload, self.steps, self.share_across_inst)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        allow = self.inner.allow_trade(payload)
+        self.cache.put(key, allow, payload)
+        return allow
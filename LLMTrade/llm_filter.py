@@ -1,5 +1,7 @@
 from typing import Any, Dict
 
+import requests
+
 
 class LLMFilter:
     def __init__(self, enabled: bool):
@@ -16,4 +18,27 @@ class LLMFilter:
 
         # TODO: 在这里接入你的大模型 API
         # 示例：return result_json.get("allow", False)
-        return True
\ No newline at end of file
+        return True
+
+    def prefetch(self, payload: Dict[str, Any]) -> None:
+        """收盘前用试算 payload 预取判断；同步过滤器不做任何事（见 async_llm.AsyncLLMFilter）。"""
+
+
+class HTTPLLMFilter(LLMFilter):
+    """把 payload POST 到模型服务（url），响应 {"allow": bool, "reason": "..."}。"""
+
+    def __init__(self, enabled: bool, url: str, timeout: float = 10.0):
+        super().__init__(enabled)
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def allow_trade(self, payload: Dict[str, Any]) -> bool:
+        if not self.enabled:
+            return True
+        r = self.session.post(self.url, json=payload, timeout=self.timeout)
+        r.raise_for_status()
+        data = r.json()
+        if "allow" not in data:
+            raise ValueError(f"LLM response missing 'allow': {data}")
+        return bool(data["allow"])
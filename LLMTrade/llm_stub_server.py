@@ -0,0 +1,90 @@
+"""
+本地大模型替身服务器（测试/演示用，不联网）：POST /v1/filter，请求体是 TrendBot 的 payload，
+返回 {"allow": bool, "reason": "..."}（HTTPLLMFilter 的约定）。
+
+- 默认规则：ema_fast > ema_slow 放行；可传 decide(payload) -> bool 自定义
+- 可注入：latency（每个请求延迟秒数，可随时改）、fail_every（每 N 个请求返回一次 500）、
+  gate（threading.Event，clear() 后请求一直挂起直到 set()，用来确定性地制造超时）
+- requests 记录收到的 payload，便于断言调用次数与预取
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubLLMServer._HTTPServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # 静默
+        pass
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        status, payload = self.server.stub.handle(self.path, json.loads(raw) if raw else {})
+        out = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+        except (BrokenPipeError, ConnectionResetError):
+            pass        # 客户端等不及先断开了
+
+
+class StubLLMServer:
+    class _HTTPServer(ThreadingHTTPServer):
+        daemon_threads = True
+        stub: "StubLLMServer"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, fail_every: int = 0,
+                 decide: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.decide = decide or (lambda p: float(p["ema_fast"]) > float(p["ema_slow"]))
+        self.requests: List[Dict[str, Any]] = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+        self._httpd = self._HTTPServer((host, port), _Handler)
+        self._httpd.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/filter"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.gate.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def handle(self, path: str, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            self.requests.append(payload)
+            n = len(self.requests)
+        self.gate.wait()
+        if self.latency:
+            time.sleep(self.latency)
+        if path != "/v1/filter":
+            return 404, {"error": f"no route {path}"}
+        if self.fail_every and n % self.fail_every == 0:
+            return 500, {"error": "model overloaded"}
+        allow = bool(self.decide(payload))
+        return 200, {"allow": allow, "reason": "stub: " + ("trend up" if allow else "no trend")}
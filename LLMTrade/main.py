@@ -1,19 +1,177 @@
 import os
+import asyncio
 import time
-import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from typing import Dict, List, Optional
 
+from async_llm import AsyncLLMFilter
 from config import BotConfig
+from ledger import Ledger
 from okx_client import OKXClient, MockOKXClient
-from llm_filter import LLMFilter
+from llm_cache import CachedLLMFilter, DecisionCache
+from llm_filter import HTTPLLMFilter, LLMFilter
+from order_batch import OrderBatcher
+from portfolio import Portfolio, load_portfolio
+from rate_limit import RateLimiter
+from scheduler import BarScheduler, ServerClock
+from tracing import Tracer, traced_client
 from trend_bot import TrendBot
 
 
-def sleep_to_next_hour():
-    now = dt.datetime.now()
-    nxt = (now.replace(minute=0, second=5, microsecond=0) + dt.timedelta(hours=1))
-    sec = (nxt - now).total_seconds()
-    if sec > 0:
-        time.sleep(sec)
+def make_scheduler(cfg: BotConfig, client: OKXClient) -> BarScheduler:
+    # 轮询模式：按交易所时钟在每根K线收盘 + bar_confirm_delay_s 时唤醒（偏移只偶尔联网重测）
+    server = ServerClock(client.get_server_time_ms, resync_s=cfg.clock_resync_s)
+    return BarScheduler(server=server, confirm_delay_s=cfg.bar_confirm_delay_s)
+
+
+def make_llm(cfg: BotConfig) -> LLMFilter:
+    # 模型（HTTP 或模板）-> 分桶缓存 -> 线程池 + deadline（超时按 llm_fallback 回退）
+    if cfg.llm_url:
+        llm = HTTPLLMFilter(cfg.enable_llm_filter, cfg.llm_url, cfg.llm_timeout_s)
+    else:
+        llm = LLMFilter(cfg.enable_llm_filter)
+    if not cfg.enable_llm_filter:
+        return llm
+    llm = CachedLLMFilter(llm, DecisionCache(cfg.llm_cache_db, cfg.llm_cache_ttl_s, cfg.llm_cache_max),
+                          share_across_inst=cfg.llm_cache_share)
+    if cfg.llm_deadline_s > 0:
+        llm = AsyncLLMFilter(llm, cfg.llm_deadline_s, cfg.llm_fallback, cfg.llm_fallback_default, cfg.llm_workers)
+    return llm
+
+
+def start_llm_prefetch(cfg: BotConfig, sched: BarScheduler, bars, prefetch) -> None:
+    # 收盘前 llm_prefetch_lead_s 秒唤醒（负的确认延迟），共用同一个交易所时钟，单独线程跑
+    if not cfg.enable_llm_filter or cfg.llm_prefetch_lead_s <= 0:
+        return
+    pre = BarScheduler(server=sched.server, confirm_delay_s=-cfg.llm_prefetch_lead_s)
+    for bar in bars:
+        pre.add(bar, lambda bar, close_ms, now_ms: prefetch(bar))
+    Thread(target=pre.run, name="llm-prefetch", daemon=True).start()
+
+
+def make_feed(cfg: BotConfig, on_bar, subs: Dict[str, List[str]], client: Optional[OKXClient] = None):
+    """
+    subs：bar -> 品种列表。配置了 ws_resample_base 时只订阅 base（如 1m）K线，
+    各周期由 Resampler 本地合成后再回调 on_bar（只推完整的K线）；base K线落本地库，启动时从库里接上正在形成的K线。
+    client：base K线断档时用来补齐本地库（不给则清空重新播种）。
+    """
+    from market_feed import MarketFeed
+
+    if not cfg.ws_resample_base:
+        feed = MarketFeed(on_bar=on_bar, public_url=cfg.ws_public_url, business_url=cfg.ws_business_url)
+        for bar, inst_ids in subs.items():
+            feed.subscribe_candles(inst_ids, bar)
+        return feed
+    from candle_store import CandleStore
+    from resampler import Resampler
+
+    # 残缺K线（中途启动/断档）不当作收盘推给策略：否则会拿半截K线更新指标、下单并落库
+    hub = Resampler(cfg.ws_resample_base, targets=(), emit_partial=False,
+                    store=CandleStore(cfg.candle_store_dir) if cfg.candle_store_dir else None, client=client)
+    for bar, inst_ids in subs.items():
+        hub.subscribe(bar, on_bar, inst_ids)
+    inst_ids = sorted({i for ids in subs.values() for i in ids})
+    for inst_id in inst_ids:
+        hub.warm(inst_id)
+    feed = MarketFeed(on_bar=hub.on_bar, public_url=cfg.ws_public_url, business_url=cfg.ws_business_url)
+    feed.subscribe_candles(inst_ids, cfg.ws_resample_base)
+    return feed
+
+
+def start_trace_export(cfg: BotConfig, tracer: Tracer) -> None:
+    # 每 trace_export_s 秒把直方图写成 Prometheus 文本 / JSON 快照（后台线程，写失败只告警）
+    if not tracer.enabled or not (cfg.trace_prom_file or cfg.trace_json_file):
+        return
+
+    def loop():
+        while True:
+            time.sleep(cfg.trace_export_s)
+            try:
+                tracer.export(cfg.trace_prom_file, cfg.trace_json_file)
+            except OSError as e:
+                print(f"[WARN] 延迟指标导出失败：{e}")
+    Thread(target=loop, name="trace-export", daemon=True).start()
+
+
+async def run_ws(cfg: BotConfig, bot: TrendBot) -> None:
+    # 推送模式：K线收盘即触发 run_once；bot 是同步代码，放到单线程池里按顺序执行
+    loop = asyncio.get_running_loop()
+    worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bot")
+
+    def handle(candle):
+        try:
+            bot.on_bar(candle)
+        except Exception as e:
+            print(f"[ERROR] {e}")
+
+    def on_bar(inst_id, bar, candle):
+        loop.run_in_executor(worker, handle, candle)
+
+    feed = make_feed(cfg, on_bar, {cfg.bar: [cfg.inst_id]}, client=bot.client)
+    await feed.run()
+
+
+async def run_ws_portfolio(cfg: BotConfig, portfolio: Portfolio) -> None:
+    # 组合推送模式：各品种收盘K线按周期缓存，该周期凑齐或等 portfolio_bar_wait_s 后只跑该周期一轮
+    loop = asyncio.get_running_loop()
+    worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="portfolio-cycle")
+    timers: Dict[str, asyncio.TimerHandle] = {}
+
+    def handle(pushed, bar):
+        try:
+            portfolio.run_cycle(pushed, bar=bar)
+            print(f"[PORTFOLIO] {bar} {len(pushed)} 个品种本轮耗时 {portfolio.stats['last_cycle_s']:.2f}s")
+        except Exception as e:
+            print(f"[ERROR] {e}")
+
+    def fire(bar):
+        timer = timers.pop(bar, None)
+        if timer is not None:
+            timer.cancel()
+        pushed = portfolio.take_pushed(bar)
+        if pushed:
+            loop.run_in_executor(worker, handle, pushed, bar)
+
+    def on_bar(inst_id, bar, candle):
+        if portfolio.on_bar(inst_id, candle, bar):
+            fire(bar)
+        elif bar not in timers:
+            timers[bar] = loop.call_later(cfg.portfolio_bar_wait_s, fire, bar)
+
+    feed = make_feed(cfg, on_bar, {bar: [i for i, b in portfolio.bots.items() if b.cfg.bar == bar]
+                                   for bar in portfolio.bars}, client=portfolio.client)
+    await feed.run()
+
+
+def run_portfolio(cfg: BotConfig, client: OKXClient, llm: LLMFilter, balances, orders: OrderBatcher,
+                  tracer: Optional[Tracer] = None) -> None:
+    portfolio = Portfolio(cfg, client, llm, load_portfolio(cfg.portfolio_file), balances=balances,
+                          orders=orders, workers=cfg.portfolio_workers, tracer=tracer)
+    print(f"Portfolio started: {len(portfolio.bots)} instruments.")
+    portfolio.run_cycle()       # 先用 REST 预热指标
+    if cfg.use_ws_feed:
+        asyncio.run(run_ws_portfolio(cfg, portfolio))
+        return
+    sched = make_scheduler(cfg, client)
+    for bar in portfolio.bars:
+        sched.add(bar, lambda bar, close_ms, now_ms: portfolio.run_cycle(now_ms=now_ms, bar=bar))
+    start_llm_prefetch(cfg, sched, portfolio.bars, portfolio.prefetch_llm)
+    sched.run()
+
+
+def _ledger_hook(ledger: Optional[Ledger], method: str):
+    # 私有推送的成交/策略单变化记账；记账失败不影响推送线程
+    if ledger is None:
+        return None
+    fn = getattr(ledger, method)
+
+    def hook(msg):
+        try:
+            fn(msg)
+        except Exception as e:
+            print(f"[WARN] 账本记录失败：{e}")
+    return hook
 
 
 def main():
@@ -35,19 +193,53 @@ def main():
             api_secret = api_secret or "dummy_secret"
             passphrase = passphrase or "dummy_passphrase"
         client = MockOKXClient(api_key, api_secret, passphrase, cfg.base_url)
+    elif cfg.portfolio_file:
+        # 组合：多个线程共用一个异步连接池（线程安全）
+        from async_okx_client import SyncOKXClient
+        client = SyncOKXClient(api_key, api_secret, passphrase, cfg.base_url, limiter=RateLimiter())
     else:
-        client = OKXClient(api_key, api_secret, passphrase, cfg.base_url)
+        client = OKXClient(api_key, api_secret, passphrase, cfg.base_url, limiter=RateLimiter())
 
-    llm = LLMFilter(cfg.enable_llm_filter)
-    bot = TrendBot(cfg, client, llm)
+    paper = isinstance(client, MockOKXClient)
+    ledger = Ledger(cfg.ledger_db, source="paper" if paper else "live") if cfg.ledger_db else None
+    if paper:
+        # 模拟盘没有私有推送：由模拟客户端的即时成交回调记账，和实盘走同一个 record_order_update
+        client.on_order = _ledger_hook(ledger, "record_order_update")
+    tracer = Tracer(cfg.trace_enabled)
+    client = traced_client(client, tracer)
+    start_trace_export(cfg, tracer)
+    orders = OrderBatcher(client, ledger=ledger)
 
-    print("Bot started. Running on hourly cadence.")
-    while True:
-        try:
-            bot.run_once()
-        except Exception as e:
-            print(f"[ERROR] {e}")
-        sleep_to_next_hour()
+    balances = None
+    if cfg.use_private_ws and not paper:
+        from account_stream import AccountStream
+        stream = AccountStream(api_key, api_secret, passphrase, cfg.ws_private_url,
+                               on_order=_ledger_hook(ledger, "record_order_update"),
+                               on_algo=_ledger_hook(ledger, "record_algo_update"))
+        stream.start_in_thread()
+        balances = stream.cache
+
+    llm = make_llm(cfg)
+    if cfg.portfolio_file:
+        run_portfolio(cfg, client, llm, balances, orders, tracer)
+        return
+    bot = TrendBot(cfg, client, llm, balances=balances, orders=orders, tracer=tracer)
+
+    if cfg.use_ws_feed:
+        print(f"Bot started. WebSocket feed {cfg.inst_id} {cfg.bar}.")
+        bot.run_once()      # 先用 REST 预热指标
+        asyncio.run(run_ws(cfg, bot))
+        return
+
+    print(f"Bot started. Running at every {cfg.bar} bar close.")
+    try:
+        bot.run_once()
+    except Exception as e:
+        print(f"[ERROR] {e}")
+    sched = make_scheduler(cfg, client)
+    sched.add(cfg.bar, lambda bar, close_ms, now_ms: bot.run_once(now_ms=now_ms))
+    start_llm_prefetch(cfg, sched, [cfg.bar], lambda bar: bot.prefetch_llm())
+    sched.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+"""
+OKX 公共 WebSocket 行情：K线（candle{bar}，business 通道）+ ticker（tickers，public 通道）。
+
+- 一个 URL 一条连接（WSConnection），多品种订阅分批发送
+- 断线自动重连（指数退避），重连后按已登记的订阅全部重订
+- 空闲时发 "ping" 保活；超过 2 个 ping 周期无任何消息视为断线
+- 只把已收盘（confirm=1）的K线推给 on_bar，按 ts 去重（重连后交易所可能重推）
+- 回调在事件循环线程里同步执行，需要很快返回；重活交给线程池（见 main.run_ws）
+"""
+import asyncio
+import json
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from timeframes import bar_to_ms
+
+PUBLIC_URL = "wss://ws.okx.com:8443/ws/v5/public"
+BUSINESS_URL = "wss://ws.okx.com:8443/ws/v5/business"
+SUBSCRIBE_BATCH = 50            # 单条 subscribe 消息里的 args 数
+PING_INTERVAL = 20.0            # OKX：30s 无数据会断开
+
+Candle = Dict[str, Any]
+BarCallback = Callable[[str, str, Candle], None]
+TickerCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def parse_candle_row(row: List[str]) -> Candle:
+    # [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm]
+    return {
+        "ts": int(row[0]),
+        "open": float(row[1]),
+        "high": float(row[2]),
+        "low": float(row[3]),
+        "close": float(row[4]),
+        "vol": float(row[5]),
+        "confirm": len(row) > 8 and row[8] == "1",
+    }
+
+
+class WSConnection:
+    """单条 WebSocket 连接：订阅登记、保活、断线重连并重订阅。"""
+
+    def __init__(self, url: str, on_message: Callable[[Dict[str, Any]], None],
+                 ping_interval: float = PING_INTERVAL, backoff: Tuple[float, float] = (0.5, 30.0),
+                 on_open: Optional[Callable[[aiohttp.ClientWebSocketResponse], Awaitable[None]]] = None,
+                 on_close: Optional[Callable[[], None]] = None):
+        self.url = url
+        self.on_message = on_message
+        self.on_open = on_open
+        self.on_close = on_close
+        self.ping_interval = ping_interval
+        self.backoff = backoff
+        self.args: List[Dict[str, str]] = []
+        self.connects = 0
+        self.errors: List[str] = []
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._stopped = False
+        self.connected = asyncio.Event()
+
+    async def subscribe(self, args: Iterable[Dict[str, str]]) -> None:
+        new = [a for a in args if a not in self.args]
+        self.args.extend(new)
+        if new and self._ws is not None and not self._ws.closed:
+            await self._send_subscribe(self._ws, new)
+
+    async def _send_subscribe(self, ws: aiohttp.ClientWebSocketResponse, args: List[Dict[str, str]]) -> None:
+        for i in range(0, len(args), SUBSCRIBE_BATCH):
+            await ws.send_str(json.dumps({"op": "subscribe", "args": args[i:i + SUBSCRIBE_BATCH]}))
+
+    async def run(self) -> None:
+        delay = self.backoff[0]
+        async with aiohttp.ClientSession() as session:
+            while not self._stopped:
+                try:
+                    async with session.ws_connect(self.url, autoping=True) as ws:
+                        self._ws = ws
+                        self.connects += 1
+                        if self.on_open is not None:
+                            await self.on_open(ws)
+                        if self.args:
+                            await self._send_subscribe(ws, list(self.args))
+                        self.connected.set()
+                        delay = self.backoff[0]
+                        await self._read(ws)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.errors.append(repr(e))
+                finally:
+                    self._ws = None
+                    self.connected.clear()
+                    if self.on_close is not None:
+                        self.on_close()
+                if self._stopped:
+                    break
+                # 退避 + 抖动，避免大量连接同时重连
+                await asyncio.sleep(delay * (0.5 + random.random() / 2))
+                delay = min(self.backoff[1], delay * 2)
+
+    async def _read(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        pinged = False
+        while True:
+            try:
+                msg = await ws.receive(timeout=self.ping_interval)
+            except asyncio.TimeoutError:
+                if pinged:
+                    return          # 两个周期没有任何数据：连接已死
+                await ws.send_str("ping")
+                pinged = True
+                continue
+            pinged = False
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                if msg.data == "pong":
+                    continue
+                self.on_message(json.loads(msg.data))
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                              aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                return
+
+    async def stop(self) -> None:
+        self._stopped = True
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+
+
+class MarketFeed:
+    def __init__(self, on_bar: Optional[BarCallback] = None, on_ticker: Optional[TickerCallback] = None,
+                 public_url: str = PUBLIC_URL, business_url: str = BUSINESS_URL,
+                 ping_interval: float = PING_INTERVAL):
+        self.on_bar = on_bar
+        self.on_ticker = on_ticker
+        self.public = WSConnection(public_url, self._on_message, ping_interval)
+        self.business = WSConnection(business_url, self._on_message, ping_interval)
+        self.tickers: Dict[str, Dict[str, Any]] = {}
+        self.forming: Dict[Tuple[str, str], Candle] = {}
+        self.last_bar_ts: Dict[Tuple[str, str], int] = {}
+        self.stats = {"bars": 0, "dup_bars": 0, "tickers": 0, "errors": 0, "last_close_lag_ms": 0.0}
+        self._pending: List[Tuple[WSConnection, List[Dict[str, str]]]] = []
+        self._tasks: Dict[WSConnection, asyncio.Task] = {}
+
+    # ---------- 订阅 ----------
+    def subscribe_candles(self, inst_ids: Iterable[str], bar: str) -> None:
+        bar_to_ms(bar)      # 提前校验周期
+        self._pending.append((self.business, [{"channel": "candle" + bar, "instId": i} for i in inst_ids]))
+
+    def subscribe_tickers(self, inst_ids: Iterable[str]) -> None:
+        self._pending.append((self.public, [{"channel": "tickers", "instId": i} for i in inst_ids]))
+
+    async def _flush_pending(self) -> None:
+        while self._pending:
+            conn, args = self._pending.pop(0)
+            await conn.subscribe(args)
+
+    # ---------- 运行 ----------
+    async def start(self) -> None:
+        """后台启动需要的连接（已登记订阅的 URL 才连）。"""
+        await self._flush_pending()
+        for conn in (self.public, self.business):
+            if conn.args and conn not in self._tasks:
+                self._tasks[conn] = asyncio.create_task(conn.run())
+
+    async def run(self) -> None:
+        await self.start()
+        await asyncio.gather(*self._tasks.values())
+
+    async def wait_connected(self) -> None:
+        await asyncio.gather(*(conn.connected.wait() for conn in self._tasks))
+
+    async def stop(self) -> None:
+        for conn in (self.public, self.business):
+            await conn.stop()
+        for t in self._tasks.values():
+            t.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks = {}
+
+    # ---------- 消息分发 ----------
+    def _on_message(self, msg: Dict[str, Any]) -> None:
+        if "event" in msg:
+            if msg["event"] == "error":
+                self.stats["errors"] += 1
+                print(f"[WS] 订阅错误：{msg.get('code')} {msg.get('msg')}")
+            return
+        arg = msg.get("arg") or {}
+        channel = arg.get("channel", "")
+        inst_id = arg.get("instId", "")
+        if channel.startswith("candle"):
+            bar = channel[len("candle"):]
+            for row in msg.get("data") or []:
+                self._on_candle(inst_id, bar, parse_candle_row(row))
+        elif channel == "tickers":
+            for t in msg.get("data") or []:
+                self.tickers[inst_id] = t
+                self.stats["tickers"] += 1
+                if self.on_ticker is not None:
+                    self.on_ticker(inst_id, t)
+
+    def _on_candle(self, inst_id: str, bar: str, candle: Candle) -> None:
+        key = (inst_id, bar)
+        if not candle["confirm"]:
+            self.forming[key] = candle
+            return
+        if candle["ts"] <= self.last_bar_ts.get(key, 0):
+            self.stats["dup_bars"] += 1
+            return
+        self.last_bar_ts[key] = candle["ts"]
+        self.stats["bars"] += 1
+        self.stats["last_close_lag_ms"] = time.time() * 1000 - (candle["ts"] + bar_to_ms(bar))
+        if self.on_bar is not None:
+            self.on_bar(inst_id, bar, candle)
@@ -5,19 +5,74 @@ import hmac
 import base64
 import hashlib
 import datetime as dt
-from typing import Any, Dict, List, Optional
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 
 import requests
 
+from rate_limit import RateLimiter, RATE_LIMIT_CODES
 
-class OKXClient:
-    def __init__(self, api_key: str, api_secret: str, passphrase: str, base_url: str):
+
+def amend_algo_body(inst_id: str, algo_id: str, new_sz: Optional[str] = None,
+                    new_sl_trigger_px: Optional[str] = None, new_sl_ord_px: Optional[str] = None,
+                    new_tp_trigger_px: Optional[str] = None, new_tp_ord_px: Optional[str] = None) -> Dict[str, Any]:
+    body = {"instId": inst_id, "algoId": algo_id}
+    for k, v in (("newSz", new_sz), ("newSlTriggerPx", new_sl_trigger_px), ("newSlOrdPx", new_sl_ord_px),
+                 ("newTpTriggerPx", new_tp_trigger_px), ("newTpOrdPx", new_tp_ord_px)):
+        if v is not None:
+            body[k] = v
+    return body
+
+
+class RequestSpec(NamedTuple):
+    """一次 REST 调用的完整描述；端点只在 OKXEndpoints 里组装一次，同步/异步客户端各自执行。"""
+    method: str
+    path: str
+    params: Optional[Dict[str, Any]] = None
+    body: Optional[Any] = None
+    auth: bool = False
+    retry: int = 2
+    partial_ok: bool = False
+
+
+def _data(resp: Dict[str, Any]) -> Any:
+    return resp["data"]
+
+
+def _first_instrument(resp: Dict[str, Any]) -> Dict[str, Any]:
+    if not resp["data"]:
+        raise RuntimeError("Instrument not found, check instId.")
+    return resp["data"][0]
+
+
+def _candle_params(inst_id: str, bar: str, limit: int,
+                   after: Optional[int], before: Optional[int]) -> Dict[str, str]:
+    # after：返回早于该 ts 的数据（往前翻页）；before：返回晚于该 ts 的数据
+    params = {"instId": inst_id, "bar": bar, "limit": str(limit)}
+    if after is not None:
+        params["after"] = str(after)
+    if before is not None:
+        params["before"] = str(before)
+    return params
+
+
+class OKXEndpoints:
+    """
+    签名/校验 + 全部端点定义。子类只实现 _call(spec, parse)：
+    OKXClient 用 requests 同步执行，AsyncOKXClient 用 aiohttp 执行并返回协程。
+    """
+
+    def __init__(self, api_key: str, api_secret: str, passphrase: str, base_url: str,
+                 limiter: Optional[RateLimiter] = None):
         self.api_key = api_key
         self.api_secret = api_secret
         self.passphrase = passphrase
         self.base_url = base_url.rstrip("/")
-        self.session = requests.Session()
-        self.session.headers.update({"Content-Type": "application/json"})
+        # 按接口限频 + 优先级（rate_limit）；None 则不限（旧行为）
+        self.limiter = limiter
+
+    def _call(self, spec: RequestSpec, parse: Callable[[Dict[str, Any]], Any] = lambda r: r) -> Any:
+        raise NotImplementedError
 
     @staticmethod
     def _iso_timestamp_utc() -> str:
@@ -31,9 +86,9 @@ class OKXClient:
         mac = hmac.new(self.api_secret.encode("utf-8"), prehash.encode("utf-8"), hashlib.sha256)
         return base64.b64encode(mac.digest()).decode()
 
-    def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
-                 body: Optional[Dict[str, Any]] = None, auth: bool = False,
-                 retry: int = 2) -> Dict[str, Any]:
+    def _prepare(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                 body: Optional[Any] = None, auth: bool = False) -> Tuple[str, str, Dict[str, str]]:
+        """组装 (requestPath, body 字符串, 签名头)；同步/异步客户端共用。"""
         method = method.upper()
         params = params or {}
         body = body or {}
@@ -57,58 +112,52 @@ class OKXClient:
                 "OK-ACCESS-TIMESTAMP": ts,
                 "OK-ACCESS-PASSPHRASE": self.passphrase,
             })
+        return request_path, body_str, headers
 
-        url = self.base_url + request_path
-
-        last_err = None
-        for attempt in range(retry + 1):
-            try:
-                if method == "GET":
-                    r = self.session.get(url, headers=headers, timeout=10)
-                else:
-                    r = self.session.post(self.base_url + path, headers=headers, data=body_str, timeout=10)
-
-                data = r.json()
-                # OKX/OKCoin 通常 code=="0" 表示成功
-                if str(data.get("code")) == "0":
-                    return data
-
-                # 常见：接口偶发超时/压力（官方 FAQ 也建议错峰/重试） 
-                last_err = RuntimeError(f"API error code={data.get('code')} msg={data.get('msg')} data={data.get('data')}")
-            except Exception as e:
-                last_err = e
-
-            if attempt < retry:
-                time.sleep(0.6 * (attempt + 1))
-
-        raise last_err
+    @staticmethod
+    def _check(data: Dict[str, Any], partial_ok: bool = False) -> Optional[Exception]:
+        # OKX/OKCoin 通常 code=="0" 表示成功
+        if str(data.get("code")) == "0":
+            return None
+        # 批量接口：1=全部失败 / 2=部分成功，逐条结果在 data[].sCode 里，交给调用方
+        if partial_ok and str(data.get("code")) in ("1", "2") and data.get("data"):
+            return None
+        return RuntimeError(f"API error code={data.get('code')} msg={data.get('msg')} data={data.get('data')}")
+
+    def _rate_limited(self, path: str, data: Dict[str, Any]) -> bool:
+        # 交易所报限频：让限频器暂停该接口（由限频器负责等待，不再固定 sleep）
+        if self.limiter is None or str(data.get("code")) not in RATE_LIMIT_CODES:
+            return False
+        self.limiter.penalize(path)
+        return True
 
     # ---------- 公共数据 ----------
     def get_server_time_ms(self) -> int:
         # GET /api/v5/public/time 
-        data = self._request("GET", "/api/v5/public/time", auth=False)
-        return int(data["data"][0]["ts"])
+        return self._call(RequestSpec("GET", "/api/v5/public/time"), lambda r: int(r["data"][0]["ts"]))
 
-    def get_candles(self, inst_id: str, bar: str, limit: int) -> List[List[str]]:
+    def get_candles(self, inst_id: str, bar: str, limit: int,
+                    after: Optional[int] = None, before: Optional[int] = None) -> List[List[str]]:
         # GET /api/v5/market/candles 
-        params = {"instId": inst_id, "bar": bar, "limit": str(limit)}
-        data = self._request("GET", "/api/v5/market/candles", params=params, auth=False)
         # 返回：[[ts, o, h, l, c, vol, volCcy, ...], ...]，按“最近在前”
-        return data["data"]
+        return self._call(RequestSpec("GET", "/api/v5/market/candles",
+                                      params=_candle_params(inst_id, bar, limit, after, before)), _data)
+
+    def get_history_candles(self, inst_id: str, bar: str, limit: int = 100,
+                            after: Optional[int] = None, before: Optional[int] = None) -> List[List[str]]:
+        # GET /api/v5/market/history-candles（全历史，单次最多 100 根，最近在前）
+        return self._call(RequestSpec("GET", "/api/v5/market/history-candles",
+                                      params=_candle_params(inst_id, bar, limit, after, before)), _data)
 
     def get_instruments_spot(self, inst_id: str) -> Dict[str, Any]:
         # GET /api/v5/public/instruments?instType=SPOT 
-        params = {"instType": "SPOT", "instId": inst_id}
-        data = self._request("GET", "/api/v5/public/instruments", params=params, auth=False)
-        if not data["data"]:
-            raise RuntimeError("Instrument not found, check instId.")
-        return data["data"][0]
+        return self._call(RequestSpec("GET", "/api/v5/public/instruments",
+                                      params={"instType": "SPOT", "instId": inst_id}), _first_instrument)
 
     # ---------- 私有数据 ----------
     def get_balance(self, ccy: str) -> Dict[str, Any]:
         # /api/v5/account/balance?ccy=BTC 等在文档签名示例中出现 
-        params = {"ccy": ccy}
-        return self._request("GET", "/api/v5/account/balance", params=params, auth=True)
+        return self._call(RequestSpec("GET", "/api/v5/account/balance", params={"ccy": ccy}, auth=True))
 
     # ---------- 下单 ----------
     def place_order(self, inst_id: str, side: str, ord_type: str, sz: str,
@@ -129,15 +178,92 @@ class OKXClient:
         if cl_ord_id is not None:
             body["clOrdId"] = cl_ord_id
 
-        return self._request("POST", "/api/v5/trade/order", body=body, auth=True)
+        return self._call(RequestSpec("POST", "/api/v5/trade/order", body=body, auth=True))
 
     def place_algo_order(self, body: Dict[str, Any]) -> Dict[str, Any]:
         # POST /api/v5/trade/order-algo 
-        return self._request("POST", "/api/v5/trade/order-algo", body=body, auth=True)
+        return self._call(RequestSpec("POST", "/api/v5/trade/order-algo", body=body, auth=True))
 
     def cancel_advance_algos(self, items: List[Dict[str, str]]) -> Dict[str, Any]:
         # POST /api/v5/trade/cancel-advance-algos 
-        return self._request("POST", "/api/v5/trade/cancel-advance-algos", body=items, auth=True)
+        return self._call(RequestSpec("POST", "/api/v5/trade/cancel-advance-algos", body=items, auth=True,
+                                      partial_ok=True))
+
+    def cancel_algos(self, items: List[Dict[str, str]]) -> Dict[str, Any]:
+        # POST /api/v5/trade/cancel-algos（conditional/oco/trigger/move_order_stop，单次最多 10 条）
+        return self._call(RequestSpec("POST", "/api/v5/trade/cancel-algos", body=items, auth=True,
+                                      partial_ok=True))
+
+    # ---------- 批量（单次最多 20 条；逐条结果见 data[].sCode，整批不自动重试以免重复下单） ----------
+    def place_batch_orders(self, orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # POST /api/v5/trade/batch-orders
+        return self._call(RequestSpec("POST", "/api/v5/trade/batch-orders", body=orders, auth=True,
+                                      retry=0, partial_ok=True))
+
+    def amend_batch_orders(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # POST /api/v5/trade/amend-batch-orders：{instId, ordId|clOrdId, newSz?, newPx?}
+        return self._call(RequestSpec("POST", "/api/v5/trade/amend-batch-orders", body=items, auth=True,
+                                      retry=0, partial_ok=True))
+
+    def cancel_batch_orders(self, items: List[Dict[str, str]]) -> Dict[str, Any]:
+        # POST /api/v5/trade/cancel-batch-orders：{instId, ordId|clOrdId}
+        return self._call(RequestSpec("POST", "/api/v5/trade/cancel-batch-orders", body=items, auth=True,
+                                      partial_ok=True))
+
+    def amend_algos(self, inst_id: str, algo_id: str, new_sz: Optional[str] = None,
+                    new_sl_trigger_px: Optional[str] = None, new_sl_ord_px: Optional[str] = None,
+                    new_tp_trigger_px: Optional[str] = None, new_tp_ord_px: Optional[str] = None) -> Dict[str, Any]:
+        # POST /api/v5/trade/amend-algos（仅 conditional/trigger，move_order_stop 不支持）
+        # 被拒不重试：调用方回落到撤单重挂
+        return self._call(RequestSpec("POST", "/api/v5/trade/amend-algos",
+                                      body=amend_algo_body(inst_id, algo_id, new_sz, new_sl_trigger_px,
+                                                           new_sl_ord_px, new_tp_trigger_px, new_tp_ord_px),
+                                      auth=True, retry=0))
+
+
+class OKXClient(OKXEndpoints):
+    def __init__(self, api_key: str, api_secret: str, passphrase: str, base_url: str,
+                 limiter: Optional[RateLimiter] = None):
+        super().__init__(api_key, api_secret, passphrase, base_url, limiter=limiter)
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def _call(self, spec: RequestSpec, parse: Callable[[Dict[str, Any]], Any] = lambda r: r) -> Any:
+        return parse(self._request(*spec))
+
+    def _throttle(self, path: str):
+        return self.limiter.slot(path) if self.limiter is not None else nullcontext()
+
+    def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                 body: Optional[Dict[str, Any]] = None, auth: bool = False,
+                 retry: int = 2, partial_ok: bool = False) -> Dict[str, Any]:
+        method = method.upper()
+
+        last_err = None
+        for attempt in range(retry + 1):
+            throttled = False
+            try:
+                with self._throttle(path):
+                    # 拿到令牌后再签名（排队可能较久，时间戳要新）
+                    request_path, body_str, headers = self._prepare(method, path, params, body, auth)
+                    if method == "GET":
+                        r = self.session.get(self.base_url + request_path, headers=headers, timeout=10)
+                    else:
+                        r = self.session.post(self.base_url + path, headers=headers, data=body_str, timeout=10)
+
+                data = r.json()
+                last_err = self._check(data, partial_ok)
+                if last_err is None:
+                    return data
+                # 常见：接口偶发超时/压力（官方 FAQ 也建议错峰/重试） 
+                throttled = self._rate_limited(path, data)
+            except Exception as e:
+                last_err = e
+
+            if attempt < retry and not throttled:
+                time.sleep(0.6 * (attempt + 1))
+
+        raise last_err
 
 
 class MockOKXClient(OKXClient):
@@ -148,12 +274,17 @@ class MockOKXClient(OKXClient):
             "BTC": 0.5,
             "USDT": 5000.0,
         }
+        self.mock_frozen: Dict[str, float] = {}      # 挂单冻结（frozenBal）
         self.mock_instrument = {
             "minSz": "0.0001",
             "lotSz": "0.00000001",
         }
         self.orders = []
         self.algos = []
+        # 市价单按最新收盘价立即全部成交，按 orders 推送格式回调 on_order（纸面交易成交记账）
+        self.mock_fee_rate = 0.001
+        self.on_order: Optional[Callable[[Dict[str, Any]], None]] = None
+        self._trade_ids = 0
 
     def _generate_mock_candles(self, count: int = 200) -> List[List[str]]:
         # 生成模拟的BTC/USDT小时K线数据，价格在 50000-60000 之间波动
@@ -184,7 +315,7 @@ class MockOKXClient(OKXClient):
 
     def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
                  body: Optional[Dict[str, Any]] = None, auth: bool = False,
-                 retry: int = 2) -> Dict[str, Any]:
+                 retry: int = 2, partial_ok: bool = False) -> Dict[str, Any]:
         # 模拟请求，返回虚拟数据
         # 根据路径和方法返回不同的模拟响应
         if path == "/api/v5/public/time":
@@ -200,51 +331,177 @@ class MockOKXClient(OKXClient):
             ccy = params.get("ccy", "USDT") if params else "USDT"
             avail = self.mock_balances.get(ccy, 0.0)
             return {"code": "0", "msg": "", "data": [{
-                "details": [{"ccy": ccy, "availBal": str(avail)}]
+                "details": [{"ccy": ccy, "availBal": str(avail), "frozenBal": str(self.mock_frozen.get(ccy, 0.0))}]
             }]}
         elif path == "/api/v5/trade/order":
             # 模拟下单成功
             order_id = f"mock_order_{len(self.orders)}"
             self.orders.append({"orderId": order_id, **body})
+            self._fill_market(self.orders[-1])
             return {"code": "0", "msg": "", "data": [{"ordId": order_id}]}
         elif path == "/api/v5/trade/order-algo":
             algo_id = f"mock_algo_{len(self.algos)}"
             self.algos.append({"algoId": algo_id, **body})
             return {"code": "0", "msg": "", "data": [{"algoId": algo_id}]}
         elif path == "/api/v5/trade/cancel-advance-algos":
-            return {"code": "0", "msg": "", "data": []}
+            return self.cancel_advance_algos(body)
+        elif path == "/api/v5/trade/amend-algos":
+            return self._amend_algo(body)
+        elif path == "/api/v5/trade/batch-orders":
+            return self.place_batch_orders(body)
+        elif path == "/api/v5/trade/amend-batch-orders":
+            return self.amend_batch_orders(body)
+        elif path == "/api/v5/trade/cancel-batch-orders":
+            return self.cancel_batch_orders(body)
+        elif path == "/api/v5/trade/cancel-algos":
+            return self.cancel_algos(body)
         else:
             # 默认返回成功
             return {"code": "0", "msg": "", "data": []}
 
     # 可以重写特定方法以提供更精确的模拟行为
-    def get_candles(self, inst_id: str, bar: str, limit: int) -> List[List[str]]:
-        # 直接返回模拟K线数据，忽略参数
-        return self.mock_candles[-limit:]
+    def get_candles(self, inst_id: str, bar: str, limit: int,
+                    after: Optional[int] = None, before: Optional[int] = None) -> List[List[str]]:
+        # 直接返回模拟K线数据，忽略 instId/bar；支持 after/before 翻页
+        rows = self.mock_candles
+        if after is not None:
+            rows = [r for r in rows if int(r[0]) < after]
+        if before is not None:
+            rows = [r for r in rows if int(r[0]) > before]
+        return rows[-limit:]
+
+    def get_history_candles(self, inst_id: str, bar: str, limit: int = 100,
+                            after: Optional[int] = None, before: Optional[int] = None) -> List[List[str]]:
+        return self.get_candles(inst_id, bar, min(limit, 100), after=after, before=before)
 
     def get_instruments_spot(self, inst_id: str) -> Dict[str, Any]:
         return self.mock_instrument
 
     def get_balance(self, ccy: str) -> Dict[str, Any]:
-        avail = self.mock_balances.get(ccy, 0.0)
+        # ccy 可逗号分隔（一次查多个币种）
         return {"code": "0", "msg": "", "data": [{
-            "details": [{"ccy": ccy, "availBal": str(avail)}]
+            "details": [{"ccy": c, "availBal": str(self.mock_balances.get(c, 0.0)),
+                         "frozenBal": str(self.mock_frozen.get(c, 0.0))} for c in ccy.split(",")]
         }]}
 
     def place_order(self, inst_id: str, side: str, ord_type: str, sz: str,
                     px: Optional[str] = None, td_mode: str = "cash",
                     tgt_ccy: Optional[str] = None, cl_ord_id: Optional[str] = None) -> Dict[str, Any]:
         order_id = f"mock_order_{len(self.orders)}"
-        self.orders.append({"orderId": order_id, "instId": inst_id, "side": side, "sz": sz})
+        self.orders.append({"orderId": order_id, "instId": inst_id, "side": side, "ordType": ord_type, "sz": sz})
+        if tgt_ccy is not None:
+            self.orders[-1]["tgtCcy"] = tgt_ccy
+        if cl_ord_id is not None:
+            self.orders[-1]["clOrdId"] = cl_ord_id
+        self._fill_market(self.orders[-1])
         return {"code": "0", "msg": "", "data": [{"ordId": order_id}]}
 
+    def _fill_market(self, order: Dict[str, Any]) -> None:
+        if order.get("ordType") != "market" or not self.mock_candles:
+            return
+        px = float(self.mock_candles[-1][4])
+        sz = float(order["sz"])
+        buy = order.get("side") == "buy"
+        # 现货市价买默认 sz 按计价币（tgtCcy=quote_ccy），卖默认按基础币
+        fill_sz = sz / px if order.get("tgtCcy", "quote_ccy" if buy else "base_ccy") == "quote_ccy" else sz
+        base_ccy, quote_ccy = order["instId"].split("-")[:2]
+        # OKX 约定：fillFee 负数为扣费；买入扣基础币，卖出扣计价币
+        if buy:
+            fee, fee_ccy = fill_sz * self.mock_fee_rate, base_ccy
+        else:
+            fee, fee_ccy = fill_sz * px * self.mock_fee_rate, quote_ccy
+        order["state"] = "filled"
+        self._trade_ids += 1
+        if self.on_order is not None:
+            self.on_order({"instId": order["instId"], "ordId": order["orderId"], "clOrdId": order.get("clOrdId", ""),
+                           "side": order["side"], "ordType": "market", "state": "filled",
+                           "fillSz": f"{fill_sz:.12f}", "fillPx": f"{px:.2f}", "fillFee": f"{-fee:.12f}",
+                           "fillFeeCcy": fee_ccy, "tradeId": f"mock_trade_{self._trade_ids}",
+                           "fillTime": str(int(time.time() * 1000))})
+
     def place_algo_order(self, body: Dict[str, Any]) -> Dict[str, Any]:
         algo_id = f"mock_algo_{len(self.algos)}"
         self.algos.append({"algoId": algo_id, **body})
         return {"code": "0", "msg": "", "data": [{"algoId": algo_id}]}
 
+    def _amend_algo(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        for a in self.algos:
+            if a["algoId"] == body.get("algoId") and a.get("state") != "canceled":
+                if "newSz" in body:
+                    a["sz"] = body["newSz"]
+                if "newSlTriggerPx" in body:
+                    a["slTriggerPx"] = body["newSlTriggerPx"]
+                if "newSlOrdPx" in body:
+                    a["slOrdPx"] = body["newSlOrdPx"]
+                return {"code": "0", "msg": "", "data": [{"algoId": a["algoId"], "sCode": "0", "sMsg": ""}]}
+        raise RuntimeError(f"API error code=1 msg= data={[{'algoId': body.get('algoId'), 'sCode': '51000'}]}")
+
+    # ---------- 批量：逐条结果 + code 0/1/2 与真实接口一致 ----------
+    @staticmethod
+    def _batch_resp(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        failed = sum(1 for r in rows if r["sCode"] != "0")
+        code = "0" if not failed else ("1" if failed == len(rows) else "2")
+        return {"code": code, "msg": "", "data": rows}
+
+    def _find_order(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        for o in self.orders:
+            if (item.get("ordId") and o["orderId"] == item["ordId"]) or \
+                    (item.get("clOrdId") and o.get("clOrdId") == item["clOrdId"]):
+                return o
+        return None
+
+    def place_batch_orders(self, orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+        rows = []
+        for body in orders:
+            if float(body.get("sz") or 0) <= 0:
+                rows.append({"ordId": "", "clOrdId": body.get("clOrdId", ""), "sCode": "51008", "sMsg": "invalid sz"})
+                continue
+            order_id = f"mock_order_{len(self.orders)}"
+            self.orders.append({"orderId": order_id, "state": "live", **body})
+            self._fill_market(self.orders[-1])
+            rows.append({"ordId": order_id, "clOrdId": body.get("clOrdId", ""), "sCode": "0", "sMsg": ""})
+        return self._batch_resp(rows)
+
+    def amend_batch_orders(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        rows = []
+        for item in items:
+            o = self._find_order(item)
+            ok = o is not None and o.get("state", "live") == "live"
+            if ok:
+                o.update({k[3:].lower(): v for k, v in item.items() if k in ("newSz", "newPx")})
+            rows.append({"ordId": item.get("ordId", ""), "clOrdId": item.get("clOrdId", ""),
+                         "sCode": "0" if ok else "51503", "sMsg": "" if ok else "order not exist"})
+        return self._batch_resp(rows)
+
+    def cancel_batch_orders(self, items: List[Dict[str, str]]) -> Dict[str, Any]:
+        rows = []
+        for item in items:
+            o = self._find_order(item)
+            ok = o is not None and o.get("state", "live") == "live"
+            if ok:
+                o["state"] = "canceled"
+            rows.append({"ordId": item.get("ordId", ""), "clOrdId": item.get("clOrdId", ""),
+                         "sCode": "0" if ok else "51400", "sMsg": "" if ok else "cancel failed"})
+        return self._batch_resp(rows)
+
+    def cancel_algos(self, items: List[Dict[str, str]]) -> Dict[str, Any]:
+        rows = []
+        for item in items:
+            found = [a for a in self.algos if a["algoId"] == item.get("algoId") and a.get("state") != "canceled"]
+            for a in found:
+                a["state"] = "canceled"
+            rows.append({"algoId": item.get("algoId"), "sCode": "0" if found else "51000", "sMsg": ""})
+        return self._batch_resp(rows)
+
     def cancel_advance_algos(self, items: List[Dict[str, str]]) -> Dict[str, Any]:
-        return {"code": "0", "msg": "", "data": []}
+        # move_order_stop 等：同 cancel_algos，逐条标记撤销、按条返回 sCode
+        return self.cancel_algos(items)
+
+    def amend_algos(self, inst_id: str, algo_id: str, new_sz: Optional[str] = None,
+                    new_sl_trigger_px: Optional[str] = None, new_sl_ord_px: Optional[str] = None,
+                    new_tp_trigger_px: Optional[str] = None, new_tp_ord_px: Optional[str] = None) -> Dict[str, Any]:
+        return self._amend_algo(amend_algo_body(inst_id, algo_id, new_sz, new_sl_trigger_px, new_sl_ord_px,
+                                                new_tp_trigger_px, new_tp_ord_px))
 
     def get_server_time_ms(self) -> int:
         import time
@@ -0,0 +1,321 @@
+"""
+本地 OKX REST 替身服务器（测试/演示用，不联网）。
+
+提供：
+- GET /api/v5/public/time
+- GET /api/v5/market/candles          最近 1440 根，支持 after/before/limit（<=300）
+- GET /api/v5/market/history-candles  全历史，支持 after/before/limit（<=100）
+- GET /api/v5/public/instruments
+- GET /api/v5/account/balance                ccy 可逗号分隔
+- POST /api/v5/trade/order | order-algo | cancel-advance-algos | amend-algos
+- POST /api/v5/trade/batch-orders | amend-batch-orders | cancel-batch-orders | cancel-algos
+  逐条 sCode；全部失败 code="1"，部分失败 code="2"（sz<=0 的下单视为参数错误 51008）
+K线由 (instId, bar, ts) 确定性生成，返回顺序与真实接口一致：最近在前，最新一根 confirm="0"。
+私有接口：给了 api_secret 就校验 OK-ACCESS-SIGN（错误返回 50113），订单/策略单记在内存里。
+HTTP/1.1 keep-alive；connections 记录出现过的客户端端口，用来观察连接复用；
+peak_in_flight 记录同时在处理的请求数峰值，用来确认客户端确实并发（不依赖耗时）。
+
+可注入故障：fail_every（每 N 个请求返回一次 50011 限频错误）、latency（每个请求延迟秒数）。
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from timeframes import bar_open_ms, bar_to_ms
+
+DEFAULT_HISTORY_START_MS = 1_577_836_800_000  # 2020-01-01T00:00:00Z
+
+
+def synthetic_candle(inst_id: str, bar: str, ts: int, confirm: bool = True) -> List[str]:
+    # 按 ts 确定性生成：同一 (instId, bar, ts) 每次结果相同，便于校验
+    seed = zlib.crc32(f"{inst_id}|{bar}".encode())
+    base = 100.0 + (seed % 50000)
+    step = ts // bar_to_ms(bar)
+    wobble = ((step * 2654435761 + seed) % 1000) / 1000.0 - 0.5
+    o = base * (1.0 + 0.001 * ((step % 97) - 48)) + wobble
+    c = o + wobble * 0.5
+    h = max(o, c) + 0.25
+    l = min(o, c) - 0.25
+    vol = 1.0 + (step % 13)
+    return [str(ts), f"{o:.4f}", f"{h:.4f}", f"{l:.4f}", f"{c:.4f}", f"{vol:.4f}",
+            f"{vol * c:.4f}", f"{vol * c:.4f}", "1" if confirm else "0"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubOKXServer._HTTPServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # 静默
+        pass
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _dispatch(self, method: str) -> None:
+        stub: StubOKXServer = self.server.stub
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = json.loads(raw) if raw else None
+        headers = dict(self.headers)
+        headers["_request_path"] = self.path
+        headers["_body"] = raw.decode()
+        stub.connections.add(self.client_address[1])
+        status, payload = stub.handle(method, url.path, query, body, headers)
+        self._send(status, payload)
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+
+class StubOKXServer:
+    class _HTTPServer(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 128      # 默认 5：并发建连时 SYN 被丢会多等 1s 重传
+        stub: "StubOKXServer"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 history_start_ms: int = DEFAULT_HISTORY_START_MS,
+                 now_ms: Optional[Callable[[], int]] = None,
+                 fail_every: int = 0, latency: float = 0.0, api_secret: str = "",
+                 balances: Optional[Dict[str, float]] = None):
+        self.history_start_ms = history_start_ms
+        self.now_ms = now_ms or (lambda: int(time.time() * 1000))
+        self.fail_every = fail_every
+        self.latency = latency
+        self.api_secret = api_secret
+        self.balances: Dict[str, float] = dict(balances or {"BTC": 0.0, "USDT": 10000.0})
+        self.orders: List[Dict[str, Any]] = []
+        self.algos: Dict[str, Dict[str, Any]] = {}
+        self.requests: List[Tuple[str, str, Dict[str, str]]] = []
+        self.connections: set = set()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.routes: Dict[Tuple[str, str], Callable[..., Tuple[int, Dict[str, Any]]]] = {
+            ("GET", "/api/v5/public/time"): self._time,
+            ("GET", "/api/v5/market/candles"): self._candles,
+            ("GET", "/api/v5/market/history-candles"): self._history_candles,
+            ("GET", "/api/v5/public/instruments"): self._instruments,
+            ("GET", "/api/v5/account/balance"): self._balance,
+            ("POST", "/api/v5/trade/order"): self._order,
+            ("POST", "/api/v5/trade/order-algo"): self._order_algo,
+            ("POST", "/api/v5/trade/cancel-advance-algos"): self._cancel_algos,
+            ("POST", "/api/v5/trade/amend-algos"): self._amend_algos,
+            ("POST", "/api/v5/trade/batch-orders"): self._batch_orders,
+            ("POST", "/api/v5/trade/amend-batch-orders"): self._amend_batch_orders,
+            ("POST", "/api/v5/trade/cancel-batch-orders"): self._cancel_batch_orders,
+            ("POST", "/api/v5/trade/cancel-algos"): self._cancel_algos,
+        }
+        self._ids = 0
+        self._lock = threading.Lock()
+        self._httpd = self._HTTPServer((host, port), _Handler)
+        self._httpd.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOKXServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StubOKXServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # ---------- 分发 ----------
+    def handle(self, method: str, path: str, query: Dict[str, str], body: Any,
+               headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            self.requests.append((method, path, query))
+            n = len(self.requests)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return self._handle(n, method, path, query, body, headers)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _handle(self, n: int, method: str, path: str, query: Dict[str, str], body: Any,
+                headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_every and n % self.fail_every == 0:
+            return 429, {"code": "50011", "msg": "Too Many Requests", "data": []}
+        route = self.routes.get((method, path))
+        if route is None:
+            return 404, {"code": "404", "msg": f"no route {method} {path}", "data": []}
+        if path.startswith(("/api/v5/account/", "/api/v5/trade/")) and not self._signed_ok(method, headers):
+            return 401, {"code": "50113", "msg": "Invalid Sign", "data": []}
+        with self._lock:
+            return route(query=query, body=body, headers=headers)
+
+    def _signed_ok(self, method: str, headers: Dict[str, str]) -> bool:
+        if not self.api_secret:
+            return True
+        prehash = (headers.get("OK-ACCESS-TIMESTAMP", "") + method
+                   + headers.get("_request_path", "") + headers.get("_body", ""))
+        mac = hmac.new(self.api_secret.encode(), prehash.encode(), hashlib.sha256)
+        return hmac.compare_digest(base64.b64encode(mac.digest()).decode(), headers.get("OK-ACCESS-SIGN", ""))
+
+    def _next_id(self, prefix: str) -> str:
+        self._ids += 1
+        return f"{prefix}{self._ids}"
+
+    # ---------- 公共行情 ----------
+    def _time(self, **_: Any) -> Tuple[int, Dict[str, Any]]:
+        return 200, {"code": "0", "msg": "", "data": [{"ts": str(self.now_ms())}]}
+
+    def _page(self, query: Dict[str, str], max_limit: int, oldest: int) -> List[List[str]]:
+        inst_id = query.get("instId", "BTC-USDT")
+        bar = query.get("bar", "1m")
+        step = bar_to_ms(bar)
+        limit = max(1, min(max_limit, int(query.get("limit", max_limit))))
+        forming = bar_open_ms(bar, self.now_ms())
+        newest = forming
+        if "after" in query:
+            newest = min(newest, bar_open_ms(bar, int(query["after"]) - 1))
+        lowest = oldest
+        if "before" in query:
+            lowest = max(lowest, bar_open_ms(bar, int(query["before"])) + step)
+        rows = []
+        ts = newest
+        while ts >= lowest and len(rows) < limit:
+            rows.append(synthetic_candle(inst_id, bar, ts, confirm=ts < forming))
+            ts -= step
+        return rows
+
+    def _candles(self, query: Dict[str, str], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        bar = query.get("bar", "1m")
+        oldest = max(self.history_start_ms, bar_open_ms(bar, self.now_ms()) - 1439 * bar_to_ms(bar))
+        return 200, {"code": "0", "msg": "", "data": self._page(query, 300, oldest)}
+
+    def _history_candles(self, query: Dict[str, str], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        return 200, {"code": "0", "msg": "", "data": self._page(query, 100, self.history_start_ms)}
+
+    def _instruments(self, query: Dict[str, str], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        inst_id = query.get("instId", "BTC-USDT")
+        base, quote = inst_id.split("-")[:2]
+        return 200, {"code": "0", "msg": "", "data": [{
+            "instId": inst_id, "instType": "SPOT", "baseCcy": base, "quoteCcy": quote,
+            "minSz": "0.0001", "lotSz": "0.00000001", "tickSz": "0.01", "state": "live"}]}
+
+    # ---------- 私有：账户/下单（内存撮合，不做成交） ----------
+    def _balance(self, query: Dict[str, str], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        ccys = [c for c in query.get("ccy", "").split(",") if c] or sorted(self.balances)
+        details = [{"ccy": c, "availBal": str(self.balances.get(c, 0.0)),
+                    "cashBal": str(self.balances.get(c, 0.0))} for c in ccys]
+        return 200, {"code": "0", "msg": "", "data": [{"details": details}]}
+
+    def _order(self, body: Dict[str, Any], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        ord_id = self._next_id("ord")
+        self.orders.append({"ordId": ord_id, "state": "live", **body})
+        return 200, {"code": "0", "msg": "", "data": [{
+            "ordId": ord_id, "clOrdId": body.get("clOrdId", ""), "sCode": "0", "sMsg": ""}]}
+
+    @staticmethod
+    def _batch(out: List[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        failed = sum(1 for r in out if r["sCode"] != "0")
+        code = "0" if not failed else ("1" if failed == len(out) else "2")
+        return 200, {"code": code, "msg": "" if code == "0" else "Operation failed.", "data": out}
+
+    def _find_order(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        for o in self.orders:
+            if (item.get("ordId") and o["ordId"] == item["ordId"]) or \
+                    (item.get("clOrdId") and o.get("clOrdId") == item["clOrdId"]):
+                return o
+        return None
+
+    def _batch_orders(self, body: List[Dict[str, Any]], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        out = []
+        for item in body or []:
+            if float(item.get("sz") or 0) <= 0:
+                out.append({"ordId": "", "clOrdId": item.get("clOrdId", ""), "sCode": "51008",
+                            "sMsg": "Order failed. Insufficient balance or invalid sz."})
+                continue
+            out.append(self._order(body=item)[1]["data"][0])
+        return self._batch(out)
+
+    def _amend_batch_orders(self, body: List[Dict[str, Any]], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        out = []
+        for item in body or []:
+            o = self._find_order(item)
+            ok = o is not None and o.get("state") == "live"
+            if ok:
+                for new, old in (("newSz", "sz"), ("newPx", "px")):
+                    if new in item:
+                        o[old] = item[new]
+            out.append({"ordId": item.get("ordId", ""), "clOrdId": item.get("clOrdId", ""),
+                        "sCode": "0" if ok else "51503", "sMsg": "" if ok else "Order does not exist"})
+        return self._batch(out)
+
+    def _cancel_batch_orders(self, body: List[Dict[str, Any]], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        out = []
+        for item in body or []:
+            o = self._find_order(item)
+            ok = o is not None and o.get("state") == "live"
+            if ok:
+                o["state"] = "canceled"
+            out.append({"ordId": item.get("ordId", ""), "clOrdId": item.get("clOrdId", ""),
+                        "sCode": "0" if ok else "51400", "sMsg": "" if ok else "Cancellation failed"})
+        return self._batch(out)
+
+    def _order_algo(self, body: Dict[str, Any], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        algo_id = self._next_id("algo")
+        self.algos[algo_id] = {"algoId": algo_id, **body}
+        return 200, {"code": "0", "msg": "", "data": [{"algoId": algo_id, "sCode": "0", "sMsg": ""}]}
+
+    def _cancel_algos(self, body: List[Dict[str, str]], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        out = []
+        for item in body or []:
+            found = self.algos.pop(str(item.get("algoId")), None) is not None
+            out.append({"algoId": item.get("algoId"), "sCode": "0" if found else "51000",
+                        "sMsg": "" if found else "algo order does not exist"})
+        return self._batch(out)
+
+    def _amend_algos(self, body: Dict[str, Any], **_: Any) -> Tuple[int, Dict[str, Any]]:
+        algo = self.algos.get(str(body.get("algoId")))
+        if algo is None or algo.get("ordType") not in ("conditional", "trigger"):
+            return 200, {"code": "1", "msg": "", "data": [{
+                "algoId": body.get("algoId"), "sCode": "51000", "sMsg": "algo order does not exist"}]}
+        for new, old in (("newSz", "sz"), ("newSlTriggerPx", "slTriggerPx"), ("newSlOrdPx", "slOrdPx"),
+                         ("newTpTriggerPx", "tpTriggerPx"), ("newTpOrdPx", "tpOrdPx")):
+            if new in body:
+                algo[old] = body[new]
+        return 200, {"code": "0", "msg": "", "data": [{"algoId": algo["algoId"], "sCode": "0", "sMsg": ""}]}
+
+
+if __name__ == "__main__":
+    with StubOKXServer(port=8089) as srv:
+        print(f"stub OKX server on {srv.base_url}（Ctrl+C 退出）")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,139 @@
+"""
+一轮决策内的下单/改单/撤单收集器：先收集所有意图，flush 时按接口合并成尽量少的请求。
+
+- 每种意图对应一个 OKX 接口，批量接口按交易所上限分块（下单/改单/撤单 20 条，撤策略单 10 条）；
+  order-algo / amend-algos 只支持单条，逐条发送
+- 同一轮内先撤单、再改单、最后下单（撤单先释放冻结资金，新单才不会余额不足）
+- 逐条结果按下标对回各自的 OrderIntent（result / error），再调用 on_result 回调；
+  回调里可以继续 add（例如改单被拒后撤单重挂），flush 会一直跑到队列清空
+- 整个请求失败（网络/签名/限频）时，这一块里的每个意图都记同一个 error
+- 给了 ledger 时，每块发完把意图及结果（ordId/algoId/sCode/错误）记进交易账本
+"""
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from okx_client import OKXClient
+
+# 单次请求最多条数
+BATCH_LIMITS: Dict[str, int] = {
+    "cancel": 20,
+    "cancel_algo": 10,
+    "cancel_advance_algo": 10,
+    "amend": 20,
+    "amend_algo": 1,
+    "place": 20,
+    "place_algo": 1,
+}
+# 同一轮内的发送顺序
+KIND_ORDER = ("cancel", "cancel_algo", "cancel_advance_algo", "amend", "amend_algo", "place", "place_algo")
+
+
+def _send(client: OKXClient, kind: str, bodies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if kind == "place":
+        return client.place_batch_orders(bodies)
+    if kind == "amend":
+        return client.amend_batch_orders(bodies)
+    if kind == "cancel":
+        return client.cancel_batch_orders(bodies)
+    if kind == "cancel_algo":
+        return client.cancel_algos(bodies)
+    if kind == "cancel_advance_algo":
+        return client.cancel_advance_algos(bodies)
+    body = bodies[0]
+    if kind == "place_algo":
+        return client.place_algo_order(body)
+    if kind == "amend_algo":
+        return client.amend_algos(body["instId"], body["algoId"], new_sz=body.get("newSz"),
+                                  new_sl_trigger_px=body.get("newSlTriggerPx"),
+                                  new_sl_ord_px=body.get("newSlOrdPx"),
+                                  new_tp_trigger_px=body.get("newTpTriggerPx"),
+                                  new_tp_ord_px=body.get("newTpOrdPx"))
+    raise ValueError(f"unknown order intent kind: {kind}")
+
+
+@dataclass
+class OrderIntent:
+    kind: str
+    body: Dict[str, Any]
+    tag: str = ""                                  # 调用方标识（品种/用途），只用于日志和回调
+    on_result: Optional[Callable[["OrderIntent"], None]] = None
+    result: Optional[Dict[str, Any]] = None        # 交易所返回的逐条结果
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.result is not None
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None or self.error is not None
+
+
+class OrderBatcher:
+    def __init__(self, client: OKXClient, ledger: Optional[Any] = None):
+        self.client = client
+        self.ledger = ledger          # ledger.Ledger
+        self.pending: List[OrderIntent] = []
+        self.stats = {"requests": 0, "intents": 0, "failed": 0}
+        # 组合模式下多个策略线程同时 add
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, body: Dict[str, Any], tag: str = "",
+            on_result: Optional[Callable[[OrderIntent], None]] = None) -> OrderIntent:
+        if kind not in BATCH_LIMITS:
+            raise ValueError(f"unknown order intent kind: {kind}")
+        intent = OrderIntent(kind, body, tag, on_result)
+        with self._lock:
+            self.pending.append(intent)
+        return intent
+
+    def flush(self) -> List[OrderIntent]:
+        """发出所有待发意图（含回调新加的），返回本次处理过的意图。"""
+        handled: List[OrderIntent] = []
+        while True:
+            with self._lock:
+                batch, self.pending = self.pending, []
+            if not batch:
+                break
+            for kind in KIND_ORDER:
+                items = [it for it in batch if it.kind == kind]
+                limit = BATCH_LIMITS[kind]
+                for i in range(0, len(items), limit):
+                    self._send_chunk(kind, items[i:i + limit])
+            # 回调在整轮发完之后再跑：新加的意图进入下一轮
+            for it in batch:
+                if it.on_result is not None:
+                    try:
+                        it.on_result(it)
+                    except Exception as e:
+                        print(f"[WARN] 订单回调异常（{it.tag or it.kind}）：{e}")
+            handled.extend(batch)
+        return handled
+
+    def _send_chunk(self, kind: str, chunk: List[OrderIntent]) -> None:
+        self._send_rows(kind, chunk)
+        if self.ledger is not None:
+            try:
+                self.ledger.record_intents(kind, chunk)
+            except Exception as e:
+                print(f"[WARN] 账本写入失败：{e}")
+
+    def _send_rows(self, kind: str, chunk: List[OrderIntent]) -> None:
+        self.stats["requests"] += 1
+        self.stats["intents"] += len(chunk)
+        try:
+            resp = _send(self.client, kind, [it.body for it in chunk])
+            rows = resp.get("data") or []
+        except Exception as e:
+            for it in chunk:
+                it.error = e
+            self.stats["failed"] += len(chunk)
+            return
+        for i, it in enumerate(chunk):
+            row = rows[i] if i < len(rows) else {}
+            it.result = row
+            s_code = str(row.get("sCode", "0"))
+            if s_code != "0":
+                it.error = RuntimeError(f"{kind} rejected sCode={s_code} sMsg={row.get('sMsg', '')}")
+                self.stats["failed"] += 1
@@ -0,0 +1,194 @@
+"""
+多品种组合：每个品种一个 TrendBot（可按品种覆盖配置），共用一个客户端（连接池+限频器）、
+一份余额快照和一个订单收集器。
+
+- 每轮：取一次服务器时间、刷新一次余额快照（无私有推送时 REST 按 20 个币种一批查），
+  然后所有策略的 cycle() 在线程池里并发推进一个阶段；全部到达阶段边界后统一 flush
+  （跨品种合并成批量下单/撤单），刷新余额，再推进下一阶段
+- 状态共用一个 SQLite 状态库（state_manager.StateStore），按 instId 分命名空间
+- 单个品种出错只跳过它自己这一轮，不影响其它品种
+- 推送模式：on_bar 按周期分组缓存各品种的收盘K线，该周期的品种凑齐（或等待超时）后只跑该周期一轮
+"""
+import dataclasses
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from account_stream import BalanceCache
+from config import BotConfig
+from llm_filter import LLMFilter
+from okx_client import OKXClient
+from order_batch import OrderBatcher
+from state_manager import StateStore
+from timeframes import bar_to_ms
+from tracing import NULL_TRACER, Tracer
+from trend_bot import TrendBot
+
+# /account/balance 的 ccy 参数一次最多 20 个币种
+BALANCE_CCY_LIMIT = 20
+
+
+def load_portfolio(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    读组合配置（JSON）：品种列表 ["BTC-USDT", "ETH-USDT"]，
+    或 {品种: 覆盖项} 如 {"BTC-USDT": {}, "ETH-USDT": {"tranche_quotes": [50, 50]}}。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    if isinstance(raw, list):
+        return {inst: {} for inst in raw}
+    return {inst: dict(ov or {}) for inst, ov in raw.items()}
+
+
+def instrument_config(base: BotConfig, inst_id: str, overrides: Optional[Mapping[str, Any]] = None) -> BotConfig:
+    # 按品种覆盖：字段名必须是 BotConfig 已有的；JSON 里的列表转回元组
+    fields = {f.name: f for f in dataclasses.fields(BotConfig)}
+    changes: Dict[str, Any] = {"inst_id": inst_id}
+    for k, v in (overrides or {}).items():
+        if k not in fields:
+            raise ValueError(f"{inst_id}: unknown config field {k!r}")
+        if isinstance(getattr(base, k), tuple) and isinstance(v, list):
+            v = tuple(v)
+        changes[k] = v
+    return dataclasses.replace(base, **changes)
+
+
+def _step(gen: Iterator[str]) -> Tuple[Optional[str], Optional[Exception]]:
+    # 推进一个阶段：返回 (阶段名, None)；结束返回 (None, None)；出错返回 (None, 异常)
+    try:
+        return next(gen), None
+    except StopIteration:
+        return None, None
+    except Exception as e:
+        return None, e
+
+
+def _prefetch(bot: TrendBot) -> Optional[Exception]:
+    try:
+        bot.prefetch_llm()
+        return None
+    except Exception as e:
+        return e
+
+
+class Portfolio:
+    def __init__(self, base_cfg: BotConfig, client: OKXClient, llm: LLMFilter,
+                 instruments: Union[Mapping[str, Mapping[str, Any]], Iterable[str]],
+                 balances: Optional[BalanceCache] = None, orders: Optional[OrderBatcher] = None,
+                 store: Optional[StateStore] = None, workers: int = 16, tracer: Optional[Tracer] = None):
+        self.client = client
+        self.tracer = tracer if tracer is not None else NULL_TRACER
+        self.orders = orders if orders is not None else OrderBatcher(client)
+        # 有私有推送就用推送缓存；否则自己建一份，每轮/每次 flush 后用 REST 整体刷新
+        self._rest_balances = balances is None
+        self.balances = balances if balances is not None else BalanceCache()
+        if not isinstance(instruments, Mapping):
+            instruments = {inst: {} for inst in instruments}
+        self.store = store if store is not None else StateStore(base_cfg.state_db)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="portfolio")
+
+        cfgs = [instrument_config(base_cfg, inst, ov) for inst, ov in instruments.items()]
+
+        def make(cfg: BotConfig) -> TrendBot:
+            return TrendBot(cfg, client, llm, balances=self.balances, orders=self.orders,
+                            store=self.store, state_path=None, tracer=self.tracer)
+
+        # 构造时每个品种要查一次 instruments：并发
+        self.bots: Dict[str, TrendBot] = {c.inst_id: bot for c, bot in zip(cfgs, self.pool.map(make, cfgs))}
+        self.ccys = sorted({b.base_ccy for b in self.bots.values()} | {b.quote_ccy for b in self.bots.values()})
+        # bar -> {instId: 收盘K线}；各周期分别凑齐
+        self._pushed: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._pushed_lock = threading.Lock()
+        self.stats = {"cycles": 0, "errors": 0, "flushes": 0, "last_cycle_s": 0.0}
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True)
+
+    # ---------- 余额快照 ----------
+    def refresh_balances(self) -> None:
+        if not self._rest_balances:
+            return
+        for i in range(0, len(self.ccys), BALANCE_CCY_LIMIT):
+            resp = self.client.get_balance(",".join(self.ccys[i:i + BALANCE_CCY_LIMIT]))
+            self.balances.apply_rest_snapshot(resp)
+
+    # ---------- 推送 ----------
+    def on_bar(self, inst_id: str, candle: Dict[str, Any], bar: Optional[str] = None) -> bool:
+        """
+        缓存一根收盘K线（bar 不给则按该品种的周期）；该周期的品种都到齐返回 True，
+        调用方随即 take_pushed(bar) + run_cycle(pushed, bar=bar)。不是该品种周期的推送忽略。
+        """
+        bot = self.bots.get(inst_id)
+        bar = bar or (bot.cfg.bar if bot is not None else None)
+        if bot is None or bot.cfg.bar != bar:
+            return False
+        with self._pushed_lock:
+            got = self._pushed.setdefault(bar, {})
+            got[inst_id] = candle
+            return len(got) == sum(1 for b in self.bots.values() if b.cfg.bar == bar)
+
+    def take_pushed(self, bar: str) -> Dict[str, Dict[str, Any]]:
+        with self._pushed_lock:
+            return self._pushed.pop(bar, {})
+
+    # ---------- 一轮 ----------
+    @property
+    def bars(self) -> List[str]:
+        # 各品种可覆盖 bar：调度器按周期分别唤醒
+        return sorted({bot.cfg.bar for bot in self.bots.values()}, key=bar_to_ms)
+
+    def prefetch_llm(self, bar: Optional[str] = None) -> None:
+        """收盘前对（该周期的）各品种并发预取 LLM 判断。"""
+        bots = [b for b in self.bots.values() if bar is None or b.cfg.bar == bar]
+        if not bots or not bots[0].llm.enabled:
+            return
+        self.refresh_balances()
+        for bot, err in zip(bots, self.pool.map(_prefetch, bots)):
+            if err is not None:
+                print(f"[WARN] {bot.cfg.inst_id} LLM 预取失败：{err}")
+
+    def run_cycle(self, pushed: Optional[Mapping[str, Dict[str, Any]]] = None, now_ms: Optional[int] = None,
+                  bar: Optional[str] = None) -> Dict[str, str]:
+        """
+        跑一轮（bar 给定时只跑该周期的品种），返回 {instId: 最后到达的阶段 / "error"}。
+        now_ms 由调度器的交易所时钟给出；不给就查一次服务器时间。
+        """
+        t0 = time.perf_counter()
+        pushed = pushed or {}
+        for inst_id, candle in pushed.items():
+            if inst_id in self.bots:
+                self.bots[inst_id].record_bar(candle)
+        if now_ms is None:
+            now_ms = self.client.get_server_time_ms()
+        self.refresh_balances()
+
+        gens = {inst: bot.cycle(pushed.get(inst), now_ms=now_ms) for inst, bot in self.bots.items()
+                if bar is None or bot.cfg.bar == bar}
+        stages = {inst: "skipped" for inst in gens}
+        sent = False
+        while gens:
+            for inst, (stage, err) in zip(list(gens), self.pool.map(_step, list(gens.values()))):
+                if err is not None:
+                    print(f"[ERROR] {inst}: {err}")
+                    self.stats["errors"] += 1
+                    stages[inst] = "error"
+                if stage is None:
+                    del gens[inst]
+                else:
+                    stages[inst] = stage
+            # 阶段边界：全部品种的订单合并发出；有订单就刷新余额，下一阶段看到成交
+            with self.tracer.span("stage", "orders"):
+                handled = self.orders.flush()
+            if handled:
+                self.stats["flushes"] += 1
+                if not sent:
+                    sent = True
+                    max((self.bots[i] for i in stages), key=lambda b: b.bar_close_ms).trace_order_latency()
+                self.refresh_balances()
+
+        self.stats["cycles"] += 1
+        self.stats["last_cycle_s"] = time.perf_counter() - t0
+        self.tracer.record("stage", "portfolio_cycle", self.stats["last_cycle_s"])
+        return stages
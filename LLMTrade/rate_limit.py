@@ -0,0 +1,312 @@
+"""
+按接口限频 + 优先级调度（同步线程与 asyncio 协程共用一个 RateLimiter）。
+
+- 每个接口一个令牌桶（OKX 文档里的 “N 次/2s”），下单类接口另有子账户级共享桶
+- 等待者按 (优先级, 先来后到) 排队：下单/撤单 > 账户 > 行情 > 历史回补；
+  低优先级只在不和更高优先级抢同一个桶/并发槽时才能插队（不同接口互不阻塞）
+- 可选 max_inflight：限制同时在途的请求数，并发槽同样按优先级分配
+- 收到 50011/429 时 penalize：该接口暂停一段时间
+- metrics()：按接口/优先级统计请求数、排队次数、等待总时长与最大等待
+- clock / sleep 可注入：测试用假时钟时 sleep(秒) 直接推进时钟，不真的等
+"""
+import asyncio
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 优先级：数字越小越先
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_MARKET = 2
+PRIORITY_BACKFILL = 3
+PRIORITY_NAMES = {PRIORITY_ORDER: "order", PRIORITY_ACCOUNT: "account",
+                  PRIORITY_MARKET: "market", PRIORITY_BACKFILL: "backfill"}
+
+# OKX v5 各接口限频（次数, 秒）
+ENDPOINT_LIMITS: Dict[str, Tuple[int, float]] = {
+    "/api/v5/public/time": (10, 2.0),
+    "/api/v5/public/instruments": (20, 2.0),
+    "/api/v5/market/candles": (40, 2.0),
+    "/api/v5/market/history-candles": (20, 2.0),
+    "/api/v5/market/ticker": (20, 2.0),
+    "/api/v5/account/balance": (10, 2.0),
+    "/api/v5/trade/order": (60, 2.0),
+    "/api/v5/trade/cancel-order": (60, 2.0),
+    "/api/v5/trade/amend-order": (60, 2.0),
+    "/api/v5/trade/batch-orders": (300, 2.0),
+    "/api/v5/trade/cancel-batch-orders": (300, 2.0),
+    "/api/v5/trade/amend-batch-orders": (300, 2.0),
+    "/api/v5/trade/order-algo": (20, 2.0),
+    "/api/v5/trade/cancel-algos": (20, 2.0),
+    "/api/v5/trade/cancel-advance-algos": (20, 2.0),
+    "/api/v5/trade/amend-algos": (20, 2.0),
+}
+DEFAULT_LIMIT = (10, 2.0)
+# 子账户级：新下单+改单合计 1000 次/2s
+SUBACCOUNT_ORDER_BUCKET = "subaccount:orders"
+SUBACCOUNT_ORDER_LIMIT = (1000, 2.0)
+_SUBACCOUNT_PATHS = ("/api/v5/trade/order", "/api/v5/trade/amend-order",
+                     "/api/v5/trade/batch-orders", "/api/v5/trade/amend-batch-orders")
+_INFLIGHT = "inflight"
+_EPS = 1e-9
+# 限频错误码：50011 请求过于频繁 / 50061 子账户下单超限
+RATE_LIMIT_CODES = ("50011", "50061")
+
+
+def classify(path: str) -> int:
+    if path.startswith("/api/v5/trade/"):
+        return PRIORITY_ORDER
+    if path.startswith("/api/v5/account/"):
+        return PRIORITY_ACCOUNT
+    if path == "/api/v5/market/history-candles":
+        return PRIORITY_BACKFILL
+    return PRIORITY_MARKET
+
+
+class TokenBucket:
+    """令牌桶（不加锁，由 RateLimiter 的锁保护）：capacity 个令牌，每 per 秒回满。"""
+
+    def __init__(self, capacity: int, per: float, now: float):
+        self.capacity = float(capacity)
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.stamp = now
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """还要等多久才有 cost 个令牌（0 表示现在就够）。"""
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        # 浮点回补会差一点点（0.999999...）：差额小于 _EPS 就算够，否则会为 1e-15 秒反复空转
+        if self.tokens >= cost - _EPS:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost: float) -> None:
+        self.tokens -= cost
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "path", "buckets", "cost", "slot", "granted", "enqueued", "wake")
+
+    def __init__(self, priority: int, seq: int, path: str, buckets: List[str], cost: float, slot: bool,
+                 enqueued: float):
+        self.priority = priority
+        self.seq = seq
+        self.path = path
+        self.buckets = buckets
+        self.cost = cost
+        self.slot = slot
+        self.granted = False
+        self.enqueued = enqueued
+        self.wake: Optional[Callable[[], None]] = None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RateLimiter:
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, float]]] = None,
+                 default: Tuple[int, float] = DEFAULT_LIMIT, max_inflight: int = 0,
+                 penalty_s: float = 1.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Optional[Callable[[float], None]] = None):
+        self.limits = dict(ENDPOINT_LIMITS)
+        self.limits.update(limits or {})
+        self.default = default
+        self.max_inflight = max_inflight
+        self.penalty_s = penalty_s
+        self.clock = clock
+        # 与 clock 配套的等待；None 表示在条件变量上等（其它线程归还令牌/并发槽时可提前唤醒）
+        self.sleep = sleep
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waiting: List[_Waiter] = []
+        self._inflight = 0
+        self._seq = itertools.count()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    # ---------- 桶 ----------
+    def _bucket(self, name: str, now: float) -> TokenBucket:
+        b = self._buckets.get(name)
+        if b is None:
+            if name == SUBACCOUNT_ORDER_BUCKET:
+                limit = self.limits.get(name, SUBACCOUNT_ORDER_LIMIT)
+            else:
+                limit = self.limits.get(name, self.default)
+            b = TokenBucket(limit[0], limit[1], now)
+            self._buckets[name] = b
+        return b
+
+    @staticmethod
+    def _bucket_names(path: str) -> List[str]:
+        return [path, SUBACCOUNT_ORDER_BUCKET] if path in _SUBACCOUNT_PATHS else [path]
+
+    def penalize(self, path: str, seconds: Optional[float] = None) -> None:
+        """交易所返回限频错误：该接口暂停 seconds 秒（默认 penalty_s）、令牌清零。"""
+        seconds = self.penalty_s if seconds is None else seconds
+        with self._cond:
+            now = self.clock()
+            b = self._bucket(path, now)
+            b.paused_until = max(b.paused_until, now + seconds)
+            b.tokens = 0.0
+            self._stat(path, "penalties", 1)
+            self._notify()
+
+    # ---------- 调度 ----------
+    def _grant(self, now: float) -> float:
+        """
+        按优先级发放：已被更高优先级等待者占用的资源，低优先级不能插队。
+        返回最早可能再次发放的等待秒数（无待发放返回 inf）。
+        """
+        claimed = set()
+        next_wake = float("inf")
+        granted_any = False
+        for w in sorted(self._waiting):
+            needs = w.buckets + ([_INFLIGHT] if w.slot else [])
+            if claimed.intersection(needs):
+                continue
+            wait = max((self._bucket(b, now).wait_time(w.cost, now) for b in w.buckets), default=0.0)
+            slot_ok = not w.slot or self._inflight < self.max_inflight
+            if wait <= 0.0 and slot_ok:
+                for b in w.buckets:
+                    self._bucket(b, now).take(w.cost)
+                if w.slot:
+                    self._inflight += 1
+                w.granted = True
+                granted_any = True
+                continue
+            claimed.update(needs)
+            if wait > 0.0:
+                next_wake = min(next_wake, wait)
+        if granted_any:
+            granted = [w for w in self._waiting if w.granted]
+            self._waiting = [w for w in self._waiting if not w.granted]
+            self._notify(granted)
+        return next_wake
+
+    def _notify(self, extra: List[_Waiter] = ()) -> None:
+        # 状态变了：同步等待者靠条件变量，协程等待者各自的 wake 回调
+        self._cond.notify_all()
+        for w in itertools.chain(extra, self._waiting):
+            if w.wake is not None:
+                w.wake()
+
+    def _enqueue(self, path: str, priority: Optional[int], cost: float, slot: bool) -> _Waiter:
+        prio = classify(path) if priority is None else priority
+        w = _Waiter(prio, next(self._seq), path, self._bucket_names(path), cost,
+                    slot and self.max_inflight > 0, self.clock())
+        self._waiting.append(w)
+        return w
+
+    def _done(self, w: _Waiter) -> float:
+        waited = self.clock() - w.enqueued
+        self._stat(w.path, "requests", 1)
+        self._stat(w.path, "wait_total_s", waited)
+        self._stat(w.path, "wait_max_s", waited, use_max=True)
+        prio_key = "priority:" + PRIORITY_NAMES.get(w.priority, str(w.priority))
+        self._stat(prio_key, "requests", 1)
+        self._stat(prio_key, "wait_total_s", waited)
+        self._stat(prio_key, "wait_max_s", waited, use_max=True)
+        if waited > 1e-3:
+            self._stat(w.path, "queued", 1)
+            self._stat(prio_key, "queued", 1)
+        return waited
+
+    def acquire(self, path: str, priority: Optional[int] = None, cost: float = 1.0,
+                slot: bool = False) -> float:
+        """阻塞直到拿到令牌（slot=True 时还占一个并发槽，需 release）；返回等待秒数。"""
+        with self._cond:
+            w = self._enqueue(path, priority, cost, slot)
+            while True:
+                wake = self._grant(self.clock())
+                if w.granted:
+                    return self._done(w)
+                if self.sleep is not None and wake != float("inf"):
+                    self._cond.release()
+                    try:
+                        self.sleep(wake)
+                    finally:
+                        self._cond.acquire()
+                else:
+                    self._cond.wait(None if wake == float("inf") else wake)
+
+    async def acquire_async(self, path: str, priority: Optional[int] = None, cost: float = 1.0,
+                            slot: bool = False) -> float:
+        """协程版：等待时让出事件循环。"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        with self._cond:
+            w = self._enqueue(path, priority, cost, slot)
+            w.wake = lambda: loop.call_soon_threadsafe(event.set)
+        try:
+            while True:
+                with self._cond:
+                    wake = self._grant(self.clock())
+                    if w.granted:
+                        w.wake = None
+                        return self._done(w)
+                    event.clear()
+                if self.sleep is not None and wake != float("inf"):
+                    self.sleep(wake)
+                    await asyncio.sleep(0)
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), None if wake == float("inf") else wake)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            with self._cond:
+                if w in self._waiting:
+                    self._waiting.remove(w)
+                elif w.granted and w.slot:
+                    self._inflight -= 1
+                w.wake = None
+                self._notify()
+            raise
+
+    def release(self) -> None:
+        with self._cond:
+            self._inflight = max(0, self._inflight - 1)
+            self._grant(self.clock())
+            self._notify()
+
+    @contextmanager
+    def slot(self, path: str, priority: Optional[int] = None, cost: float = 1.0) -> Iterator[float]:
+        waited = self.acquire(path, priority, cost, slot=True)
+        try:
+            yield waited
+        finally:
+            if self.max_inflight > 0:
+                self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, path: str, priority: Optional[int] = None, cost: float = 1.0) -> AsyncIterator[float]:
+        waited = await self.acquire_async(path, priority, cost, slot=True)
+        try:
+            yield waited
+        finally:
+            if self.max_inflight > 0:
+                self.release()
+
+    # ---------- 指标 ----------
+    def _stat(self, key: str, name: str, value: float, use_max: bool = False) -> None:
+        s = self._stats.setdefault(key, {"requests": 0, "queued": 0, "wait_total_s": 0.0,
+                                         "wait_max_s": 0.0, "penalties": 0})
+        s[name] = max(s[name], value) if use_max else s[name] + value
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self._cond:
+            out = {}
+            for k, s in self._stats.items():
+                d = dict(s)
+                d["wait_avg_s"] = s["wait_total_s"] / s["requests"] if s["requests"] else 0.0
+                out[k] = d
+            out["_scheduler"] = {"waiting": len(self._waiting), "inflight": self._inflight}
+            return out
@@ -0,0 +1,224 @@
+"""
+多周期合成：一条 1m（base）K线流，本地合成 5m/15m/1H/4H/1D 等周期，不再每个周期单独拉 REST / 订阅。
+
+- 对齐用 timeframes.bar_open_ms（6H 及以上按香港时间开盘，*utc 按 UTC，周线从周一开始）
+- 批量：resample_arrays 把列数组一次性聚合（reduceat 向量化）；resample_series 直接读本地 base 序列的尾部
+- 增量：Resampler.on_bar(inst_id, base, candle) 与 MarketFeed 的 on_bar 同签名，
+  base K线收盘时更新各目标周期的“正在形成”的K线；该周期最后一根 base 到达即收盘推送，
+  不用等下一根。base 断档（整段分钟没数据）时，由后续 base 或 flush(now_ms) 按时间收盘
+- 残缺K线：输出带 n（包含的 base 根数）与 complete（n 是否等于应有根数）；
+  emit_partial=False 时残缺的不推送（启动时从中途开始、断档），计入 stats["partial_dropped"]
+- subscribe(bar, callback, inst_ids=None)：回调签名 (inst_id, bar, candle)，与 MarketFeed 一致
+- forming(inst_id, bar, base_forming=None)：未收盘的合成K线（confirm=False），可并入未收盘的 base
+- store：给定 CandleStore 时收到的 base 收盘K线顺手落盘，启动 warm 从本地 base 序列恢复正在形成的K线；
+  落盘只接库尾连续的K线，漏推/重连留下的断档给了 client 就用 CandleSync 补齐，否则清空重新播种
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from candle_store import COLUMNS, CandleStore, CandleSync
+from timeframes import bar_open_ms, bar_to_ms
+
+Candle = Dict[str, Any]
+BarCallback = Callable[[str, str, Candle], None]
+
+DEFAULT_TARGETS = ("5m", "15m", "1H", "4H", "1D")
+
+
+def resample_arrays(bars: Dict[str, np.ndarray], bar: str, base: str = "1m",
+                    drop_partial: bool = False) -> Dict[str, np.ndarray]:
+    """
+    批量聚合：bars 为按 ts 正序的 base 列数组（ts/open/high/low/close/vol）。
+    返回目标周期的列数组，外加 n（base 根数）、complete、confirm（最后一根的收盘时间是否已被覆盖）。
+    """
+    ts = np.asarray(bars["ts"], dtype=np.int64)
+    base_ms, step = bar_to_ms(base), bar_to_ms(bar)
+    if step % base_ms:
+        raise ValueError(f"{bar} is not a multiple of {base}")
+    if ts.size == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return {"ts": np.empty(0, dtype=np.int64), "open": empty, "high": empty, "low": empty, "close": empty,
+                "vol": empty, "n": np.empty(0, dtype=np.int64), "complete": np.empty(0, dtype=bool),
+                "confirm": np.empty(0, dtype=bool)}
+    keys = bar_open_ms(bar, ts)
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    ends = np.append(starts[1:], ts.size) - 1
+    out = {
+        "ts": keys[starts],
+        "open": np.asarray(bars["open"], dtype=np.float64)[starts],
+        "high": np.maximum.reduceat(np.asarray(bars["high"], dtype=np.float64), starts),
+        "low": np.minimum.reduceat(np.asarray(bars["low"], dtype=np.float64), starts),
+        "close": np.asarray(bars["close"], dtype=np.float64)[ends],
+        "vol": np.add.reduceat(np.asarray(bars["vol"], dtype=np.float64), starts),
+        "n": ends - starts + 1,
+    }
+    out["complete"] = out["n"] == step // base_ms
+    # 只有最后一根可能还在形成：它最后一根 base 的收盘时间没到目标周期收盘
+    confirm = np.ones(starts.size, dtype=bool)
+    confirm[-1] = ts[-1] + base_ms >= keys[-1] + step
+    out["confirm"] = confirm
+    if drop_partial:
+        keep = out["complete"]
+        out = {k: v[keep] for k, v in out.items()}
+    return out
+
+
+def resample_series(series, bar: str, base: str = "1m", n: Optional[int] = None,
+                    drop_partial: bool = False) -> Dict[str, np.ndarray]:
+    """从本地 base 序列（CandleSeries）合成最近 n 根目标周期K线（n 为空则全部），只读需要的尾部。"""
+    if n is None or not len(series):
+        return resample_arrays(series.window(), bar, base, drop_partial)
+    start = bar_open_ms(bar, series.last_ts) - (int(n) - 1) * bar_to_ms(bar)
+    out = resample_arrays(series.window(start_ts=start), bar, base, drop_partial)
+    return {k: v[-int(n):] for k, v in out.items()}
+
+
+def _merge(cur: Optional[Candle], c: Candle, key: int) -> Candle:
+    if cur is None:
+        return {"ts": key, "open": float(c["open"]), "high": float(c["high"]), "low": float(c["low"]),
+                "close": float(c["close"]), "vol": float(c["vol"]), "n": 1}
+    return {"ts": key, "open": cur["open"], "high": max(cur["high"], float(c["high"])),
+            "low": min(cur["low"], float(c["low"])), "close": float(c["close"]),
+            "vol": cur["vol"] + float(c["vol"]), "n": cur["n"] + 1}
+
+
+class Resampler:
+    def __init__(self, base: str = "1m", targets: Iterable[str] = DEFAULT_TARGETS, emit_partial: bool = True,
+                 store: Optional[CandleStore] = None, client: Any = None):
+        self.base = base
+        self.base_ms = bar_to_ms(base)
+        self.targets: List[str] = []
+        self.emit_partial = emit_partial
+        self.store = store
+        self.sync = CandleSync(client, store) if store is not None and client is not None else None
+        # (instId, bar) -> 正在形成的合成K线；instId -> 最后一根已吸收的 base ts
+        self._forming: Dict[Tuple[str, str], Candle] = {}
+        self.last_base_ts: Dict[str, int] = {}
+        self._subs: Dict[str, List[Tuple[BarCallback, Optional[frozenset]]]] = {}
+        self.stats = {"base_bars": 0, "dup_bars": 0, "emitted": 0, "partial_dropped": 0, "store_gaps": 0}
+        for bar in targets:
+            self.add_target(bar)
+
+    # ---------- 订阅 ----------
+    def add_target(self, bar: str) -> None:
+        if bar == self.base or bar in self.targets:
+            return
+        if bar_to_ms(bar) % self.base_ms:
+            raise ValueError(f"{bar} is not a multiple of {self.base}")
+        self.targets.append(bar)
+        self.targets.sort(key=bar_to_ms)
+
+    def subscribe(self, bar: str, callback: BarCallback, inst_ids: Optional[Iterable[str]] = None) -> None:
+        """订阅某周期（含 base 本身）的收盘K线；inst_ids 为空表示全部品种。"""
+        self.add_target(bar)
+        self._subs.setdefault(bar, []).append((callback, None if inst_ids is None else frozenset(inst_ids)))
+
+    def _emit(self, inst_id: str, bar: str, candle: Candle) -> None:
+        for cb, insts in self._subs.get(bar, ()):
+            if insts is None or inst_id in insts:
+                cb(inst_id, bar, candle)
+
+    def _close(self, inst_id: str, bar: str) -> None:
+        cur = self._forming.pop((inst_id, bar), None)
+        if cur is None:
+            return
+        cur["complete"] = cur["n"] == bar_to_ms(bar) // self.base_ms
+        cur["confirm"] = True
+        if not cur["complete"] and not self.emit_partial:
+            self.stats["partial_dropped"] += 1
+            return
+        self.stats["emitted"] += 1
+        self._emit(inst_id, bar, cur)
+
+    # ---------- 增量 ----------
+    def on_bar(self, inst_id: str, bar: str, candle: Candle) -> None:
+        """吸收一根 base 收盘K线（MarketFeed on_bar 回调）；其它周期的推送直接转发给订阅者。"""
+        if bar != self.base:
+            self._emit(inst_id, bar, candle)
+            return
+        ts = int(candle["ts"])
+        if ts <= self.last_base_ts.get(inst_id, 0):
+            self.stats["dup_bars"] += 1
+            return
+        self.last_base_ts[inst_id] = ts
+        self.stats["base_bars"] += 1
+        if self.store is not None:
+            self._store_base(inst_id, candle)
+        self._emit(inst_id, self.base, candle)
+        for target in self.targets:
+            key = bar_open_ms(target, ts)
+            cur = self._forming.get((inst_id, target))
+            if cur is not None and cur["ts"] != key:
+                self._close(inst_id, target)        # 断档：上一根没等到最后一根 base
+                cur = None
+            self._forming[(inst_id, target)] = _merge(cur, candle, key)
+            if ts + self.base_ms >= key + bar_to_ms(target):
+                self._close(inst_id, target)
+
+    def _store_base(self, inst_id: str, candle: Candle) -> None:
+        series = self.store.series(inst_id, self.base)
+        row = {c: np.array([candle[c]]) for c in COLUMNS}
+        if series.append_contiguous(row, self.base_ms) or int(candle["ts"]) <= series.last_ts:
+            return
+        # 接不上库尾（漏推/重连）：不跨洞追加
+        self.stats["store_gaps"] += 1
+        if self.sync is not None:
+            try:
+                self.sync.sync(inst_id, self.base, 2)        # 补齐；补不上时 CandleSync 自己重新播种
+            except Exception as e:
+                print(f"[WARN] {inst_id} {self.base} 本地K线补档失败（{e}），暂不落盘")
+                return
+        else:
+            print(f"[WARN] {inst_id} {self.base} 本地K线断档（{series.last_ts} 之后），清空后重新播种")
+            series.reset()
+        series.append_contiguous(row, self.base_ms)
+
+    def flush(self, now_ms: int) -> None:
+        """按时间收盘：收盘时间 <= now_ms 仍未收到最后一根 base 的合成K线（断档/停推）。"""
+        for (inst_id, bar), cur in list(self._forming.items()):
+            if cur["ts"] + bar_to_ms(bar) <= now_ms:
+                self._close(inst_id, bar)
+
+    def forming(self, inst_id: str, bar: str, base_forming: Optional[Candle] = None) -> Optional[Candle]:
+        """未收盘的合成K线（confirm=False）；base_forming 为未收盘的 base K线时一并计入（用于 peek 试算）。"""
+        cur = self._forming.get((inst_id, bar))
+        if base_forming is not None and int(base_forming["ts"]) > self.last_base_ts.get(inst_id, 0):
+            key = bar_open_ms(bar, int(base_forming["ts"]))
+            cur = _merge(cur if cur is not None and cur["ts"] == key else None, base_forming, key)
+        if cur is None:
+            return None
+        return dict(cur, complete=False, confirm=False)
+
+    # ---------- 预热 ----------
+    def warm(self, inst_id: str, bars: Optional[Dict[str, np.ndarray]] = None) -> None:
+        """
+        从 base 历史（列数组；不给则读 store 里的 base 序列）恢复各周期正在形成的K线与 last_base_ts，
+        之后的实时 base 接着往上合成，启动时不会产出半截K线。
+        """
+        if bars is None:
+            if self.store is None:
+                return
+            series = self.store.series(inst_id, self.base)
+            if not len(series):
+                return
+            # 只需要覆盖最长周期当前这一根
+            last = series.last_ts
+            start = min(bar_open_ms(t, last) for t in self.targets) if self.targets else last
+            bars = series.window(start_ts=start)
+        ts = np.asarray(bars["ts"], dtype=np.int64)
+        if ts.size == 0:
+            return
+        last = int(ts[-1])
+        self.last_base_ts[inst_id] = max(self.last_base_ts.get(inst_id, 0), last)
+        for target in self.targets:
+            key = bar_open_ms(target, last)
+            lo = int(np.searchsorted(ts, key, side="left"))
+            if last + self.base_ms >= key + bar_to_ms(target):
+                self._forming.pop((inst_id, target), None)   # 最后一根已收盘，没有正在形成的
+                continue
+            agg = resample_arrays({c: np.asarray(bars[c])[lo:] for c in COLUMNS}, target, self.base)
+            self._forming[(inst_id, target)] = {"ts": int(agg["ts"][-1]), "open": float(agg["open"][-1]),
+                                                "high": float(agg["high"][-1]), "low": float(agg["low"][-1]),
+                                                "close": float(agg["close"][-1]), "vol": float(agg["vol"][-1]),
+                                                "n": int(agg["n"][-1])}
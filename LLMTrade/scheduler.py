@@ -0,0 +1,192 @@
+"""
+按K线收盘对齐的调度器：用交易所时钟（本地时间 + 测得的偏移）在 收盘 + confirm_delay_s 时唤醒。
+
+- ServerClock：取几次 /public/time，按往返最短的一次估算偏移；之后本地算，不再每轮联网，
+  超过 resync_s 才在唤醒处理完后顺手重测（失败就沿用旧偏移）
+- BarScheduler：可同时挂多个周期（1m ~ 1W，含 utc 周期），同一时刻收盘的周期合并为一次唤醒；
+  按周期记录唤醒迟到（实际唤醒 - 目标时刻）的次数/平均/最大/最近值
+- 时钟可注入：SystemClock 走真实时间；SimClock 按倍速流逝或完全虚拟（sleep 直接快进），
+  回放/模拟时整天的调度几毫秒跑完
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from timeframes import bar_to_ms, next_bar_close_ms
+
+# 单次 sleep 最长秒数：便于响应 stop 和时钟调整
+MAX_SLEEP_S = 30.0
+
+
+class SystemClock:
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class SimClock:
+    """模拟时钟：speed>0 时按 speed 倍速流逝；speed=0 时完全虚拟，sleep 直接把时间往前拨。"""
+
+    def __init__(self, start: float, speed: float = 0.0):
+        self.start = start
+        self.speed = speed
+        self._virtual = start
+        self._real0 = time.monotonic()
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        if self.speed <= 0:
+            with self._lock:
+                return self._virtual
+        return self.start + (time.monotonic() - self._real0) * self.speed
+
+    def sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        if self.speed <= 0:
+            self.advance(seconds)
+        else:
+            time.sleep(seconds / self.speed)
+
+    def advance(self, seconds: float) -> None:
+        # 虚拟模式下手动拨时间（模拟处理耗时等）
+        with self._lock:
+            self._virtual += seconds
+
+
+class ServerClock:
+    def __init__(self, fetch_ms: Callable[[], int], clock: Optional[SystemClock] = None,
+                 resync_s: float = 900.0, samples: int = 3):
+        self.fetch_ms = fetch_ms                 # 一般是 client.get_server_time_ms
+        self.clock = clock or SystemClock()
+        self.resync_s = resync_s
+        self.samples = samples
+        self.offset_ms = 0.0                     # 交易所时间 - 本地时间
+        self.rtt_ms = float("inf")
+        self.synced_at: Optional[float] = None   # 本地秒；None 表示从未测过
+
+    def sync(self) -> float:
+        """测偏移：取往返最短的一次，假设请求在往返正中到达服务器。返回偏移毫秒。"""
+        best: Optional[Tuple[float, float]] = None
+        for _ in range(max(1, self.samples)):
+            t0 = self.clock.time()
+            server = self.fetch_ms()
+            t1 = self.clock.time()
+            rtt = (t1 - t0) * 1000.0
+            if best is None or rtt < best[0]:
+                best = (rtt, server - (t0 + t1) * 500.0)
+        self.rtt_ms, self.offset_ms = best
+        self.synced_at = self.clock.time()
+        return self.offset_ms
+
+    def stale(self) -> bool:
+        return self.synced_at is None or self.clock.time() - self.synced_at > self.resync_s
+
+    def maybe_sync(self) -> None:
+        if not self.stale():
+            return
+        try:
+            self.sync()
+        except Exception as e:
+            print(f"[WARN] 服务器时间校准失败，沿用偏移 {self.offset_ms:.0f}ms：{e}")
+            self.synced_at = self.clock.time()   # 别每次唤醒都重试
+
+    def now_ms(self) -> int:
+        return int(self.clock.time() * 1000.0 + self.offset_ms)
+
+
+# callback(bar, close_ms, now_ms)：close_ms 为刚收盘那根K线的收盘时间（交易所时钟）
+BarCallback = Callable[[str, int, int], None]
+
+
+class BarScheduler:
+    def __init__(self, clock: Optional[SystemClock] = None, server: Optional[ServerClock] = None,
+                 confirm_delay_s: float = 2.0):
+        self.clock = clock or (server.clock if server is not None else SystemClock())
+        self.server = server
+        self.confirm_delay_ms = int(confirm_delay_s * 1000)
+        self.jobs: List[Tuple[str, BarCallback]] = []
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._stop = threading.Event()
+
+    def add(self, bar: str, callback: BarCallback) -> None:
+        bar_to_ms(bar)      # 提前校验周期
+        self.jobs.append((bar, callback))
+        self.stats.setdefault(bar, {"wakes": 0, "errors": 0, "lateness_last_ms": 0.0,
+                                    "lateness_max_ms": 0.0, "lateness_total_ms": 0.0})
+
+    def now_ms(self) -> int:
+        if self.server is not None:
+            return self.server.now_ms()
+        return int(self.clock.time() * 1000.0)
+
+    def next_wake(self, now_ms: Optional[int] = None) -> Tuple[int, List[str]]:
+        """下一次收盘时间（交易所时钟）及在该时刻收盘的周期。"""
+        if not self.jobs:
+            raise RuntimeError("no bars scheduled")
+        # 已过收盘但还在确认延迟内的，仍算这一根
+        ref = (self.now_ms() if now_ms is None else now_ms) - self.confirm_delay_ms
+        closes = {bar: next_bar_close_ms(bar, ref) for bar, _ in self.jobs}
+        close = min(closes.values())
+        return close, sorted({b for b, c in closes.items() if c == close}, key=bar_to_ms)
+
+    def wait_next(self) -> Optional[Tuple[int, List[str]]]:
+        """睡到下一次收盘 + confirm_delay；被 stop() 打断返回 None。"""
+        close, bars = self.next_wake()
+        target = close + self.confirm_delay_ms
+        while not self._stop.is_set():
+            remaining = (target - self.now_ms()) / 1000.0
+            if remaining <= 0:
+                return close, bars
+            self.clock.sleep(min(remaining, MAX_SLEEP_S))
+        return None
+
+    def run_pending(self, close: int, bars: List[str]) -> None:
+        target = close + self.confirm_delay_ms
+        for bar, callback in self.jobs:
+            if bar not in bars:
+                continue
+            now = self.now_ms()
+            late = float(now - target)
+            s = self.stats[bar]
+            s["wakes"] += 1
+            s["lateness_last_ms"] = late
+            s["lateness_max_ms"] = max(s["lateness_max_ms"], late)
+            s["lateness_total_ms"] += late
+            try:
+                callback(bar, close, now)
+            except Exception as e:
+                s["errors"] += 1
+                print(f"[ERROR] {bar} 收盘任务失败：{e}")
+        if self.server is not None:
+            # 处理完再校准，不占收盘后的关键时间
+            self.server.maybe_sync()
+
+    def run(self, max_wakes: Optional[int] = None) -> int:
+        """循环唤醒直到 stop() 或达到 max_wakes，返回唤醒次数。"""
+        if self.server is not None and self.server.synced_at is None:
+            self.server.maybe_sync()
+        wakes = 0
+        while max_wakes is None or wakes < max_wakes:
+            nxt = self.wait_next()
+            if nxt is None:
+                break
+            self.run_pending(*nxt)
+            wakes += 1
+        return wakes
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for bar, s in self.stats.items():
+            d = dict(s)
+            d["lateness_avg_ms"] = s["lateness_total_ms"] / s["wakes"] if s["wakes"] else 0.0
+            out[bar] = d
+        if self.server is not None:
+            out["_clock"] = {"offset_ms": self.server.offset_ms, "rtt_ms": self.server.rtt_ms}
+        return out
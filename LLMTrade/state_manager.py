@@ -1,6 +1,21 @@
-import os
+"""
+策略状态持久化。
+
+- StateStore：SQLite（WAL 模式）键值表 state(ns, key, value)，ns 一般是 instId；
+  每次 commit 只写变动的键、一个事务，崩溃后要么是旧值要么是新值，不会写坏一半
+- NamespacedState：某个 ns 的 dict 视图，记录改过/删过的键，commit() 增量落库
+- import_json：把旧版 state.json 一次性导入某个 ns（只在该 ns 为空时导入，导入过的文件记在 meta 表）
+- load_state / save_state：旧版 JSON 读写（save 改为临时文件 + 原子替换）
+
+命令行：python state_manager.py import state.json --db state.db --ns BTC-USDT
+"""
+import argparse
 import json
-from typing import Any, Dict
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List
 
 
 def load_state(path: str) -> Dict[str, Any]:
@@ -11,5 +26,191 @@ def load_state(path: str) -> Dict[str, Any]:
 
 
 def save_state(path: str, state: Dict[str, Any]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
\ No newline at end of file
+    # 先写临时文件再原子替换：写到一半崩溃也不会留下半个 JSON
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_ms INTEGER NOT NULL,
+    PRIMARY KEY (ns, key)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class StateStore:
+    def __init__(self, path: str = "state.db"):
+        self.path = path
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        # 多个策略线程共用一个连接，由 _lock 串行化
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + FULL：commit 返回即已落盘（下单后的状态不能丢）
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.executescript(_SCHEMA)
+        self.writes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "StateStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    # ---------- 读写 ----------
+    def load(self, ns: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM state WHERE ns = ?", (ns,)).fetchall()
+        return {k: json.loads(v) for k, v in rows}
+
+    def write(self, ns: str, changes: Dict[str, Any], deleted: Iterable[str] = ()) -> None:
+        """一个事务里写入 changes、删除 deleted。"""
+        deleted = list(deleted)
+        if not changes and not deleted:
+            return
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO state (ns, key, value, updated_ms) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value, updated_ms = excluded.updated_ms",
+                    [(ns, k, json.dumps(v, ensure_ascii=False), now_ms) for k, v in changes.items()])
+                self._conn.executemany("DELETE FROM state WHERE ns = ? AND key = ?", [(ns, k) for k in deleted])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.writes += 1
+
+    def namespaces(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT ns FROM state ORDER BY ns")]
+
+    def state(self, ns: str) -> "NamespacedState":
+        return NamespacedState(self, ns)
+
+    # ---------- 旧版 JSON 导入 ----------
+    def import_json(self, json_path: str, ns: str) -> bool:
+        """旧 state.json -> ns（只导一次；ns 已有数据则跳过）。返回是否导入。"""
+        if not os.path.exists(json_path):
+            return False
+        marker = "imported:" + os.path.abspath(json_path)
+        with self._lock:
+            done = self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone()
+            has_ns = self._conn.execute("SELECT 1 FROM state WHERE ns = ? LIMIT 1", (ns,)).fetchone()
+        if done or has_ns:
+            return False
+        data = load_state(json_path)
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO state (ns, key, value, updated_ms) VALUES (?, ?, ?, ?)",
+                    [(ns, k, json.dumps(v, ensure_ascii=False), now_ms) for k, v in data.items()])
+                self._conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (marker, ns))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        print(f"[STATE] 已把 {json_path} 导入 {self.path}（ns={ns}，{len(data)} 个键）")
+        return True
+
+
+class NamespacedState(dict):
+    """某个 ns 的状态 dict：照常读写，commit() 只把改过/删过的键写进 StateStore。"""
+
+    def __init__(self, store: StateStore, ns: str):
+        super().__init__(store.load(ns))
+        self.store = store
+        self.ns = ns
+        self._dirty: set = set()
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        super().__setitem__(key, value)
+        self._dirty.add(key)
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self._dirty.add(key)
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key in self:
+            self._dirty.add(key)
+        return super().pop(key, *default)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def clear(self) -> None:
+        self._dirty.update(self.keys())
+        super().clear()
+
+    def mark(self, key: str) -> None:
+        # 原地改了嵌套值（list/dict）时手动标脏
+        self._dirty.add(key)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty)
+
+    def commit(self) -> None:
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        changes = {k: self[k] for k in keys if k in self}
+        try:
+            self.store.write(self.ns, changes, [k for k in keys if k not in self])
+        except Exception:
+            self._dirty |= keys      # 写失败：下次再试
+            raise
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="策略状态库（SQLite）工具")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_imp = sub.add_parser("import", help="把旧版 JSON 状态导入某个 ns")
+    p_imp.add_argument("json_path")
+    p_imp.add_argument("--db", default="state.db")
+    p_imp.add_argument("--ns", default="BTC-USDT")
+    p_show = sub.add_parser("show", help="打印某个 ns（不给则全部）")
+    p_show.add_argument("--db", default="state.db")
+    p_show.add_argument("--ns", default=None)
+    args = parser.parse_args()
+
+    with StateStore(args.db) as store:
+        if args.cmd == "import":
+            if not store.import_json(args.json_path, args.ns):
+                print("[STATE] 未导入：文件不存在、已导入过，或该 ns 已有状态")
+        else:
+            for ns in ([args.ns] if args.ns else store.namespaces()):
+                print(json.dumps({ns: store.load(ns)}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,682 @@
+"""
+增量（流式）指标：每根确认K线 O(1) 更新，可序列化进 state，启动时用历史预热。
+
+与 vector_indicators 的批量结果逐点一致（同样的 SMA 种子与预热 NaN 语义）。
+peek() 用“未收盘K线”试算当前值，不改变状态。
+RollingMax / RollingMin 为单调队列滑动极值，StreamingADX 为 Wilder ADX；
+StreamingRSI / StreamingBollinger / StreamingDonchian / StreamingKeltner / StreamingSuperTrend
+对应 vector_indicators 里的同名批量指标。
+"""
+import math
+from collections import deque
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from features import FEATURE_NAMES, derive
+from vector_indicators import ema_array, rma_array, atr_array, supertrend_step
+
+NAN = float("nan")
+
+
+class StreamingEMA:
+    """EMA，k = 2/(period+1)。"""
+
+    def __init__(self, period: int, alpha: Optional[float] = None):
+        self.period = int(period)
+        self.alpha = 2.0 / (self.period + 1.0) if alpha is None else alpha
+        self.count = 0
+        self.value = NAN
+        self._seed_sum = 0.0
+
+    def _next(self, x: float) -> Tuple[int, float, float]:
+        count = self.count + 1
+        if count < self.period:
+            return count, NAN, self._seed_sum + x
+        if count == self.period:
+            seed = self._seed_sum + x
+            return count, seed / self.period, seed
+        a = self.alpha
+        return count, x * a + self.value * (1 - a), self._seed_sum
+
+    def update(self, x: float) -> float:
+        self.count, self.value, self._seed_sum = self._next(float(x))
+        return self.value
+
+    def peek(self, x: float) -> float:
+        return self._next(float(x))[1]
+
+    def warm_start(self, values: Sequence[float]) -> None:
+        v = np.asarray(values, dtype=np.float64)
+        self.count = int(v.size)
+        if v.size >= self.period:
+            self.value = float(self._batch(v)[-1])
+            self._seed_sum = float(v[:self.period].sum())
+        else:
+            self.value = NAN
+            self._seed_sum = float(v.sum())
+
+    def _batch(self, v: np.ndarray) -> np.ndarray:
+        return ema_array(v, self.period)
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.period
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "count": self.count,
+                "value": None if math.isnan(self.value) else self.value,
+                "seed_sum": self._seed_sum}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["period"]))
+        obj.count = int(d.get("count", 0))
+        v = d.get("value")
+        obj.value = NAN if v is None else float(v)
+        obj._seed_sum = float(d.get("seed_sum", 0.0))
+        return obj
+
+
+class StreamingRMA(StreamingEMA):
+    """Wilder RMA，alpha = 1/period。"""
+
+    def __init__(self, period: int):
+        super().__init__(period, alpha=1.0 / int(period))
+
+    def _batch(self, v: np.ndarray) -> np.ndarray:
+        return rma_array(v, self.period)
+
+
+class StreamingATR:
+    """ATR = RMA(TR)；第一根K线只记录收盘价（与批量版一致，前 period 个输出为 NaN）。"""
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.rma = StreamingRMA(self.period)
+        self.prev_close = NAN
+
+    def _tr(self, high: float, low: float) -> float:
+        pc = self.prev_close
+        return max(high - low, abs(high - pc), abs(low - pc))
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if not math.isnan(self.prev_close):
+            self.rma.update(self._tr(float(high), float(low)))
+        self.prev_close = float(close)
+        return self.rma.value
+
+    def peek(self, high: float, low: float, close: float) -> float:
+        if math.isnan(self.prev_close):
+            return NAN
+        return self.rma.peek(self._tr(float(high), float(low)))
+
+    def warm_start(self, highs, lows, closes) -> None:
+        c = np.asarray(closes, dtype=np.float64)
+        self.rma = StreamingRMA(self.period)
+        if c.size == 0:
+            self.prev_close = NAN
+            return
+        self.prev_close = float(c[-1])
+        n_tr = c.size - 1
+        self.rma.count = n_tr
+        if n_tr >= self.period:
+            self.rma.value = float(atr_array(highs, lows, c, self.period)[-1])
+        h = np.asarray(highs, dtype=np.float64)
+        l = np.asarray(lows, dtype=np.float64)
+        head = min(n_tr, self.period) + 1
+        if head > 1:
+            hh, ll, cc = h[1:head], l[1:head], c[:head]
+            trs = np.maximum(hh - ll, np.maximum(np.abs(hh - cc[:-1]), np.abs(ll - cc[:-1])))
+            self.rma._seed_sum = float(trs.sum())
+
+    @property
+    def value(self) -> float:
+        return self.rma.value
+
+    @property
+    def ready(self) -> bool:
+        return self.rma.ready
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "rma": self.rma.to_dict(),
+                "prev_close": None if math.isnan(self.prev_close) else self.prev_close}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["period"]))
+        obj.rma = StreamingRMA.from_dict(d["rma"])
+        pc = d.get("prev_close")
+        obj.prev_close = NAN if pc is None else float(pc)
+        return obj
+
+
+class RollingWindow:
+    """定长滑动窗口，维护滚动和（均值/求和 O(1)）。"""
+
+    def __init__(self, size: int):
+        self.size = int(size)
+        self.values: deque = deque(maxlen=self.size)
+        self.total = 0.0
+
+    def update(self, x: float) -> None:
+        x = float(x)
+        if len(self.values) == self.size:
+            self.total -= self.values[0]
+        self.values.append(x)
+        self.total += x
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.size
+
+    @property
+    def mean(self) -> float:
+        return self.total / len(self.values) if self.values else NAN
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"size": self.size, "values": list(self.values)}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["size"]))
+        for v in d.get("values", []):
+            obj.update(v)
+        return obj
+
+
+class RollingMax:
+    """
+    滑动窗口最大值：单调队列（下标, 值），队首即最大值，每次更新摊还 O(1)。
+    与 vector_indicators.rolling_max 一致：不满 window 个时为 NaN。
+    """
+    _sign = 1.0
+
+    def __init__(self, window: int):
+        self.window = int(window)
+        self.count = 0
+        self.items: deque = deque()      # (下标, sign*值)，值单调递减
+
+    def update(self, x: float) -> float:
+        v = self._sign * float(x)
+        items = self.items
+        while items and items[-1][1] <= v:
+            items.pop()
+        items.append((self.count, v))
+        self.count += 1
+        if items[0][0] <= self.count - 1 - self.window:
+            items.popleft()
+        return self.value
+
+    def peek(self, x: float) -> float:
+        if self.count + 1 < self.window:
+            return NAN
+        v = self._sign * float(x)
+        oldest = self.count + 1 - self.window     # 加入 x 后窗口里最早的下标
+        for i, w in self.items:
+            if i >= oldest:
+                v = max(v, w)
+                break
+        return self._sign * v
+
+    @property
+    def value(self) -> float:
+        return self._sign * self.items[0][1] if self.count >= self.window else NAN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"window": self.window, "count": self.count, "items": [[i, v] for i, v in self.items]}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["window"]))
+        obj.count = int(d["count"])
+        obj.items = deque((int(i), float(v)) for i, v in d["items"])
+        return obj
+
+
+class RollingMin(RollingMax):
+    """滑动窗口最小值（同 RollingMax，取负存储）。"""
+    _sign = -1.0
+
+
+def _dx(plus_s: float, minus_s: float, tr_s: float) -> Tuple[float, float, float]:
+    # 与 vector_indicators._dx_from_smoothed 同口径：TR 或 DI 之和为 0 时记 0
+    di_p = 100.0 * plus_s / tr_s if tr_s > 0.0 else 0.0
+    di_m = 100.0 * minus_s / tr_s if tr_s > 0.0 else 0.0
+    total = di_p + di_m
+    return di_p, di_m, (100.0 * abs(di_p - di_m) / total if total > 0.0 else 0.0)
+
+
+class StreamingADX:
+    """Wilder ADX：RMA(TR) / RMA(+DM) / RMA(-DM) -> DX，再 RMA(DX)。与 dmi_array 逐点一致。"""
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.tr = StreamingRMA(self.period)
+        self.plus = StreamingRMA(self.period)
+        self.minus = StreamingRMA(self.period)
+        self.dx = StreamingRMA(self.period)
+        self.prev = (NAN, NAN, NAN)          # 上一根 high / low / close
+
+    def _moves(self, high: float, low: float) -> Tuple[float, float, float]:
+        ph, pl, pc = self.prev
+        tr = max(high - low, abs(high - pc), abs(low - pc))
+        up, down = high - ph, pl - low
+        return tr, (up if up > down and up > 0.0 else 0.0), (down if down > up and down > 0.0 else 0.0)
+
+    def update(self, high: float, low: float, close: float) -> float:
+        high, low, close = float(high), float(low), float(close)
+        if not math.isnan(self.prev[2]):
+            tr, pdm, mdm = self._moves(high, low)
+            t, p, m = self.tr.update(tr), self.plus.update(pdm), self.minus.update(mdm)
+            if not math.isnan(t):
+                self.dx.update(_dx(p, m, t)[2])
+        self.prev = (high, low, close)
+        return self.dx.value
+
+    def peek(self, high: float, low: float, close: float) -> float:
+        if math.isnan(self.prev[2]):
+            return NAN
+        tr, pdm, mdm = self._moves(float(high), float(low))
+        t = self.tr.peek(tr)
+        if math.isnan(t):
+            return NAN
+        return self.dx.peek(_dx(self.plus.peek(pdm), self.minus.peek(mdm), t)[2])
+
+    def warm_start(self, highs, lows, closes) -> None:
+        self.__init__(self.period)
+        for h, l, c in zip(np.asarray(highs, dtype=np.float64).tolist(), np.asarray(lows, dtype=np.float64).tolist(),
+                           np.asarray(closes, dtype=np.float64).tolist()):
+            self.update(h, l, c)
+
+    @property
+    def value(self) -> float:
+        return self.dx.value
+
+    @property
+    def ready(self) -> bool:
+        return self.dx.ready
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "tr": self.tr.to_dict(), "plus": self.plus.to_dict(),
+                "minus": self.minus.to_dict(), "dx": self.dx.to_dict(),
+                "prev": [None if math.isnan(x) else x for x in self.prev]}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["period"]))
+        obj.tr = StreamingRMA.from_dict(d["tr"])
+        obj.plus = StreamingRMA.from_dict(d["plus"])
+        obj.minus = StreamingRMA.from_dict(d["minus"])
+        obj.dx = StreamingRMA.from_dict(d["dx"])
+        obj.prev = tuple(NAN if x is None else float(x) for x in d["prev"])
+        return obj
+
+
+def _warm_by_updates(ind, *columns) -> None:
+    # 逐根 update 预热（递推有路径依赖或有多段平滑的指标用）
+    for row in zip(*(np.asarray(col, dtype=np.float64).tolist() for col in columns)):
+        ind.update(*row)
+
+
+def _opt(x: float) -> Optional[float]:
+    return None if math.isnan(x) else x
+
+
+def _nan(x: Optional[float]) -> float:
+    return NAN if x is None else float(x)
+
+
+class StreamingRSI:
+    """Wilder RSI：RMA(涨幅) / RMA(跌幅)，与 rsi_array 逐点一致。"""
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.gain = StreamingRMA(self.period)
+        self.loss = StreamingRMA(self.period)
+        self.prev_close = NAN
+
+    @staticmethod
+    def _rsi(g: float, l: float) -> float:
+        if math.isnan(g):
+            return NAN
+        if l > 0.0:
+            return 100.0 - 100.0 / (1.0 + g / l)
+        return 100.0 if g > 0.0 else 50.0
+
+    def update(self, close: float) -> float:
+        close = float(close)
+        if not math.isnan(self.prev_close):
+            ch = close - self.prev_close
+            self.gain.update(max(ch, 0.0))
+            self.loss.update(max(-ch, 0.0))
+        self.prev_close = close
+        return self.value
+
+    def peek(self, close: float) -> float:
+        if math.isnan(self.prev_close):
+            return NAN
+        ch = float(close) - self.prev_close
+        return self._rsi(self.gain.peek(max(ch, 0.0)), self.loss.peek(max(-ch, 0.0)))
+
+    def warm_start(self, closes) -> None:
+        self.__init__(self.period)
+        _warm_by_updates(self, closes)
+
+    @property
+    def value(self) -> float:
+        return self._rsi(self.gain.value, self.loss.value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "gain": self.gain.to_dict(), "loss": self.loss.to_dict(),
+                "prev_close": _opt(self.prev_close)}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["period"]))
+        obj.gain = StreamingRMA.from_dict(d["gain"])
+        obj.loss = StreamingRMA.from_dict(d["loss"])
+        obj.prev_close = _nan(d.get("prev_close"))
+        return obj
+
+
+class StreamingBollinger:
+    """
+    布林带：窗口内两遍法求均值/标准差（与 rolling_mean_std 同口径），每根 O(period)。
+    update / peek 返回 (mid, upper, lower)。
+    """
+
+    def __init__(self, period: int, mult: float = 2.0):
+        self.period = int(period)
+        self.mult = float(mult)
+        self.window = RollingWindow(self.period)
+
+    def _bands(self, values) -> Tuple[float, float, float]:
+        if len(values) < self.period:
+            return NAN, NAN, NAN
+        m = math.fsum(values) / self.period
+        sd = math.sqrt(sum((v - m) * (v - m) for v in values) / self.period)
+        return m, m + self.mult * sd, m - self.mult * sd
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        self.window.update(close)
+        return self.value
+
+    def peek(self, close: float) -> Tuple[float, float, float]:
+        vals = list(self.window.values)[1 if self.window.full else 0:] + [float(close)]
+        return self._bands(vals)
+
+    def warm_start(self, closes) -> None:
+        self.window = RollingWindow(self.period)
+        for x in np.asarray(closes, dtype=np.float64)[-self.period:].tolist():
+            self.window.update(x)
+
+    @property
+    def value(self) -> Tuple[float, float, float]:
+        return self._bands(self.window.values)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "mult": self.mult, "window": self.window.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["period"]), float(d["mult"]))
+        obj.window = RollingWindow.from_dict(d["window"])
+        return obj
+
+
+class StreamingDonchian:
+    """唐奇安通道：最高价 / 最低价单调队列，update / peek 返回 (upper, lower, mid)。"""
+
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.high_max = RollingMax(self.period)
+        self.low_min = RollingMin(self.period)
+
+    def update(self, high: float, low: float) -> Tuple[float, float, float]:
+        u, l = self.high_max.update(high), self.low_min.update(low)
+        return u, l, (u + l) / 2.0
+
+    def peek(self, high: float, low: float) -> Tuple[float, float, float]:
+        u, l = self.high_max.peek(high), self.low_min.peek(low)
+        return u, l, (u + l) / 2.0
+
+    def warm_start(self, highs, lows) -> None:
+        self.__init__(self.period)
+        _warm_by_updates(self, highs, lows)
+
+    @property
+    def value(self) -> Tuple[float, float, float]:
+        u, l = self.high_max.value, self.low_min.value
+        return u, l, (u + l) / 2.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "high_max": self.high_max.to_dict(), "low_min": self.low_min.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["period"]))
+        obj.high_max = RollingMax.from_dict(d["high_max"])
+        obj.low_min = RollingMin.from_dict(d["low_min"])
+        return obj
+
+
+class StreamingKeltner:
+    """肯特纳通道：EMA(close) ± mult * ATR，update / peek 返回 (mid, upper, lower)。"""
+
+    def __init__(self, ema_len: int, atr_len: int, mult: float = 2.0):
+        self.ema = StreamingEMA(ema_len)
+        self.atr = StreamingATR(atr_len)
+        self.mult = float(mult)
+
+    def _bands(self, m: float, a: float) -> Tuple[float, float, float]:
+        return m, m + self.mult * a, m - self.mult * a
+
+    def update(self, high: float, low: float, close: float) -> Tuple[float, float, float]:
+        return self._bands(self.ema.update(close), self.atr.update(high, low, close))
+
+    def peek(self, high: float, low: float, close: float) -> Tuple[float, float, float]:
+        return self._bands(self.ema.peek(close), self.atr.peek(high, low, close))
+
+    def warm_start(self, highs, lows, closes) -> None:
+        self.ema.warm_start(closes)
+        self.atr.warm_start(highs, lows, closes)
+
+    @property
+    def value(self) -> Tuple[float, float, float]:
+        return self._bands(self.ema.value, self.atr.value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ema": self.ema.to_dict(), "atr": self.atr.to_dict(), "mult": self.mult}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["ema"]["period"]), int(d["atr"]["period"]), float(d["mult"]))
+        obj.ema = StreamingEMA.from_dict(d["ema"])
+        obj.atr = StreamingATR.from_dict(d["atr"])
+        return obj
+
+
+class StreamingSuperTrend:
+    """SuperTrend：ATR 增量 + supertrend_step（与 supertrend_array 共用），update / peek 返回 (line, direction)。"""
+
+    def __init__(self, period: int, mult: float = 3.0):
+        self.period = int(period)
+        self.mult = float(mult)
+        self.atr = StreamingATR(self.period)
+        self.state: Optional[Tuple[float, float, int]] = None
+
+    def _step(self, a: float, high: float, low: float, close: float):
+        if math.isnan(a):
+            return None
+        return supertrend_step(self.state, (float(high) + float(low)) / 2.0, a, float(close),
+                               self.atr.prev_close, self.mult)
+
+    @staticmethod
+    def _line(state) -> Tuple[float, float]:
+        if state is None:
+            return NAN, NAN
+        u, l, d = state
+        return (l if d == 1 else u), float(d)
+
+    def update(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        # 注意：_step 要用上一根收盘价，必须在 atr.update 改写 prev_close 之前算
+        nxt = self._step(self.atr.peek(high, low, close), high, low, close)
+        self.atr.update(high, low, close)
+        self.state = nxt
+        return self._line(nxt)
+
+    def peek(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        return self._line(self._step(self.atr.peek(high, low, close), high, low, close))
+
+    def warm_start(self, highs, lows, closes) -> None:
+        self.__init__(self.period, self.mult)
+        _warm_by_updates(self, highs, lows, closes)
+
+    @property
+    def value(self) -> Tuple[float, float]:
+        return self._line(self.state)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "mult": self.mult, "atr": self.atr.to_dict(),
+                "state": None if self.state is None else list(self.state)}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        obj = cls(int(d["period"]), float(d["mult"]))
+        obj.atr = StreamingATR.from_dict(d["atr"])
+        st = d.get("state")
+        obj.state = None if st is None else (float(st[0]), float(st[1]), int(st[2]))
+        return obj
+
+
+class TrendIndicators:
+    """
+    TrendBot 用的一组增量指标：EMA 快/慢 + ATR + ADX，外加特征用的滚动窗口
+    （72h 最高价/最高收盘价的单调队列、收盘价与 EMA快 的回看窗口），见 features.py。
+    last_ts 为最后一根已吸收的确认K线时间戳，用于去重和断档检测。
+    window / short / slope 为特征回看的K线根数（features.feature_windows）。
+    """
+
+    def __init__(self, ema_fast: int, ema_slow: int, atr_len: int, window: int = 72,
+                 adx_len: int = 14, short: int = 24, slope: int = 6):
+        self.ema_fast = StreamingEMA(ema_fast)
+        self.ema_slow = StreamingEMA(ema_slow)
+        self.atr = StreamingATR(atr_len)
+        self.adx = StreamingADX(adx_len)
+        self.window, self.short, self.slope = int(window), int(short), int(slope)
+        self.closes = RollingWindow(self.window + 1)
+        self.high_max = RollingMax(self.window)
+        self.close_max = RollingMax(self.window)
+        self.ef_hist = RollingWindow(self.slope + 1)
+        self.last_ts = 0
+
+    def matches(self, ema_fast: int, ema_slow: int, atr_len: int, adx_len: int = 14,
+                window: Optional[int] = None) -> bool:
+        return ((self.ema_fast.period, self.ema_slow.period, self.atr.period, self.adx.period)
+                == (ema_fast, ema_slow, atr_len, adx_len) and (window is None or window == self.window))
+
+    def update(self, ts: int, high: float, low: float, close: float) -> None:
+        if ts <= self.last_ts:
+            return
+        ef = self.ema_fast.update(close)
+        self.ema_slow.update(close)
+        self.atr.update(high, low, close)
+        self.adx.update(high, low, close)
+        self.closes.update(close)
+        self.high_max.update(high)
+        self.close_max.update(close)
+        if ef == ef:
+            self.ef_hist.update(ef)
+        self.last_ts = int(ts)
+
+    def warm_start(self, ts, highs, lows, closes) -> None:
+        h = np.asarray(highs, dtype=np.float64)
+        l = np.asarray(lows, dtype=np.float64)
+        c = np.asarray(closes, dtype=np.float64)
+        self.ema_fast.warm_start(c)
+        self.ema_slow.warm_start(c)
+        self.atr.warm_start(h, l, c)
+        self.adx.warm_start(h, l, c)
+        self.closes = RollingWindow(self.closes.size)
+        for x in c[-self.closes.size:]:
+            self.closes.update(x)
+        # 单调队列只需最后 window 根，但计数从头算（不满 window 时为 NaN）
+        self.high_max = RollingMax(self.window)
+        self.close_max = RollingMax(self.window)
+        skip = max(0, c.size - self.window)
+        self.high_max.count = self.close_max.count = skip
+        for hi, x in zip(h[skip:], c[skip:]):
+            self.high_max.update(hi)
+            self.close_max.update(x)
+        self.ef_hist = RollingWindow(self.ef_hist.size)
+        if c.size >= self.ema_fast.period:
+            for x in ema_array(c, self.ema_fast.period)[-self.ef_hist.size:]:
+                if x == x:
+                    self.ef_hist.update(x)
+        self.last_ts = int(ts[-1]) if len(ts) else 0
+
+    def values(self) -> Tuple[float, float, float]:
+        return self.ema_fast.value, self.ema_slow.value, self.atr.value
+
+    def peek(self, high: float, low: float, close: float) -> Tuple[float, float, float]:
+        return self.ema_fast.peek(close), self.ema_slow.peek(close), self.atr.peek(high, low, close)
+
+    def _features(self, close: float, ef: float, es: float, atr: float, adx: float, high_max: float,
+                  close_max: float, closes: Sequence[float], efs: Sequence[float]) -> Dict[str, float]:
+        # closes / efs 末尾为当前这根；不够回看长度的特征为 NaN
+        def back(seq: Sequence[float], k: int) -> float:
+            return seq[-1 - k] if len(seq) > k else NAN
+        return {k: float(v) for k, v in derive(close, ef, es, atr, adx, high_max, close_max,
+                                               back(closes, self.short), back(closes, self.window),
+                                               back(efs, self.slope)).items()}
+
+    def features(self) -> Dict[str, float]:
+        """最后一根确认K线上的特征（features.FEATURE_NAMES）。"""
+        closes = list(self.closes.values)
+        if not closes:
+            return {k: NAN for k in FEATURE_NAMES}
+        ef, es, atr = self.values()
+        return self._features(closes[-1], ef, es, atr, self.adx.value, self.high_max.value,
+                              self.close_max.value, closes, list(self.ef_hist.values))
+
+    def peek_features(self, high: float, low: float, close: float) -> Dict[str, float]:
+        """用未收盘K线试算特征，不改变状态。"""
+        ef, es, atr = self.peek(high, low, close)
+        efs = list(self.ef_hist.values) + ([ef] if ef == ef else [])
+        return self._features(float(close), ef, es, atr, self.adx.peek(high, low, close),
+                              self.high_max.peek(high), self.close_max.peek(close),
+                              list(self.closes.values) + [float(close)], efs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "last_ts": self.last_ts,
+            "ema_fast": self.ema_fast.to_dict(),
+            "ema_slow": self.ema_slow.to_dict(),
+            "atr": self.atr.to_dict(),
+            "adx": self.adx.to_dict(),
+            "windows": [self.window, self.short, self.slope],
+            "closes": self.closes.to_dict(),
+            "high_max": self.high_max.to_dict(),
+            "close_max": self.close_max.to_dict(),
+            "ef_hist": self.ef_hist.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        window, short, slope = d["windows"]
+        obj = cls(int(d["ema_fast"]["period"]), int(d["ema_slow"]["period"]), int(d["atr"]["period"]),
+                  int(window), int(d["adx"]["period"]), int(short), int(slope))
+        obj.ema_fast = StreamingEMA.from_dict(d["ema_fast"])
+        obj.ema_slow = StreamingEMA.from_dict(d["ema_slow"])
+        obj.atr = StreamingATR.from_dict(d["atr"])
+        obj.adx = StreamingADX.from_dict(d["adx"])
+        obj.closes = RollingWindow.from_dict(d["closes"])
+        obj.high_max = RollingMax.from_dict(d["high_max"])
+        obj.close_max = RollingMax.from_dict(d["close_max"])
+        obj.ef_hist = RollingWindow.from_dict(d["ef_hist"])
+        obj.last_ts = int(d.get("last_ts", 0))
+        return obj
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+BotConfig 参数扫描：网格 / 随机采样，进程池并行回测。
+
+- K线只放一份到共享内存（multiprocessing.shared_memory），各进程按名字挂载，不随任务 pickle
+- 每个进程按 (ema_fast, ema_slow, atr_len) 缓存预计算指标；任务按指标参数排序后分块，命中率高
+- 结果边算边回流到 ResultTable，可排序/导出 CSV
+
+用法：
+    python sweep.py --synthetic 87600 --random 2000 --sort total_return
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from analytics import ANALYTICS_FIELDS, metric_rows, summarize
+from backtest import FillModel, run_backtest, precompute_indicators, synthetic_bars, load_bars
+from config import BotConfig
+
+SWEEP_FIELDS = ("ema_fast", "ema_slow", "atr_len", "add_on_pullback_atr",
+                "tp1_pct", "tp1_sell_pct", "trail_atr_mult")
+STAT_FIELDS = ("total_return", "max_drawdown", "trades", "cycles", "fees", "exposure")
+
+
+# ---------- 参数空间 ----------
+def grid(base: BotConfig, **axes: Sequence[Any]) -> List[BotConfig]:
+    """笛卡尔积；自动跳过 ema_fast >= ema_slow 的组合。"""
+    names = list(axes)
+    out = []
+    for values in itertools.product(*(axes[k] for k in names)):
+        cfg = replace(base, **dict(zip(names, values)))
+        if cfg.ema_fast < cfg.ema_slow:
+            out.append(cfg)
+    return out
+
+
+def random_sample(base: BotConfig, space: Dict[str, Any], n: int, seed: int = 0) -> List[BotConfig]:
+    """
+    space 取值：列表 -> 均匀挑一个；(lo, hi) 元组 -> 区间均匀（int 端点则取整数）。
+    """
+    rng = random.Random(seed)
+    out: List[BotConfig] = []
+    tries = 0
+    while len(out) < n and tries < n * 20:
+        tries += 1
+        picked = {}
+        for k, v in space.items():
+            if isinstance(v, tuple):
+                lo, hi = v
+                picked[k] = rng.randint(lo, hi) if isinstance(lo, int) and isinstance(hi, int) else rng.uniform(lo, hi)
+            else:
+                picked[k] = rng.choice(list(v))
+        cfg = replace(base, **picked)
+        if cfg.ema_fast < cfg.ema_slow:
+            out.append(cfg)
+    return out
+
+
+# ---------- 共享K线 ----------
+class SharedBars:
+    """把列数组放进一块共享内存；spec 可 pickle，子进程 attach 后得到零拷贝视图。"""
+
+    def __init__(self, bars: Dict[str, np.ndarray]):
+        cols = {k: np.ascontiguousarray(v) for k, v in bars.items()}
+        total = sum(v.nbytes for v in cols.values())
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, total))
+        self.spec: Dict[str, Any] = {"name": self.shm.name, "columns": []}
+        offset = 0
+        for k, v in cols.items():
+            np.ndarray(v.shape, dtype=v.dtype, buffer=self.shm.buf, offset=offset)[...] = v
+            self.spec["columns"].append((k, v.dtype.str, v.shape, offset))
+            offset += v.nbytes
+
+    @staticmethod
+    def attach(spec: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        bars = {}
+        for k, dtype, shape, offset in spec["columns"]:
+            arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            arr.flags.writeable = False
+            bars[k] = arr
+        return shm, bars
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> "SharedBars":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+# ---------- 工作进程 ----------
+_WORKER: Dict[str, Any] = {}
+
+
+def init_worker(spec: Dict[str, Any], fill: FillModel, initial_quote: float) -> None:
+    shm, bars = SharedBars.attach(spec)
+    _WORKER.clear()
+    _WORKER.update(shm=shm, bars=bars, fill=fill, initial_quote=initial_quote, ind_cache={})
+
+
+def worker_bars() -> Tuple[Dict[str, np.ndarray], FillModel, float]:
+    return _WORKER["bars"], _WORKER["fill"], _WORKER["initial_quote"]
+
+
+def worker_indicators(cfg: BotConfig) -> Dict[str, np.ndarray]:
+    cache = _WORKER["ind_cache"]
+    key = (cfg.ema_fast, cfg.ema_slow, cfg.atr_len, cfg.adx_len if cfg.adx_min > 0.0 else 0)
+    ind = cache.get(key)
+    if ind is None:
+        if len(cache) >= 64:
+            cache.pop(next(iter(cache)))
+        ind = precompute_indicators(_WORKER["bars"], cfg)
+        cache[key] = ind
+    return ind
+
+
+def result_row(cfg: BotConfig, stats: Dict[str, float], metrics: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    row = {k: getattr(cfg, k) for k in SWEEP_FIELDS}
+    row.update({k: stats.get(k) for k in STAT_FIELDS})
+    if metrics is not None:
+        row.update({k: metrics.get(k) for k in ANALYTICS_FIELDS})
+    return row
+
+
+def _run_chunk(configs: List[BotConfig], start: int = 0, end: Optional[int] = None) -> List[Dict[str, Any]]:
+    bars, fill, quote = worker_bars()
+    results = [run_backtest(cfg, bars, fill=fill, initial_quote=quote, start=start, end=end,
+                            indicators=worker_indicators(cfg)) for cfg in configs]
+    # 整块一次向量化算 Sharpe/胜率/分批归因等
+    metrics = metric_rows(summarize(results, configs[0].bar)) if results else []
+    return [result_row(cfg, res.stats, m) for cfg, res, m in zip(configs, results, metrics)]
+
+
+# ---------- 结果表 ----------
+class ResultTable:
+    def __init__(self, rows: Optional[Iterable[Dict[str, Any]]] = None):
+        self.rows: List[Dict[str, Any]] = list(rows or [])
+
+    def add(self, rows: Iterable[Dict[str, Any]]) -> None:
+        self.rows.extend(rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def sort(self, by: str = "total_return", descending: bool = True) -> "ResultTable":
+        key = (lambda r: (r.get(by) is None, -(r.get(by) or 0.0))) if descending \
+            else (lambda r: (r.get(by) is None, r.get(by) or 0.0))
+        self.rows.sort(key=key)
+        return self
+
+    def top(self, n: int = 10) -> List[Dict[str, Any]]:
+        return self.rows[:n]
+
+    def to_csv(self, path: str) -> None:
+        if not self.rows:
+            return
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=list(self.rows[0]))
+            w.writeheader()
+            w.writerows(self.rows)
+
+    def format(self, n: int = 10) -> str:
+        if not self.rows:
+            return "(empty)"
+        cols = list(self.rows[0])
+        lines = ["  ".join(f"{c:>14s}" for c in cols)]
+        for r in self.rows[:n]:
+            lines.append("  ".join(f"{r[c]:>14.6g}" if isinstance(r[c], (int, float)) else f"{str(r[c]):>14s}"
+                                   for c in cols))
+        return "\n".join(lines)
+
+
+def run_sweep(bars: Dict[str, np.ndarray], configs: List[BotConfig], workers: Optional[int] = None,
+              fill: Optional[FillModel] = None, initial_quote: float = 10000.0, chunk_size: int = 16,
+              start: int = 0, end: Optional[int] = None,
+              on_rows: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> ResultTable:
+    """在进程池里跑完 configs 的回测，返回 ResultTable；on_rows 每完成一块回调一次（流式消费）。"""
+    fill = fill or FillModel()
+    table = ResultTable()
+    # 同一组指标参数的配置放在一起，worker 端缓存命中更高
+    ordered = sorted(configs, key=lambda c: (c.ema_fast, c.ema_slow, c.atr_len))
+    chunks = [ordered[i:i + chunk_size] for i in range(0, len(ordered), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    with SharedBars(bars) as shared, ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker,
+            initargs=(shared.spec, fill, initial_quote)) as pool:
+        futures = [pool.submit(_run_chunk, ch, start, end) for ch in chunks]
+        for fut in as_completed(futures):
+            rows = fut.result()
+            table.add(rows)
+            if on_rows is not None:
+                on_rows(rows)
+    return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BotConfig 参数扫描")
+    parser.add_argument("--inst", default=BotConfig.inst_id)
+    parser.add_argument("--bar", default=BotConfig.bar)
+    parser.add_argument("--store", default=BotConfig.candle_store_dir)
+    parser.add_argument("--synthetic", type=int, default=0, help="用 N 根合成K线代替本地K线库")
+    parser.add_argument("--random", type=int, default=0, help="随机采样 N 组（默认走内置网格）")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--sort", default="total_return")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--csv", default="")
+    parser.add_argument("--no-reset", action="store_true", help="清仓后不重置分批进度（同实盘默认）")
+    args = parser.parse_args()
+
+    base = BotConfig(inst_id=args.inst, bar=args.bar, reset_cycle_when_flat=not args.no_reset)
+    bars = synthetic_bars(args.synthetic, args.bar) if args.synthetic else load_bars(args.store, args.inst, args.bar)
+    if bars["ts"].size == 0:
+        print("没有K线数据：先运行 backfill.py 回补，或用 --synthetic")
+        return
+    bars = {k: np.asarray(v) for k, v in bars.items()}
+    if args.random:
+        configs = random_sample(base, {
+            "ema_fast": (5, 40), "ema_slow": (30, 200), "atr_len": [7, 14, 21, 28],
+            "add_on_pullback_atr": (0.3, 2.0), "tp1_pct": (0.005, 0.05),
+            "tp1_sell_pct": (0.1, 0.6), "trail_atr_mult": (1.0, 4.0),
+        }, args.random)
+    else:
+        configs = grid(base, ema_fast=[10, 20, 30], ema_slow=[50, 100], atr_len=[14],
+                       add_on_pullback_atr=[0.5, 0.8, 1.2], tp1_pct=[0.008, 0.012, 0.02],
+                       tp1_sell_pct=[0.25, 0.35, 0.5], trail_atr_mult=[1.5, 2.2, 3.0])
+
+    t0 = time.perf_counter()
+    done = {"n": 0}
+
+    def progress(rows: List[Dict[str, Any]]) -> None:
+        done["n"] += len(rows)
+        print(f"\r[SWEEP] {done['n']}/{len(configs)}", end="", flush=True)
+
+    table = run_sweep(bars, configs, workers=args.workers or None, on_rows=progress)
+    print(f"\n[SWEEP] {len(configs)} 组，用时 {time.perf_counter() - t0:.1f}s")
+    table.sort(args.sort)
+    print(table.format(args.top))
+    if args.csv:
+        table.to_csv(args.csv)
+
+
+if __name__ == "__main__":
+    main()
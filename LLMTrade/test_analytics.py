@@ -0,0 +1,71 @@
+"""
+绩效分析：手算样例、批量与逐个一致、归因守恒。
+运行：python -m pytest -q test_analytics.py
+"""
+import numpy as np
+
+from analytics import equity_metrics, stack_trades, summarize, trade_metrics, tranche_attribution
+from backtest import ENTRY, ADD, TP1, STOP, TRADE_DTYPE, run_backtest, synthetic_bars
+from config import BotConfig
+
+
+def _trades(rows):
+    return np.array(rows, dtype=TRADE_DTYPE)
+
+
+def test_equity_metrics_by_hand():
+    eq = np.array([[100.0, 110.0, 99.0, 99.0, 120.0],
+                   [100.0, 100.0, 100.0, 100.0, 100.0]])
+    m = equity_metrics(eq, periods=4)
+    r = np.array([0.1, -0.1, 0.0, 120.0 / 99.0 - 1.0])
+    assert np.allclose(m["total_return"], [0.2, 0.0])
+    assert np.isclose(m["sharpe"][0], r.mean() / r.std(ddof=1) * 2.0) and m["sharpe"][1] == 0.0
+    assert np.isclose(m["sortino"][0], r.mean() / np.sqrt(0.01 / 4) * 2.0)
+    assert np.allclose(m["max_drawdown"], [0.1, 0.0]) and m["max_dd_bars"].tolist() == [2.0, 0.0]
+    assert np.isclose(m["cagr"][0], 1.2 - 1.0)          # 4 步 = 1 年
+
+
+def test_cycles_and_tranche_attribution():
+    a = _trades([
+        # 第 0 轮：两批买入，TP1 卖一半，止损卖剩下 -> 已平仓
+        (1, ENTRY, 1, 100.0, 1.0, 0.1, 1, 0), (2, ADD, 1, 90.0, 1.0, 0.1, 2, 0),
+        (3, TP1, -1, 110.0, 1.0, 0.2, 2, 0), (4, STOP, -1, 92.0, 1.0, 0.2, 2, 0),
+        # 第 1 轮：亏损平仓
+        (5, ENTRY, 1, 100.0, 1.0, 0.1, 1, 1), (6, STOP, -1, 95.0, 1.0, 0.1, 1, 1),
+        # 第 2 轮：未平仓，不计入
+        (7, ENTRY, 1, 100.0, 1.0, 0.1, 1, 2),
+    ])
+    b = _trades([(1, ENTRY, 1, 10.0, 2.0, 0.0, 1, 0), (2, TP1, -1, 12.0, 2.0, 0.0, 1, 0)])
+    trades, run = stack_trades([a, b])
+    m = trade_metrics(trades, run)
+    pnl0 = (110.0 - 0.2 + 92.0 - 0.2) - (190.2)
+    pnl1 = (95.0 - 0.1) - 100.1
+    assert m["cycles_closed"].tolist() == [2.0, 1.0]
+    assert np.allclose(m["realized_pnl"], [pnl0 + pnl1, 4.0])
+    assert np.allclose(m["win_rate"], [0.5, 1.0]) and np.allclose(m["expectancy"], [(pnl0 + pnl1) / 2, 4.0])
+    assert np.isclose(m["profit_factor"][0], pnl0 / -pnl1) and m["profit_factor"][1] == np.inf
+
+    attr = tranche_attribution(trades, run, n_tranches=2)
+    # 第 0 轮：每批占一半数量，分到一半卖出所得
+    t1 = 0.5 * (109.8 + 91.8) - 100.1 + pnl1
+    t2 = 0.5 * (109.8 + 91.8) - 90.1
+    assert np.allclose(attr["tranche_pnl"][0], [t1, t2])
+    assert np.allclose(attr["exit_pnl"][0], [109.8 - 95.1, 91.8 - 95.1 + pnl1])
+    assert np.allclose(attr["pnl"].sum(axis=(1, 2)), m["realized_pnl"])
+    assert np.allclose(attr["tranche_cost"][0], [200.2, 90.1])
+
+
+def test_batch_summary_matches_single_runs():
+    bars = synthetic_bars(20_000)
+    results = [run_backtest(BotConfig(trail_atr_mult=k, tp1_pct=p), bars, initial_quote=1000.0)
+               for k in (1.2, 2.2, 3.5) for p in (0.005, 0.012)]
+    batch = summarize(results, "1H")
+    for i, res in enumerate(results):
+        one = summarize([res], "1H", n_tranches=batch["tranche_pnl"].shape[1])
+        for k, v in batch.items():
+            assert np.allclose(v[i], one[k][0]), k
+        assert np.isclose(batch["total_return"][i], res.stats["total_return"])
+        assert np.isclose(batch["max_drawdown"][i], res.stats["max_drawdown"])
+        assert np.isclose(batch["exposure"][i], res.stats["exposure"])
+        assert np.isclose(batch["fees"][i], res.stats["fees"])
+    assert np.allclose(batch["tranche_pnl"].sum(axis=1), batch["realized_pnl"])
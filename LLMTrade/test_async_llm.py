@@ -0,0 +1,74 @@
+from async_llm import AsyncLLMFilter
+from config import BotConfig
+from llm_filter import HTTPLLMFilter
+from llm_stub_server import StubLLMServer
+from okx_client import MockOKXClient
+from trend_bot import TrendBot
+
+
+def _payload(inst="BTC-USDT", ef=50100.0):
+    return {"instId": inst, "bar": "1H", "last_price": 50000.0, "ema_fast": ef, "ema_slow": 49500.0,
+            "atr": 400.0, "pos_btc": 0.0, "usdt_avail": 1000.0}
+
+
+def test_deadline_and_fallback_policies():
+    with StubLLMServer() as srv:
+        llm = AsyncLLMFilter(HTTPLLMFilter(True, srv.url, timeout=5.0), deadline_s=0.1, fallback="last",
+                             default=False)
+        srv.gate.clear()                                      # 模型挂起：必然超过 deadline
+        assert llm.allow_trade(_payload()) is False           # 还没有过判断：default
+        assert llm.stats["timeouts"] == 1 and llm.stats["errors"] == 0
+        srv.gate.set()
+        assert llm.drain(5.0)                                 # 晚到的结论记为最近一次判断
+        srv.gate.clear()
+        assert llm.allow_trade(_payload(ef=49000.0)) is True
+        llm.fallback = "deny"
+        assert llm.allow_trade(_payload()) is False
+        assert llm.stats["timeouts"] == 3 and len(srv.requests) == 3
+        srv.gate.set()
+        assert llm.drain(5.0)
+
+        llm.deadline_s = 5.0                                  # 下面只看报错/正常结论，不再制造超时
+        srv.fail_every = 1                                    # 模型报错：同样回退
+        llm.fallback = "allow"
+        assert llm.allow_trade(_payload(ef=49000.0)) is True
+        assert llm.stats["errors"] == 1
+        srv.fail_every = 0
+        assert llm.allow_trade(_payload(ef=49000.0)) is False  # 正常返回的真实结论
+        assert llm.stats["timeouts"] == 3
+        llm.close()
+
+
+def test_prefetch_is_reused_when_features_match():
+    with StubLLMServer() as srv:
+        llm = AsyncLLMFilter(HTTPLLMFilter(True, srv.url), deadline_s=0.1)
+        fut = llm.submit(_payload(inst="ETH-USDT"))
+        assert fut.result(timeout=5.0) is True and fut.done()
+        llm.prefetch(_payload(ef=50090.0))                    # 收盘前试算：同一桶
+        assert llm.drain(5.0) and len(srv.requests) == 2
+        srv.gate.clear()                                      # 再发请求就会超时：命中预取则不会
+        assert llm.allow_trade(_payload()) is True
+        assert len(srv.requests) == 2 and llm.stats["timeouts"] == 0
+
+        srv.gate.set()
+        llm.deadline_s = 5.0
+        llm.prefetch(_payload(ef=49000.0))                    # 收盘时趋势变了：不用预取
+        assert llm.allow_trade(_payload()) is True
+        assert llm.drain(5.0) and len(srv.requests) == 4
+        assert llm.stats["prefetch_hits"] == 1 and llm.stats["prefetch_misses"] == 1
+        llm.close()
+
+
+def test_trend_bot_prefetches_before_close(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with StubLLMServer() as srv:
+        llm = AsyncLLMFilter(HTTPLLMFilter(True, srv.url), deadline_s=2.0)
+        client = MockOKXClient("k", "s", "p", "http://mock")
+        bot = TrendBot(BotConfig(candle_store_dir=""), client, llm)
+        bot.prefetch_llm()
+        bot.run_once()
+        assert llm.stats["calls"] == 1
+        assert llm.stats["prefetch_hits"] + llm.stats["prefetch_misses"] == 1
+        assert len(srv.requests) == 1 + llm.stats["prefetch_misses"]
+        assert srv.requests[0]["instId"] == "BTC-USDT"
+        llm.close()
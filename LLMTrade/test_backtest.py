@@ -0,0 +1,115 @@
+"""
+回测引擎：权益/成交一致性、规则触发（吞吐见 bench.py）。
+运行：python -m pytest -q test_backtest.py
+"""
+import numpy as np
+
+from backtest import run_backtest, synthetic_bars, precompute_indicators, ENTRY, TP1, STOP
+from config import BotConfig
+
+
+def test_equity_matches_cash_and_position():
+    cfg = BotConfig()
+    bars = synthetic_bars(20_000)
+    res = run_backtest(cfg, bars, initial_quote=1000.0)
+    t = res.trades
+    assert res.equity.shape == (20_000,) and t.size > 0
+    cash = 1000.0 - (t["qty"] * t["price"] * t["side"]).sum() - t["fee"].sum()
+    # 买单的 fee 已含在 quote 里：市价买 q = qty*px + fee
+    held = (t["qty"] * t["side"]).sum()
+    assert abs(held - res.position[-1]) < 1e-9
+    assert abs(cash + held * bars["close"][-1] - res.equity[-1]) < 1e-6
+    assert set(np.unique(t["kind"])) <= {0, 1, 2, 3}
+
+
+def test_uptrend_enters_then_takes_profit_and_stops():
+    cfg = BotConfig()
+    n = 400
+    # 稳步上涨后一根跳空下跌 10%
+    close = np.concatenate([np.linspace(100.0, 130.0, 300), np.full(100, 117.0)])
+    bars = {"ts": np.arange(n, dtype=np.int64) * 3_600_000, "open": close, "high": close * 1.002,
+            "low": close * 0.998, "close": close, "vol": np.ones(n)}
+    res = run_backtest(cfg, bars)
+    kinds = res.trades["kind"].tolist()
+    assert kinds[0] == ENTRY and TP1 in kinds and STOP in kinds
+
+
+def test_window_with_shared_indicators_matches_slice():
+    cfg = BotConfig()
+    bars = synthetic_bars(5_000)
+    ind = precompute_indicators(bars, cfg)
+    a = run_backtest(cfg, bars, start=1000, end=3000, indicators=ind)
+    assert a.equity.size == 2000 and a.ts[0] == bars["ts"][1000] + 3_600_000
+
+
+def test_sweep_matches_direct_backtests():
+    from analytics import metric_rows, summarize
+    from sweep import grid, random_sample, run_sweep, result_row
+
+    base = BotConfig()
+    configs = grid(base, ema_fast=[10, 60], ema_slow=[50], trail_atr_mult=[1.5, 3.0])
+    assert len(configs) == 2          # ema_fast=60 >= ema_slow 被跳过
+    assert len(random_sample(base, {"ema_fast": (5, 20), "tp1_pct": (0.005, 0.02)}, 5)) == 5
+
+    bars = synthetic_bars(3_000)
+    streamed = []
+    table = run_sweep(bars, configs, workers=2, chunk_size=1, on_rows=streamed.extend)
+    assert len(table) == len(streamed) == 2
+    table.sort("trail_atr_mult", descending=False)
+    for cfg, row in zip(sorted(configs, key=lambda c: c.trail_atr_mult), table.rows):
+        res = run_backtest(cfg, bars)
+        assert row == result_row(cfg, res.stats, metric_rows(summarize([res], cfg.bar))[0])
+
+
+def test_walk_forward_windows_and_oos_summary():
+    from sweep import grid
+    from walk_forward import make_windows, run_walk_forward
+
+    assert make_windows(100, 40, 20) == [(0, 40, 40, 60), (20, 60, 60, 80), (40, 80, 80, 100)]
+    assert make_windows(100, 40, 20, anchored=True)[-1] == (0, 80, 80, 100)
+
+    bars = synthetic_bars(6_000)
+    configs = grid(BotConfig(), ema_fast=[10, 20], trail_atr_mult=[1.5, 3.0])
+    rows, summary = run_walk_forward(bars, configs, make_windows(6_000, 2_000, 1_000), workers=2)
+    assert [r["window"] for r in rows] == [0, 1, 2, 3]
+    assert not any(k.startswith("_") for r in rows for k in r)      # 样本外曲线不混进公开结果行
+    assert 0.0 <= summary["oos_max_drawdown"] < 1.0
+    best = max(configs, key=lambda c: run_backtest(c, bars, start=0, end=2_000).stats["total_return"])
+    assert (rows[0]["ema_fast"], rows[0]["trail_atr_mult"]) == (best.ema_fast, best.trail_atr_mult)
+    expected = np.prod([1.0 + r["test_return"] for r in rows]) - 1.0
+    assert abs(summary["oos_return"] - expected) < 1e-12
+
+
+def test_live_reset_counts_frozen_tp1_and_cancels_leftover(tmp_path):
+    from llm_filter import LLMFilter
+    from okx_client import MockOKXClient
+    from state_manager import StateStore
+    from trend_bot import TrendBot
+
+    client = MockOKXClient("k", "s", "p", "http://mock")
+    cancels = []
+    client.cancel_batch_orders = lambda items: cancels.extend(items) or {"code": "0", "data": []}
+    assert BotConfig().reset_cycle_when_flat is False          # 实盘默认不重置
+    from trend_bot import plan_entry
+    # 不足 minSz 的残余：实盘默认仍按有仓位处理（不重新 ENTRY），开启重置后才视为空仓
+    dust = dict(cfg=None, state={}, pos_base=5e-5, quote_avail=1e6, last_price=100.0, last_atr=1.0,
+                now_ms=0, min_sz=1e-4)
+    assert plan_entry(**dict(dust, cfg=BotConfig())) is None
+    assert plan_entry(**dict(dust, cfg=BotConfig(reset_cycle_when_flat=True)))[0] == "ENTRY"
+    cfg = BotConfig(candle_store_dir="", reset_cycle_when_flat=True)
+    bot = TrendBot(cfg, client, LLMFilter(False), store=StateStore(str(tmp_path / "s.db")), state_path=None)
+    bot.state["tranche_idx"] = 1
+    bot.state["tp1_placed"] = True
+    bot.state["tp1_ord_id"] = "tp1-a"
+
+    # 止损已把剩余卖光，TP1 还挂着（base 冻结）：可用为 0 但不算清仓
+    client.mock_balances["BTC"] = 0.0
+    client.mock_frozen["BTC"] = 0.01
+    bot.run_once()
+    assert bot.state.get("tp1_placed") and bot.state.get("tp1_ord_id") == "tp1-a" and cancels == []
+
+    # 冻结只剩不足 minSz 的零头：重置，并撤掉残留的 TP1
+    client.mock_frozen["BTC"] = 0.00001
+    bot.run_once()
+    assert not bot.state.get("tp1_placed") and "tp1_ord_id" not in bot.state
+    assert cancels == [{"instId": cfg.inst_id, "ordId": "tp1-a"}]
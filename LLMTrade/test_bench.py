@@ -0,0 +1,22 @@
+import json
+
+import bench
+
+
+def test_compare_flags_regressions():
+    base = {"results": {"a": {"min_s": 1.0}, "b": {"min_s": 1.0}, "c": {"min_s": 1.0}}}
+    cur = {"results": {"a": {"min_s": 1.05}, "b": {"min_s": 1.2}, "c": {"min_s": 0.5}, "d": {"min_s": 1.0}}}
+    status = {r["name"]: r["status"] for r in bench.compare(base, cur, threshold=0.10)}
+    assert status == {"a": "ok", "b": "regression", "c": "faster", "d": "new"}
+
+
+def test_cli_writes_results_and_fails_on_regression(tmp_path):
+    out = tmp_path / "b.json"
+    args = ["-k", "okx._sign", "--repeat", "2", "--min-time", "0.001"]
+    assert bench.main(args + ["--out", str(out)]) == 0
+    res = json.loads(out.read_text())
+    assert list(res["results"]) == ["okx._sign"] and res["meta"]["python"]
+    res["results"]["okx._sign"]["min_s"] /= 100.0        # 基线“快 100 倍”：当前即回归
+    out.write_text(json.dumps(res))
+    assert bench.main(args + ["--compare", str(out)]) == 1
+    assert {n for n, (_, big) in bench.CASES.items() if big} == {"indicators.ema[1M]", "indicators.atr[1M]"}
@@ -0,0 +1,163 @@
+"""
+本地K线库：追加/窗口/崩溃修复/增量同步。
+运行：python -m pytest -q test_candle_store.py
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from candle_store import CandleStore, CandleSync, COLUMNS
+from okx_client import MockOKXClient
+
+
+def _bars(ts):
+    ts = np.asarray(ts, dtype=np.int64)
+    px = ts.astype(float) / 1000.0
+    return {"ts": ts, "open": px, "high": px + 1, "low": px - 1, "close": px + 0.5, "vol": np.ones(ts.size)}
+
+
+def test_append_window_and_recover():
+    with tempfile.TemporaryDirectory() as root:
+        s = CandleStore(root).series("BTC-USDT", "1H")
+        assert len(s) == 0 and s.last_ts == 0
+        assert s.append(_bars([1000, 2000, 3000])) == 3
+        # 重复/旧数据被忽略，只追加新的
+        assert s.append(_bars([2000, 3000, 4000])) == 1
+        assert s.window(2)["ts"].tolist() == [3000, 4000]
+        assert s.window(start_ts=2000, end_ts=3000)["close"].tolist() == [2.5, 3.5]
+        assert isinstance(s.window()["ts"], np.memmap)
+
+        # 模拟追加到一半崩溃：数据列多写了一行，ts 列未写
+        with open(os.path.join(s.path, "open.bin"), "ab") as fh:
+            fh.write(np.float64(9.0).tobytes())
+        s2 = CandleStore(root).series("BTC-USDT", "1H")
+        assert len(s2) == 4
+        assert all(os.path.getsize(os.path.join(s.path, f"{c}.bin")) == 32 for c in COLUMNS)
+
+
+def test_append_contiguous_refuses_gaps():
+    with tempfile.TemporaryDirectory() as root:
+        s = CandleStore(root).series("BTC-USDT", "1H")
+        assert s.append_contiguous(_bars([1000]), 1000) == 1             # 空库：直接接
+        assert s.append_contiguous(_bars([2000, 3000]), 1000) == 2
+        assert s.append_contiguous(_bars([3000]), 1000) == 0             # 重复
+        assert s.append_contiguous(_bars([6000]), 1000) == 0             # 漏了 4000/5000：不写
+        assert s.append_contiguous(_bars([4000, 6000]), 1000) == 0       # 批内有洞：整批不写
+        assert s.window()["ts"].tolist() == [1000, 2000, 3000]
+
+
+def test_reset_keeps_earlier_memmaps_readable():
+    with tempfile.TemporaryDirectory() as root:
+        s = CandleStore(root).series("BTC-USDT", "1H")
+        s.append(_bars([1000, 2000, 3000]))
+        old = s.window()
+        s.reset()
+        # 旧 memmap 仍指向被替换掉的文件（原地截断时这里会 SIGBUS）
+        assert old["ts"].tolist() == [1000, 2000, 3000] and float(old["close"][-1]) == 3.5
+        assert len(s) == 0 and s.window()["ts"].size == 0
+        assert not any(f.endswith(".tmp") or f == "merge.commit" for f in os.listdir(s.path))
+        assert s.append(_bars([9000])) == 1 and len(CandleStore(root).series("BTC-USDT", "1H")) == 1
+
+
+def test_sync_fetches_only_new_bars():
+    with tempfile.TemporaryDirectory() as root:
+        client = MockOKXClient("k", "s", "p", "https://example.invalid")
+        calls = []
+        orig = client.get_candles
+
+        def counting(inst_id, bar, limit, **kw):
+            rows = orig(inst_id, bar, limit, **kw)
+            calls.append(len(rows))
+            return rows
+
+        client.get_candles = counting
+        sync = CandleSync(client, CandleStore(root))
+        first = sync.sync("BTC-USDT", "1H", 100)
+        assert first["ts"].size == 101 and not first["confirm"][-1]
+        calls.clear()
+        again = sync.sync("BTC-USDT", "1H", 100)
+        assert max(calls) <= 4
+        assert again["ts"].tolist() == first["ts"].tolist()
+
+
+def test_sync_fills_long_gap_from_history_or_reseeds():
+    from okx_client import OKXClient
+    from okx_stub_server import StubOKXServer
+
+    minute = 60_000
+    clock = {"now": 1_700_000_000_000 // minute * minute + 1234}
+    with StubOKXServer(now_ms=lambda: clock["now"], history_start_ms=0) as srv, \
+            tempfile.TemporaryDirectory() as root:
+        client = OKXClient("", "", "", srv.base_url)
+        sync = CandleSync(client, CandleStore(root))
+        sync.sync("BTC-USDT", "1m", 100)
+        series = sync.store.series("BTC-USDT", "1m")
+        last = series.last_ts
+
+        # 停机 50 小时：/market/candles 只有最近 1440 根，最新几页接不上，用 history-candles 补齐
+        clock["now"] += 3000 * minute
+        sync.sync("BTC-USDT", "1m", 100)
+        ts = series.columns()["ts"]
+        assert sync.stats == {"gaps_filled": 1, "reseeds": 0}
+        assert ts[-1] > last + 3000 * minute - 3 * minute and np.all(np.diff(ts) == minute)
+        assert any(p == "/api/v5/market/history-candles" for _, p, _ in srv.requests)
+
+        # 补齐页数超出上限：不带洞追加，而是清空重新播种
+        clock["now"] += 3000 * minute
+        sync.max_gap_pages = 2
+        out = sync.sync("BTC-USDT", "1m", 100)
+        ts = series.columns()["ts"]
+        assert sync.stats["reseeds"] == 1 and np.all(np.diff(ts) == minute)
+        assert ts[0] > last + 3000 * minute and out["ts"].size == 101
+
+
+def test_backfill_resumes_against_stub_server():
+    from backfill import Backfiller, BackfillJob
+    from okx_client import OKXClient
+    from okx_stub_server import StubOKXServer, synthetic_candle
+
+    hour = 3_600_000
+    now = 1_700_000_000_000 // hour * hour + 1234
+    since = now // hour * hour - 450 * hour
+    with StubOKXServer(now_ms=lambda: now, history_start_ms=since - 1000 * hour) as srv, \
+            tempfile.TemporaryDirectory() as root:
+        client = OKXClient("", "", "", srv.base_url)
+        store = CandleStore(os.path.join(root, "candles"))
+        ckpt = os.path.join(root, "ckpt.json")
+        jobs = [BackfillJob("BTC-USDT", "1H", since), BackfillJob("ETH-USDT", "1H", since),
+                BackfillJob("BTC-USDT", "4H", since)]
+
+        # 第一次运行：第 3 页后“断网”
+        pages = {"n": 0}
+        orig = client.get_history_candles
+
+        def flaky(*a, **kw):
+            pages["n"] += 1
+            if pages["n"] > 3:
+                raise ConnectionError("boom")
+            return orig(*a, **kw)
+
+        client.get_history_candles = flaky
+        Backfiller(client, store, ckpt, workers=3, rate=(1000, 1.0)).run(jobs)
+        assert os.path.exists(ckpt)
+
+        client.get_history_candles = orig
+        before = len(srv.requests)
+        results = Backfiller(client, CandleStore(os.path.join(root, "candles")), ckpt,
+                             workers=3, rate=(1000, 1.0)).run(jobs)
+        assert not os.path.exists(ckpt) or not json_load(ckpt)
+        # 续传不会从头再来：总请求数 ≈ 各任务页数之和
+        assert len(srv.requests) - before <= 5 + 5 + 2 + 3
+
+        s = CandleStore(os.path.join(root, "candles")).series("ETH-USDT", "1H")
+        ts = s.columns()["ts"]
+        assert results["ETH-USDT|1H"] == 450 and ts[0] == since and np.all(np.diff(ts) == hour)
+        row = synthetic_candle("ETH-USDT", "1H", int(ts[100]))
+        assert s.columns()["close"][100] == float(row[4])
+
+
+def json_load(path):
+    import json
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
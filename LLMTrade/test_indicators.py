@@ -0,0 +1,212 @@
+"""
+指标对拍：NumPy 向量化实现 vs 旧的逐点循环（bench_indicators 里的参考实现）。
+运行：python -m pytest -q test_indicators.py
+"""
+import math
+
+import numpy as np
+
+from bench_indicators import (adx_loop, atr_loop, bollinger_loop, ema_loop, rolling_max_loop, rsi_loop,
+                              supertrend_loop, synthetic_ohlc)
+from indicators import ema, atr
+from vector_indicators import (ema_array, atr_array, rma_array, candles_to_arrays, adx_array, rolling_max,
+                               rolling_min, rolling_sum, rsi_array, bollinger_array, donchian_array,
+                               keltner_array, supertrend_array)
+
+
+def _same(a, b, tol=1e-9) -> bool:
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    if a.shape != b.shape or not np.array_equal(np.isnan(a), np.isnan(b)):
+        return False
+    m = ~np.isnan(a)
+    return bool(np.all(np.abs(a[m] - b[m]) <= tol * np.maximum(1.0, np.abs(b[m]))))
+
+
+def test_ema_matches_loop():
+    _, _, close = synthetic_ohlc(3000)
+    for period in (1, 2, 14, 20, 50, 200):
+        assert _same(ema_array(close, period), ema_loop(close.tolist(), period))
+
+
+def test_atr_matches_loop():
+    high, low, close = synthetic_ohlc(3000)
+    for period in (1, 5, 14, 100):
+        assert _same(atr_array(high, low, close, period),
+                     atr_loop(high.tolist(), low.tolist(), close.tolist(), period))
+
+
+def test_list_api_is_compatible():
+    high, low, close = synthetic_ohlc(120)
+    assert ema(close.tolist()[:10], 20) == []
+    assert atr(high.tolist()[:14], low.tolist()[:14], close.tolist()[:14], 14) == []
+    out = ema(close.tolist(), 20)
+    assert isinstance(out, list) and len(out) == 120 and math.isnan(out[18])
+    assert _same(out, ema_loop(close.tolist(), 20))
+    assert _same(atr(high.tolist(), low.tolist(), close.tolist(), 14),
+                 atr_loop(high.tolist(), low.tolist(), close.tolist(), 14))
+
+
+def test_2d_instruments_and_period_sets():
+    high, low, close = synthetic_ohlc(2000)
+    rows = np.stack([close, close * 0.5, close[::-1]])
+    out = ema_array(rows, 20)
+    for i in range(3):
+        assert _same(out[i], ema_array(rows[i], 20))
+
+    periods = [5, 20, 50]
+    sweep = ema_array(close, periods)
+    assert sweep.shape == (3, 2000)
+    for i, p in enumerate(periods):
+        assert _same(sweep[i], ema_array(close, p))
+
+    a = atr_array(np.stack([high, high]), np.stack([low, low]), np.stack([close, close]), [7, 14])
+    assert _same(a[1], atr_array(high, low, close, 14))
+    assert _same(rma_array(close, 14)[13:14], [close[:14].mean()])
+
+
+def test_candles_to_arrays_sorts_by_ts():
+    candles = [["3000", "1", "4", "0.5", "2", "10"], ["1000", "1", "2", "0.5", "1.5", "5"]]
+    bars = candles_to_arrays(candles)
+    assert bars["ts"].tolist() == [1000, 3000]
+    assert bars["close"].tolist() == [1.5, 2.0]
+
+
+def test_streaming_matches_batch_and_roundtrips():
+    import json
+    from streaming import StreamingEMA, StreamingATR, TrendIndicators
+
+    high, low, close = synthetic_ohlc(400)
+    e = StreamingEMA(20)
+    a = StreamingATR(14)
+    stream_e, stream_a = [], []
+    for i in range(400):
+        if i == 200:
+            # 中途序列化/反序列化，模拟重启
+            e = StreamingEMA.from_dict(json.loads(json.dumps(e.to_dict())))
+            a = StreamingATR.from_dict(json.loads(json.dumps(a.to_dict())))
+        stream_e.append(e.update(close[i]))
+        stream_a.append(a.update(high[i], low[i], close[i]))
+    assert _same(stream_e, ema_array(close, 20))
+    assert _same(stream_a, atr_array(high, low, close, 14))
+
+    # 预热到第 299 根，再增量吸收其余，结果与整段批量一致；peek 不改状态
+    ts = np.arange(400, dtype=np.int64) * 3_600_000
+    ind = TrendIndicators(20, 50, 14)
+    ind.warm_start(ts[:299], high[:299], low[:299], close[:299])
+    for i in range(299, 399):
+        ind.update(int(ts[i]), high[i], low[i], close[i])
+    before = ind.values()
+    ef, es, at = ind.peek(high[399], low[399], close[399])
+    assert ind.values() == before
+    assert _same([ef, es, at], [ema_array(close, 20)[-1], ema_array(close, 50)[-1],
+                                atr_array(high, low, close, 14)[-1]])
+    assert _same(ind.values()[2:], [atr_array(high[:399], low[:399], close[:399], 14)[-1]])
+
+
+def test_rolling_primitives_match_naive():
+    high, low, close = synthetic_ohlc(500)
+    for w in (1, 2, 7, 72, 500, 600):
+        assert _same(rolling_max(high, w), rolling_max_loop(high.tolist(), w))
+        assert _same(rolling_min(low, w), [-x for x in rolling_max_loop((-low).tolist(), w)])
+        ref = [float("nan")] * min(w - 1, 500) + [sum(close[i - w + 1:i + 1]) for i in range(w - 1, 500)]
+        assert _same(rolling_sum(close, w), ref)
+    rows = np.vstack([high, low])
+    assert _same(rolling_max(rows, 24)[1], rolling_max(low, 24))
+
+
+def test_adx_matches_loop():
+    high, low, close = synthetic_ohlc(1000)
+    for period in (2, 14, 30):
+        assert _same(adx_array(high, low, close, period),
+                     adx_loop(high.tolist(), low.tolist(), close.tolist(), period), tol=1e-8)
+
+
+def test_streaming_features_match_batch():
+    import json
+    from features import FEATURE_NAMES, compute_features
+    from streaming import RollingMax, TrendIndicators
+
+    m = RollingMax(3)
+    assert _same([m.update(x) for x in (1.0, 3.0, 2.0, 1.0, 0.0)], [np.nan, np.nan, 3.0, 3.0, 2.0])
+    assert m.peek(5.0) == 5.0 and m.value == 2.0
+
+    high, low, close = synthetic_ohlc(400)
+    ts = np.arange(400, dtype=np.int64) * 3_600_000
+    batch = compute_features({"high": high, "low": low, "close": close}, 20, 50, 14, adx_len=14, bar="1H")
+    ind = TrendIndicators(20, 50, 14, adx_len=14)
+    ind.warm_start(ts[:150], high[:150], low[:150], close[:150])
+    for i in range(150, 399):
+        if i == 250:
+            ind = TrendIndicators.from_dict(json.loads(json.dumps(ind.to_dict())))
+        ind.update(int(ts[i]), high[i], low[i], close[i])
+    f = ind.features()
+    assert _same([f[k] for k in FEATURE_NAMES], [batch[k][398] for k in FEATURE_NAMES])
+    p = ind.peek_features(high[399], low[399], close[399])
+    assert ind.features() == f
+    assert _same([p[k] for k in FEATURE_NAMES], [batch[k][399] for k in FEATURE_NAMES])
+
+
+def test_band_indicators_match_loops():
+    high, low, close = synthetic_ohlc(1500)
+    hl, ll, cl = high.tolist(), low.tolist(), close.tolist()
+    for period in (2, 14, 50):
+        assert _same(rsi_array(close, period), rsi_loop(cl, period))
+    assert _same(rsi_array(np.vstack([close, close[::-1]]), [14, 7])[1], rsi_loop(cl[::-1], 7))
+    # 单边行情：没有跌幅 -> 100；完全走平 -> 50
+    assert rsi_array(np.arange(30.0), 14)[-1] == 100.0 and rsi_array(np.ones(30), 14)[-1] == 50.0
+
+    bb = bollinger_array(close, 20, 2.0)
+    assert all(_same(bb[k], ref) for k, ref in zip(("mid", "upper", "lower"), bollinger_loop(cl, 20, 2.0)))
+    dc = donchian_array(high, low, 20)
+    assert _same(dc["upper"], rolling_max_loop(hl, 20))
+    assert _same(dc["lower"], [-x for x in rolling_max_loop([-x for x in ll], 20)])
+    kc = keltner_array(high, low, close, 20, 10, 1.5)
+    assert _same(kc["upper"], np.array(ema_loop(cl, 20)) + 1.5 * np.array(atr_loop(hl, ll, cl, 10)))
+
+    for period, mult in ((10, 3.0), (7, 1.0)):
+        st = supertrend_array(high, low, close, period, mult)
+        line, direction = supertrend_loop(hl, ll, cl, period, mult)
+        assert _same(st["line"], line) and _same(st["direction"], direction)
+        assert set(np.unique(st["direction"][period:])) == {-1.0, 1.0}
+    st2 = supertrend_array(np.vstack([high, high]), np.vstack([low, low]), np.vstack([close, close]), 10)
+    assert _same(st2["line"][1], supertrend_array(high, low, close, 10)["line"])
+
+
+def test_streaming_band_indicators_match_batch():
+    import json
+    from streaming import (StreamingBollinger, StreamingDonchian, StreamingKeltner, StreamingRSI,
+                           StreamingSuperTrend)
+
+    high, low, close = synthetic_ohlc(300)
+    batch = {
+        "rsi": rsi_array(close, 14),
+        "bb": np.vstack(list(bollinger_array(close, 20, 2.0).values())).T,
+        "dc": np.vstack(list(donchian_array(high, low, 20).values())).T,
+        "kc": np.vstack(list(keltner_array(high, low, close, 20, 10, 2.0).values())).T,
+        "st": np.vstack(list(supertrend_array(high, low, close, 10, 3.0).values())).T,
+    }
+    make = {"rsi": lambda: StreamingRSI(14), "bb": lambda: StreamingBollinger(20, 2.0),
+            "dc": lambda: StreamingDonchian(20), "kc": lambda: StreamingKeltner(20, 10, 2.0),
+            "st": lambda: StreamingSuperTrend(10, 3.0)}
+    args = {"rsi": lambda i: (close[i],), "bb": lambda i: (close[i],), "dc": lambda i: (high[i], low[i]),
+            "kc": lambda i: (high[i], low[i], close[i]), "st": lambda i: (high[i], low[i], close[i])}
+    cols = {"rsi": (close,), "bb": (close,), "dc": (high, low), "kc": (high, low, close), "st": (high, low, close)}
+    for name, new in make.items():
+        ind = new()
+        got = []
+        for i in range(300):
+            if i == 150:
+                # 中途序列化/反序列化，模拟重启
+                ind = type(ind).from_dict(json.loads(json.dumps(ind.to_dict())))
+            got.append(ind.update(*args[name](i)))
+        assert _same(np.array(got, dtype=float).reshape(batch[name].shape), batch[name]), name
+
+        # 预热前 298 根后，peek 第 299 根与批量一致且不改状态；update 后 value 一致
+        ind = new()
+        ind.warm_start(*(c[:299] for c in cols[name]))
+        before = json.dumps(ind.to_dict())
+        assert _same(ind.peek(*args[name](299)), batch[name][299]), name
+        assert json.dumps(ind.to_dict()) == before
+        ind.update(*args[name](299))
+        assert _same(ind.value, batch[name][299]), name
@@ -0,0 +1,117 @@
+"""
+交易账本：回测成交落账后与权益对账、乱序重算、意图与推送成交记录。
+运行：python -m pytest -q test_ledger.py
+"""
+import numpy as np
+
+from backtest import run_backtest, synthetic_bars
+from config import BotConfig
+from ledger import Ledger
+from okx_client import MockOKXClient
+from order_batch import OrderBatcher
+
+
+def test_backtest_fills_reconcile_with_equity(tmp_path):
+    bars = synthetic_bars(20_000)
+    res = run_backtest(BotConfig(), bars, initial_quote=1000.0)
+    with Ledger(str(tmp_path / "ledger.db"), source="backtest", run_id="r1") as led:
+        assert led.record_backtest("BTC-USDT", res.trades) == res.trades.size
+        ts, close = bars["ts"], bars["close"]
+        pos = led.position("BTC-USDT")
+        unrealized = pos * close[-1] - pos * led.average_entry("BTC-USDT")
+        assert abs(pos - res.position[-1]) < 1e-9
+        assert abs(led.realized_pnl("BTC-USDT") + unrealized - (res.equity[-1] - 1000.0)) < 1e-6
+
+        # 区间可加；任一时刻的持仓与回测逐根持仓一致
+        mid = int(ts[10_000])
+        assert abs(led.realized_pnl("BTC-USDT", end_ms=mid) + led.realized_pnl("BTC-USDT", start_ms=mid)
+                   - led.realized_pnl("BTC-USDT")) < 1e-9
+        assert abs(led.position("BTC-USDT", at_ms=mid) - res.position[10_000]) < 1e-9
+        exp = led.exposure("BTC-USDT", int(ts[0]), int(ts[-1]) + 1)
+        assert abs(exp["pos_avg"] - res.position.mean()) < 1e-3 * max(res.position.max(), 1e-9)
+        assert exp["pos_max"] == res.position.max()
+        # 其它 run 互不影响
+        assert led.realized_pnl("BTC-USDT", run_id="other") == 0.0
+
+
+def test_out_of_order_fill_rebuilds_chain(tmp_path):
+    with Ledger(str(tmp_path / "ledger.db"), source="paper") as led:
+        led.record_fill("ETH-USDT", 1, 100.0, 1.0, 0.1, ts_ms=1000)
+        led.record_fill("ETH-USDT", -1, 120.0, 1.0, 0.1, ts_ms=3000)
+        # 晚到的更早一笔买单：卖出的均价与已实现盈亏都要重算
+        led.record_fill("ETH-USDT", 1, 110.0, 1.0, 0.1, ts_ms=2000)
+        assert abs(led.average_entry("ETH-USDT", at_ms=2500) - 105.1) < 1e-9
+        assert abs(led.realized_pnl("ETH-USDT") - (120.0 - 105.1 - 0.1)) < 1e-9
+        assert abs(led.average_entry("ETH-USDT") - 105.1) < 1e-9
+        f = led.fills("ETH-USDT")
+        assert f["ts_ms"].tolist() == [1000, 2000, 3000] and f["side"].tolist() == [1, 1, -1]
+
+
+def test_batch_of_descending_late_fills_rebuilds_from_earliest(tmp_path):
+    fills = {50: (1, 90.0), 100: (1, 100.0), 150: (-1, 150.0), 200: (-1, 200.0)}
+    with Ledger(str(tmp_path / "late.db"), source="paper", run_id="late") as late, \
+            Ledger(str(tmp_path / "ordered.db"), source="paper", run_id="ordered") as ordered:
+        for ts in (100, 200):
+            late.record_fill("BTC-USDT", fills[ts][0], fills[ts][1], 1.0, 0.0, ts_ms=ts)
+        # 同一批里两笔晚到，且按时间倒序：重算要从 50 开始，而不是第一笔的 150
+        late.record_fills("BTC-USDT", [150, 50], [fills[150][0], fills[50][0]], [fills[150][1], fills[50][1]],
+                          [1.0, 1.0], [0.0, 0.0])
+        for ts in sorted(fills):
+            ordered.record_fill("BTC-USDT", fills[ts][0], fills[ts][1], 1.0, 0.0, ts_ms=ts)
+        assert abs(late.realized_pnl("BTC-USDT") - 160.0) < 1e-9
+        a, b = late.fills("BTC-USDT"), ordered.fills("BTC-USDT")
+        assert a["ts_ms"].tolist() == [50, 100, 150, 200]
+        for col in ("pos_after", "cost_after", "realized"):
+            assert np.allclose(a[col], b[col])
+
+
+def test_batcher_intents_and_pushed_fills_are_journaled(tmp_path):
+    led = Ledger(str(tmp_path / "ledger.db"), source="paper")
+    client = MockOKXClient("k", "s", "p", "http://mock")
+    batcher = OrderBatcher(client, ledger=led)
+    ok = batcher.add("place", {"instId": "BTC-USDT", "tdMode": "cash", "side": "buy", "ordType": "market",
+                               "sz": "100", "tgtCcy": "quote_ccy"}, tag="BTC-USDT:buy")
+    bad = batcher.add("place", {"instId": "BTC-USDT", "tdMode": "cash", "side": "buy", "ordType": "market",
+                                "sz": "0", "tgtCcy": "quote_ccy"}, tag="BTC-USDT:buy")
+    batcher.flush()
+    rows = led._conn.execute("SELECT status, ord_id, s_code, tag FROM intents ORDER BY id").fetchall()
+    assert rows == [("ok", ok.result["ordId"], "0", "BTC-USDT:buy"), ("rejected", None, "51008", "BTC-USDT:buy")]
+    assert bad.error is not None
+
+    # orders 推送：手续费以基础币扣；重连后的重放按 tradeId 去重，用途取自下单 tag
+    push = {"instId": "BTC-USDT", "ordId": ok.result["ordId"], "side": "buy", "fillSz": "0.002",
+            "fillPx": "50000", "fillFee": "-0.000002", "fillFeeCcy": "BTC", "tradeId": "t1", "fillTime": "5000"}
+    assert led.record_order_update(push) is True
+    assert led.record_order_update(push) is False
+    assert led.record_order_update(dict(push, fillSz="0", tradeId="")) is False
+    f = led.fills("BTC-USDT")
+    assert np.allclose(f["qty"], [0.001998]) and np.allclose(f["fee"], [0.1])
+    assert abs(led.average_entry("BTC-USDT") * led.position("BTC-USDT") - 100.0) < 1e-9
+    assert led._conn.execute("SELECT kind FROM fills").fetchone() == ("BUY",)
+
+    # maker 返佣（fillFee 为正）：记成负成本，卖出的已实现盈亏因此变多而不是变少
+    sell = {"instId": "BTC-USDT", "ordId": "x2", "side": "sell", "fillSz": "0.001998", "fillPx": "51000",
+            "fillFee": "0.5", "fillFeeCcy": "USDT", "tradeId": "t2", "fillTime": "6000"}
+    assert led.record_order_update(sell) is True
+    f = led.fills("BTC-USDT")
+    assert np.allclose(f["fee"], [0.1, -0.5])
+    assert abs(f["realized"][-1] - (0.001998 * 51000.0 - 100.0 + 0.5)) < 1e-9
+    led.close()
+
+
+def test_paper_market_orders_write_fills(tmp_path):
+    client = MockOKXClient("k", "s", "p", "http://mock")
+    with Ledger(str(tmp_path / "paper.db"), source="paper", run_id="p1") as led:
+        client.on_order = led.record_order_update
+        batcher = OrderBatcher(client, ledger=led)
+        batcher.add("place", {"instId": "BTC-USDT", "tdMode": "cash", "side": "buy", "ordType": "market",
+                              "sz": "100", "tgtCcy": "quote_ccy"}, tag="BTC-USDT:buy")
+        batcher.add("place", {"instId": "BTC-USDT", "tdMode": "cash", "side": "sell", "ordType": "limit",
+                              "sz": "0.001", "px": "99999", "tgtCcy": "base_ccy"}, tag="BTC-USDT:tp1")
+        batcher.flush()
+        f = led.fills("BTC-USDT")
+        px = float(client.mock_candles[-1][4])
+        # 只有市价单即时成交；买入手续费以基础币扣、折成计价币记
+        assert f["ts_ms"].size == 1 and f["side"].tolist() == [1] and np.allclose(f["px"], [px])
+        assert np.allclose(f["qty"], [100.0 / px * 0.999]) and np.allclose(f["fee"], [100.0 * 0.001])
+        assert abs(led.average_entry("BTC-USDT") * led.position("BTC-USDT") - 100.0) < 1e-6
@@ -0,0 +1,59 @@
+from llm_cache import CachedLLMFilter, DecisionCache, feature_key
+from llm_filter import LLMFilter
+
+
+class CountingFilter(LLMFilter):
+    def __init__(self):
+        super().__init__(True)
+        self.calls = 0
+
+    def allow_trade(self, payload):
+        self.calls += 1
+        return payload["ema_fast"] > payload["ema_slow"]
+
+
+def _payload(inst="BTC-USDT", px=50000.0, ef=50100.0, es=49500.0, atr=400.0, pos=0.0, usdt=1000.0):
+    return {"instId": inst, "bar": "1H", "last_price": px, "ema_fast": ef, "ema_slow": es, "atr": atr,
+            "pos_btc": pos, "usdt_avail": usdt}
+
+
+def test_similar_payloads_share_a_decision_across_instruments():
+    inner = CountingFilter()
+    llm = CachedLLMFilter(inner, DecisionCache())
+    assert llm.allow_trade(_payload()) is True
+    # 价格略动、资金同一量级、换成同比例的 ETH：都落在同一桶
+    assert llm.allow_trade(_payload(px=50010.0, usdt=1010.0)) is True
+    assert llm.allow_trade(_payload("ETH-USDT", px=2500.0, ef=2505.0, es=2475.0, atr=20.0)) is True
+    assert inner.calls == 1
+    # 趋势反转 / 有持仓：不同桶
+    assert llm.allow_trade(_payload(ef=49400.0)) is False
+    assert llm.allow_trade(_payload(pos=0.1)) is True
+    assert inner.calls == 3
+    assert llm.cache.stats == {"hits": 2, "misses": 3, "expired": 0, "evictions": 0}
+
+    per_inst = feature_key(_payload(), share_across_inst=False)
+    assert per_inst != feature_key(_payload("ETH-USDT"), share_across_inst=False)
+    # 未启用过滤：不查缓存
+    off = CachedLLMFilter(LLMFilter(False), DecisionCache())
+    assert off.allow_trade(_payload(ef=1.0)) is True and off.cache.stats["misses"] == 0
+
+
+def test_ttl_lru_and_persistence(tmp_path):
+    now = [1_000.0]
+    db = str(tmp_path / "llm_cache.db")
+    cache = DecisionCache(db, ttl_s=60.0, max_entries=2, clock=lambda: now[0])
+    cache.put("a", True)
+    cache.put("b", False)
+    assert cache.get("a") is True            # a 变为最近使用
+    cache.put("c", True)                     # 淘汰 b
+    assert cache.get("b") is None and cache.stats["evictions"] == 1
+    cache.close()
+
+    # 重启：未过期的条目还在，被淘汰的没有
+    now[0] += 30.0
+    again = DecisionCache(db, ttl_s=60.0, max_entries=2, clock=lambda: now[0])
+    assert len(again) == 2 and again.get("a") is True and again.get("c") is True and again.get("b") is None
+    now[0] += 31.0
+    assert again.get("a") is None and again.stats["expired"] == 1
+    again.close()
+    assert len(DecisionCache(db, ttl_s=60.0, clock=lambda: now[0])) == 0
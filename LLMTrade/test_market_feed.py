@@ -0,0 +1,122 @@
+import asyncio
+import time
+
+from account_stream import AccountStream
+from config import BotConfig
+from llm_filter import LLMFilter
+from market_feed import MarketFeed
+from okx_client import MockOKXClient
+from state_manager import StateStore
+from trend_bot import TrendBot
+from ws_stub_server import StubWSServer
+
+H = 3_600_000
+T0 = 1_700_000_000_000 // H * H
+
+
+async def _until(cond, timeout=3.0):
+    for _ in range(int(timeout / 0.01)):
+        if cond():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timeout")
+
+
+def test_feed_pushes_confirmed_bars_and_resubscribes_after_drop():
+    insts = ["BTC-USDT", "ETH-USDT", "SOL-USDT"]
+    got = []
+    with StubWSServer() as srv:
+        async def go():
+            feed = MarketFeed(on_bar=lambda i, b, c: got.append((i, b, c["ts"])),
+                              public_url=srv.public_url, business_url=srv.business_url)
+            feed.subscribe_candles(insts, "1H")
+            feed.subscribe_tickers(insts)
+            await feed.start()
+            await _until(lambda: srv.subscribers("candle1H", "SOL-USDT") and srv.subscribers("tickers", "SOL-USDT"))
+
+            for i in insts:
+                srv.push_candle(i, "1H", T0, confirm=False)     # 未收盘：不推给策略
+                srv.push_candle(i, "1H", T0, confirm=True)
+                srv.push_candle(i, "1H", T0, confirm=True)      # 重推：去重
+            srv.push_ticker("ETH-USDT", 2000.5, T0)
+            await _until(lambda: len(got) == 3 and "ETH-USDT" in feed.tickers)
+
+            srv.drop_connections()
+            await _until(lambda: srv.connects >= 4 and srv.subscribers("candle1H", "BTC-USDT"))
+            srv.push_candle("BTC-USDT", "1H", T0 + H)
+            await _until(lambda: len(got) == 4)
+            await feed.stop()
+            return feed
+
+        feed = asyncio.run(go())
+    assert sorted(got[:3]) == [(i, "1H", T0) for i in sorted(insts)]
+    assert got[3] == ("BTC-USDT", "1H", T0 + H)
+    assert feed.stats["dup_bars"] == 3
+    assert feed.business.connects == 2 and feed.tickers["ETH-USDT"]["last"] == "2000.5"
+
+
+def test_trend_bot_on_bar_updates_indicators_without_rest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = MockOKXClient("k", "s", "p", "http://mock")
+    bot = TrendBot(BotConfig(candle_store_dir=""), client, LLMFilter(False))
+    bot.run_once()
+    last = bot.indicators.last_ts
+
+    calls = []
+    client.get_candles = lambda *a, **k: calls.append(a) or []
+    bot.on_bar({"ts": last + H, "open": 55000.0, "high": 55100.0, "low": 54900.0, "close": 55050.0,
+                "vol": 1.0, "confirm": True})
+    assert calls == [] and bot.indicators.last_ts == last + H
+    assert StateStore("state.db").load("BTC-USDT")["indicators"]["last_ts"] == last + H
+
+
+def test_record_bar_skips_pushed_bar_after_gap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = MockOKXClient("k", "s", "p", "http://mock")
+    bot = TrendBot(BotConfig(candle_store_dir=str(tmp_path / "candles")), client, LLMFilter(False))
+    series = bot.candles.store.series("BTC-USDT", "1H")
+    bar = {"ts": T0, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "vol": 1.0, "confirm": True}
+    bot.record_bar(bar)
+    bot.record_bar(dict(bar, ts=T0 + H))
+    bot.record_bar(dict(bar, ts=T0 + 4 * H))          # 重连后漏了两根：不落库
+    assert series.window()["ts"].tolist() == [T0, T0 + H]
+    bot.record_bar(dict(bar, ts=T0 + 2 * H))
+    assert series.last_ts == T0 + 2 * H
+
+
+def test_account_stream_balance_cache_feeds_trend_bot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with StubWSServer(api_secret="secret", balances={"BTC": 0.0, "USDT": 800.0}) as srv:
+        stream = AccountStream("k", "secret", "p", srv.private_url)
+        stream.start_in_thread()
+        cache = stream.cache
+        cache.reconciled_at = time.monotonic()          # 视为刚对过账
+        assert cache.wait_newer(0, 3.0) and cache.avail("USDT") == 800.0
+
+        client = MockOKXClient("k", "s", "p", "http://mock")
+        rest_calls = []
+        client.get_balance = lambda ccy: rest_calls.append(ccy) or {"data": [{"details": []}]}
+        bot = TrendBot(BotConfig(candle_store_dir=""), client, LLMFilter(False), balances=cache)
+        assert bot._get_spot_balances() == (0.0, 800.0)
+
+        # 下单后：等推送里的新余额，不走 REST
+        bot._place_market_buy_usdt(100.0)
+        srv.push_account({"BTC": 0.002, "USDT": 700.0})
+        srv.push_order({"instId": "BTC-USDT", "ordId": "o1", "state": "filled", "accFillSz": "0.002"})
+        assert bot._get_spot_balances() == (0.002, 700.0)
+        assert rest_calls == []
+
+        # 断线：缓存失效 -> 回落 REST；重连后快照恢复
+        srv.drop_connections()
+        for _ in range(300):
+            if not cache.ready:
+                break
+            time.sleep(0.01)
+        assert bot._get_spot_balances() == (0.0, 0.0) and rest_calls == ["BTC", "USDT"]
+        for _ in range(300):
+            if cache.ready:
+                break
+            time.sleep(0.01)
+        cache.reconciled_at = time.monotonic()
+        assert bot._get_spot_balances() == (0.002, 700.0)
+        assert cache.open_orders() == [] and cache.orders["o1"]["state"] == "filled"
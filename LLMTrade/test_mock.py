@@ -23,4 +23,4 @@ if __name__ == "__main__":
     print("=== 开始模拟运行一次策略循环 ===")
     bot.run_once()
     print("=== 模拟运行完成 ===")
-    print("状态已保存到 state.json")
\ No newline at end of file
+    print("状态已保存到 state.db")
\ No newline at end of file
@@ -0,0 +1,213 @@
+import asyncio
+import threading
+import time
+
+from async_okx_client import AsyncOKXClient, SyncOKXClient
+from config import BotConfig
+from llm_filter import LLMFilter
+from order_batch import OrderBatcher
+from okx_client import MockOKXClient, OKXClient
+from okx_stub_server import StubOKXServer
+from rate_limit import RateLimiter
+from trend_bot import TrendBot
+
+
+class FakeClock:
+    """假时钟：sleep 只推进时间，限频测试不真的等。"""
+
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self) -> float:
+        return self.t
+
+    def sleep(self, seconds: float) -> None:
+        self.t += seconds
+
+
+def test_async_client_concurrent_requests_share_pool():
+    with StubOKXServer(latency=0.05) as srv:
+        async def go():
+            async with AsyncOKXClient("k", "s", "p", srv.base_url, max_connections=8) as cli:
+                insts = [f"C{i}-USDT" for i in range(24)]
+                return await asyncio.gather(*(cli.get_candles(i, "1H", 5) for i in insts))
+
+        pages = asyncio.run(go())
+    assert [len(p) for p in pages] == [5] * 24
+    assert pages[0][0][0] == pages[1][0][0]
+    # 确实并发（串行时峰值恒为 1），且不超过连接池上限；24 个请求复用这 8 条 keep-alive 连接
+    assert 1 < srv.peak_in_flight <= 8
+    assert len(srv.connections) <= 8 and len(srv.requests) == 24
+
+
+def test_async_and_requests_clients_share_endpoint_definitions():
+    now = 1_700_000_000_000
+    with StubOKXServer(now_ms=lambda: now) as srv:
+        async def go():
+            async with AsyncOKXClient("k", "s", "p", srv.base_url) as aio:
+                return (await aio.get_server_time_ms(), await aio.get_instruments_spot("ETH-USDT"),
+                        await aio.get_history_candles("BTC-USDT", "1m", 3, after=now - 60_000))
+
+        sync = OKXClient("k", "s", "p", srv.base_url)
+        expected = (sync.get_server_time_ms(), sync.get_instruments_spot("ETH-USDT"),
+                    sync.get_history_candles("BTC-USDT", "1m", 3, after=now - 60_000))
+        assert asyncio.run(go()) == expected
+    assert expected[0] == now and expected[1]["instId"] == "ETH-USDT" and len(expected[2]) == 3
+    # 端点只在 OKXEndpoints 定义一次，异步客户端不再自带一份
+    assert "get_candles" not in vars(AsyncOKXClient) and "get_candles" not in vars(OKXClient)
+
+
+def test_signed_private_calls_sync_facade_matches_requests_client():
+    with StubOKXServer(api_secret="secret", balances={"BTC": 0.25, "USDT": 500.0}) as srv:
+        with SyncOKXClient("k", "secret", "p", srv.base_url) as cli:
+            bal = cli.get_balance("BTC")
+            assert bal["data"][0]["details"][0]["availBal"] == "0.25"
+            ord_resp = cli.place_order("BTC-USDT", "buy", "market", "100", tgt_ccy="quote_ccy")
+            algo = cli.place_algo_order({"instId": "BTC-USDT", "ordType": "conditional", "sz": "0.1"})
+            algo_id = algo["data"][0]["algoId"]
+            cancel = cli.cancel_advance_algos([{"algoId": algo_id, "instId": "BTC-USDT"}])
+            assert cancel["data"][0]["sCode"] == "0"
+        assert ord_resp["data"][0]["ordId"] == srv.orders[0]["ordId"]
+        assert srv.orders[0]["tgtCcy"] == "quote_ccy" and not srv.algos
+
+        # 同一个桩对 requests 版客户端也一样校验签名
+        assert OKXClient("k", "secret", "p", srv.base_url).get_balance("USDT")["code"] == "0"
+        bad = OKXClient("k", "wrong", "p", srv.base_url)
+        try:
+            bad._request("GET", "/api/v5/account/balance", params={"ccy": "USDT"}, auth=True, retry=0)
+            assert False, "bad signature accepted"
+        except RuntimeError as e:
+            assert "50113" in str(e)
+
+
+def test_rate_limiter_priority_and_per_endpoint_buckets():
+    lim = RateLimiter({"/api/v5/market/candles": (10, 0.1)}, max_inflight=1)
+    done = []
+
+    def worker(path):
+        with lim.slot(path):
+            done.append(path)
+
+    paths = ["/api/v5/market/history-candles", "/api/v5/market/candles", "/api/v5/trade/order"]
+    with lim.slot("/api/v5/public/time"):
+        threads = []
+        for i, p in enumerate(paths):
+            threads.append(threading.Thread(target=worker, args=(p,)))
+            threads[-1].start()
+            while lim.metrics()["_scheduler"]["waiting"] < i + 1:
+                time.sleep(0.001)
+    for t in threads:
+        t.join()
+    # 并发槽按优先级：下单 > 行情 > 回补
+    assert done == paths[::-1]
+
+    # 令牌桶：10 次/0.1s（假时钟）：前 10 次不等，之后每次等 1 个令牌 0.01s，30 次正好 0.2s
+    clock = FakeClock()
+    lim = RateLimiter({"/api/v5/market/candles": (10, 0.1)}, clock=clock, sleep=clock.sleep)
+    t0 = clock()
+    waits = [lim.acquire("/api/v5/market/candles") for _ in range(30)]
+    assert waits[:10] == [0.0] * 10 and all(abs(w - 0.01) < 1e-9 for w in waits[10:])
+    assert abs(clock() - t0 - 0.2) < 1e-9
+    assert lim.acquire("/api/v5/trade/order") == 0.0                # 其它接口不受影响
+    m = lim.metrics()
+    assert m["/api/v5/market/candles"]["queued"] == 20 and m["priority:order"]["requests"] == 1
+
+
+def test_client_penalizes_endpoint_on_rate_limit_error(monkeypatch):
+    clock = FakeClock()
+    lim = RateLimiter({"/api/v5/public/time": (100, 1.0)}, penalty_s=0.05, clock=clock, sleep=clock.sleep)
+    backoffs = []
+    monkeypatch.setattr(time, "sleep", backoffs.append)
+    with StubOKXServer(fail_every=2) as srv:
+        cli = OKXClient("k", "s", "p", srv.base_url, limiter=lim)
+        for _ in range(4):
+            assert cli.get_server_time_ms() > 0
+    # 限频错误后只在限频器里等 penalty_s，不再固定 sleep 0.6s
+    assert backoffs == []
+    m = lim.metrics()
+    assert m["/api/v5/public/time"]["penalties"] == 3
+    assert abs(m["/api/v5/public/time"]["wait_max_s"] - 0.05) < 1e-9
+
+    with StubOKXServer(fail_every=4) as srv:
+        async def go():
+            async with AsyncOKXClient("k", "s", "p", srv.base_url, limiter=lim) as aio:
+                return await asyncio.gather(*(aio.get_candles("BTC-USDT", "1H", 2) for _ in range(4)))
+
+        pages = asyncio.run(go())
+    assert all(len(p) == 2 for p in pages)
+    assert lim.metrics()["/api/v5/market/candles"]["penalties"] == 1
+
+
+def test_trailing_stop_amends_in_place_and_falls_back_to_replace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with StubOKXServer() as srv:
+        cli = OKXClient("k", "s", "p", srv.base_url)
+        bot = TrendBot(BotConfig(candle_store_dir="", stop_update_min_ticks=5), cli, LLMFilter(False))
+
+        def trade_calls():
+            return [p for m, p, _ in srv.requests if p.startswith("/api/v5/trade/")]
+
+        def trail(sz, px, atr):
+            bot._place_or_update_trailing_stop(sz, px, atr)
+            bot.orders.flush()
+
+        trail(0.01, 30000.0, 100.0)                                       # 首次：下单
+        first = bot.state["sl_algo_id"]
+        trail(0.01, 30000.03, 100.0)                                      # 变动 3 tick：不动
+        trail(0.01, 30010.0, 100.0)                                       # 改单
+        assert trade_calls() == ["/api/v5/trade/order-algo", "/api/v5/trade/amend-algos"]
+        assert bot.state["sl_algo_id"] == first
+        assert srv.algos[first]["slTriggerPx"] == "29790.00"
+
+        srv.algos.clear()                                                 # 止损已触发：改单被拒
+        trail(0.008, 30020.0, 100.0)
+        assert trade_calls()[2:] == ["/api/v5/trade/amend-algos", "/api/v5/trade/cancel-algos",
+                                     "/api/v5/trade/order-algo"]
+        assert list(srv.algos) == [bot.state["sl_algo_id"]] and bot.state["sl_algo_id"] != first
+
+
+def _buy(inst, sz):
+    # 挂单不成交（模拟客户端的市价单会立即成交，撤不掉）
+    return {"instId": inst, "tdMode": "cash", "side": "buy", "ordType": "limit", "sz": sz, "px": "1"}
+
+
+def test_batcher_merges_intents_and_maps_partial_results():
+    for make in (lambda url: OKXClient("k", "s", "p", url), lambda url: MockOKXClient("k", "s", "p", url)):
+        with StubOKXServer() as srv:
+            cli = make(srv.base_url)
+            batcher = OrderBatcher(cli)
+            seen = []
+            intents = [batcher.add("place", _buy(f"C{i}-USDT", "0" if i == 3 else "10"), tag=f"C{i}",
+                                   on_result=lambda it: seen.append(it.tag)) for i in range(25)]
+            batcher.flush()
+            assert [it.ok for it in intents] == [i != 3 for i in range(25)]
+            assert seen == [f"C{i}" for i in range(25)]
+
+            # 撤单：已存在的成功，不存在的逐条失败；回调里追加的下单在下一轮发出
+            live = [it.result["ordId"] for it in intents if it.ok][:2]
+            cancels = [batcher.add("cancel", {"instId": "C0-USDT", "ordId": o}) for o in live + ["nope"]]
+            batcher.add("cancel", {"instId": "C0-USDT", "ordId": live[0]},
+                        on_result=lambda it: batcher.add("place", _buy("C0-USDT", "5"), tag="again"))
+            again = batcher.flush()
+            assert [it.ok for it in cancels] == [True, True, False]
+            assert again[-1].tag == "again" and again[-1].ok
+
+        # 25 单 -> 20 + 5 两个批量请求；4 条撤单合成一个请求
+        assert batcher.stats == {"requests": 4, "intents": 30, "failed": 3}
+        if not isinstance(cli, MockOKXClient):
+            assert [p for m, p, _ in srv.requests] == ["/api/v5/trade/batch-orders"] * 2 + [
+                "/api/v5/trade/cancel-batch-orders", "/api/v5/trade/batch-orders"]
+
+
+def test_mock_cancel_advance_algos_marks_algos_canceled():
+    cli = MockOKXClient("k", "s", "p", "http://mock")
+    algo = cli.place_algo_order({"instId": "BTC-USDT", "ordType": "move_order_stop", "sz": "0.1"})
+    algo_id = algo["data"][0]["algoId"]
+    batcher = OrderBatcher(cli)
+    ok = batcher.add("cancel_advance_algo", {"algoId": algo_id, "instId": "BTC-USDT"})
+    gone = batcher.add("cancel_advance_algo", {"algoId": "nope", "instId": "BTC-USDT"})
+    batcher.flush()
+    assert ok.ok and not gone.ok and cli.algos[0]["state"] == "canceled"
+    # 已撤销的再撤：逐条失败，不再假装成功
+    again = cli._request("POST", "/api/v5/trade/cancel-advance-algos", body=[{"algoId": algo_id}])
+    assert again["code"] == "1" and again["data"][0]["sCode"] == "51000"
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from async_okx_client import SyncOKXClient
+from config import BotConfig
+from llm_filter import LLMFilter
+from okx_stub_server import StubOKXServer
+from portfolio import Portfolio, instrument_config, load_portfolio
+from state_manager import StateStore
+
+
+def test_instrument_overrides_and_portfolio_file(tmp_path):
+    path = tmp_path / "portfolio.json"
+    path.write_text(json.dumps({"BTC-USDT": {}, "ETH-USDT": {"tranche_quotes": [50, 50], "trail_atr_mult": 3.0}}))
+    insts = load_portfolio(str(path))
+    cfg = instrument_config(BotConfig(), "ETH-USDT", insts["ETH-USDT"])
+    assert cfg.inst_id == "ETH-USDT" and cfg.tranche_quotes == (50, 50) and cfg.trail_atr_mult == 3.0
+    assert BotConfig().inst_id == "BTC-USDT"
+    with pytest.raises(ValueError):
+        instrument_config(BotConfig(), "ETH-USDT", {"no_such_field": 1})
+
+
+def test_portfolio_runs_100_instruments_concurrently_on_shared_client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    insts = [f"C{i}-USDT" for i in range(100)]
+    with StubOKXServer(latency=0.01, balances={"USDT": 100000.0}) as srv:
+        with SyncOKXClient("k", "s", "p", srv.base_url) as cli:
+            pf = Portfolio(BotConfig(candle_store_dir=""), cli, LLMFilter(False), insts, workers=32)
+            del srv.requests[:]
+            srv.peak_in_flight = 0
+            stages = pf.run_cycle()
+            pf.close()
+
+    calls = [p for _, p, _ in srv.requests]
+    buys = [o for o in srv.orders if o["side"] == "buy"]
+    # 共用客户端上的请求确实同时在飞（串行时峰值恒为 1）
+    assert srv.peak_in_flight > 1 and set(stages.values()) <= {"entry", "skipped"}
+    assert calls.count("/api/v5/market/candles") == 100 and calls.count("/api/v5/public/time") == 1
+    # 余额：101 个币种每次 6 个请求（开头一次 + 下单后一次），不再每个品种各查
+    assert calls.count("/api/v5/account/balance") == 12
+    assert buys and calls.count("/api/v5/trade/batch-orders") == -(-len(buys) // 20)
+    assert "/api/v5/trade/order" not in calls
+    # 状态按品种分命名空间；只有下单成功的品种推进了分批进度
+    store = StateStore("state.db")
+    assert store.namespaces() == sorted(insts)
+    assert {i for i in insts if store.load(i).get("tranche_idx")} == {o["instId"] for o in buys}
+
+
+def test_pushes_are_grouped_by_bar_and_cycle_only_that_bar(tmp_path):
+    from okx_client import MockOKXClient
+
+    client = MockOKXClient("k", "s", "p", "http://mock")
+    pf = Portfolio(BotConfig(candle_store_dir=""), client, LLMFilter(False),
+                   {"BTC-USDT": {}, "ETH-USDT": {"bar": "4H"}, "SOL-USDT": {"bar": "4H"}},
+                   store=StateStore(str(tmp_path / "s.db")), workers=2)
+    candle = {"ts": 0, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "vol": 1.0}
+    assert pf.on_bar("ETH-USDT", candle, "1H") is False          # 不是该品种的周期：忽略
+    assert pf.on_bar("ETH-USDT", candle, "4H") is False          # 4H 还差 SOL
+    assert pf.on_bar("BTC-USDT", candle, "1H") is True           # 1H 只有 BTC：凑齐
+    assert pf.take_pushed("1H") == {"BTC-USDT": candle}
+    assert pf.on_bar("SOL-USDT", candle) is True                 # 不给 bar 按品种周期
+    assert sorted(pf.take_pushed("4H")) == ["ETH-USDT", "SOL-USDT"] and pf.take_pushed("4H") == {}
+
+    stages = pf.run_cycle(bar="4H")
+    pf.close()
+    assert sorted(stages) == ["ETH-USDT", "SOL-USDT"]
@@ -0,0 +1,149 @@
+import numpy as np
+
+from candle_store import CandleStore
+from config import BotConfig
+from resampler import Resampler, resample_arrays, resample_series
+
+M = 60_000
+H = 60 * M
+D0 = 1_700_006_400_000          # 2023-11-15 00:00 UTC = 08:00 香港时间
+
+
+def _minutes(start, n, skip=()):
+    rng = np.random.default_rng(3)
+    ts = start + np.arange(n, dtype=np.int64) * M
+    keep = ~np.isin(np.arange(n), list(skip))
+    close = 100.0 + np.cumsum(rng.normal(0.0, 0.1, n))
+    bars = {"ts": ts, "open": close - 0.05, "high": close + rng.random(n), "low": close - rng.random(n),
+            "close": close, "vol": rng.random(n)}
+    return {k: v[keep] for k, v in bars.items()}
+
+
+def _candles(bars):
+    return [{c: (int(bars[c][i]) if c == "ts" else float(bars[c][i])) for c in bars} | {"confirm": True}
+            for i in range(bars["ts"].size)]
+
+
+def test_incremental_matches_batch_with_gaps_and_alignment():
+    # 两天多的 1m，中间断档 90 分钟（整根 1H 缺失 + 前后残缺）
+    bars = _minutes(D0 - 7 * M, 3000, skip=range(1000, 1090))
+    hub = Resampler("1m", targets=("5m", "15m", "1H", "4H", "1D", "1Dutc"))
+    got = {}
+    for bar in hub.targets:
+        hub.subscribe(bar, lambda i, b, c: got.setdefault(b, []).append(c), ["BTC-USDT"])
+    for c in _candles(bars):
+        hub.on_bar("BTC-USDT", "1m", c)
+        hub.on_bar("ETH-USDT", "1m", c)      # 未订阅的品种只合成，不回调
+    hub.on_bar("BTC-USDT", "1m", _candles(bars)[-1])
+    assert hub.stats["dup_bars"] == 1
+
+    for bar in hub.targets:
+        ref = resample_arrays(bars, bar)
+        closed = ref["confirm"]
+        out = got[bar]
+        assert [c["ts"] for c in out] == ref["ts"][closed].tolist()
+        for col in ("open", "high", "low", "close", "vol"):
+            assert np.allclose([c[col] for c in out], ref[col][closed])
+        assert [c["complete"] for c in out] == ref["complete"][closed].tolist()
+        # 未收盘的最后一根在 forming 里
+        if not closed[-1]:
+            assert hub.forming("BTC-USDT", bar)["ts"] == ref["ts"][-1]
+
+    # 1D 按香港时间 00:00（UTC 16:00）开盘，1Dutc 按 UTC 00:00
+    assert all(c["ts"] % (24 * H) == 16 * H for c in got["1D"])
+    assert all(c["ts"] % (24 * H) == 0 for c in got["1Dutc"])
+    # 第一根 5m 从中途开始（残缺），最后一根 base 到达即收盘，不用等下一根
+    assert got["5m"][0]["complete"] is False and got["5m"][0]["n"] == 2
+    assert got["1H"][-1]["ts"] + H <= int(bars["ts"][-1]) + M
+
+
+def test_partial_policy_warm_from_store_and_forming(tmp_path):
+    store = CandleStore(str(tmp_path))
+    bars = _minutes(D0 + 3 * M, 120)
+    cs = _candles(bars)
+
+    strict = Resampler("1m", targets=("15m",), emit_partial=False)
+    out = []
+    strict.subscribe("15m", lambda i, b, c: out.append(c))
+    for c in cs:
+        strict.on_bar("BTC-USDT", "1m", c)
+    assert strict.stats["partial_dropped"] == 1 and all(c["n"] == 15 for c in out)
+
+    # 前 70 根落盘后“重启”：warm 接上正在形成的 1H，与不中断的结果一致
+    first = Resampler("1m", targets=("1H",), store=store)
+    for c in cs[:70]:
+        first.on_bar("BTC-USDT", "1m", c)
+    assert len(store.series("BTC-USDT", "1m")) == 70
+    second = Resampler("1m", targets=("1H",), store=CandleStore(str(tmp_path)))
+    got = []
+    second.subscribe("1H", lambda i, b, c: got.append(c))
+    second.warm("BTC-USDT")
+    for c in cs[60:]:
+        second.on_bar("BTC-USDT", "1m", c)      # 重叠部分按 ts 去重
+    ref = resample_arrays(bars, "1H")
+    assert got[0]["ts"] == ref["ts"][1] and got[0]["n"] == 60
+    assert np.isclose(got[0]["high"], ref["high"][1]) and np.isclose(got[0]["vol"], ref["vol"][1])
+
+    # 未收盘 base 一并计入的试算K线；flush 按时间收盘断档的K线
+    live = {"ts": int(bars["ts"][-1]) + M, "open": 1.0, "high": 999.0, "low": 0.5, "close": 2.0, "vol": 1.0}
+    peek = second.forming("BTC-USDT", "1H", live)
+    assert peek["confirm"] is False and peek["high"] == 999.0 and peek["close"] == 2.0
+    assert second.forming("BTC-USDT", "1H")["high"] < 999.0
+    second.flush(int(bars["ts"][-1]) + 2 * H)
+    assert len(got) == 2 and got[1]["complete"] is False
+
+    s = resample_series(store.series("BTC-USDT", "1m"), "15m", n=3)
+    ref = resample_arrays({k: v[:70] for k, v in bars.items()}, "15m")
+    assert s["ts"].tolist() == ref["ts"][-3:].tolist() and s["n"].tolist() == ref["n"][-3:].tolist()
+
+
+def test_make_feed_subscribes_base_and_routes_derived_bars(tmp_path):
+    from main import make_feed
+
+    cfg = BotConfig(ws_resample_base="1m", candle_store_dir=str(tmp_path))
+    got = []
+    feed = make_feed(cfg, lambda i, b, c: got.append((i, b, c["ts"])), {"5m": ["BTC-USDT"], "1H": ["ETH-USDT"]})
+    assert sorted(a["instId"] for conn, args in feed._pending for a in args) == ["BTC-USDT", "ETH-USDT"]
+    assert {a["channel"] for conn, args in feed._pending for a in args} == {"candle1m"}
+    for k in range(60):
+        for inst in ("BTC-USDT", "ETH-USDT"):
+            row = [str(D0 + k * M), "1", "2", "0.5", "1.5", "3", "0", "0", "1"]
+            feed._on_message({"arg": {"channel": "candle1m", "instId": inst}, "data": [row]})
+    assert got.count(("ETH-USDT", "1H", D0)) == 1
+    assert [g for g in got if g[0] == "BTC-USDT"] == [("BTC-USDT", "5m", D0 + k * 5 * M) for k in range(12)]
+
+
+def test_make_feed_drops_partial_bar_when_started_mid_hour(tmp_path):
+    from main import make_feed
+
+    cfg = BotConfig(ws_resample_base="1m", candle_store_dir=str(tmp_path))
+    got = []
+    feed = make_feed(cfg, lambda i, b, c: got.append(c), {"1H": ["BTC-USDT"]})
+    # 整点后 50 分钟才启动：第一根 1H 只有 10 根 base，不能当收盘K线推给策略
+    for k in range(50, 180):
+        row = [str(D0 + k * M), "1", "2", "0.5", "1.5", "3", "0", "0", "1"]
+        feed._on_message({"arg": {"channel": "candle1m", "instId": "BTC-USDT"}, "data": [row]})
+    assert [c["ts"] for c in got] == [D0 + H, D0 + 2 * H] and all(c["complete"] for c in got)
+
+
+def test_base_store_never_appends_across_gap(tmp_path):
+    from okx_client import OKXClient
+    from okx_stub_server import StubOKXServer
+
+    cs = _candles(_minutes(D0, 30))
+    # 没有 client：断档后清空重新播种，库里始终连续
+    hub = Resampler("1m", targets=("5m",), store=CandleStore(str(tmp_path / "a")))
+    for c in cs[:10] + cs[15:17]:
+        hub.on_bar("BTC-USDT", "1m", c)
+    series = hub.store.series("BTC-USDT", "1m")
+    assert hub.stats["store_gaps"] == 1 and series.window()["ts"].tolist() == [D0 + 15 * M, D0 + 16 * M]
+
+    # 有 client：用 CandleSync 从 REST 补齐中间漏掉的分钟
+    with StubOKXServer(now_ms=lambda: D0 + 21 * M + 500, history_start_ms=0) as srv:
+        hub = Resampler("1m", targets=("5m",), store=CandleStore(str(tmp_path / "b")),
+                        client=OKXClient("", "", "", srv.base_url))
+        for c in cs[:10] + cs[20:21]:
+            hub.on_bar("BTC-USDT", "1m", c)
+    ts = hub.store.series("BTC-USDT", "1m").window()["ts"]
+    assert hub.stats["store_gaps"] == 1 and ts[0] == D0 and ts[-1] == D0 + 20 * M
+    assert np.all(np.diff(ts) == M)
@@ -0,0 +1,51 @@
+import datetime as dt
+
+from scheduler import BarScheduler, ServerClock, SimClock
+from timeframes import bar_open_ms, next_bar_close_ms
+
+
+def _ms(*args):
+    return int(dt.datetime(*args, tzinfo=dt.timezone.utc).timestamp() * 1000)
+
+
+def test_bar_alignment_follows_okx_timezones():
+    t = _ms(2024, 5, 15, 12, 34)            # 周三
+    assert bar_open_ms("1m", t) == t and bar_open_ms("4H", t) == _ms(2024, 5, 15, 12)
+    # 1D/6H/1W 按香港时间开盘，*utc 按 UTC；周线从周一开始
+    assert bar_open_ms("1D", t) == _ms(2024, 5, 14, 16)
+    assert bar_open_ms("1Dutc", t) == _ms(2024, 5, 15)
+    assert bar_open_ms("6H", t) == _ms(2024, 5, 15, 10)
+    assert bar_open_ms("1Wutc", t) == _ms(2024, 5, 13)
+    assert next_bar_close_ms("1W", t) == _ms(2024, 5, 19, 16)
+
+
+def test_scheduler_wakes_at_server_bar_close_in_simulated_time():
+    sim = SimClock(start=_ms(2024, 5, 15, 11, 58, 30) / 1000.0)
+    fetches = []
+
+    def server_ms():
+        # 交易所时钟比本地快 1.5s；每次查询本地过去 20ms
+        fetches.append(1)
+        sim.advance(0.02)
+        return int(sim.time() * 1000) - 10 + 1500
+
+    server = ServerClock(server_ms, clock=sim, resync_s=3600.0)
+    sched = BarScheduler(server=server, confirm_delay_s=2.0)
+    woke = []
+    sched.add("1m", lambda bar, close, now: woke.append((bar, close, now)))
+    sched.add("1H", lambda bar, close, now: woke.append((bar, close, now)))
+    sched.add("5m", lambda bar, close, now: sim.advance(0.25) or woke.append((bar, close, now)))
+
+    assert sched.run(max_wakes=3) == 3
+    assert abs(server.offset_ms - 1500) <= 1
+    # 11:59 / 12:00（1m+5m+1H 合并一次唤醒）/ 12:01；回调拿到的是交易所时钟
+    assert [(b, c) for b, c, _ in woke] == [("1m", _ms(2024, 5, 15, 11, 59)), ("1m", _ms(2024, 5, 15, 12)),
+                                           ("1H", _ms(2024, 5, 15, 12)), ("5m", _ms(2024, 5, 15, 12)),
+                                           ("1m", _ms(2024, 5, 15, 12, 1))]
+    assert all(0 <= now - (c + 2000) <= 1 for _, c, now in woke[:4])
+    m = sched.metrics()
+    assert m["1m"]["wakes"] == 3 and m["5m"]["wakes"] == 1 and m["1m"]["lateness_max_ms"] <= 1
+    # 5m 回调耗时 250ms：之后的 1m 不漂移
+    assert woke[-1][2] - (woke[-1][1] + 2000) <= 1
+    # 只在启动时测了 3 次偏移，之后每轮不再联网取时间
+    assert len(fetches) == 3
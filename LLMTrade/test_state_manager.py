@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+
+import state_manager
+from config import BotConfig
+from llm_filter import LLMFilter
+from okx_client import MockOKXClient
+from state_manager import StateStore
+from trend_bot import TrendBot
+
+
+def test_incremental_commits_survive_hard_kill(tmp_path):
+    db = str(tmp_path / "state.db")
+    script = f"""
+import os, sys
+sys.path.insert(0, {os.path.dirname(os.path.abspath(state_manager.__file__))!r})
+from state_manager import StateStore
+st = StateStore({db!r}).state("BTC-USDT")
+st["tranche_idx"] = 1
+st["sl_algo_id"] = "a1"
+st.commit()
+st["tranche_idx"] = 2          # 未 commit：崩溃后应丢失
+os._exit(1)
+"""
+    subprocess.run([sys.executable, "-c", script], check=False)
+    store = StateStore(db)
+    assert store.load("BTC-USDT") == {"tranche_idx": 1, "sl_algo_id": "a1"}
+
+    # 增量：只写改过/删过的键；别的命名空间不受影响
+    st = store.state("BTC-USDT")
+    other = store.state("ETH-USDT")
+    other["tranche_idx"] = 5
+    other.commit()
+    writes = store.writes
+    st.pop("sl_algo_id")
+    st["tp1_placed"] = True
+    st.commit()
+    st.commit()                    # 没有变动：不写
+    assert store.writes == writes + 1
+    assert StateStore(db).load("BTC-USDT") == {"tranche_idx": 1, "tp1_placed": True}
+    assert store.load("ETH-USDT") == {"tranche_idx": 5}
+
+
+def test_trend_bot_imports_legacy_json_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "state.json").write_text(json.dumps({"tranche_idx": 2, "sl_algo_id": "old", "tp1_placed": True}))
+    client = MockOKXClient("k", "s", "p", "http://mock")
+    bot = TrendBot(BotConfig(candle_store_dir=""), client, LLMFilter(False))
+    assert bot.state["tranche_idx"] == 2 and bot.state["sl_algo_id"] == "old"
+
+    bot.state["tranche_idx"] = 3
+    bot.state.commit()
+    (tmp_path / "state.json").write_text(json.dumps({"tranche_idx": 0}))
+    again = TrendBot(BotConfig(candle_store_dir=""), client, LLMFilter(False))
+    assert again.state["tranche_idx"] == 3
@@ -0,0 +1,64 @@
+import json
+import math
+import random
+
+from config import BotConfig
+from llm_filter import LLMFilter
+from okx_client import MockOKXClient
+from tracing import (HALF, N_BUCKETS, NULL_TRACER, LatencyHistogram, Tracer, bucket_bounds, bucket_index,
+                     traced_client)
+from trend_bot import TrendBot
+
+
+def test_histogram_buckets_and_percentiles():
+    for i in range(N_BUCKETS - 1):
+        lo, hi = bucket_bounds(i)
+        assert bucket_index(lo) == i and bucket_index(hi) == i and bucket_bounds(i + 1)[0] == hi + 1
+
+    rng = random.Random(5)
+    xs = [int(rng.lognormvariate(8, 1.5)) for _ in range(20000)]
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for k, x in enumerate(xs):
+        (a if k % 2 else b).record_us(x)
+    a.merge(b)
+    xs.sort()
+    assert a.count == len(xs) and a.min_us == xs[0] and a.max_us == xs[-1] and a.total_us == sum(xs)
+    for q in (0.5, 0.9, 0.99, 0.999, 1.0):
+        exact = xs[math.ceil(q * len(xs)) - 1]
+        # 取桶上界：不低估，相对误差不超过 1/HALF
+        assert exact <= a.percentile_us(q) <= exact * (1 + 1 / HALF) + 1
+
+
+def test_disabled_tracer_is_a_noop():
+    client = MockOKXClient("k", "s", "p", "http://mock")
+    assert traced_client(client, NULL_TRACER) is client
+    assert NULL_TRACER.span("stage", "x") is NULL_TRACER.span("endpoint", "y")
+    with NULL_TRACER.span("stage", "x"):
+        pass
+    NULL_TRACER.record("e2e", "x", 1.0)
+    assert NULL_TRACER.hists == {}
+
+
+def test_trend_bot_spans_and_exports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracer = Tracer()
+    client = traced_client(MockOKXClient("k", "s", "p", "http://mock"), tracer)
+    bot = TrendBot(BotConfig(candle_store_dir=""), client, LLMFilter(False), tracer=tracer)
+    bot.run_once()
+    bot.trace_order_latency()
+    spans = tracer.snapshot()["spans"]
+    for key in ("endpoint/get_instruments_spot", "endpoint/get_candles", "endpoint/get_balance",
+                "stage/indicators", "stage/balances", "stage/llm", "stage/state_save", "e2e/bar_close_to_order"):
+        assert spans[key]["count"] >= 1, key
+    assert bot.bar_close_ms == bot.indicators.last_ts + bot.bar_ms
+    assert client.mock_balances["USDT"] > 0          # 非方法属性透传
+
+    tracer.export(str(tmp_path / "m.prom"), str(tmp_path / "m.json"))
+    prom = (tmp_path / "m.prom").read_text().splitlines()
+    assert "# TYPE llmtrade_latency_seconds summary" in prom
+    assert any(line.startswith('llmtrade_latency_seconds{kind="stage",name="indicators",quantile="0.99"} ')
+               for line in prom)
+    n = spans["endpoint/get_balance"]["count"]
+    assert f'llmtrade_latency_seconds_count{{kind="endpoint",name="get_balance"}} {n}' in prom
+    snap = json.loads((tmp_path / "m.json").read_text())
+    assert sum(c for _, c in snap["spans"]["stage/llm"]["buckets"]) == spans["stage/llm"]["count"]
@@ -0,0 +1,45 @@
+"""
+OKX K线周期（bar）工具：1m/3m/5m/15m/30m/1H/2H/4H/6H/12H/1D/2D/3D/1W，
+以及 6Hutc/12Hutc/1Dutc/2Dutc/3Dutc/1Wutc。月线（1M）长度不固定，不支持。
+
+对齐：6H 及以上不带 utc 的周期按香港时间（UTC+8）开盘，带 utc 的按 UTC；周线从周一开始。
+"""
+_UNIT_MS = {
+    "m": 60_000,
+    "H": 3_600_000,
+    "D": 86_400_000,
+    "W": 604_800_000,
+}
+
+
+def bar_to_ms(bar: str) -> int:
+    b = bar[:-3] if bar.endswith("utc") else bar
+    if len(b) < 2 or b[-1] not in _UNIT_MS or not b[:-1].isdigit():
+        raise ValueError(f"unsupported bar: {bar}")
+    return int(b[:-1]) * _UNIT_MS[b[-1]]
+
+
+_HKT_MS = 8 * 3_600_000
+_EPOCH_TO_MONDAY_MS = 3 * 86_400_000      # 1970-01-01 是周四：+3 天对齐到周一
+
+
+def _align_ms(bar: str) -> int:
+    step = bar_to_ms(bar)
+    off = 0
+    if not bar.endswith("utc") and step >= 6 * _UNIT_MS["H"]:
+        off += _HKT_MS
+    if (bar[:-3] if bar.endswith("utc") else bar).endswith("W"):
+        off += _EPOCH_TO_MONDAY_MS
+    return off % step
+
+
+def bar_open_ms(bar: str, ts_ms: int) -> int:
+    """ts_ms 所在那根K线的开盘时间。"""
+    step = bar_to_ms(bar)
+    off = _align_ms(bar)
+    return (ts_ms + off) // step * step - off
+
+
+def next_bar_close_ms(bar: str, ts_ms: int) -> int:
+    """ts_ms 所在那根K线的收盘时间（= 下一根的开盘时间）。"""
+    return bar_open_ms(bar, ts_ms) + bar_to_ms(bar)
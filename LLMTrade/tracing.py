@@ -0,0 +1,233 @@
+"""
+延迟追踪：每个客户端调用（endpoint）和决策阶段（stage）一个 HDR 式直方图，导出 Prometheus 文本与 JSON 快照。
+
+- LatencyHistogram：对数-线性分桶（微秒整数），2^k 区间再均分 64 份，相对误差 <= 1/64，
+  记录 O(1)、内存固定，可合并；分位数取桶上界（不会低估）
+- Tracer.span(kind, name)：with 包住一段代码计时；enabled=False 时返回共享的空上下文，几乎零开销
+- traced_client(client, tracer)：给客户端的每个公开方法包一层 endpoint span（未启用时原样返回客户端）
+- 导出：to_prometheus / write_prometheus（node_exporter textfile 采集，原子替换）、
+  snapshot / write_json（含非空桶，便于离线对比回归）
+- kind 约定：endpoint（客户端方法）、stage（TrendBot / Portfolio 决策阶段）、e2e（K线收盘到下单）
+"""
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+HALF_BITS = 6
+HALF = 1 << HALF_BITS                    # 每个 2^k 区间的子桶数
+SUB_BITS = HALF_BITS + 1
+MAX_EXP = 40                             # 上限约 2^40 us（约 12.7 天），超出的计入最后一桶
+N_BUCKETS = HALF * (MAX_EXP + 2)
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def bucket_index(us: int) -> int:
+    if us < 2 * HALF:
+        return max(us, 0)
+    e = us.bit_length() - SUB_BITS
+    return min(HALF * e + (us >> e), N_BUCKETS - 1)
+
+
+def bucket_bounds(idx: int) -> Tuple[int, int]:
+    """桶 idx 覆盖的微秒闭区间 [lo, hi]。"""
+    e = max(idx // HALF - 1, 0)
+    m = idx - HALF * e
+    return m << e, ((m + 1) << e) - 1
+
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * N_BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+
+    def record_us(self, us: int) -> None:
+        us = max(int(us), 0)
+        self.counts[bucket_index(us)] += 1
+        if self.count == 0 or us < self.min_us:
+            self.min_us = us
+        if us > self.max_us:
+            self.max_us = us
+        self.count += 1
+        self.total_us += us
+
+    def record(self, seconds: float) -> None:
+        self.record_us(int(seconds * 1e6))
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if other.count == 0:
+            return
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.min_us = other.min_us if self.count == 0 else min(self.min_us, other.min_us)
+        self.max_us = max(self.max_us, other.max_us)
+        self.count += other.count
+        self.total_us += other.total_us
+
+    def percentile_us(self, q: float) -> int:
+        """q 分位（0~1）：第 ceil(q*count) 个样本所在桶的上界，不超过实际最大值。"""
+        if self.count == 0:
+            return 0
+        rank = max(1, math.ceil(q * self.count - 1e-9))
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(bucket_bounds(idx)[1], self.max_us)
+        return self.max_us
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"count": self.count, "sum_s": self.total_us / 1e6,
+                               "mean_ms": self.total_us / self.count / 1e3 if self.count else 0.0,
+                               "min_ms": self.min_us / 1e3, "max_ms": self.max_us / 1e3}
+        for q in QUANTILES:
+            out[f"p{q * 100:g}_ms"] = self.percentile_us(q) / 1e3
+        return out
+
+    def nonzero(self) -> List[List[int]]:
+        """非空桶 [下界 us, 个数]，JSON 快照用。"""
+        return [[bucket_bounds(i)[0], c] for i, c in enumerate(self.counts) if c]
+
+
+class _Span:
+    __slots__ = ("tracer", "key", "t0")
+
+    def __init__(self, tracer: "Tracer", key: Tuple[str, str]):
+        self.tracer = tracer
+        self.key = key
+
+    def __enter__(self) -> "_Span":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.tracer._record(self.key, time.perf_counter() - self.t0)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _label(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _atomic_write(path: str, text: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class Tracer:
+    def __init__(self, enabled: bool = True, prefix: str = "llmtrade"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.hists: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def span(self, kind: str, name: str):
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, (kind, name))
+
+    def record(self, kind: str, name: str, seconds: float) -> None:
+        if self.enabled:
+            self._record((kind, name), seconds)
+
+    def _record(self, key: Tuple[str, str], seconds: float) -> None:
+        with self._lock:
+            h = self.hists.get(key)
+            if h is None:
+                h = self.hists[key] = LatencyHistogram()
+            h.record(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.hists = {}
+
+    def _items(self) -> Iterator[Tuple[Tuple[str, str], LatencyHistogram]]:
+        with self._lock:
+            items = sorted(self.hists.items())
+        return iter(items)
+
+    # ---------- 导出 ----------
+    def snapshot(self, buckets: bool = True) -> Dict[str, Any]:
+        spans = {}
+        for (kind, name), h in self._items():
+            d = h.summary()
+            if buckets:
+                d["buckets"] = h.nonzero()
+            spans[f"{kind}/{name}"] = d
+        return {"ts_ms": int(time.time() * 1000), "enabled": self.enabled, "spans": spans}
+
+    def to_prometheus(self) -> str:
+        m = f"{self.prefix}_latency_seconds"
+        lines = [f"# HELP {m} Latency of client calls (kind=endpoint) and decision stages (kind=stage).",
+                 f"# TYPE {m} summary"]
+        maxes = [f"# HELP {m}_max Largest observed latency.", f"# TYPE {m}_max gauge"]
+        for (kind, name), h in self._items():
+            labels = f'kind="{_label(kind)}",name="{_label(name)}"'
+            for q in QUANTILES:
+                lines.append(f'{m}{{{labels},quantile="{q:g}"}} {h.percentile_us(q) / 1e6:.6f}')
+            lines.append(f"{m}_sum{{{labels}}} {h.total_us / 1e6:.6f}")
+            lines.append(f"{m}_count{{{labels}}} {h.count}")
+            maxes.append(f"{m}_max{{{labels}}} {h.max_us / 1e6:.6f}")
+        return "\n".join(lines + maxes) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        _atomic_write(path, self.to_prometheus())
+
+    def write_json(self, path: str) -> None:
+        _atomic_write(path, json.dumps(self.snapshot(), ensure_ascii=False))
+
+    def export(self, prom_path: str = "", json_path: str = "") -> None:
+        if prom_path:
+            self.write_prometheus(prom_path)
+        if json_path:
+            self.write_json(json_path)
+
+
+# 未启用追踪时各组件默认用它：span 返回共享空上下文
+NULL_TRACER = Tracer(enabled=False)
+
+
+class _TracedClient:
+    """客户端代理：公开方法调用计入 endpoint/<方法名>，其余属性透传。"""
+
+    def __init__(self, client: Any, tracer: Tracer):
+        object.__setattr__(self, "_client", client)
+        object.__setattr__(self, "_tracer", tracer)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        tracer = self._tracer
+
+        def traced(*args: Any, **kwargs: Any) -> Any:
+            with tracer.span("endpoint", name):
+                return attr(*args, **kwargs)
+        return traced
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._client, name, value)
+
+
+def traced_client(client: Any, tracer: Optional[Tracer]) -> Any:
+    if tracer is None or not tracer.enabled:
+        return client
+    return _TracedClient(client, tracer)
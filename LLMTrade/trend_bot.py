@@ -1,28 +1,142 @@
 import os
 import json
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
 
 from config import BotConfig
-from okx_client import OKXClient
+from okx_client import OKXClient, amend_algo_body
+from order_batch import OrderBatcher, OrderIntent
 from llm_filter import LLMFilter
-from indicators import ema, atr
-from state_manager import load_state, save_state
+from account_stream import BalanceCache, parse_avail, parse_total
+from vector_indicators import candles_to_arrays
+from streaming import TrendIndicators
+from features import feature_windows, to_payload
+from candle_store import CandleStore, CandleSync, COLUMNS
+from timeframes import bar_to_ms
+from state_manager import StateStore
+from tracing import NULL_TRACER, Tracer
+
+
+# ====== 策略规则（纯函数）：实盘 TrendBot 与回测 backtest 共用同一套判断 ======
+# 一轮仓位周期内的状态键；清仓后（reset_cycle_when_flat）清掉，下一轮重新分批
+CYCLE_KEYS = ("tranche_idx", "invested_quote", "entry_ref_price", "tp1_placed", "tp1_ord_id")
+
+
+def reset_cycle_if_flat(cfg: BotConfig, state: Dict[str, Any], pos_total: float, min_sz: float) -> bool:
+    # 仓位已被止盈/止损卖空：重置分批进度，否则 tranche_idx 用满后永远不会再入场。
+    # pos_total 必须含挂单冻结的部分：TP1 限价单还挂着时不算清仓
+    if not cfg.reset_cycle_when_flat or pos_total >= min_sz or not int(state.get("tranche_idx", 0)):
+        return False
+    for k in CYCLE_KEYS:
+        state.pop(k, None)
+    return True
+
+
+def trend_ok(cfg: BotConfig, ema_fast: float, ema_slow: float, adx: float) -> bool:
+    # 趋势向上：EMA快 > EMA慢；adx_min > 0 时还要求 ADX 达到阈值（预热不足的 NaN 视为不满足）
+    return ema_fast > ema_slow and (cfg.adx_min <= 0.0 or adx >= cfg.adx_min)
+
+
+def plan_entry(cfg: BotConfig, state: Dict[str, Any], pos_base: float, quote_avail: float,
+               last_price: float, last_atr: float, now_ms: int,
+               min_sz: float = 0.0) -> Optional[Tuple[str, float, float, float]]:
+    """
+    趋势向上时的入场/加仓判断。返回 (kind, quote, pullback, need_pullback) 或 None；
+    kind: "ENTRY"（空仓首笔）/ "ADD"（趋势内回撤加仓）。
+    """
+    tranche_idx = int(state.get("tranche_idx", 0))
+    if tranche_idx >= len(cfg.tranche_quotes):
+        return None
+    q = cfg.tranche_quotes[tranche_idx]
+    invested = float(state.get("invested_quote", 0.0))
+    if invested + q > cfg.max_total_quote or quote_avail < q:
+        return None
+
+    # 1) 若没有持仓，做第一笔（开启 reset_cycle_when_flat 时，不足最小下单量的残余也视为空仓）
+    if pos_base <= 0.0 or (cfg.reset_cycle_when_flat and pos_base < min_sz):
+        return "ENTRY", q, 0.0, 0.0
+
+    # 2) 若已有仓位，回撤加仓（趋势内回撤）
+    last_add_time_ms = int(state.get("last_add_time_ms", 0))
+    hours_since_add = (now_ms - last_add_time_ms) / 3600000.0 if last_add_time_ms else 1e9
+    entry_ref = float(state.get("entry_ref_price", last_price))  # 用于判断回撤加仓
+    pullback = max(0.0, entry_ref - last_price)
+    need_pullback = cfg.add_on_pullback_atr * last_atr
+    if pullback >= need_pullback and hours_since_add >= cfg.min_hours_between_adds:
+        return "ADD", q, pullback, need_pullback
+    return None
+
+
+def commit_entry(state: Dict[str, Any], quote: float, now_ms: int, last_price: float) -> None:
+    state["tranche_idx"] = int(state.get("tranche_idx", 0)) + 1
+    state["invested_quote"] = float(state.get("invested_quote", 0.0)) + quote
+    state["last_add_time_ms"] = now_ms
+    # 更新参考价：用最新价作为下一次回撤锚点
+    state["entry_ref_price"] = last_price
+
+
+def plan_tp1(cfg: BotConfig, state: Dict[str, Any], pos_base: float, last_price: float) -> Optional[Tuple[float, float]]:
+    # tp1 只挂一次；返回 (未取整数量, 价格)
+    if pos_base <= 0.0 or state.get("tp1_placed"):
+        return None
+    return pos_base * cfg.tp1_sell_pct, last_price * (1.0 + cfg.tp1_pct)
+
+
+def trail_remaining(cfg: BotConfig, state: Dict[str, Any], base_avail: float) -> float:
+    # 对“剩余仓位”做追踪
+    remaining = base_avail * (1.0 - cfg.tp1_sell_pct) if state.get("tp1_placed") else base_avail
+    return max(0.0, remaining)
+
+
+def trail_stop_price(cfg: BotConfig, last_price: float, last_atr: float) -> float:
+    # 追踪止损距离 = trail_atr_mult * ATR
+    return max(0.0, last_price - cfg.trail_atr_mult * last_atr)
+
+
+def stop_needs_update(cfg: BotConfig, prev_px: float, prev_sz: float, new_px: float, new_sz: float,
+                      tick_sz: float) -> bool:
+    # 触发价变动不超过 stop_update_min_ticks 个 tick 且数量不变：沿用旧止损单，不发请求
+    if prev_px <= 0.0 or new_sz != prev_sz:
+        return True
+    return abs(new_px - prev_px) > cfg.stop_update_min_ticks * tick_sz + 1e-12
 
 
 class TrendBot:
-    def __init__(self, cfg: BotConfig, client: OKXClient, llm: LLMFilter):
+    def __init__(self, cfg: BotConfig, client: OKXClient, llm: LLMFilter,
+                 balances: Optional[BalanceCache] = None, orders: Optional[OrderBatcher] = None,
+                 store: Optional[StateStore] = None, state_path: Optional[str] = "state.json",
+                 tracer: Optional[Tracer] = None):
         self.cfg = cfg
+        # 各决策阶段的耗时直方图（tracing）；未启用时 span 为空操作
+        self.tracer = tracer if tracer is not None else NULL_TRACER
         self.client = client
         self.llm = llm
-        self.state_path = "state.json"
-        self.state = load_state(self.state_path)
+        # 一轮决策里的订单意图先收集，阶段结束时合并成批量请求发出
+        self.orders = orders if orders is not None else OrderBatcher(client)
+        # 私有 WebSocket 维护的余额缓存（account_stream）；None 则每次走 REST
+        self.balances = balances
+        self._balance_dirty: Optional[int] = None
+        # 现货交易对 BASE-QUOTE（如 ETH-USDT）
+        self.base_ccy, self.quote_ccy = cfg.inst_id.split("-")[:2]
+        # 状态存 SQLite（按 instId 分命名空间，增量事务写）；旧版 state.json 首次启动时导入一次
+        self.store = store if store is not None else StateStore(cfg.state_db)
+        if state_path:
+            self.store.import_json(state_path, cfg.inst_id)
+        self.state = self.store.state(cfg.inst_id)
+        self.bar_ms = bar_to_ms(cfg.bar)
+        self.indicators = self._load_indicators()
+        self.features: Dict[str, float] = {}       # 最近一次算出的趋势特征（features.FEATURE_NAMES）
+        self.bar_close_ms = 0                      # 本轮决策所依据的最后一根已收盘K线的收盘时间
+        self.candles = CandleSync(client, CandleStore(cfg.candle_store_dir)) if cfg.candle_store_dir else None
 
         # 交易对规则（最小下单数量/步进），来自 instruments
         inst = self.client.get_instruments_spot(cfg.inst_id)
         # 常见字段：minSz, lotSz（不同站点字段可能略差异，拿不到就级降）
         self.min_sz = float(inst.get("minSz", "0.0001"))
         self.lot_sz = float(inst.get("lotSz", "0.00000001"))
+        self.tick_sz = float(inst.get("tickSz", "0.01"))
 
     def _round_sz(self, sz: float) -> float:
         # 向下取整到 lotSz
@@ -30,77 +144,194 @@ class TrendBot:
         r = steps * self.lot_sz
         return float(f"{r:.12f}")
 
-    def _get_last_price_and_atr(self) -> Tuple[float, float, float, float]:
-        candles = self.client.get_candles(self.cfg.inst_id, self.cfg.bar, self.cfg.candle_limit)
-        # candles: 最近在前 -> 翻转为时间正序
-        candles = list(reversed(candles))
-        closes = [float(x[4]) for x in candles]
-        highs = [float(x[2]) for x in candles]
-        lows  = [float(x[3]) for x in candles]
-
-        ef = ema(closes, self.cfg.ema_fast)
-        es = ema(closes, self.cfg.ema_slow)
-        a  = atr(highs, lows, closes, self.cfg.atr_len)
-
-        last = closes[-1]
-        last_ef = ef[-1] if ef else float("nan")
-        last_es = es[-1] if es else float("nan")
-        last_atr = a[-1] if a else float("nan")
-        return last, last_ef, last_es, last_atr
+    def _load_indicators(self) -> Optional[TrendIndicators]:
+        d = self.state.get("indicators")
+        if not d:
+            return None
+        try:
+            ind = TrendIndicators.from_dict(d)
+        except (KeyError, TypeError, ValueError):
+            return None
+        # 周期参数改过就作废，重新预热
+        if not ind.matches(self.cfg.ema_fast, self.cfg.ema_slow, self.cfg.atr_len, self.cfg.adx_len,
+                           feature_windows(self.cfg.bar)["window"]):
+            return None
+        return ind
+
+    def _candle_fetch_limit(self) -> int:
+        # 指标已热：只拉上次之后的新K线（+当前未收盘那根），否则拉完整窗口预热
+        ind = self.indicators
+        if ind is None or not ind.last_ts:
+            return self.cfg.candle_limit
+        missing = int((time.time() * 1000 - ind.last_ts) // self.bar_ms) + 2
+        return max(2, min(self.cfg.candle_limit, missing))
+
+    def _fetch_bars(self, limit: int) -> Dict[str, Any]:
+        if self.candles is not None:
+            # 本地K线库：只拉新K线落盘，再从本地读窗口
+            return self.candles.sync(self.cfg.inst_id, self.cfg.bar, limit)
+        candles = self.client.get_candles(self.cfg.inst_id, self.cfg.bar, limit)
+        # candles: 字符串二维列表 -> 按 ts 正序的列数组（不依赖返回顺序）
+        return candles_to_arrays(candles)
+
+    def _get_last_price_and_atr(self, pushed: Optional[Dict[str, Any]] = None) -> Tuple[float, float, float, float]:
+        ind = self.indicators
+        if pushed is not None and ind is not None and pushed["ts"] - ind.last_ts == self.bar_ms:
+            # WebSocket 推来的正好是下一根已收盘K线：直接增量更新，不走 REST
+            ind.update(int(pushed["ts"]), pushed["high"], pushed["low"], pushed["close"])
+            self.state["indicators"] = ind.to_dict()
+            self.features = ind.features()
+            ef, es, a = ind.values()
+            return float(pushed["close"]), ef, es, a
+
+        limit = self._candle_fetch_limit()
+        bars = self._fetch_bars(limit)
+        closes = bars["close"]
+        if closes.size == 0:
+            return float("nan"), float("nan"), float("nan"), float("nan")
+
+        ts, highs, lows = bars["ts"], bars["high"], bars["low"]
+        done = np.flatnonzero(bars["confirm"])
+        new = done[ts[done] > ind.last_ts] if ind is not None else done
+        # 断档（停机太久/首次启动）：用完整窗口重新预热；否则逐根增量吸收新确认K线
+        if ind is None or (new.size and ts[new[0]] - ind.last_ts > self.bar_ms):
+            if limit < self.cfg.candle_limit:
+                bars = self._fetch_bars(self.cfg.candle_limit)
+                ts, highs, lows, closes = bars["ts"], bars["high"], bars["low"], bars["close"]
+                done = np.flatnonzero(bars["confirm"])
+            ind = TrendIndicators(self.cfg.ema_fast, self.cfg.ema_slow, self.cfg.atr_len,
+                                  adx_len=self.cfg.adx_len, **feature_windows(self.cfg.bar))
+            ind.warm_start(ts[done], highs[done], lows[done], closes[done])
+            self.indicators = ind
+        else:
+            for i in new:
+                ind.update(int(ts[i]), highs[i], lows[i], closes[i])
+        self.state["indicators"] = ind.to_dict()
+
+        last = float(closes[-1])
+        if bars["confirm"][-1]:
+            ef, es, a = ind.values()
+            self.features = ind.features()
+        else:
+            # 最新一根未收盘：试算（不写入状态），与旧版“含未收盘K线”的口径一致
+            ef, es, a = ind.peek(highs[-1], lows[-1], closes[-1])
+            self.features = ind.peek_features(highs[-1], lows[-1], closes[-1])
+        return last, ef, es, a
 
     def _get_spot_balances(self) -> Tuple[float, float]:
-        # 简化：只取 BTC 和 USDT
-        b_btc = self.client.get_balance("BTC")
-        b_usdt = self.client.get_balance("USDT")
-
-        def parse_avail(balance_resp: Dict[str, Any], ccy: str) -> float:
-            # data[0].details[] 里找 ccy；字段常见为 availBal
-            try:
-                details = balance_resp["data"][0].get("details", [])
-                for d in details:
-                    if d.get("ccy") == ccy:
-                        return float(d.get("availBal", "0"))
-            except Exception:
-                pass
-            return 0.0
-
-        return parse_avail(b_btc, "BTC"), parse_avail(b_usdt, "USDT")
-
-    def _place_market_buy_usdt(self, usdt_amount: float) -> Dict[str, Any]:
-        # 现货市价买：sz 默认按 quote_ccy（USDT） 
+        with self.tracer.span("stage", "balances"):
+            return self._read_spot_balances()
+
+    def _read_spot_balances(self) -> Tuple[float, float]:
+        cache = self.balances
+        if cache is not None:
+            fresh = True
+            if self._balance_dirty is not None:
+                # 刚下过单：等成交后的余额推送，等不到就走 REST 对账
+                fresh = cache.wait_newer(self._balance_dirty, self.cfg.balance_push_wait_s)
+                self._balance_dirty = None
+            due = time.monotonic() - cache.reconciled_at > self.cfg.balance_reconcile_s
+            if fresh and not due:
+                base, quote = cache.avail(self.base_ccy), cache.avail(self.quote_ccy)
+                if base is not None and quote is not None:
+                    return base, quote
+
+        # 只取本交易对的 base / quote 两个币种
+        b_base = self.client.get_balance(self.base_ccy)
+        b_quote = self.client.get_balance(self.quote_ccy)
+        if cache is not None:
+            cache.apply_rest(self.base_ccy, b_base)
+            cache.apply_rest(self.quote_ccy, b_quote)
+        return parse_avail(b_base, self.base_ccy), parse_avail(b_quote, self.quote_ccy)
+
+    def _get_base_total(self) -> float:
+        # base 总量（可用 + 挂单冻结）：判断是否清仓用，TP1 冻结的部分仍是持仓
+        if self.balances is not None:
+            total = self.balances.total(self.base_ccy)
+            if total is not None:
+                return total
+        return parse_total(self.client.get_balance(self.base_ccy), self.base_ccy)
+
+    def _mark_balance_dirty(self) -> None:
+        # 下单前记下余额版本，之后读余额时等比它新的推送
+        if self.balances is not None and self._balance_dirty is None:
+            self._balance_dirty = self.balances.version
+
+    def _place_market_buy_usdt(self, usdt_amount: float,
+                               on_result: Optional[Callable[[OrderIntent], None]] = None) -> OrderIntent:
+        # 现货市价买：sz 默认按 quote_ccy（USDT）；进本轮收集器，flush 时批量发出
         usdt_amount = float(usdt_amount)
-        return self.client.place_order(
-            inst_id=self.cfg.inst_id,
-            side="buy",
-            ord_type="market",
-            sz=f"{usdt_amount:.6f}",
-            td_mode="cash",
-            tgt_ccy="quote_ccy",
-        )
-
-    def _place_limit_sell_btc(self, btc_sz: float, px: float) -> Dict[str, Any]:
+        self._mark_balance_dirty()
+        return self.orders.add("place", {
+            "instId": self.cfg.inst_id,
+            "tdMode": "cash",
+            "side": "buy",
+            "ordType": "market",
+            "sz": f"{usdt_amount:.6f}",
+            "tgtCcy": "quote_ccy",
+        }, tag=f"{self.cfg.inst_id}:buy", on_result=on_result)
+
+    def _place_limit_sell_btc(self, btc_sz: float, px: float,
+                              on_result: Optional[Callable[[OrderIntent], None]] = None) -> OrderIntent:
         btc_sz = self._round_sz(btc_sz)
         if btc_sz < self.min_sz:
             raise RuntimeError(f"sell size too small: {btc_sz} < minSz {self.min_sz}")
-        return self.client.place_order(
-            inst_id=self.cfg.inst_id,
-            side="sell",
-            ord_type="limit",
-            sz=f"{btc_sz:.12f}",
-            px=f"{px:.2f}",
-            td_mode="cash",
-            tgt_ccy="base_ccy",
-        )
+        self._mark_balance_dirty()
+        return self.orders.add("place", {
+            "instId": self.cfg.inst_id,
+            "tdMode": "cash",
+            "side": "sell",
+            "ordType": "limit",
+            "sz": f"{btc_sz:.12f}",
+            "px": f"{px:.2f}",
+            "tgtCcy": "base_ccy",
+        }, tag=f"{self.cfg.inst_id}:tp1", on_result=on_result)
 
     def _cancel_algo_if_any(self, algo_key: str) -> None:
         algo_id = self.state.get(algo_key)
         if not algo_id:
             return
-        try:
-            self.client.cancel_advance_algos([{"algoId": str(algo_id), "instId": self.cfg.inst_id}])
-        except Exception:
-            pass
+        # conditional 止损走 cancel-algos；move_order_stop 走 cancel-advance-algos。失败不影响后续
+        kind = "cancel_algo" if algo_key == "sl_algo_id" else "cancel_advance_algo"
+        self.orders.add(kind, {"algoId": str(algo_id), "instId": self.cfg.inst_id},
+                        tag=f"{self.cfg.inst_id}:{algo_key}")
         self.state[algo_key] = None
+        if algo_key == "sl_algo_id":
+            self.state.pop("sl_trigger_px", None)
+            self.state.pop("sl_sz", None)
+
+    def _place_stop_algo(self, algo_key: str, body: Dict[str, Any],
+                         extra: Optional[Dict[str, Any]] = None) -> None:
+        # 策略单下单成功后才记 algoId（以及触发价/数量）
+        def done(it: OrderIntent) -> None:
+            if not it.ok:
+                print(f"[WARN] 止损策略单下单失败：{it.error}")
+                return
+            self.state[algo_key] = it.result.get("algoId")
+            self.state.update(extra or {})
+            self.state.commit()
+
+        self.orders.add("place_algo", body, tag=f"{self.cfg.inst_id}:{algo_key}", on_result=done)
+
+    def _replace_stop(self, sz: float, trigger: float) -> None:
+        # 撤旧 conditional 止损再重挂（slOrdPx=-1 表示市价止损）
+        self._cancel_algo_if_any("sl_algo_id")
+        body = {
+            "instId": self.cfg.inst_id,
+            "tdMode": "cash",
+            "side": "sell",
+            "ordType": "conditional",
+            "sz": f"{sz:.12f}",
+            "tgtCcy": "base_ccy",
+            "slTriggerPx": f"{trigger:.{self._px_decimals()}f}",
+            "slOrdPx": "-1",
+            "slTriggerPxType": "last",
+        }
+        self._place_stop_algo("sl_algo_id", body, {"sl_trigger_px": trigger, "sl_sz": sz})
+
+    def _px_decimals(self) -> int:
+        text = f"{self.tick_sz:.10f}".rstrip("0")
+        return max(0, len(text.split(".")[1])) if "." in text else 0
 
     def _place_or_update_trailing_stop(self, btc_remaining: float, last_price: float, last_atr: float) -> None:
         # 思路：对“剩余仓位”放一个追踪止损
@@ -109,10 +340,10 @@ class TrendBot:
             return
 
         trail_dist = self.cfg.trail_atr_mult * last_atr
-        stop_trigger = max(0.0, last_price - trail_dist)
+        stop_trigger = trail_stop_price(self.cfg, last_price, last_atr)
 
-        # 先取消旧的追踪/止损策略单
         if self.cfg.use_exchange_trailing_algo:
+            # move_order_stop 不支持 amend-algos：先取消旧的追踪策略单再重挂
             self._cancel_algo_if_any("trail_algo_id")
 
             # 使用 move_order_stop（追踪策略单），参数说明在文档里给了 callbackRatio/activePx/moveTriggerPx 
@@ -130,48 +361,38 @@ class TrendBot:
                 "moveTriggerPx": f"{last_price:.2f}",
                 # 注意：不同账号/站点可能还需要其它字段；若报错，建议改用本地追踪模式
             }
-            resp = self.client.place_algo_order(body)
-            # 返回里通常有 algoId（模板：尽力取）
-            algo_id = None
-            try:
-                algo_id = resp["data"][0].get("algoId")
-            except Exception:
-                pass
-            self.state["trail_algo_id"] = algo_id
+            self._place_stop_algo("trail_algo_id", body)
         else:
-            # 本地追踪：每小时重新下一个 conditional 止损（slOrdPx=-1 表示市价止损） 
-            self._cancel_algo_if_any("sl_algo_id")
-
-            body = {
-                "instId": self.cfg.inst_id,
-                "tdMode": "cash",
-                "side": "sell",
-                "ordType": "conditional",
-                "sz": f"{btc_remaining:.12f}",
-                "tgtCcy": "base_ccy",
-                "slTriggerPx": f"{stop_trigger:.2f}",
-                "slOrdPx": "-1",
-                "slTriggerPxType": "last",
-            }
-            resp = self.client.place_algo_order(body)
-            algo_id = None
-            try:
-                algo_id = resp["data"][0].get("algoId")
-            except Exception:
-                pass
-            self.state["sl_algo_id"] = algo_id
-
-    def run_once(self) -> None:
-        last_price, ef, es, last_atr = self._get_last_price_and_atr()
-        if any(map(lambda x: x != x, [ef, es, last_atr])):  # NaN 检测
-            print("指标数据不足，等待更多K线…")
-            return
-
-        btc_avail, usdt_avail = self._get_spot_balances()
-        pos_btc = btc_avail
-
-        in_uptrend = ef > es
-        payload_for_llm = {
+            # 本地追踪：已有 conditional 止损就改单（amend-algos），变动不足阈值不动；
+            # 没有旧单或改单被拒才撤单重挂
+            stop_trigger = round(stop_trigger / self.tick_sz) * self.tick_sz
+            algo_id = self.state.get("sl_algo_id")
+            if not algo_id:
+                self._replace_stop(btc_remaining, stop_trigger)
+                return
+            prev_px = float(self.state.get("sl_trigger_px") or 0.0)
+            prev_sz = float(self.state.get("sl_sz") or 0.0)
+            if not stop_needs_update(self.cfg, prev_px, prev_sz, stop_trigger, btc_remaining, self.tick_sz):
+                print(f"[TRAIL] 止损 {prev_px:.2f} 变动不足 {self.cfg.stop_update_min_ticks} tick，保持不变")
+                return
+
+            # 改单：原地更新触发价/数量，省一次往返且没有“无止损”空窗；被拒再撤单重挂
+            def amended(it: OrderIntent) -> None:
+                if it.ok:
+                    self.state["sl_trigger_px"] = stop_trigger
+                    self.state["sl_sz"] = btc_remaining
+                    self.state.commit()
+                    return
+                print(f"[WARN] 止损改单被拒，改为撤单重挂：{it.error}")
+                self._replace_stop(btc_remaining, stop_trigger)
+
+            self.orders.add("amend_algo", amend_algo_body(self.cfg.inst_id, str(algo_id), f"{btc_remaining:.12f}",
+                                                          f"{stop_trigger:.{self._px_decimals()}f}"),
+                            tag=f"{self.cfg.inst_id}:sl_algo_id", on_result=amended)
+
+    def _llm_payload(self, last_price: float, ef: float, es: float, last_atr: float,
+                     pos_btc: float, usdt_avail: float) -> Dict[str, Any]:
+        return {
             "instId": self.cfg.inst_id,
             "bar": self.cfg.bar,
             "last_price": last_price,
@@ -180,76 +401,142 @@ class TrendBot:
             "atr": last_atr,
             "pos_btc": pos_btc,
             "usdt_avail": usdt_avail,
+            **(to_payload(self.features) if self.features else {}),
         }
-        if not self.llm.allow_trade(payload_for_llm):
-            print("LLM 过滤：本轮不交易")
+
+    def prefetch_llm(self) -> None:
+        """收盘前几秒：用未收盘K线试算的指标提前发出过滤请求（收盘后特征没变就直接用预取结论）。"""
+        if not self.llm.enabled:
+            return
+        last_price, ef, es, last_atr = self._get_last_price_and_atr()
+        if any(map(lambda x: x != x, [ef, es, last_atr])):
+            return
+        btc_avail, usdt_avail = self._get_spot_balances()
+        self.llm.prefetch(self._llm_payload(last_price, ef, es, last_atr, btc_avail, usdt_avail))
+
+    def record_bar(self, candle: Dict[str, Any]) -> None:
+        # 推送来的收盘K线直接落本地K线库；和库尾不连续（漏推/重连）就不写，由 CandleSync.sync 补档
+        if self.candles is not None:
+            series = self.candles.store.series(self.cfg.inst_id, self.cfg.bar)
+            row = {c: np.array([candle[c]]) for c in COLUMNS}
+            if not series.append_contiguous(row, self.bar_ms) and int(candle["ts"]) > series.last_ts:
+                print(f"[CANDLE] {self.cfg.inst_id} 推送K线 {candle['ts']} 接不上本地 {series.last_ts}，"
+                      f"跳过，等同步补齐")
+
+    def on_bar(self, candle: Dict[str, Any]) -> None:
+        """行情推送入口（market_feed）：一根K线收盘即决策，不再等整点轮询。"""
+        self.record_bar(candle)
+        self.run_once(pushed=candle)
+
+    def run_once(self, pushed: Optional[Dict[str, Any]] = None, now_ms: Optional[int] = None) -> None:
+        # 单品种：每个阶段收集的订单立刻 flush（组合运行时由 portfolio 统一 flush）
+        sent = False
+        for _ in self.cycle(pushed, now_ms):
+            with self.tracer.span("stage", "orders"):
+                handled = self.orders.flush()
+            if handled and not sent:
+                sent = True
+                self.trace_order_latency()
+
+    def trace_order_latency(self) -> None:
+        """本轮第一批订单发出：记录“K线收盘 -> 下单完成”的端到端延迟（本机时钟）。"""
+        if self.bar_close_ms:
+            self.tracer.record("e2e", "bar_close_to_order", time.time() - self.bar_close_ms / 1000.0)
+
+    def cycle(self, pushed: Optional[Dict[str, Any]] = None, now_ms: Optional[int] = None) -> Iterator[str]:
+        """
+        一轮决策，分阶段产出：入场 -> 止盈 -> 追踪止损。每次 yield 之后调用方 flush 收集器，
+        下一阶段读到的余额才包含上一阶段的成交。now_ms 不给就取一次服务器时间。
+        """
+        with self.tracer.span("stage", "indicators"):
+            last_price, ef, es, last_atr = self._get_last_price_and_atr(pushed)
+        if self.indicators is not None and self.indicators.last_ts:
+            self.bar_close_ms = self.indicators.last_ts + self.bar_ms
+        if any(map(lambda x: x != x, [ef, es, last_atr])):  # NaN 检测
+            print("指标数据不足，等待更多K线…")
             return
 
-        # ====== 入场/加仓状态 ======
-        tranche_idx = int(self.state.get("tranche_idx", 0))
-        last_add_time_ms = int(self.state.get("last_add_time_ms", 0))
+        btc_avail, usdt_avail = self._get_spot_balances()
+        pos_btc = btc_avail
 
-        now_ms = self.client.get_server_time_ms()  # 用服务器时间更稳 
-        hours_since_add = (now_ms - last_add_time_ms) / 3600000.0 if last_add_time_ms else 1e9
+        in_uptrend = trend_ok(self.cfg, ef, es, self.features.get("adx", float("nan")))
+        payload_for_llm = self._llm_payload(last_price, ef, es, last_atr, pos_btc, usdt_avail)
+        with self.tracer.span("stage", "llm"):
+            allowed = self.llm.allow_trade(payload_for_llm)
+        if not allowed:
+            print("LLM 过滤：本轮不交易")
+            return
 
-        invested = float(self.state.get("invested_quote", 0.0))
-        entry_ref = float(self.state.get("entry_ref_price", last_price))  # 用于判断回撤加仓
+        # ====== 入场/加仓状态 ======
+        # 可用 >= minSz 时肯定没清仓，不必再查总余额
+        tp1_ord_id = self.state.get("tp1_ord_id")
+        if self.cfg.reset_cycle_when_flat and pos_btc < self.min_sz and \
+                reset_cycle_if_flat(self.cfg, self.state, self._get_base_total(), self.min_sz):
+            print("[RESET] 仓位已清空，重置分批进度")
+            self._cancel_algo_if_any("trail_algo_id" if self.cfg.use_exchange_trailing_algo else "sl_algo_id")
+            if tp1_ord_id:
+                # 残留的 TP1（冻结量不足 minSz）一并撤掉，避免下一轮再挂一张叠在上面
+                self.orders.add("cancel", {"instId": self.cfg.inst_id, "ordId": str(tp1_ord_id)},
+                                tag=f"{self.cfg.inst_id}:tp1")
+
+        if now_ms is None:
+            with self.tracer.span("stage", "server_time"):
+                now_ms = self.client.get_server_time_ms()  # 用服务器时间更稳 
 
         # ====== 趋势跟随逻辑（示例） ======
         if in_uptrend:
-            # 1) 若没有持仓，做第一笔
-            if pos_btc <= 0.0 and tranche_idx < len(self.cfg.tranche_quotes):
-                q = self.cfg.tranche_quotes[tranche_idx]
-                if invested + q <= self.cfg.max_total_quote and usdt_avail >= q:
+            plan = plan_entry(self.cfg, self.state, pos_btc, usdt_avail, last_price, last_atr, now_ms, self.min_sz)
+            if plan is not None:
+                kind, q, pullback, need_pullback = plan
+                if kind == "ENTRY":
                     print(f"[ENTRY] 趋势向上，市价买入 {q} USDT")
-                    self._place_market_buy_usdt(q)
-                    self.state["tranche_idx"] = tranche_idx + 1
-                    self.state["invested_quote"] = invested + q
-                    self.state["last_add_time_ms"] = now_ms
-                    self.state["entry_ref_price"] = last_price
-
-            # 2) 若已有仓位，回撤加仓（趋势内回撤）
-            elif pos_btc > 0.0 and tranche_idx < len(self.cfg.tranche_quotes):
-                pullback = max(0.0, entry_ref - last_price)
-                need_pullback = self.cfg.add_on_pullback_atr * last_atr
-                if pullback >= need_pullback and hours_since_add >= self.cfg.min_hours_between_adds:
-                    q = self.cfg.tranche_quotes[tranche_idx]
-                    if invested + q <= self.cfg.max_total_quote and usdt_avail >= q:
-                        print(f"[ADD] 回撤 {pullback:.2f} >= {need_pullback:.2f}，加仓 {q} USDT")
-                        self._place_market_buy_usdt(q)
-                        self.state["tranche_idx"] = tranche_idx + 1
-                        self.state["invested_quote"] = invested + q
-                        self.state["last_add_time_ms"] = now_ms
-                        # 更新参考价：用最新价作为下一次回撤锚点
-                        self.state["entry_ref_price"] = last_price
+                else:
+                    print(f"[ADD] 回撤 {pullback:.2f} >= {need_pullback:.2f}，加仓 {q} USDT")
+
+                def entered(it: OrderIntent) -> None:
+                    # 成交回报确认后才推进分批进度
+                    if it.ok:
+                        commit_entry(self.state, q, now_ms, last_price)
+                        self.state.commit()
+                    else:
+                        print(f"[WARN] {kind} 下单失败：{it.error}")
+
+                self._place_market_buy_usdt(q, on_result=entered)
 
         else:
             # 趋势转弱：这里模板不强制清仓（因为你要“趋势跟随 + 追踪止损”）
             print("[INFO] EMA 快线 <= 慢线：趋势不强，暂停加仓，仅维护止盈/止损")
+        yield "entry"
 
         # ====== 部分止盈 + 剩余追踪 ======
         # 简化：当持仓存在时，挂一个 tp1 限价卖 + 对剩余放追踪止损
         btc_avail, usdt_avail = self._get_spot_balances()
         pos_btc = btc_avail
         if pos_btc > 0.0:
-            # tp1 只挂一次
-            if not self.state.get("tp1_placed"):
-                tp1_px = last_price * (1.0 + self.cfg.tp1_pct)
-                tp1_sz = pos_btc * self.cfg.tp1_sell_pct
-                tp1_sz = self._round_sz(tp1_sz)
+            tp1 = plan_tp1(self.cfg, self.state, pos_btc, last_price)
+            if tp1 is not None:
+                tp1_sz = self._round_sz(tp1[0])
+                tp1_px = tp1[1]
 
                 if tp1_sz >= self.min_sz:
+                    def tp1_done(it: OrderIntent) -> None:
+                        if it.ok:
+                            self.state["tp1_placed"] = True
+                            self.state["tp1_ord_id"] = (it.result or {}).get("ordId")
+                            self.state.commit()
+                        else:
+                            print(f"[WARN] TP1 下单失败：{it.error}")
+
                     try:
                         print(f"[TP1] 挂限价卖出 {tp1_sz} BTC @ {tp1_px:.2f}")
-                        self._place_limit_sell_btc(tp1_sz, tp1_px)
-                        self.state["tp1_placed"] = True
+                        self._place_limit_sell_btc(tp1_sz, tp1_px, on_result=tp1_done)
                     except Exception as e:
                         print(f"[WARN] TP1 下单失败：{e}")
+            yield "tp1"
 
             # 对“剩余仓位”做追踪（每次 run_once 都会更新一次）
             btc_avail, _ = self._get_spot_balances()
-            remaining = btc_avail * (1.0 - self.cfg.tp1_sell_pct) if self.state.get("tp1_placed") else btc_avail
-            remaining = max(0.0, remaining)
+            remaining = trail_remaining(self.cfg, self.state, btc_avail)
 
             if remaining >= self.min_sz:
                 print(f"[TRAIL] 维护追踪止损（remaining={remaining:.8f} BTC, ATR={last_atr:.2f})")
@@ -257,5 +544,7 @@ class TrendBot:
                     self._place_or_update_trailing_stop(remaining, last_price, last_atr)
                 except Exception as e:
                     print(f"[WARN] 追踪止损维护失败：{e}")
+            yield "trail"
 
-        save_state(self.state_path, self.state)
\ No newline at end of file
+        with self.tracer.span("stage", "state_save"):
+            self.state.commit()
@@ -0,0 +1,420 @@
+"""
+向量化指标引擎（NumPy）
+
+约定：
+- 输入为 np.ndarray，时间在最后一维（axis=-1）；1-D 为单序列，2-D 为 (标的/参数组, 时间)
+- period 可为标量，也可为与前导维度广播的数组（例如同一序列一次算多组周期）
+- 预热期填 NaN，与 indicators.ema / indicators.atr 的列表版本逐点一致
+- 平滑一律 Wilder RMA（SMA 种子）：ATR / ADX / RSI；增量版见 streaming.py，逐点一致
+
+指标：ema / rma / atr / adx(dmi) / rsi / bollinger / donchian / keltner / supertrend，
+外加滑动窗口原语 rolling_max / rolling_min / rolling_sum / rolling_mean_std。
+"""
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+Period = Union[int, Sequence[int], np.ndarray]
+
+# 分块递推时 decay^-B 的上限，避免溢出（float64 最大约 1e308）
+_MAX_GROWTH_LOG = np.log(1e100)
+
+
+def _as_float_array(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def _broadcast_period(lead_shape, period: Period):
+    p = np.asarray(period, dtype=np.int64)
+    if p.ndim == 0:
+        return p, lead_shape
+    shape = np.broadcast_shapes(lead_shape, p.shape)
+    return np.broadcast_to(p, shape), shape
+
+
+def _linear_recursion(x: np.ndarray, decay: np.ndarray, gain: np.ndarray) -> np.ndarray:
+    """
+    s[t] = decay * s[t-1] + gain * x[t]，s[-1] = 0，沿最后一维。
+    分块用 cumsum 闭式求解：块内 s[j] = d^(j+1) * (carry + g * sum_{i<=j} x[i] * d^-(i+1))，
+    carry 为上一块末值。
+    """
+    n = x.shape[-1]
+    if n == 0:
+        return np.empty_like(x)
+    decay = np.asarray(decay, dtype=np.float64)[..., None]
+    gain = np.asarray(gain, dtype=np.float64)[..., None]
+
+    # period=1 时 decay=0，EMA 退化为 gain*x，单独处理，避免拖小分块
+    degenerate = decay <= 0.0
+    if np.all(degenerate):
+        return np.broadcast_to(gain * x, x.shape).copy()
+    if np.any(degenerate):
+        decay = np.where(degenerate, 0.5, decay)
+    d_min = float(decay.min())
+    block = int(_MAX_GROWTH_LOG / -np.log(d_min)) if d_min < 1.0 else n
+    block = max(1, min(n, block))
+
+    # 各块先按零初值并行求解，再用块间标量递推补上进位项 carry * d^(j+1)
+    nb = -(-n // block)
+    pad = nb * block - n
+    xb = x if pad == 0 else np.concatenate([x, np.zeros(x.shape[:-1] + (pad,))], axis=-1)
+    xb = xb.reshape(x.shape[:-1] + (nb, block))
+    steps = np.arange(1, block + 1, dtype=np.float64)
+    decay_b = decay[..., None]
+    pows = decay_b ** steps                        # d^(j+1)
+    acc = np.cumsum(xb * (gain[..., None] / pows), axis=-1)
+
+    # 块尾真实值 = d^B * (carry + acc[-1])，块间顺序递推 carry
+    decay_block = pows[..., 0, -1]
+    tail = acc[..., -1]
+    carries = np.empty(tail.shape)
+    c = np.zeros(tail.shape[:-1])
+    for j in range(nb):
+        carries[..., j] = c
+        c = (c + tail[..., j]) * decay_block
+    acc += carries[..., None]
+    acc *= pows
+    out = acc.reshape(x.shape[:-1] + (nb * block,))[..., :n]
+    if np.any(degenerate):
+        mask = np.broadcast_to(degenerate, out.shape)
+        out[mask] = np.broadcast_to(gain * x, out.shape)[mask]
+    return out
+
+
+def _seeded_smoothing(x: np.ndarray, alpha: np.ndarray, period: np.ndarray, offset: int = 0) -> np.ndarray:
+    """
+    以前 period 个值的 SMA 作种子，之后 s = alpha*x + (1-alpha)*s。
+    offset：x[0] 对应输出下标（ATR 的 TR 从第 1 根 K 线开始，offset=1）。
+    返回与 x 同形状（最后一维 +offset），种子之前为 NaN。
+    """
+    lead = x.shape[:-1]
+    n = x.shape[-1]
+    period = np.broadcast_to(period, lead)
+    alpha = np.broadcast_to(alpha, lead)
+    out = np.full(lead + (n + offset,), np.nan)
+    if n == 0:
+        return out
+
+    p_min = int(period.min())
+    if p_min > n:
+        return out
+    start = p_min - 1
+    # 把每个序列自己的种子“注入”成等价输入：种子前为 0，种子处 x' = sma / alpha
+    p_max = min(n, int(period.max()))
+    csum = np.cumsum(x[..., :p_max], axis=-1)
+    seed_idx = np.minimum(period - 1, p_max - 1)
+    sma = np.take_along_axis(csum, seed_idx[..., None], axis=-1)[..., 0] / period
+
+    # 只有 [p_min-1, p_max-1] 这一段需要按序列区分（种子前置 0 / 种子处注入）
+    head = p_max - start
+    xs = x[..., start:].copy()
+    idx = np.arange(start, start + head)
+    before = idx < (period[..., None] - 1)
+    at_seed = idx == (period[..., None] - 1)
+    xs_head = xs[..., :head]
+    xs_head[before] = 0.0
+    inject = np.broadcast_to((sma / alpha)[..., None], xs_head.shape)
+    xs_head[at_seed] = inject[at_seed]
+
+    s = _linear_recursion(xs, 1.0 - alpha, alpha)
+    s[..., :head][before] = np.nan
+    too_short = period > n
+    if np.any(too_short):
+        s[too_short] = np.nan
+    out[..., offset + start:] = s
+    return out
+
+
+def ema_array(values, period: Period) -> np.ndarray:
+    """EMA，SMA 种子，k = 2/(period+1)。"""
+    x = _as_float_array(values)
+    p, shape = _broadcast_period(x.shape[:-1], period)
+    if shape != x.shape[:-1]:
+        x = np.broadcast_to(x, shape + x.shape[-1:])
+    alpha = 2.0 / (p + 1.0)
+    return _seeded_smoothing(x, alpha, p)
+
+
+def rma_array(values, period: Period) -> np.ndarray:
+    """Wilder RMA（alpha = 1/period），SMA 种子。"""
+    x = _as_float_array(values)
+    p, shape = _broadcast_period(x.shape[:-1], period)
+    if shape != x.shape[:-1]:
+        x = np.broadcast_to(x, shape + x.shape[-1:])
+    return _seeded_smoothing(x, 1.0 / p, p)
+
+
+def true_range(highs, lows, closes) -> np.ndarray:
+    """TR，从第 1 根开始（长度 n-1），与列表版一致：不含第 0 根。"""
+    h = _as_float_array(highs)
+    l = _as_float_array(lows)
+    c = _as_float_array(closes)
+    prev_c = c[..., :-1]
+    h1 = h[..., 1:]
+    l1 = l[..., 1:]
+    return np.maximum(h1 - l1, np.maximum(np.abs(h1 - prev_c), np.abs(l1 - prev_c)))
+
+
+def atr_array(highs, lows, closes, period: Period) -> np.ndarray:
+    """ATR：TR 的 RMA 平滑，输出与 closes 等长，前 period 个为 NaN。"""
+    tr = true_range(highs, lows, closes)
+    p, shape = _broadcast_period(tr.shape[:-1], period)
+    if shape != tr.shape[:-1]:
+        tr = np.broadcast_to(tr, shape + tr.shape[-1:])
+    return _seeded_smoothing(tr, 1.0 / p, p, offset=1)
+
+
+def _rolling_extreme(x: np.ndarray, window: int, op: np.ufunc, fill: float) -> np.ndarray:
+    """
+    van Herk / Gil-Werman：按窗口长度分块，块内前缀与后缀累积极值，
+    任一窗口 = 起点所在块的后缀 op 终点所在块的前缀。O(n)，与窗口长度无关。
+    """
+    n = x.shape[-1]
+    out = np.full(x.shape, np.nan)
+    if window <= 1:
+        out[...] = x
+        return out
+    if n < window:
+        return out
+    nb = -(-n // window)
+    pad = nb * window - n
+    xb = x if pad == 0 else np.concatenate([x, np.full(x.shape[:-1] + (pad,), fill)], axis=-1)
+    xb = xb.reshape(x.shape[:-1] + (nb, window))
+    pre = op.accumulate(xb, axis=-1).reshape(x.shape[:-1] + (nb * window,))
+    suf = op.accumulate(xb[..., ::-1], axis=-1)[..., ::-1].reshape(x.shape[:-1] + (nb * window,))
+    out[..., window - 1:] = op(suf[..., :n - window + 1], pre[..., window - 1:n])
+    return out
+
+
+def rolling_max(values, window: int) -> np.ndarray:
+    """最近 window 个值的最大值（含当前），前 window-1 个为 NaN。"""
+    return _rolling_extreme(_as_float_array(values), int(window), np.maximum, -np.inf)
+
+
+def rolling_min(values, window: int) -> np.ndarray:
+    """最近 window 个值的最小值（含当前），前 window-1 个为 NaN。"""
+    return _rolling_extreme(_as_float_array(values), int(window), np.minimum, np.inf)
+
+
+def rolling_sum(values, window: int) -> np.ndarray:
+    """最近 window 个值之和（前缀和相减），前 window-1 个为 NaN。"""
+    x = _as_float_array(values)
+    window = int(window)
+    n = x.shape[-1]
+    out = np.full(x.shape, np.nan)
+    if window < 1 or n < window:
+        return out
+    c = np.cumsum(x, axis=-1)
+    out[..., window - 1] = c[..., window - 1]
+    out[..., window:] = c[..., window:] - c[..., :-window]
+    return out
+
+
+def directional_movement(highs, lows):
+    """+DM / -DM，从第 1 根开始（长度 n-1，与 true_range 对齐）。"""
+    h = _as_float_array(highs)
+    l = _as_float_array(lows)
+    up = h[..., 1:] - h[..., :-1]
+    down = l[..., :-1] - l[..., 1:]
+    plus = np.where((up > down) & (up > 0.0), up, 0.0)
+    minus = np.where((down > up) & (down > 0.0), down, 0.0)
+    return plus, minus
+
+
+def _dx_from_smoothed(plus_s: np.ndarray, minus_s: np.ndarray, tr_s: np.ndarray):
+    # DI = 100 * RMA(DM) / RMA(TR)；DX = 100 * |DI+ - DI-| / (DI+ + DI-)，0/0 记 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        di_p = np.where(tr_s > 0.0, 100.0 * plus_s / tr_s, 0.0)
+        di_m = np.where(tr_s > 0.0, 100.0 * minus_s / tr_s, 0.0)
+        total = di_p + di_m
+        dx = np.where(total > 0.0, 100.0 * np.abs(di_p - di_m) / total, 0.0)
+    nan = np.isnan(tr_s)
+    for a in (di_p, di_m, dx):
+        a[nan] = np.nan
+    return di_p, di_m, dx
+
+
+def dmi_array(highs, lows, closes, period: Period) -> Dict[str, np.ndarray]:
+    """
+    Wilder DMI：+DI / -DI / ADX，输出与 closes 等长。
+    DM 与 TR 都用 RMA（SMA 种子）平滑：DI 前 period 个为 NaN，ADX = RMA(DX)，前 2*period-1 个为 NaN。
+    """
+    tr = true_range(highs, lows, closes)
+    plus, minus = directional_movement(highs, lows)
+    p, shape = _broadcast_period(tr.shape[:-1], period)
+    if shape != tr.shape[:-1]:
+        tr, plus, minus = (np.broadcast_to(a, shape + a.shape[-1:]) for a in (tr, plus, minus))
+    alpha = 1.0 / p
+    tr_s = _seeded_smoothing(tr, alpha, p, offset=1)
+    di_p, di_m, dx = _dx_from_smoothed(_seeded_smoothing(plus, alpha, p, offset=1),
+                                       _seeded_smoothing(minus, alpha, p, offset=1), tr_s)
+    n = dx.shape[-1]
+    adx = np.full(dx.shape, np.nan)
+    # DX 从下标 period 起有效；各序列周期不同时按周期分组平滑
+    p_full = np.broadcast_to(p, dx.shape[:-1])
+    for q in np.unique(p_full):
+        q = int(q)
+        if q >= n:
+            continue
+        rows = p_full == q
+        adx[rows, q:] = _seeded_smoothing(dx[rows, q:], np.float64(1.0 / q), np.int64(q))
+    return {"plus_di": di_p, "minus_di": di_m, "adx": adx}
+
+
+def adx_array(highs, lows, closes, period: Period) -> np.ndarray:
+    """ADX（Wilder），见 dmi_array。"""
+    return dmi_array(highs, lows, closes, period)["adx"]
+
+
+def rsi_array(closes, period: Period) -> np.ndarray:
+    """
+    Wilder RSI：涨跌幅分别 RMA 平滑（SMA 种子），输出与 closes 等长，前 period 个为 NaN。
+    平均跌幅为 0 时记 100，涨跌都为 0 时记 50。
+    """
+    c = _as_float_array(closes)
+    ch = c[..., 1:] - c[..., :-1]
+    p, shape = _broadcast_period(ch.shape[:-1], period)
+    if shape != ch.shape[:-1]:
+        ch = np.broadcast_to(ch, shape + ch.shape[-1:])
+    gain = _seeded_smoothing(np.maximum(ch, 0.0), 1.0 / p, p, offset=1)
+    loss = _seeded_smoothing(np.maximum(-ch, 0.0), 1.0 / p, p, offset=1)
+    return _rsi_from_smoothed(gain, loss)
+
+
+def _rsi_from_smoothed(gain, loss):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsi = np.where(loss > 0.0, 100.0 - 100.0 / (1.0 + gain / loss), np.where(gain > 0.0, 100.0, 50.0))
+    return np.where(np.isnan(gain), np.nan, rsi)
+
+
+# rolling_std 分块大小（窗口起点个数），限制 sliding_window_view 临时数组的内存
+_STD_BLOCK = 1 << 16
+
+
+def rolling_mean_std(values, window: int, ddof: int = 0):
+    """
+    滑动均值与标准差（两遍法，逐窗口先减均值再平方，不用 sum(x^2) 相减，价格量级大也不丢精度）。
+    O(n*window)，按块处理；前 window-1 个为 NaN。
+    """
+    x = _as_float_array(values)
+    window = int(window)
+    n = x.shape[-1]
+    mean = np.full(x.shape, np.nan)
+    std = np.full(x.shape, np.nan)
+    if window < 1 or n < window or window <= ddof:
+        return mean, std
+    view = np.lib.stride_tricks.sliding_window_view(x, window, axis=-1)
+    for a in range(0, n - window + 1, _STD_BLOCK):
+        v = view[..., a:a + _STD_BLOCK, :]
+        m = v.mean(axis=-1)
+        d = v - m[..., None]
+        mean[..., window - 1 + a:window - 1 + a + m.shape[-1]] = m
+        std[..., window - 1 + a:window - 1 + a + m.shape[-1]] = np.sqrt(
+            np.einsum("...i,...i->...", d, d) / (window - ddof))
+    return mean, std
+
+
+def bollinger_array(closes, period: int, mult: float = 2.0) -> Dict[str, np.ndarray]:
+    """布林带：mid = SMA，upper/lower = mid ± mult * 总体标准差；前 period-1 个为 NaN。"""
+    mid, sd = rolling_mean_std(closes, period)
+    return {"mid": mid, "upper": mid + mult * sd, "lower": mid - mult * sd}
+
+
+def donchian_array(highs, lows, period: int) -> Dict[str, np.ndarray]:
+    """
+    唐奇安通道：最近 period 根（含当前）的最高价 / 最低价及中线；前 period-1 个为 NaN。
+    做突破判断时用上一根的通道（当前价与“不含自己”的通道比较）。
+    """
+    upper = rolling_max(highs, period)
+    lower = rolling_min(lows, period)
+    return {"upper": upper, "lower": lower, "mid": (upper + lower) / 2.0}
+
+
+def keltner_array(highs, lows, closes, ema_len: Period, atr_len: Period, mult: float = 2.0) -> Dict[str, np.ndarray]:
+    """肯特纳通道：mid = EMA(close)，upper/lower = mid ± mult * ATR；任一未预热为 NaN。"""
+    mid = ema_array(closes, ema_len)
+    a = atr_array(highs, lows, closes, atr_len)
+    return {"mid": mid, "upper": mid + mult * a, "lower": mid - mult * a}
+
+
+def supertrend_step(state, hl2: float, atr: float, close: float, prev_close: float, mult: float):
+    """
+    SuperTrend 单步（批量与增量共用）：state = (上轨, 下轨, 方向) 或 None（首根有效 ATR）。
+    上轨只在变低或上一根收盘突破它时更新，下轨对称；方向 1 = 上升（线取下轨），-1 = 下降（线取上轨）。
+    首根有效K线按下降处理（与 TradingView ta.supertrend 一致）。
+    """
+    bu = hl2 + mult * atr
+    bl = hl2 - mult * atr
+    if state is None:
+        return bu, bl, -1
+    u, l, d = state
+    u = bu if (bu < u or prev_close > u) else u
+    l = bl if (bl > l or prev_close < l) else l
+    if d == -1:
+        d = 1 if close > u else -1
+    else:
+        d = -1 if close < l else 1
+    return u, l, d
+
+
+def supertrend_array(highs, lows, closes, period: int, mult: float = 3.0) -> Dict[str, np.ndarray]:
+    """
+    SuperTrend：line（止损线）与 direction（1 / -1），ATR 预热期（前 period 个）为 NaN。
+    轨道有路径依赖（依赖上一步的轨道与方向），无法闭式向量化：ATR 向量化算好后逐根递推，
+    2-D 输入逐行处理。
+    """
+    h = _as_float_array(highs)
+    l = _as_float_array(lows)
+    c = _as_float_array(closes)
+    a = atr_array(h, l, c, int(period))
+    hl2 = (h + l) / 2.0
+    line = np.full(c.shape, np.nan)
+    direction = np.full(c.shape, np.nan)
+    n = c.shape[-1]
+    start = int(period)
+    if n <= start:
+        return {"line": line, "direction": direction}
+    rows = int(np.prod(c.shape[:-1], dtype=np.int64))
+    lines = line.reshape(rows, n)
+    dirs = direction.reshape(rows, n)
+    for r, (hr, ar, cr) in enumerate(zip(hl2.reshape(rows, n)[:, start:].tolist(),
+                                         a.reshape(rows, n)[:, start:].tolist(),
+                                         c.reshape(rows, n)[:, start - 1:].tolist())):
+        out_l, out_d = [], []
+        state = None
+        for i in range(len(hr)):
+            state = supertrend_step(state, hr[i], ar[i], cr[i + 1], cr[i], mult)
+            out_l.append(state[1] if state[2] == 1 else state[0])
+            out_d.append(state[2])
+        lines[r, start:] = out_l
+        dirs[r, start:] = out_d
+    return {"line": line, "direction": direction}
+
+
+def candles_to_arrays(candles: List[List[str]]) -> Dict[str, np.ndarray]:
+    """
+    OKX K线（字符串二维列表，任意顺序）-> 按时间正序的列数组。
+    返回 ts(int64) / open / high / low / close / vol(float64) / confirm(bool)。
+    confirm 取第 9 列（"1"=已收盘）；没有该列时（旧接口/模拟数据）视最新一根为未收盘。
+    """
+    if not candles:
+        empty = np.empty(0, dtype=np.float64)
+        return {"ts": np.empty(0, dtype=np.int64), "open": empty, "high": empty,
+                "low": empty, "close": empty, "vol": empty, "confirm": np.empty(0, dtype=bool)}
+    raw = np.array([row[:6] for row in candles], dtype=np.float64)
+    order = np.argsort(raw[:, 0], kind="stable")
+    raw = raw[order]
+    if all(len(row) > 8 for row in candles):
+        confirm = np.array([row[8] == "1" for row in candles], dtype=bool)[order]
+    else:
+        confirm = np.ones(len(candles), dtype=bool)
+        confirm[-1] = False
+    return {
+        "ts": raw[:, 0].astype(np.int64),
+        "open": raw[:, 1],
+        "high": raw[:, 2],
+        "low": raw[:, 3],
+        "close": raw[:, 4],
+        "vol": raw[:, 5],
+        "confirm": confirm,
+    }
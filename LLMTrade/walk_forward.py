@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+滚动前推（walk-forward）优化：把历史切成 训练/测试 窗口，
+在每个训练段上选最优 BotConfig，然后在紧随其后的测试段上做样本外评估。
+
+- 各窗口在进程池里并行（沿用 sweep 的共享内存K线 + 进程内指标缓存）
+- 指标是因果的（只依赖过去），整段算一次，所有窗口按下标切片复用，无需每段重算预热
+
+用法：
+    python walk_forward.py --synthetic 87600 --train 8760 --test 2190
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backtest import FillModel, run_backtest, synthetic_bars, load_bars
+from config import BotConfig
+from sweep import SharedBars, SWEEP_FIELDS, init_worker, worker_bars, worker_indicators, grid
+
+Window = Tuple[int, int, int, int]   # (train_start, train_end, test_start, test_end)
+
+
+def make_windows(n: int, train: int, test: int, step: Optional[int] = None,
+                 anchored: bool = False, start: int = 0) -> List[Window]:
+    """
+    rolling：训练段长度固定，整体每次前移 step（默认 = test）
+    anchored：训练段起点固定在 start，只往后扩
+    """
+    step = step or test
+    out = []
+    train_start = start
+    train_end = start + train
+    while train_end + test <= n:
+        out.append((train_start, train_end, train_end, train_end + test))
+        train_end += step
+        if not anchored:
+            train_start += step
+    return out
+
+
+def score(stats: Dict[str, float], objective: str) -> float:
+    if objective == "return_over_dd":
+        return stats["total_return"] / max(stats["max_drawdown"], 1e-4)
+    return stats[objective]
+
+
+def _run_window(idx: int, window: Window, configs: List[BotConfig],
+                objective: str) -> Tuple[Dict[str, Any], np.ndarray]:
+    """返回 (公开结果行, 测试段归一化权益曲线)；曲线只给 summarize 拼样本外，不进结果行。"""
+    tr0, tr1, te0, te1 = window
+    bars, fill, quote = worker_bars()
+    best_cfg, best_stats, best_score = None, None, -np.inf
+    for cfg in configs:
+        stats = run_backtest(cfg, bars, fill=fill, initial_quote=quote, start=tr0, end=tr1,
+                             indicators=worker_indicators(cfg)).stats
+        s = score(stats, objective)
+        if s > best_score:
+            best_cfg, best_stats, best_score = cfg, stats, s
+    test = run_backtest(best_cfg, bars, fill=fill, initial_quote=quote, start=te0, end=te1,
+                        indicators=worker_indicators(best_cfg))
+    ts = bars["ts"]
+    row = {
+        "window": idx,
+        "train_from": int(ts[tr0]), "train_to": int(ts[tr1 - 1]),
+        "test_from": int(ts[te0]), "test_to": int(ts[te1 - 1]),
+        "train_score": best_score,
+        "train_return": best_stats["total_return"],
+        "test_return": test.stats["total_return"],
+        "test_max_drawdown": test.stats["max_drawdown"],
+        "test_trades": test.stats["trades"],
+    }
+    row.update({k: getattr(best_cfg, k) for k in SWEEP_FIELDS})
+    return row, test.equity / test.stats["initial_equity"]
+
+
+def summarize(rows: List[Dict[str, Any]], curves: List[np.ndarray]) -> Dict[str, float]:
+    """curves[i] 为 rows[i] 测试段的归一化权益曲线。"""
+    if not rows:
+        return {}
+    test_ret = np.array([r["test_return"] for r in rows])
+    train_ret = np.array([r["train_return"] for r in rows])
+    # 样本外拼接：各测试段按收益复利连起来
+    curve = np.concatenate(curves)
+    scale = np.repeat(np.cumprod(np.concatenate([[1.0], 1.0 + test_ret[:-1]])), [c.size for c in curves])
+    oos = curve * scale
+    peak = np.maximum.accumulate(oos) if oos.size else oos
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eff = np.where(np.abs(train_ret) > 1e-12, test_ret / train_ret, np.nan)
+    return {
+        "windows": float(len(rows)),
+        "oos_return": float(np.prod(1.0 + test_ret) - 1.0),
+        "oos_max_drawdown": float(np.max(1.0 - oos / peak)) if oos.size else 0.0,
+        "mean_test_return": float(test_ret.mean()),
+        "positive_windows": float((test_ret > 0).mean()),
+        "mean_train_return": float(train_ret.mean()),
+        "walk_forward_efficiency": float(np.nanmedian(eff)) if np.any(~np.isnan(eff)) else float("nan"),
+    }
+
+
+def run_walk_forward(bars: Dict[str, np.ndarray], configs: List[BotConfig], windows: List[Window],
+                     objective: str = "total_return", workers: Optional[int] = None,
+                     fill: Optional[FillModel] = None,
+                     initial_quote: float = 10000.0) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    fill = fill or FillModel()
+    configs = sorted(configs, key=lambda c: (c.ema_fast, c.ema_slow, c.atr_len))
+    results: List[Tuple[Dict[str, Any], np.ndarray]] = []
+    with SharedBars(bars) as shared, ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count() or 1, initializer=init_worker,
+            initargs=(shared.spec, fill, initial_quote)) as pool:
+        futures = [pool.submit(_run_window, i, w, configs, objective) for i, w in enumerate(windows)]
+        for fut in as_completed(futures):
+            results.append(fut.result())
+    results.sort(key=lambda rc: rc[0]["window"])
+    rows = [row for row, _ in results]
+    return rows, summarize(rows, [curve for _, curve in results])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TrendBot walk-forward 优化")
+    parser.add_argument("--inst", default=BotConfig.inst_id)
+    parser.add_argument("--bar", default=BotConfig.bar)
+    parser.add_argument("--store", default=BotConfig.candle_store_dir)
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--train", type=int, default=24 * 365, help="训练段K线数")
+    parser.add_argument("--test", type=int, default=24 * 90, help="测试段K线数")
+    parser.add_argument("--step", type=int, default=0)
+    parser.add_argument("--anchored", action="store_true")
+    parser.add_argument("--objective", default="total_return", help="total_return / return_over_dd / ...")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--no-reset", action="store_true", help="清仓后不重置分批进度（同实盘默认）")
+    args = parser.parse_args()
+
+    base = BotConfig(inst_id=args.inst, bar=args.bar, reset_cycle_when_flat=not args.no_reset)
+    bars = synthetic_bars(args.synthetic, args.bar) if args.synthetic else load_bars(args.store, args.inst, args.bar)
+    bars = {k: np.asarray(v) for k, v in bars.items()}
+    windows = make_windows(bars["ts"].size, args.train, args.test, args.step or None, args.anchored)
+    if not windows:
+        print("K线不足以切出一个 训练+测试 窗口")
+        return
+    configs = grid(base, ema_fast=[10, 20, 30], ema_slow=[50, 100], trail_atr_mult=[1.5, 2.2, 3.0],
+                   add_on_pullback_atr=[0.5, 0.8, 1.2])
+    rows, summary = run_walk_forward(bars, configs, windows, args.objective, args.workers or None)
+    for r in rows:
+        print(f"[WF] #{r['window']:<3d} train {r['train_return']:+.4f}  test {r['test_return']:+.4f}  "
+              f"ema {r['ema_fast']}/{r['ema_slow']} trail {r['trail_atr_mult']} pullback {r['add_on_pullback_atr']}")
+    for k, v in summary.items():
+        print(f"{k:>24s}: {v:.6g}")
+
+
+if __name__ == "__main__":
+    main()
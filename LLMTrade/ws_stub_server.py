@@ -0,0 +1,196 @@
+"""
+本地 OKX WebSocket 替身服务器（测试/演示用，不联网），基于 aiohttp.web，后台线程运行。
+
+- 路径 /ws/v5/public、/ws/v5/business、/ws/v5/private 都接受连接
+- /private 需先 op=login（给了 api_secret 就校验签名）；订阅 account 时先推一条余额快照
+- op=subscribe / unsubscribe：按 OKX 格式回 event 确认；文本 "ping" 回 "pong"
+- push(arg, data)：按订阅广播（线程安全，测试里直接调用）
+- push_candle / push_ticker / push_account / push_order：构造与真实接口一致的推送
+- drop_connections()：主动断开所有客户端，用来测断线重连/重订阅
+"""
+import asyncio
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import WSMsgType, web
+
+from account_stream import login_args
+from okx_stub_server import synthetic_candle
+
+
+def _arg_key(arg: Dict[str, Any]) -> Tuple[str, str]:
+    return arg.get("channel", ""), arg.get("instId", "")
+
+
+class StubWSServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, api_secret: str = "",
+                 balances: Optional[Dict[str, float]] = None):
+        self.host = host
+        self.port = port
+        self.api_secret = api_secret
+        self.balances: Dict[str, float] = dict(balances or {"BTC": 0.0, "USDT": 10000.0})
+        self.clients: Dict[web.WebSocketResponse, set] = {}
+        self.private: Dict[web.WebSocketResponse, bool] = {}     # 私有连接 -> 是否已登录
+        self.messages: List[Dict[str, Any]] = []      # 收到的 op 消息（按顺序）
+        self.connects = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    @property
+    def public_url(self) -> str:
+        return self.base_url + "/ws/v5/public"
+
+    @property
+    def business_url(self) -> str:
+        return self.base_url + "/ws/v5/business"
+
+    @property
+    def private_url(self) -> str:
+        return self.base_url + "/ws/v5/private"
+
+    # ---------- 生命周期 ----------
+    def start(self) -> "StubWSServer":
+        self._thread = threading.Thread(target=self._serve, name="ws-stub", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _serve(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._setup())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _setup(self) -> None:
+        app = web.Application()
+        app.router.add_get("/ws/v5/{kind}", self._ws_handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def stop(self) -> None:
+        self.call(self._shutdown())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join()
+        self._loop.close()
+
+    async def _shutdown(self) -> None:
+        for ws in list(self.clients):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def __enter__(self) -> "StubWSServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def call(self, coro: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    # ---------- 连接处理 ----------
+    async def _ws_handler(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.clients[ws] = set()
+        if request.match_info["kind"] == "private":
+            self.private[ws] = False
+        self.connects += 1
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                if msg.data == "ping":
+                    await ws.send_str("pong")
+                    continue
+                req = json.loads(msg.data)
+                self.messages.append(req)
+                await self.on_op(ws, req)
+        finally:
+            self.clients.pop(ws, None)
+            self.private.pop(ws, None)
+        return ws
+
+    async def on_op(self, ws: web.WebSocketResponse, req: Dict[str, Any]) -> None:
+        op = req.get("op")
+        if op == "login":
+            args = (req.get("args") or [{}])[0]
+            ok = not self.api_secret or args.get("sign") == login_args(
+                args.get("apiKey", ""), self.api_secret, args.get("passphrase", ""), args.get("timestamp"))["sign"]
+            if ws in self.private:
+                self.private[ws] = ok
+            await ws.send_str(json.dumps({"event": "login" if ok else "error",
+                                          "code": "0" if ok else "60009", "msg": "" if ok else "Login failed."}))
+            return
+        if ws in self.private and not self.private[ws]:
+            await ws.send_str(json.dumps({"event": "error", "code": "60011", "msg": "Please log in"}))
+            return
+        if op in ("subscribe", "unsubscribe"):
+            subs = self.clients.get(ws, set())
+            for arg in req.get("args", []):
+                if op == "subscribe":
+                    subs.add(_arg_key(arg))
+                else:
+                    subs.discard(_arg_key(arg))
+                await ws.send_str(json.dumps({"event": op, "arg": arg, "connId": "stub"}))
+                if op == "subscribe" and arg.get("channel") == "account":
+                    await ws.send_str(json.dumps({"arg": arg, "data": [self._account_data(self.balances)]}))
+        else:
+            await ws.send_str(json.dumps({"event": "error", "code": "60012", "msg": f"Invalid request: {op}"}))
+
+    # ---------- 推送 ----------
+    def subscribers(self, channel: str, inst_id: str) -> int:
+        return sum(1 for subs in self.clients.values() if (channel, inst_id) in subs)
+
+    def push(self, arg: Dict[str, Any], data: List[Any]) -> int:
+        return self.call(self._push(arg, data))
+
+    async def _push(self, arg: Dict[str, Any], data: List[Any]) -> int:
+        raw = json.dumps({"arg": arg, "data": data})
+        sent = 0
+        for ws, subs in list(self.clients.items()):
+            if _arg_key(arg) in subs and not ws.closed:
+                await ws.send_str(raw)
+                sent += 1
+        return sent
+
+    def push_candle(self, inst_id: str, bar: str, ts: int, confirm: bool = True) -> int:
+        return self.push({"channel": "candle" + bar, "instId": inst_id},
+                         [synthetic_candle(inst_id, bar, ts, confirm)])
+
+    def push_ticker(self, inst_id: str, last: float, ts: int) -> int:
+        return self.push({"channel": "tickers", "instId": inst_id},
+                         [{"instType": "SPOT", "instId": inst_id, "last": str(last), "ts": str(ts)}])
+
+    @staticmethod
+    def _account_data(balances: Dict[str, float]) -> Dict[str, Any]:
+        return {"details": [{"ccy": c, "availBal": str(v), "cashBal": str(v), "frozenBal": "0"}
+                            for c, v in balances.items()]}
+
+    def push_account(self, changes: Dict[str, float]) -> int:
+        # 只推变动的币种（与真实接口一致）
+        self.balances.update(changes)
+        return self.push({"channel": "account"}, [self._account_data(changes)])
+
+    def push_order(self, order: Dict[str, Any]) -> int:
+        return self.push({"channel": "orders", "instType": "SPOT"}, [order])
+
+    def push_algo(self, algo: Dict[str, Any]) -> int:
+        return self.push({"channel": "orders-algo", "instType": "SPOT"}, [algo])
+
+    def drop_connections(self) -> None:
+        async def _drop() -> None:
+            for ws in list(self.clients):
+                await ws.close()
+        self.call(_drop())